@@ -0,0 +1,35 @@
+"""add pressure_anomaly_scan: водяной знак инкрементального сканера аномалий
+
+Revision ID: fa4anomalyscan01
+Revises: fa3signatories02
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "fa4anomalyscan01"
+down_revision: Union[str, Sequence[str], None] = "fa3signatories02"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "pressure_anomaly_scan",
+        sa.Column(
+            "well_id", sa.Integer(), sa.ForeignKey("wells.id"), primary_key=True,
+        ),
+        sa.Column("scanned_until", sa.DateTime(), nullable=False),
+        sa.Column("last_run_at", sa.DateTime(), nullable=True),
+        sa.Column("last_rows", sa.Integer(), nullable=True),
+        sa.Column("last_found", sa.Integer(), nullable=True),
+        sa.Column("last_created", sa.Integer(), nullable=True),
+        sa.Column("last_duration_ms", sa.Float(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("pressure_anomaly_scan")
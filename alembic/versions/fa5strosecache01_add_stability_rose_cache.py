@@ -0,0 +1,64 @@
+"""add stability_rose_axes / stability_rose_calibration: кэш и калибровка розы нестабильности
+
+Revision ID: fa5strosecache01
+Revises: fa4anomalyscan01
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "fa5strosecache01"
+down_revision: Union[str, Sequence[str], None] = "fa4anomalyscan01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stability_rose_axes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("well", sa.String(32), nullable=False),
+        sa.Column("anchor", sa.Date(), nullable=False),
+        sa.Column("source", sa.String(16), nullable=False, server_default="well_daily"),
+        sa.Column("trend_days", sa.Integer(), nullable=False),
+        sa.Column("downtime_days", sa.Integer(), nullable=False),
+        sa.Column("rows_count", sa.Integer(), nullable=False),
+        sa.Column("data_loaded_at", sa.DateTime(), nullable=True),
+        sa.Column("choke_mm", sa.Float(), nullable=True),
+        sa.Column("n_days", sa.Integer(), nullable=False),
+        sa.Column("n_work", sa.Integer(), nullable=False),
+        sa.Column("l_star", sa.Integer(), nullable=False),
+        sa.Column("raw", postgresql.JSONB(), nullable=False),
+        sa.Column("confidence", postgresql.JSONB(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.Column("batch_id", sa.String(16), nullable=True),
+        sa.UniqueConstraint(
+            "well", "anchor", "source", "trend_days", "downtime_days",
+            name="uq_stability_rose_axes_key",
+        ),
+    )
+    op.create_index("ix_stability_rose_axes_well", "stability_rose_axes", ["well"])
+
+    op.create_table(
+        "stability_rose_calibration",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("source", sa.String(16), nullable=False, server_default="well_daily"),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.Column("batch_id", sa.String(16), nullable=True),
+        sa.Column("n_wells", sa.Integer(), nullable=False),
+        sa.Column("n_samples", sa.Integer(), nullable=False),
+        sa.Column("params", postgresql.JSONB(), nullable=False),
+        sa.Column("percentiles", postgresql.JSONB(), nullable=False),
+        sa.Column("scales", postgresql.JSONB(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False, server_default=sa.text("false")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("stability_rose_calibration")
+    op.drop_index("ix_stability_rose_axes_well", table_name="stability_rose_axes")
+    op.drop_table("stability_rose_axes")
@@ -0,0 +1,45 @@
+"""add job_execution_logs queue columns: очередь генерации отчётов
+
+Revision ID: fa6reportjobs01
+Revises: fa5strosecache01
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "fa6reportjobs01"
+down_revision: Union[str, Sequence[str], None] = "fa5strosecache01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("job_execution_logs", sa.Column("dedupe_key", sa.String(64), nullable=True))
+    op.add_column("job_execution_logs", sa.Column("stage", sa.String(50), nullable=True))
+    op.add_column("job_execution_logs", sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+    op.add_column(
+        "job_execution_logs",
+        sa.Column("cancel_requested", sa.Boolean(), nullable=False,
+                  server_default=sa.text("false")),
+    )
+    op.add_column("job_execution_logs", sa.Column("artifact_path", sa.Text(), nullable=True))
+    # Одинаковый запрос, пока он в очереди или выполняется, — одна запись.
+    op.create_index(
+        "uq_job_log_active_dedupe", "job_execution_logs", ["dedupe_key"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+    op.create_index(
+        "idx_job_log_queued", "job_execution_logs", ["id"],
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_job_log_queued", table_name="job_execution_logs")
+    op.drop_index("uq_job_log_active_dedupe", table_name="job_execution_logs")
+    for col in ("artifact_path", "cancel_requested", "heartbeat_at", "stage", "dedupe_key"):
+        op.drop_column("job_execution_logs", col)
@@ -55,6 +55,7 @@ from backend.services.reagent_balance_service import ReagentBalanceService
 from backend.models.users import DashboardUser
 from backend.services.well_sync_service import sync_wells_from_events, fix_wells_missing_data
 from backend.services.pressure_aggregate_service import get_wells_pressure_stats
+from backend.services import fleet_snapshot
 from backend.models.events import Event
 from backend.models.reagents import ReagentSupply
 from .api import wells
@@ -486,6 +487,38 @@ def ensure_pressure_raw_table():
         print(f">>> pressure_raw: ошибка при создании: {e}")
 
 
+@app.on_event("startup")
+def start_report_job_workers():
+    """Процессы-воркеры очереди генерации отчётов (report_job_queue)."""
+    from backend.services import report_job_queue
+    try:
+        report_job_queue.start_workers(settings.REPORT_JOB_WORKERS)
+    except Exception as e:
+        print(f">>> report_job_queue: воркеры не запущены: {e}")
+
+
+@app.on_event("shutdown")
+def stop_report_job_workers():
+    from backend.services import report_job_queue
+    report_job_queue.stop_workers()
+
+
+@app.on_event("startup")
+def start_plotly_render_daemon():
+    """Тёплый рендерер Plotly-графиков для PDF (plotly_render_daemon)."""
+    from backend.services import plotly_render_daemon
+    try:
+        plotly_render_daemon.spawn(settings.PLOTLY_RENDER_TABS)
+    except Exception as e:
+        print(f">>> plotly_render_daemon: не запущен: {e}")
+
+
+@app.on_event("shutdown")
+def stop_plotly_render_daemon():
+    from backend.services import plotly_render_daemon
+    plotly_render_daemon.stop_spawned()
+
+
 @app.get("/", include_in_schema=False)
 async def root(current_user: str = Depends(get_current_user)):
     return RedirectResponse("/visual")
@@ -795,113 +828,6 @@ def _now_db() -> datetime:
     return datetime.utcnow() + timedelta(hours=5)
 
 
-# ── Дебит для карточек дашборда ─────────────────────────────
-import math as _math
-
-def _calc_daily_flow_for_tiles(
-    well_ids: list[int],
-) -> tuple[dict[int, float | None], dict[int, float | None]]:
-    """
-    Средний суточный дебит за сегодня и вчера для списка скважин.
-
-    Использует pressure_hourly (уже агрегированные средние за час),
-    формулу истечения газа через штуцер (та же, что в flow_rate/calculator.py),
-    и choke_diam_mm из well_construction.
-
-    Returns: (flow_today, flow_yesterday) — dict[well_id] → float | None
-    """
-    from backend.db import engine as pg_engine
-
-    if not well_ids:
-        return {}, {}
-
-    # Кунград UTC+5: «сегодня» = 00:00 .. now по UTC+5
-    now_kungrad = datetime.utcnow() + timedelta(hours=5)
-    today_start_utc = (
-        now_kungrad.replace(hour=0, minute=0, second=0, microsecond=0)
-        - timedelta(hours=5)
-    )
-    yesterday_start_utc = today_start_utc - timedelta(days=1)
-
-    well_id_csv = ",".join(str(int(w)) for w in well_ids)
-
-    # 1) Медианные давления за сегодня и вчера (из pressure_hourly)
-    # Медиана вместо AVG — защита от ложных скачков датчиков (tube=1.7 вместо 17)
-    sql_pressure = text(f"""
-        SELECT
-            well_id,
-            CASE WHEN hour_start >= :today THEN 'today' ELSE 'yesterday' END AS day,
-            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY CASE WHEN p_tube_avg > 0 AND p_tube_avg <= 85 THEN p_tube_avg END) AS p_tube,
-            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY CASE WHEN p_line_avg > 0 AND p_line_avg <= 85 THEN p_line_avg END) AS p_line
-        FROM pressure_hourly
-        WHERE well_id IN ({well_id_csv})
-          AND hour_start >= :yesterday
-        GROUP BY well_id, day
-    """)
-
-    # 2) Штуцеры для всех скважин (batch)
-    sql_choke = text(f"""
-        SELECT DISTINCT ON (w.id)
-            w.id AS well_id,
-            wc.choke_diam_mm
-        FROM wells w
-        JOIN well_construction wc ON w.number::text = wc.well_no
-        WHERE w.id IN ({well_id_csv})
-          AND wc.choke_diam_mm IS NOT NULL
-        ORDER BY w.id, wc.data_as_of DESC NULLS LAST
-    """)
-
-    flow_today: dict[int, float | None] = {}
-    flow_yesterday: dict[int, float | None] = {}
-
-    try:
-        with pg_engine.connect() as conn:
-            # Давления
-            pressure_rows = conn.execute(
-                sql_pressure,
-                {"today": today_start_utc, "yesterday": yesterday_start_utc},
-            ).fetchall()
-
-            # Штуцеры
-            choke_rows = conn.execute(sql_choke).fetchall()
-    except Exception:
-        return {}, {}
-
-    choke_map: dict[int, float] = {r[0]: float(r[1]) for r in choke_rows}
-
-    # Формула (идентична calculator.py DEFAULT_FLOW)
-    C1 = 2.919
-    C2 = 4.654
-    C3 = 286.95
-    multiplier = 4.1
-    crit_ratio = 0.5
-
-    def _q(p_tube: float, p_line: float, choke_mm: float) -> float:
-        if p_tube <= p_line or p_tube <= 0:
-            return 0.0
-        r = (p_tube - p_line) / p_tube
-        choke_sq = (choke_mm / C2) ** 2
-        if r < crit_ratio:
-            q = C1 * choke_sq * p_tube * (1.0 - r / 1.5) * _math.sqrt(max(r / C3, 0.0))
-        else:
-            q = 0.667 * C1 * choke_sq * p_tube * _math.sqrt(0.5 / C3)
-        return max(q * multiplier, 0.0)
-
-    for row in pressure_rows:
-        wid, day_label, pt, pl = row[0], row[1], row[2], row[3]
-        choke = choke_map.get(wid)
-        if pt is None or pl is None or choke is None:
-            val = None
-        else:
-            val = round(_q(float(pt), float(pl), choke), 2)
-        if day_label == "today":
-            flow_today[wid] = val
-        else:
-            flow_yesterday[wid] = val
-
-    return flow_today, flow_yesterday
-
-
 # === Наша первая страница дашборда ===
 @app.get("/visual", response_class=HTMLResponse)
 def visual_page(
@@ -939,8 +865,9 @@ def visual_page(
         .all()
     )
 
-    print(f"[visual_page] Загружено {len(all_wells)} скважин из wells")
-    print(f"[visual_page] Скважины: {[(w.id, w.number, w.name) for w in all_wells]}")
+    # Статусы, подстатусы, давления, дебит и последние события — из снимка
+    # парка (кэш на интервал пайплайна, см. services/fleet_snapshot.py)
+    snapshot = fleet_snapshot.get_snapshot(db)
 
     # 2) Какие скважины показывать как плитки — определяется ПОСЛЕ загрузки статусов (см. ниже)
 
@@ -948,28 +875,13 @@ def visual_page(
     now_naive = _to_naive(now)
 
     # ----- A) ТЕКУЩИЙ СТАТУС ДЛЯ ВСЕХ СКВАЖИН -----
-    if all_wells:
-        all_ids = [w.id for w in all_wells]
-
-        active_statuses = (
-            db.query(WellStatus)
-            .filter(
-                WellStatus.well_id.in_(all_ids),
-                WellStatus.dt_end.is_(None),
-            )
-            .all()
-        )
-        by_well_id = {st.well_id: st for st in active_statuses}
-    else:
-        by_well_id = {}
-
     for w in all_wells:
-        st = by_well_id.get(w.id)
-        if st:
-            w.current_status = st.status
-            w.current_status_css = css_by_label(st.status)
+        tile = snapshot.tile(w.id)
+        if tile and tile.status:
+            w.current_status = tile.status
+            w.current_status_css = css_by_label(tile.status)
 
-            start_dt = _to_naive(st.dt_start)
+            start_dt = _to_naive(tile.status_start)
             w.current_status_start = start_dt
 
             if start_dt and now_naive:
@@ -984,25 +896,12 @@ def visual_page(
             w.current_status_days = None
 
     # ----- A2) ТЕКУЩИЙ ПОДСТАТУС ДЛЯ ВСЕХ СКВАЖИН -----
-    if all_wells:
-        active_substatuses = (
-            db.query(WellSubStatus)
-            .filter(
-                WellSubStatus.well_id.in_(all_ids),
-                WellSubStatus.dt_end.is_(None),
-            )
-            .all()
-        )
-        substatus_by_well = {sst.well_id: sst for sst in active_substatuses}
-    else:
-        substatus_by_well = {}
-
     for w in all_wells:
-        sst = substatus_by_well.get(w.id)
-        if sst:
-            w.current_substatus = sst.sub_status
-            w.current_substatus_color = substatus_color(sst.sub_status)
-            w.current_substatus_start = _to_naive(sst.dt_start)
+        tile = snapshot.tile(w.id)
+        if tile and tile.substatus:
+            w.current_substatus = tile.substatus
+            w.current_substatus_color = substatus_color(tile.substatus)
+            w.current_substatus_start = _to_naive(tile.substatus_start)
         else:
             w.current_substatus = "В работе"
             w.current_substatus_color = "#10b981"
@@ -1026,38 +925,10 @@ def visual_page(
         if not tiles:
             tiles = all_wells
 
-    print(f"[visual_page] Tiles: {len(tiles)} скважин (приоритетные статусы: {PRIORITY_STATUSES})")
-
     # ----- A3) ПОСЛЕДНИЕ СОБЫТИЯ ДЛЯ КАЖДОЙ СКВАЖИНЫ (2 шт) -----
-    if tiles:
-        well_keys = []
-        _key_to_id = {}
-        for w in tiles:
-            k = str(w.number) if w.number else str(w.id)
-            well_keys.append(k)
-            _key_to_id[k] = w.id
-
-        recent_events_raw = (
-            db.query(Event)
-            .filter(Event.well.in_(well_keys))
-            .order_by(Event.event_time.desc())
-            .limit(len(well_keys) * 3)
-            .all()
-        )
-        recent_by_well: dict[int, list] = {}
-        for ev in recent_events_raw:
-            wid = _key_to_id.get(str(ev.well))
-            if wid is None:
-                continue
-            lst = recent_by_well.setdefault(wid, [])
-            if len(lst) < 2:
-                lst.append(ev)
-
-        for w in tiles:
-            w.recent_events = recent_by_well.get(w.id, [])
-    else:
-        for w in tiles:
-            w.recent_events = []
+    for w in tiles:
+        tile = snapshot.tile(w.id)
+        w.recent_events = tile.recent_events if tile else []
 
     # ----- A4) ГЛОБАЛЬНАЯ ЛЕНТА (последние 20 событий) -----
     global_recent_events = (
@@ -1375,8 +1246,15 @@ def visual_page(
 
     # ========== ДАВЛЕНИЯ ДЛЯ ПЛИТОК ==========
     # Получаем средние давления для всех плиток
+    # 10m / 1h — последний замер (pressure_latest) из снимка; 1d / 1m — запрос
     pressure_stats = {}
-    if tiles_sorted:
+    if tiles_sorted and pressure_period in ("10m", "1h"):
+        pressure_stats = {
+            w.id: tile.pressure_stats()
+            for w in tiles_sorted
+            if (tile := snapshot.tile(w.id)) is not None
+        }
+    elif tiles_sorted:
         well_ids = [w.id for w in tiles_sorted]
         try:
             pressure_stats = get_wells_pressure_stats(db, well_ids, pressure_period)
@@ -1403,31 +1281,16 @@ def visual_page(
 
     # ========== ДЕБИТ НА КАРТОЧКАХ ==========
     # Средний суточный дебит за сегодня и вчера (Кунград UTC+5)
-    _flow_today: dict[int, float | None] = {}
-    _flow_yesterday: dict[int, float | None] = {}
-    if tiles_sorted:
-        try:
-            _flow_today, _flow_yesterday = _calc_daily_flow_for_tiles(
-                [w.id for w in tiles_sorted]
-            )
-        except Exception as e:
-            print(f"[visual_page] Ошибка расчёта дебита: {e}")
-
     for w in tiles_sorted:
-        w.flow_today = _flow_today.get(w.id)
-        w.flow_yesterday = _flow_yesterday.get(w.id)
+        tile = snapshot.tile(w.id)
+        w.flow_today = tile.flow_today if tile else None
+        w.flow_yesterday = tile.flow_yesterday if tile else None
 
-    # ========== ТАЙМЛАЙН: ЗАВАНТАЖЕННЯ ДАНИХ ==========
+    # ========== ТАЙМЛАЙН ==========
 
-    # Завантажуємо дані за останні 3 місяці (90 днів)
+    # Події за останні 90 днів visual_timeline.js догружає сторінками з
+    # GET /api/visual/timeline; тут — лише фільтри та кольори реагентів.
     # Фільтрація по періоду буде на клієнті
-    date_from_dt = datetime.now() - timedelta(days=90)
-    date_from_dt = date_from_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-    date_to_dt = datetime.now()
-    date_to_dt = date_to_dt.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-    date_from_str = date_from_dt.strftime('%Y-%m-%d')
-    date_to_str = date_to_dt.strftime('%Y-%m-%d')
 
     # Зберігаємо поточний період для UI
     current_period = tl_period if tl_period else '3d'
@@ -1440,130 +1303,12 @@ def visual_page(
         'date_to': current_date_to,
     }
 
-    # Отримуємо ВСІ свердловини для легенди
-    all_wells_dict = {str(w.number): w for w in all_wells if w.number}
-
-    # Визначаємо які свердловини показувати
-    wells_to_show = []
-
-    if tl_wells:
-        # Якщо вибрано конкретні свердловини - показуємо їх
-        wells_to_show = tl_wells
-    elif tl_statuses:
-        # Якщо вибрано статуси - знаходимо свердловини з цими статусами
-        status_wells = (
-            db.query(Well)
-            .join(WellStatus, Well.id == WellStatus.well_id)
-            .filter(
-                WellStatus.dt_end.is_(None),
-                WellStatus.status.in_(tl_statuses)
-            )
-            .all()
-        )
-        wells_to_show = [str(w.number) for w in status_wells if w.number]
-    else:
-        # Якщо нічого не вибрано - показуємо ВСІ свердловини
-        wells_to_show = [str(w.number) for w in all_wells if w.number]
-
-    # Запит подій
-    events_query = db.query(Event).filter(
-        Event.event_time >= date_from_dt,
-        Event.event_time <= date_to_dt
+    all_reagents, all_event_types_in_data = fleet_snapshot.timeline_facets(
+        db, snapshot,
+        wells=tl_wells, statuses=tl_statuses,
+        event_types=tl_event_types, reagents=tl_reagents,
     )
-
-    # Фільтр по свердловинах
-    if wells_to_show:
-        events_query = events_query.filter(Event.well.in_(wells_to_show))
-
-    # Фільтр по типах подій (якщо вибрано)
-    if tl_event_types:
-        events_query = events_query.filter(Event.event_type.in_(tl_event_types))
-
-    # Сортування
-    if tl_sort == 'asc':
-        timeline_events_raw = events_query.order_by(Event.event_time.asc()).all()
-    else:
-        timeline_events_raw = events_query.order_by(Event.event_time.desc()).all()
-
-    # Підготовка подій для JS
-    timeline_events = []
-    timeline_injections = []
-
-    # ОПТИМІЗАЦІЯ: Завантажуємо всіх users одним запитом
-    all_user_ids = set(evt.user_id for evt in timeline_events_raw if evt.user_id)
-    users_dict = {}
-    if all_user_ids:
-        users_from_db = db.query(User).filter(User.id.in_(all_user_ids)).all()
-        for user in users_from_db:
-            users_dict[user.id] = user.username or user.full_name or f"User {user.id}"
-
-    for evt in timeline_events_raw:
-        if not evt.event_time:
-            continue
-
-        # Отримуємо username з кешу
-        username = users_dict.get(evt.user_id) if evt.user_id else None
-
-        # Базова подія
-        event_data = {
-            't': evt.event_time.isoformat(),
-            'well': str(evt.well) if evt.well else '',
-            'type': evt.event_type or 'other',
-            'description': evt.description or '',
-            'p_tube': float(evt.p_tube) if evt.p_tube is not None else None,
-            'p_line': float(evt.p_line) if evt.p_line is not None else None,
-            'user_id': evt.user_id,
-            'username': username,
-            'geo_status': evt.geo_status or 'Не указан',
-            'purge_phase': evt.purge_phase,
-        }
-
-        # Якщо подія - вброс реагента
-        if evt.event_type == 'reagent' and evt.reagent:
-            # Фільтр по реагентах (якщо вибрано)
-            if tl_reagents and evt.reagent not in tl_reagents:
-                continue
-
-            timeline_injections.append({
-                't': evt.event_time.isoformat(),
-                'well': str(evt.well) if evt.well else '',
-                'reagent': evt.reagent,
-                'qty': float(evt.qty) if evt.qty else 1.0,
-                'description': evt.description or '',
-                'user_id': evt.user_id,
-                'username': username,
-                'geo_status': evt.geo_status or 'Не указан',
-            })
-        else:
-            timeline_events.append(event_data)
-
-    # Збираємо унікальні значення для фільтрів
-    all_reagents = set(inj['reagent'] for inj in timeline_injections)
-    all_event_types_in_data = set(
-        evt.event_type for evt in timeline_events_raw if evt.event_type and evt.event_type != 'reagent')
-
-    # Кольори для реагентів
-    reagent_colors_base = {
-        'Пенний реагент': '#ff6b6b',
-        'Інгібітор': '#4ecdc4',
-        'Surfactant': '#95e1d3',
-        'Foamer': '#f38181',
-        'ПАР': '#aa96da',
-        'Деемульгатор': '#fcbad3',
-    }
-
-    color_palette = [
-        '#ff6b6b', '#4ecdc4', '#95e1d3', '#f38181',
-        '#aa96da', '#fcbad3', '#ffffd2', '#a8e6cf',
-        '#ffd3b6', '#ffaaa5', '#ff8b94', '#c7ceea'
-    ]
-
-    timeline_reagent_colors = {}
-    for idx, reagent in enumerate(sorted(all_reagents)):
-        if reagent in reagent_colors_base:
-            timeline_reagent_colors[reagent] = reagent_colors_base[reagent]
-        else:
-            timeline_reagent_colors[reagent] = color_palette[idx % len(color_palette)]
+    timeline_reagent_colors = fleet_snapshot.reagent_colors(all_reagents)
 
     # Кольори для подій
     timeline_event_colors = {
@@ -1607,15 +1352,9 @@ def visual_page(
     ]
 
     # Словник статусів свердловин для JS
-    timeline_well_statuses = {}
-    for w in all_wells:
-        if w.number:
-            well_key = str(w.number)
-            st = by_well_id.get(w.id)
-            if st:
-                timeline_well_statuses[well_key] = st.status
-            else:
-                timeline_well_statuses[well_key] = None
+    timeline_well_statuses = {
+        t.number: t.status for t in snapshot.tiles.values() if t.number
+    }
 
     # Кольори статусів (з style.css CSS variables)
     timeline_status_colors = {
@@ -1862,8 +1601,6 @@ def visual_page(
 
             # ТАЙМЛАЙН - обновленные переменные
             "timeline_filters": timeline_filters,
-            "timeline_injections": timeline_injections,
-            "timeline_events": timeline_events,
             "timeline_reagent_colors": timeline_reagent_colors,
             "timeline_event_colors": timeline_event_colors,
             "timeline_all_event_types": timeline_all_event_types,
@@ -1883,6 +1620,27 @@ def visual_page(
     )
 
 
+@app.get("/api/visual/timeline")
+def visual_timeline_api(
+        db: Session = Depends(get_db),
+        current_user: str = Depends(get_current_user),
+        tl_wells: list[str] = Query(default=[]),
+        tl_statuses: list[str] = Query(default=[]),
+        tl_event_types: list[str] = Query(default=[]),
+        tl_reagents: list[str] = Query(default=[]),
+        tl_sort: str = Query("desc"),
+        limit: int = Query(fleet_snapshot.TIMELINE_PAGE_LIMIT, ge=1, le=5000),
+        offset: int = Query(0, ge=0),
+):
+    """Страница событий таймлайна /visual (те же фильтры tl_*, что у страницы)."""
+    return fleet_snapshot.timeline_page(
+        db, fleet_snapshot.get_snapshot(db),
+        wells=tl_wells, statuses=tl_statuses,
+        event_types=tl_event_types, reagents=tl_reagents,
+        sort=tl_sort, limit=limit, offset=offset,
+    )
+
+
 # === АДМИН-ПАНЕЛЬ ПОЛЬЗОВАТЕЛЕЙ ===
 
 @app.get("/admin/users", response_class=HTMLResponse)
@@ -3458,6 +3216,7 @@ def set_well_status(
     )
     db.add(new_status)
     db.commit()
+    fleet_snapshot.invalidate()
 
     # 6) Возврат на страницу скважины
     return RedirectResponse(
@@ -3509,6 +3268,7 @@ def set_well_substatus(
     )
     db.add(new_sub)
     db.commit()
+    fleet_snapshot.invalidate()
 
     return {"success": True, "substatus": substatus_text, "color": substatus_color(substatus_text)}
 
@@ -3561,6 +3321,7 @@ def edit_well_status(
     st.note = (status_note or None)
 
     db.commit()
+    fleet_snapshot.invalidate()
 
     return RedirectResponse(
         url=f"/well/{well_id}",
@@ -3591,6 +3352,7 @@ def delete_well_status(
 
     db.delete(st)
     db.commit()
+    fleet_snapshot.invalidate()
 
     return RedirectResponse(
         url=f"/well/{well_id}",
@@ -3632,6 +3394,7 @@ def update_well(
 
     # 4) Физически записываем изменения в БД
     db.commit()
+    fleet_snapshot.invalidate()
 
     # 5) Перенаправляем пользователя обратно на страницу скважины
     return RedirectResponse(
@@ -3732,6 +3495,7 @@ async def api_update_choke(
         )
 
     db.commit()
+    fleet_snapshot.invalidate()
     return {"ok": True, "choke_diam_mm": choke}
 
 
@@ -11,7 +11,6 @@ from jinja2 import Template, Environment, FileSystemLoader
 from datetime import date
 
 from .models import Document
-from backend.utils.latex import find_xelatex as _find_xelatex
 
 
 class DocumentGenerator:
@@ -484,45 +483,21 @@ class DocumentGenerator:
         Returns:
             str: Полный путь к PDF файлу
         """
+        from backend.services.latex_compile_service import LatexCompileError, compile_latex
+
         # Имя файла без расширения
         base_name = f"{document.doc_number.replace('/', '-')}"
 
-        # Временная директория
-        temp_dir = self.output_dir / "temp"
-        tex_file = temp_dir / f"{base_name}.tex"
-
-        # Сохраняем .tex файл
-        with open(tex_file, 'w', encoding='utf-8') as f:
-            f.write(latex_source)
-
-        # Компилируем в PDF (xelatex для поддержки русского)
-        # Запускаем дважды для правильных ссылок
-        for _ in range(2):
-            result = subprocess.run(
-                [_find_xelatex(), '-interaction=nonstopmode', f'-output-directory={temp_dir}', str(tex_file)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=str(temp_dir)
+        # Компилируем в PDF (xelatex для поддержки русского) в изолированном
+        # каталоге внутри temp; второй проход — только если менялись ссылки
+        try:
+            result = compile_latex(
+                latex_source, base_name, self.output_dir / "pdf",
+                work_root=self.output_dir / "temp",
             )
-
-            if result.returncode != 0:
-                error_msg = result.stderr.decode('utf-8', errors='ignore')
-                raise RuntimeError(f"Ошибка компиляции LaTeX: {error_msg}")
-
-        # Перемещаем PDF в output
-        temp_pdf = temp_dir / f"{base_name}.pdf"
-        final_pdf = self.output_dir / "pdf" / f"{base_name}.pdf"
-
-        if temp_pdf.exists():
-            temp_pdf.rename(final_pdf)
-        else:
-            raise FileNotFoundError(f"PDF файл не создан: {temp_pdf}")
-
-        # Очищаем временные файлы
-        for ext in ['.aux', '.log', '.out', '.tex']:
-            temp_file = temp_dir / f"{base_name}{ext}"
-            if temp_file.exists():
-                temp_file.unlink()
+        except LatexCompileError as e:
+            raise RuntimeError(f"Ошибка компиляции LaTeX: {e.stderr or e}") from e
+        final_pdf = self.output_dir / "pdf" / result.pdf_path.name
 
         return str(final_pdf)
 
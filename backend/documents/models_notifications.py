@@ -5,7 +5,7 @@
 
 from sqlalchemy import (
     Column, Integer, String, Text, Boolean,
-    DateTime, ForeignKey, Index
+    DateTime, ForeignKey, Index, text
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
@@ -119,10 +119,21 @@ class JobExecutionLog(Base):
     triggered_by = Column(String(100))  # 'cron', 'manual', 'api'
     triggered_by_user_id = Column(Integer)
 
+    # Очередь отчётов (report_job_queue): status 'queued' → 'running' →
+    # 'success' / 'failed' / 'cancelled'
+    dedupe_key = Column(String(64))  # sha256(job_type + params) — дубликаты активных задач
+    stage = Column(String(50))  # 'queued', 'data', 'charts', 'latex', 'done'
+    heartbeat_at = Column(DateTime)  # последняя смена этапа воркером
+    cancel_requested = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+    artifact_path = Column(Text)  # путь к готовому PDF (относительно static или абсолютный)
+
     created_at = Column(DateTime, default=datetime.now)
 
     __table_args__ = (
         Index('idx_job_log_type_started', 'job_type', 'started_at'),
+        Index('uq_job_log_active_dedupe', 'dedupe_key', unique=True,
+              postgresql_where=text("status IN ('queued', 'running')")),
+        Index('idx_job_log_queued', 'id', postgresql_where=text("status = 'queued'")),
     )
 
     def __repr__(self):
@@ -42,4 +42,6 @@ from .customer_baseline import CustomerBaseline
 from .customer_report_block import CustomerReportBlock
 from .comparison_set import ComparisonSet
 from .comparison_curve import ComparisonCurve
-from .period_report import PeriodReport
\ No newline at end of file
+from .period_report import PeriodReport
+from .pressure_anomaly_scan import PressureAnomalyScan
+from .stability_rose_cache import StabilityRoseAxes, StabilityRoseCalibration
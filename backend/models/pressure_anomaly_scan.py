@@ -0,0 +1,29 @@
+"""
+PressureAnomalyScan — водяной знак инкрементального сканера аномалий ΔP.
+
+Одна строка на скважину: до какого момента (UTC) pressure_raw уже
+проанализирован детектором. Следующий прогон берёт только новые минуты
+плюс контекстный запас (см. services/pressure_anomaly_scanner.py).
+"""
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer
+
+from backend.db import Base
+
+
+class PressureAnomalyScan(Base):
+    __tablename__ = "pressure_anomaly_scan"
+
+    well_id = Column(Integer, ForeignKey("wells.id"), primary_key=True)
+    scanned_until = Column(DateTime, nullable=False)     # UTC, последняя проанализированная точка
+
+    # Статистика последнего прогона
+    last_run_at = Column(DateTime, nullable=True)        # UTC
+    last_rows = Column(Integer, nullable=True)           # строк pressure_raw загружено
+    last_found = Column(Integer, nullable=True)          # аномалий найдено
+    last_created = Column(Integer, nullable=True)        # масок создано
+    last_duration_ms = Column(Float, nullable=True)
+
+    def __repr__(self):
+        return f"<PressureAnomalyScan well={self.well_id} until={self.scanned_until}>"
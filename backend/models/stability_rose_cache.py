@@ -0,0 +1,71 @@
+"""
+Кэш розы нестабильности (services/stability_rose_batch.py).
+
+StabilityRoseAxes — сырые оси розы по well_daily на (скважина, якорь, окна).
+Лепестки не хранятся: их пересчитывает превью с действующими шкалами.
+Версия данных (rows_count, data_loaded_at) — число строк скважины до якоря и
+MAX(loaded_at); перезагрузка сводки меняет версию, и строка не используется.
+
+StabilityRoseCalibration — перцентили сырых осей по фонду и предложенные
+шкалы (P95). Активная калибровка (is_active) заменяет SCALES по умолчанию.
+"""
+from __future__ import annotations
+
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Float, Integer, String, UniqueConstraint,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from backend.db import Base
+
+
+class StabilityRoseAxes(Base):
+    __tablename__ = "stability_rose_axes"
+    __table_args__ = (
+        UniqueConstraint(
+            "well", "anchor", "source", "trend_days", "downtime_days",
+            name="uq_stability_rose_axes_key",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    well = Column(String(32), nullable=False, index=True)   # well_daily.well
+    anchor = Column(Date, nullable=False)                    # фактический якорь (последний день ≤ запрошенного)
+    source = Column(String(16), nullable=False, default="well_daily")
+    trend_days = Column(Integer, nullable=False)
+    downtime_days = Column(Integer, nullable=False)
+
+    # Версия данных скважины до якоря
+    rows_count = Column(Integer, nullable=False)
+    data_loaded_at = Column(DateTime, nullable=True)
+
+    choke_mm = Column(Float, nullable=True)
+    n_days = Column(Integer, nullable=False)
+    n_work = Column(Integer, nullable=False)
+    l_star = Column(Integer, nullable=False)
+    raw = Column(JSONB, nullable=False)          # {ось: значение | null}
+    confidence = Column(JSONB, nullable=False)   # {ось: normal|reduced|insufficient}
+
+    computed_at = Column(DateTime, nullable=False)   # UTC
+    batch_id = Column(String(16), nullable=True)     # None — записано превью
+
+    def __repr__(self):
+        return f"<StabilityRoseAxes well={self.well} anchor={self.anchor}>"
+
+
+class StabilityRoseCalibration(Base):
+    __tablename__ = "stability_rose_calibration"
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String(16), nullable=False, default="well_daily")
+    computed_at = Column(DateTime, nullable=False)   # UTC
+    batch_id = Column(String(16), nullable=True)
+    n_wells = Column(Integer, nullable=False)
+    n_samples = Column(Integer, nullable=False)
+    params = Column(JSONB, nullable=False)        # окна, шаг якорей, глубина истории
+    percentiles = Column(JSONB, nullable=False)   # {ось: {p50, p75, p90, p95, p99, n}}
+    scales = Column(JSONB, nullable=False)        # предложенные шкалы (P95) + DSTAR
+    is_active = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"<StabilityRoseCalibration id={self.id} active={self.is_active}>"
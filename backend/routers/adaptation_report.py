@@ -1484,10 +1484,12 @@ def _finalize_pdf_response(
     # PNG главы 2 (плитки заказчика, сравнения, розы) — НЕ чистим вручную:
     # они лежат в эфемерном TemporaryDirectory, который удаляется внешним
     # try/finally в _build_pdf_response.
+    # PNG снапшотных блоков из artifact_cache не удаляем — они переживают сборку.
+    from backend.services import artifact_cache
     # PNG сравнения участков в §4.7 (adaptation_comparison)
     for _ab in adaptation_blocks_fmt:
         _cp = _ab.get("chart_path")
-        if _cp:
+        if _cp and not artifact_cache.owns(_cp):
             Path(_cp).unlink(missing_ok=True)
     # PNG графиков §3.4 (observation_analysis): 3 PNG на каждый блок —
     # давления, ΔP, Q. Рендерятся live через render_baseline_tile_charts.
@@ -1495,21 +1497,21 @@ def _finalize_pdf_response(
     for _ob in observation_blocks_fmt:
         for _key in ("chart_pressures", "chart_dp", "chart_flow"):
             _p = _ob.get(_key)
-            if _p:
+            if _p and not artifact_cache.owns(_p):
                 Path(_p).unlink(missing_ok=True)
         # segment_analysis: cleanup PNG графиков из render_segment_analysis
         for _cp in (_ob.get("_chart_paths") or []):
-            if _cp:
+            if _cp and not artifact_cache.owns(_cp):
                 Path(_cp).unlink(missing_ok=True)
     # PNG главы «Отчёт за период»: period_full_analysis (3 PNG давления/ΔP/Q),
     # period_comparison/segment (chart_path), segment_analysis (_chart_paths).
     for _pb in period_blocks_fmt:
         for _key in ("chart_pressures", "chart_dp", "chart_flow", "chart_path"):
             _p = _pb.get(_key)
-            if _p:
+            if _p and not artifact_cache.owns(_p):
                 Path(_p).unlink(missing_ok=True)
         for _cp in (_pb.get("_chart_paths") or []):
-            if _cp:
+            if _cp and not artifact_cache.owns(_cp):
                 Path(_cp).unlink(missing_ok=True)
 
     response = FileResponse(
@@ -1592,8 +1594,12 @@ def preview_pdf_post(
     но НЕ деливерабл (не даёт editable .tex). По требованию пользователя (A)
     кнопка использует LaTeX-путь.
     """
-    return _build_pdf_response(
-        db, req.well_id,
+    return _build_pdf_response(db, req.well_id, **_preview_pdf_kwargs(req))
+
+
+def _preview_pdf_kwargs(req: CustomDatesRequest) -> dict:
+    """Аргументы _build_pdf_response из тела preview-PDF (и задачи очереди)."""
+    return dict(
         obs_from=req.obs_from, obs_to=req.obs_to,
         adapt_from=req.adapt_from, adapt_to=req.adapt_to,
         obs_description=req.obs_description,
@@ -1615,6 +1621,26 @@ def preview_pdf_post(
     )
 
 
+@router.post("/preview-pdf/jobs")
+def preview_pdf_job(
+    req: CustomDatesRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """preview-PDF через очередь отчётов: сразу отдаёт задачу, UI опрашивает
+    GET /api/jobs/reports/{id} и забирает файл по file_url.
+
+    Повторный запрос с тем же телом, пока сборка идёт, — та же задача.
+    """
+    from backend.services import report_job_queue
+
+    job, created = report_job_queue.enqueue(
+        db, report_job_queue.PREVIEW_KIND, req.model_dump(mode="json"),
+        user_id=request.session.get("user_id"),
+    )
+    return {**report_job_queue.job_status(job), "deduplicated": not created}
+
+
 # ═══════════════════════════════════════════════════════════════════
 #  HTML Preview
 # ═══════════════════════════════════════════════════════════════════
@@ -2,11 +2,11 @@
 Admin Map tab: well map + custom map objects + distance tool.
 """
 from __future__ import annotations
-import math
 import logging
+from typing import Literal
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Query
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from sqlalchemy.orm import Session
 
 from backend.db import get_db, SessionLocal
@@ -112,15 +112,47 @@ def admin_map_page(
     for w in wells:
         w._sensors = well_sensors.get(w.id, [])
 
+    from backend.services import basemap_tiles
     ctx = base_context(request)
     ctx.update({
         "wells": wells,
         "map_objects": map_objects,
+        # провайдеры с локальным хранилищем тайлов → слой идёт через /admin/map/tiles
+        "basemap_local": {name: basemap_tiles.store(name).exists()
+                          for name in basemap_tiles.PROVIDERS},
     })
 
     return templates.TemplateResponse("admin_map.html", ctx)
 
 
+# =====================================================
+# TILES: /admin/map/tiles/{provider}/{z}/{x}/{y}
+# =====================================================
+@pages_router.get("/admin/map/tiles/{provider}/{z}/{x}/{y}")
+def admin_map_tile(
+    provider: str,
+    z: int,
+    x: int,
+    y: int,
+    current_user: DashboardUser = Depends(get_map_user),
+):
+    """Тайл подложки из локального MBTiles; нет в хранилище — редирект к провайдеру."""
+    from backend.services import basemap_tiles
+
+    try:
+        p = basemap_tiles.provider(provider)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Unknown tile provider")
+    data = basemap_tiles.tile(provider, z, x, y)
+    if data is None:
+        return RedirectResponse(p.url.format(z=z, x=x, y=y), status_code=307)
+    return Response(
+        data,
+        media_type="image/jpeg" if p.fmt == "jpg" else "image/png",
+        headers={"Cache-Control": "private, max-age=604800"},
+    )
+
+
 # =====================================================
 # CRUD API: /api/map-objects
 # =====================================================
@@ -209,7 +241,7 @@ def delete_map_object(obj_id: int):
 
 
 # =====================================================
-# DISTANCE API (server-side Haversine)
+# DISTANCE API (server-side Haversine, map_spatial_service)
 # =====================================================
 @router.get("/distance")
 def calculate_distance(
@@ -217,16 +249,87 @@ def calculate_distance(
     lat2: float = Query(...), lon2: float = Query(...),
 ):
     """Haversine distance in meters between two points."""
-    R = 6_371_000
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
+    from backend.services.map_spatial_service import haversine_m
+
+    return {"distance_m": round(float(haversine_m(lat1, lon1, lat2, lon2)), 1)}
+
 
-    a = math.sin(dphi / 2) ** 2 + \
-        math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+MapLayer = Literal["well", "object", "antenna"]
 
-    return {"distance_m": round(R * c, 1)}
+
+def _query_point(index, lat: float | None, lon: float | None, well_id: int | None):
+    """Точка запроса: координаты скважины well_id или явные lat/lon."""
+    if well_id is not None:
+        coords = index.coords("well", well_id)
+        if coords is None:
+            raise HTTPException(404, "У скважины нет координат")
+        return coords
+    if lat is None or lon is None:
+        raise HTTPException(400, "Нужны lat+lon или well_id")
+    return lat, lon
+
+
+@router.get("/nearest")
+def nearest_objects(
+    lat: float = Query(None), lon: float = Query(None),
+    well_id: int = Query(None),
+    kind: MapLayer = Query("antenna"),
+    k: int = Query(1, ge=1, le=100),
+):
+    """k nearest wells / map objects / antennas to a point or a well (KD-tree)."""
+    from backend.services import map_spatial_service as spatial
+
+    db = SessionLocal()
+    try:
+        index = spatial.get_index(db)
+    finally:
+        db.close()
+    plat, plon = _query_point(index, lat, lon, well_id)
+    exclude = well_id if kind == "well" else None
+    return index.nearest(plat, plon, kind=kind, k=k, exclude_id=exclude)
+
+
+@router.get("/within")
+def objects_within(
+    radius_m: float = Query(..., gt=0, le=200_000),
+    lat: float = Query(None), lon: float = Query(None),
+    well_id: int = Query(None),
+    kind: MapLayer = Query("antenna"),
+):
+    """Wells / map objects / antennas within radius_m of a point or a well."""
+    from backend.services import map_spatial_service as spatial
+
+    db = SessionLocal()
+    try:
+        index = spatial.get_index(db)
+    finally:
+        db.close()
+    plat, plon = _query_point(index, lat, lon, well_id)
+    exclude = well_id if kind == "well" else None
+    return index.within(plat, plon, radius_m, kind=kind, exclude_id=exclude)
+
+
+@router.get("/distance-matrix")
+def distance_matrix(
+    rows: MapLayer = Query("well"),
+    cols: MapLayer = Query("antenna"),
+    method: Literal["haversine", "geodesic"] = Query("haversine"),
+):
+    """Full distance matrix (m) between two layers, e.g. wells × antennas."""
+    from backend.services import map_spatial_service as spatial
+
+    db = SessionLocal()
+    try:
+        index = spatial.get_index(db)
+    finally:
+        db.close()
+    m = index.matrix(rows, cols, method=method)
+    return {
+        "rows": [int(i) for i in index.layers[rows].ids],
+        "cols": [int(i) for i in index.layers[cols].ids],
+        "method": method,
+        "distance_m": m.round(1).tolist(),
+    }
 
 
 def _serialize(obj: MapObject) -> dict:
@@ -248,18 +351,29 @@ def _serialize(obj: MapObject) -> dict:
 # =====================================================
 @router.post("/well-antenna-distance")
 def upsert_well_antenna_distance(data: dict):
-    """Save or update distance from well to a map object (antenna)."""
+    """Save or update distance from well to a map object (antenna).
+
+    Расстояние считается на сервере по текущим координатам (map_spatial_service);
+    переданное distance_m — только если у скважины или объекта нет координат.
+    """
     from backend.models.well_antenna_distance import WellAntennaDistance
+    from backend.services import map_spatial_service as spatial
 
     well_id = data.get("well_id")
     map_object_id = data.get("map_object_id")
-    distance_m = data.get("distance_m")
 
-    if well_id is None or map_object_id is None or distance_m is None:
-        raise HTTPException(400, "well_id, map_object_id, distance_m обязательны")
+    if well_id is None or map_object_id is None:
+        raise HTTPException(400, "well_id, map_object_id обязательны")
 
     db = SessionLocal()
     try:
+        distance_m = spatial.get_index(db, sync=True).well_object_distance(
+            int(well_id), int(map_object_id),
+        )
+        if distance_m is None:
+            distance_m = data.get("distance_m")
+        if distance_m is None:
+            raise HTTPException(400, "Нет координат — передайте distance_m")
         row = (
             db.query(WellAntennaDistance)
             .filter(
@@ -293,9 +407,12 @@ def upsert_well_antenna_distance(data: dict):
 def get_well_antenna_distances(well_id: int):
     """Get all antenna distances for a given well."""
     from backend.models.well_antenna_distance import WellAntennaDistance
+    from backend.services import map_spatial_service as spatial
 
     db = SessionLocal()
     try:
+        # координаты менялись → сохранённые расстояния пересчитываются
+        spatial.get_index(db, sync=True)
         rows = (
             db.query(WellAntennaDistance, MapObject.name)
             .join(MapObject, MapObject.id == WellAntennaDistance.map_object_id)
@@ -38,6 +38,21 @@ log = logging.getLogger(__name__)
 DEFAULT_STATUSES = {"Наблюдение", "Адаптация", "Оптимизация"}
 
 
+def _queue_pdf(db: Session, doc: Document) -> None:
+    """Поставить генерацию PDF документа в очередь (report_job_queue).
+
+    Генератор выбирается по meta.report_mode; ошибка постановки не теряет
+    документ — его можно перегенерировать со страницы.
+    """
+    from backend.services.report_job_queue import enqueue_document
+
+    try:
+        enqueue_document(db, doc)
+    except Exception as e:
+        log.exception("Report job enqueue failed for doc %s: %s", doc.id, e)
+        db.rollback()
+
+
 # ──────────────────── HTML PAGE ────────────────────
 
 @pages_router.get("/daily-report", response_class=HTMLResponse)
@@ -144,16 +159,8 @@ def create_single_report(
         db.commit()
         db.refresh(doc)
 
-    # Generate PDF
-    try:
-        from backend.services.daily_report_service import generate_daily_report_pdf
-        pdf_rel = generate_daily_report_pdf(doc, db)
-        doc.pdf_filename = pdf_rel
-        doc.status = "generated"
-        db.commit()
-    except Exception as e:
-        log.error("PDF generation failed: %s", e)
-        db.commit()  # keep the document even if PDF failed
+    # PDF — в очереди отчётов; страница документа опрашивает статус задачи
+    _queue_pdf(db, doc)
 
     return RedirectResponse(url=f"/documents/{doc.id}", status_code=303)
 
@@ -227,16 +234,8 @@ def create_all_report(
         db.commit()
         db.refresh(doc)
 
-    # Generate PDF
-    try:
-        from backend.services.daily_report_service import generate_daily_report_pdf
-        pdf_rel = generate_daily_report_pdf(doc, db)
-        doc.pdf_filename = pdf_rel
-        doc.status = "generated"
-        db.commit()
-    except Exception as e:
-        log.error("PDF generation failed for summary report: %s", e)
-        db.commit()
+    # PDF — в очереди отчётов; страница документа опрашивает статус задачи
+    _queue_pdf(db, doc)
 
     return RedirectResponse(url=f"/documents/{doc.id}", status_code=303)
 
@@ -315,15 +314,8 @@ def create_summary_report(
         db.commit()
         db.refresh(doc)
 
-    try:
-        from backend.services.daily_report_service import generate_summary_report_pdf
-        pdf_rel = generate_summary_report_pdf(doc, db)
-        doc.pdf_filename = pdf_rel
-        doc.status = "generated"
-        db.commit()
-    except Exception as e:
-        log.exception("Summary PDF generation failed: %s", e)
-        db.commit()
+    # PDF — в очереди отчётов; страница документа опрашивает статус задачи
+    _queue_pdf(db, doc)
 
     return RedirectResponse(url=f"/documents/{doc.id}", status_code=303)
 
@@ -399,15 +391,8 @@ def create_monthly_report(
     db.commit()
     db.refresh(doc)
 
-    try:
-        from backend.services.daily_report_service import generate_monthly_report_pdf
-        pdf_rel = generate_monthly_report_pdf(doc, db)
-        doc.pdf_filename = pdf_rel
-        doc.status = "generated"
-        db.commit()
-    except Exception as e:
-        log.exception("Monthly PDF generation failed: %s", e)
-        db.commit()
+    # PDF — в очереди отчётов; страница документа опрашивает статус задачи
+    _queue_pdf(db, doc)
 
     return RedirectResponse(url=f"/documents/{doc.id}", status_code=303)
 
@@ -418,7 +403,7 @@ def regenerate_report(
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user),
 ):
-    """Regenerate PDF for an existing daily report document."""
+    """Regenerate PDF for an existing daily report document (через очередь отчётов)."""
     doc = db.query(Document).filter(Document.id == doc_id).first()
     if not doc:
         raise HTTPException(404, "Document not found")
@@ -426,20 +411,6 @@ def regenerate_report(
     if not doc.doc_type or doc.doc_type.code not in ("daily_report_well", "daily_report_all"):
         raise HTTPException(400, "Not a daily report document")
 
-    meta = doc.meta or {}
-    mode = meta.get("report_mode", "")
-    if mode == "monthly":
-        from backend.services.daily_report_service import generate_monthly_report_pdf
-        pdf_rel = generate_monthly_report_pdf(doc, db)
-    elif mode == "summary":
-        from backend.services.daily_report_service import generate_summary_report_pdf
-        pdf_rel = generate_summary_report_pdf(doc, db)
-    else:
-        from backend.services.daily_report_service import generate_daily_report_pdf
-        pdf_rel = generate_daily_report_pdf(doc, db)
-
-    doc.pdf_filename = pdf_rel
-    doc.status = "generated"
-    db.commit()
+    _queue_pdf(db, doc)
 
     return RedirectResponse(url=f"/documents/{doc.id}", status_code=303)
@@ -8,12 +8,13 @@ from starlette.responses import RedirectResponse
 
 import sqlalchemy as sa
 import json
+import logging
 import re
 from datetime import datetime, date
 from calendar import monthrange
 
 from backend.db import get_db
-from backend.utils.latex import find_xelatex as _find_xelatex
+from backend.deps import get_current_admin
 from backend.web.templates import templates, base_context
 
 from backend.models.wells import Well
@@ -21,9 +22,10 @@ from backend.documents.models import Document, DocumentType, DocumentItem
 from backend.documents.models_notifications import JobExecutionLog, DocumentSendLog
 from backend.models.well_status import WellStatus
 from pathlib import Path
-import subprocess
 from backend.documents.numbering import build_doc_number
 
+log = logging.getLogger(__name__)
+
 router = APIRouter(tags=["documents-pages"])
 
 
@@ -481,8 +483,34 @@ def documents_jobs(request: Request, db: Session = Depends(get_db)):
     )
 
 
+@router.get("/admin/report-builds", response_class=HTMLResponse)
+def admin_report_builds(
+    request: Request,
+    days: int = Query(7, ge=1, le=90),
+    db: Session = Depends(get_db),
+    current_admin: str = Depends(get_current_admin),
+):
+    """Админка: самые долгие сборки отчётов с профилем по секциям."""
+    from backend.services.report_job_queue import slowest_builds
+
+    return templates.TemplateResponse(
+        "admin_report_builds.html",
+        {
+            **base_context(request),
+            "builds": slowest_builds(db, days=days),
+            "days": days,
+        },
+    )
+
+
 @router.get("/documents/{doc_id}", response_class=HTMLResponse)
-def document_detail(doc_id: int, request: Request, db: Session = Depends(get_db)):
+def document_detail(
+    doc_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    msg: str | None = Query(None),
+    msg_type: str | None = Query(None),
+):
     doc = (
         db.query(Document)
         .filter(
@@ -525,6 +553,15 @@ def document_detail(doc_id: int, request: Request, db: Session = Depends(get_db)
         .all()
     )
 
+    # Задача генерации PDF (report_job_queue): прогресс показываем, пока она
+    # не завершилась, — и для draft, и при перегенерации готового акта
+    from backend.services.report_job_queue import FINAL_STATUSES
+    report_job_id = (doc.meta or {}).get("report_job_id")
+    report_job_active = bool(report_job_id) and db.query(JobExecutionLog.id).filter(
+        JobExecutionLog.id == report_job_id,
+        JobExecutionLog.status.notin_(FINAL_STATUSES),
+    ).first() is not None
+
     return templates.TemplateResponse(
         "documents/detail.html",
         {
@@ -534,6 +571,10 @@ def document_detail(doc_id: int, request: Request, db: Session = Depends(get_db)
             "all_status_names": all_status_names,
             "saved_status_names": saved_status_names,
             "send_history": send_history,
+            "report_job_id": report_job_id,
+            "report_job_active": report_job_active,
+            "flash_msg": msg,
+            "flash_msg_type": msg_type or "info",
         },
     )
 
@@ -1018,13 +1059,19 @@ def document_generate_pdf(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # daily_report — отдельный генератор
+    # daily_report — отдельный генератор, через очередь отчётов (режим —
+    # по meta.report_mode); страница документа опрашивает статус задачи
     if doc.doc_type and doc.doc_type.code in ("daily_report_well", "daily_report_all"):
-        from backend.services.daily_report_service import generate_daily_report_pdf
-        pdf_rel = generate_daily_report_pdf(doc, db)
-        doc.pdf_filename = pdf_rel
-        doc.status = "generated"
-        db.commit()
+        from urllib.parse import urlencode
+        from backend.services.report_job_queue import enqueue_document
+        try:
+            enqueue_document(db, doc)
+        except Exception as e:
+            # Как daily_report._queue_pdf: документ не теряем, сообщаем на странице
+            log.exception("Report job enqueue failed for doc %s: %s", doc.id, e)
+            db.rollback()
+            params = urlencode({"msg": "Не удалось поставить PDF в очередь", "msg_type": "error"})
+            return RedirectResponse(url=f"/documents/{doc_id}?{params}", status_code=303)
         return RedirectResponse(url=f"/documents/{doc_id}", status_code=303)
 
     # пока делаем только для reagent_expense
@@ -1245,26 +1292,14 @@ def document_generate_pdf(
         )
     tex_path.write_text(latex_tpl, encoding="utf-8")
 
-    # --- компиляция xelatex ---
+    # --- компиляция xelatex (latex_compile_service: изолированный каталог,
+    # второй проход — только если менялись ссылки) ---
+    from backend.services.latex_compile_service import LatexCompileError, compile_latex
     try:
-        cmd = [
-            _find_xelatex(),
-            "-interaction=nonstopmode",
-            "-halt-on-error",
-            f"-output-directory={str(out_dir)}",
-            f"-jobname={base_name}",  # <-- фиксируем имя выходного PDF
-            str(tex_path),  # <-- полный путь к .tex (надёжнее)
-        ]
-        subprocess.run(
-            cmd,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-        )
-    except subprocess.CalledProcessError as e:
-        log = e.stdout if e.stdout else str(e)
-        raise HTTPException(status_code=500, detail=f"LaTeX build failed:\n{log[:4000]}")
+        compile_latex(latex_tpl, base_name, out_dir, halt_on_error=True)
+    except LatexCompileError as e:
+        output = e.output or str(e)
+        raise HTTPException(status_code=500, detail=f"LaTeX build failed:\n{output[:4000]}")
 
     # сохраним путь в БД
     doc.pdf_filename = f"generated/pdf/{base_name}.pdf"
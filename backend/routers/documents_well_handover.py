@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import re
-import subprocess
 from datetime import datetime, date as _date
 from pathlib import Path
 
@@ -13,7 +12,6 @@ from sqlalchemy.orm.attributes import flag_modified
 from starlette.responses import RedirectResponse
 
 from backend.db import get_db
-from backend.utils.latex import find_xelatex as _find_xelatex
 from backend.web.templates import templates, base_context
 from backend.models.wells import Well
 from backend.documents.models import Document, DocumentType
@@ -996,18 +994,13 @@ def well_handover_generate_pdf(doc_id: int, db: Session = Depends(get_db)):
     latex_tpl = _apply_vars_or_fail(latex_tpl, mapping)
     tex_path.write_text(latex_tpl, encoding="utf-8")
 
+    # --- компиляция xelatex (latex_compile_service: изолированный каталог,
+    # второй проход — только если менялись ссылки) ---
+    from backend.services.latex_compile_service import LatexCompileError, compile_latex
     try:
-        cmd = [
-            _find_xelatex(),
-            "-interaction=nonstopmode",
-            "-halt-on-error",
-            f"-output-directory={str(out_dir)}",
-            f"-jobname={base_name}",
-            str(tex_path),
-        ]
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-    except subprocess.CalledProcessError as e:
-        log = e.stdout if e.stdout else str(e)
+        compile_latex(latex_tpl, base_name, out_dir, halt_on_error=True)
+    except LatexCompileError as e:
+        log = e.output or str(e)
         raise HTTPException(status_code=500, detail=f"LaTeX build failed:\n{log[:4000]}")
 
     doc.pdf_filename = f"generated/pdf/{base_name}.pdf"
@@ -10,11 +10,9 @@
 from __future__ import annotations
 
 import re
-import subprocess
 from datetime import datetime, timedelta
 from pathlib import Path
 
-from backend.utils.latex import find_xelatex as _find_xelatex
 from typing import List, Optional, Tuple
 
 import sqlalchemy as sa
@@ -1011,50 +1009,18 @@ def equipment_doc_generate_pdf(
     with open(tex_file, "w", encoding="utf-8") as f:
         f.write(latex_source)
 
-    # Компиляция
+    # Компиляция (latex_compile_service: изолированный каталог, второй проход —
+    # только если менялись ссылки; при ошибке — копия в /tmp/xelatex_fail_*)
+    from backend.services.latex_compile_service import LatexCompileError, compile_latex
     try:
-        result = subprocess.run(
-            [
-                _find_xelatex(),
-                "-interaction=nonstopmode",
-                "-halt-on-error",
-                f"{safe_name}.tex",  # Только имя файла, так как cwd=output_dir
-            ],
-            cwd=str(output_dir),
-            capture_output=True,
-            timeout=60,
+        compile_latex(latex_source, safe_name, output_dir, halt_on_error=True, timeout=60)
+    except LatexCompileError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"LaTeX compilation failed.\n\nSTDOUT:\n{e.output}\n\nSTDERR:\n{e.stderr}"
+                   f"\n\nLOG:\n" + ("\n".join(e.errors) or str(e))[-3000:],
         )
 
-        if result.returncode != 0:
-            # Читаем лог-файл для детальной информации
-            log_file = output_dir / f"{safe_name}.log"
-            log_content = ""
-            if log_file.exists():
-                log_content = log_file.read_text(encoding="utf-8", errors="ignore")
-
-            # Также выводим в консоль для отладки
-            print("="*80)
-            print("LaTeX compilation FAILED")
-            print("="*80)
-            print("STDOUT:")
-            print(result.stdout)
-            print("-"*80)
-            print("STDERR:")
-            print(result.stderr)
-            print("-"*80)
-            if log_content:
-                print("LOG FILE (last 3000 chars):")
-                print(log_content[-3000:])
-            print("="*80)
-
-            raise HTTPException(
-                status_code=500,
-                detail=f"LaTeX compilation failed.\n\nSTDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}\n\nLOG:\n{log_content[-3000:]}"
-            )
-
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=500, detail="LaTeX compilation timeout")
-
     doc.pdf_filename = f"generated/pdf/{safe_name}.pdf"
     doc.latex_source = latex_source
     doc.status = "generated"
@@ -6,6 +6,10 @@ API для фоновых задач (автосоздание актов, и т
 - POST /api/jobs/reagent-expense/auto-create  — запуск автосоздания
 - GET  /api/jobs/logs                         — список выполненных задач
 - GET  /api/jobs/logs/{id}                    — детали конкретной задачи
+- POST /api/jobs/reports                      — поставить генерацию PDF документа в очередь
+- GET  /api/jobs/reports/{id}                 — статус / этап задачи отчёта (опрос из UI)
+- POST /api/jobs/reports/{id}/cancel          — отменить задачу отчёта
+- GET  /api/jobs/reports/{id}/file            — готовый PDF задачи
 
 Защита:
 - Для cron-задач: заголовок X-Job-Secret
@@ -506,3 +510,110 @@ def api_send_batch(
         "total": len(results),
         "results": results,
     }
+
+
+# =============================================================================
+# Очередь генерации отчётов (report_job_queue)
+# =============================================================================
+
+class ReportJobRequest(BaseModel):
+    document_id: int
+
+
+@router.post("/reports")
+def api_report_job_enqueue(
+    body: ReportJobRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    x_job_secret: Optional[str] = Header(None),
+):
+    """
+    Поставить генерацию PDF документа (суточный / сводный / месячный /
+    адаптация) в очередь. Одинаковый запрос, пока задача не завершена,
+    возвращает ту же задачу (deduplicated=true).
+    """
+    from backend.services import report_job_queue
+
+    auth = get_auth_context(request, x_job_secret)
+    doc = db.query(Document).filter(Document.id == body.document_id).first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    try:
+        job, created = report_job_queue.enqueue_document(
+            db, doc, triggered_by=auth["triggered_by"], user_id=auth["user_id"],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**report_job_queue.job_status(job), "deduplicated": not created}
+
+
+def _get_report_job(db: Session, job_id: int) -> JobExecutionLog:
+    from backend.services.report_job_queue import JOB_PREFIX
+
+    job = (
+        db.query(JobExecutionLog)
+        .filter(JobExecutionLog.id == job_id,
+                JobExecutionLog.job_type.like(JOB_PREFIX + "%"))
+        .first()
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+
+@router.get("/reports/{job_id}")
+def api_report_job_status(
+    job_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    x_job_secret: Optional[str] = Header(None),
+):
+    """
+    Статус задачи отчёта: status (queued/running/success/failed/cancelled),
+    stage (data/charts/latex), время этапов, file_url по готовности.
+    """
+    from backend.services.report_job_queue import job_status
+
+    get_auth_context(request, x_job_secret)
+    return job_status(_get_report_job(db, job_id))
+
+
+@router.post("/reports/{job_id}/cancel")
+def api_report_job_cancel(
+    job_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    x_job_secret: Optional[str] = Header(None),
+):
+    """
+    Отменить задачу: из очереди — сразу, выполняющуюся — на ближайшем этапе.
+    """
+    from backend.services import report_job_queue
+
+    get_auth_context(request, x_job_secret)
+    _get_report_job(db, job_id)
+    job = report_job_queue.cancel(db, job_id)
+    return report_job_queue.job_status(job)
+
+
+@router.get("/reports/{job_id}/file")
+def api_report_job_file(
+    job_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    x_job_secret: Optional[str] = Header(None),
+):
+    """
+    Готовый PDF задачи (inline).
+    """
+    from fastapi.responses import FileResponse
+    from backend.services.report_job_queue import artifact_file
+
+    get_auth_context(request, x_job_secret)
+    job = _get_report_job(db, job_id)
+    path = artifact_file(job)
+    if path is None:
+        raise HTTPException(status_code=409, detail=f"PDF не готов (status={job.status})")
+    resp = FileResponse(path=str(path), media_type="application/pdf", filename=path.name)
+    resp.headers["Content-Disposition"] = f'inline; filename="{path.name}"'
+    return resp
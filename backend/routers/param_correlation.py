@@ -2,22 +2,29 @@
 Роутер «Зависимость двух параметров» (scatter + регрессия).
 
 POST /api/param-correlation/compute — облако точек X↔Y за период + регрессия.
+POST /api/param-correlation/matrix — регрессии всех нецикличных пар сигналов
+для нескольких скважин/периодов (сравнение по фонду).
 Переиспользуемый блок (kind='param_correlation'), сохраняется в любую главу.
 """
 from __future__ import annotations
 
 from datetime import date, datetime
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from backend.db import SessionLocal
 from backend.models.wells import Well
-from backend.services.param_correlation_service import build_param_correlation
+from backend.services.param_correlation_service import (
+    build_param_correlation,
+    build_param_correlation_matrices,
+)
 
 router = APIRouter(prefix="/api/param-correlation", tags=["param-correlation"])
 
+MAX_BATCH_ITEMS = 50
+
 
 def get_db():
     db = SessionLocal()
@@ -36,6 +43,18 @@ class CorrelationRequest(BaseModel):
     label: str | None = None
 
 
+class MatrixItem(BaseModel):
+    well_id: int
+    period_from: date
+    period_to: date
+    label: str | None = None
+
+
+class MatrixRequest(BaseModel):
+    items: list[MatrixItem]
+    signals: list[str] | None = None   # None — все сигналы SIGNAL_META
+
+
 @router.post("/compute")
 def compute_correlation(req: CorrelationRequest, db: Session = Depends(get_db)):
     """Считает зависимость X↔Y за период. Возвращает snapshot."""
@@ -58,3 +77,26 @@ def compute_correlation(req: CorrelationRequest, db: Session = Depends(get_db)):
         "ok": snapshot.get("block_status") not in ("no_data",),
         "snapshot": snapshot,
     }
+
+
+@router.post("/matrix")
+def compute_matrix(req: MatrixRequest, db: Session = Depends(get_db)):
+    """Матрицы зависимостей для нескольких (скважина, период)."""
+    if not req.items:
+        raise HTTPException(400, "Пустой список items")
+    if len(req.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(400, f"Не более {MAX_BATCH_ITEMS} элементов за запрос")
+
+    well_ids = {it.well_id for it in req.items}
+    numbers = {w.id: str(w.number) for w in db.query(Well).filter(Well.id.in_(well_ids))}
+    items = [{**it.model_dump(), "well_number": numbers.get(it.well_id)} for it in req.items]
+
+    snapshots = build_param_correlation_matrices(db, items, signals=req.signals)
+    computed_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    for snap in snapshots:
+        snap["computed_at"] = computed_at
+
+    return {
+        "ok": any(s.get("block_status") not in ("no_data",) for s in snapshots),
+        "snapshots": snapshots,
+    }
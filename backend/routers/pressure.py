@@ -1057,8 +1057,10 @@ def pressure_refresh(
 
     _refresh_running = True
     try:
+        from backend.services import fleet_snapshot
         from backend.services.pressure_pipeline import run_pipeline
         result = run_pipeline(skip_sync=skip_sync)
+        fleet_snapshot.invalidate()
         return {"status": "ok", "result": result}
     finally:
         _refresh_running = False
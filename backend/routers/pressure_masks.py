@@ -193,6 +193,7 @@ def verify_batch(data: dict):
     """
     from backend.db import SessionLocal
     from backend.models.pressure_mask import PressureMask
+    from backend.services.pressure_mask_service import invalidate_mask_index
 
     mask_ids = data.get("mask_ids", [])
     action = data.get("action")
@@ -224,6 +225,8 @@ def verify_batch(data: dict):
             updated += 1
 
         db.commit()
+        for wid in {m.well_id for m in masks}:
+            invalidate_mask_index(wid)
         return {"ok": True, "action": action, "updated": updated}
     finally:
         db.close()
@@ -275,6 +278,7 @@ def get_mask(mask_id: int):
 def create_mask(data: dict, current_user: str = Depends(get_current_user)):
     from backend.db import SessionLocal
     from backend.models.pressure_mask import PressureMask
+    from backend.services.pressure_mask_service import invalidate_mask_index
 
     required = ("well_id", "affected_sensor", "correction_method", "dt_start", "dt_end")
     for field in required:
@@ -330,6 +334,7 @@ def create_mask(data: dict, current_user: str = Depends(get_current_user)):
         db.add(m)
         db.commit()
         db.refresh(m)
+        invalidate_mask_index(m.well_id)
         return _mask_to_dict(m)
     finally:
         db.close()
@@ -342,6 +347,7 @@ def create_mask(data: dict, current_user: str = Depends(get_current_user)):
 def update_mask(mask_id: int, data: dict):
     from backend.db import SessionLocal
     from backend.models.pressure_mask import PressureMask
+    from backend.services.pressure_mask_service import invalidate_mask_index
 
     db = SessionLocal()
     try:
@@ -364,6 +370,7 @@ def update_mask(mask_id: int, data: dict):
 
         db.commit()
         db.refresh(m)
+        invalidate_mask_index(m.well_id)
         return _mask_to_dict(m)
     finally:
         db.close()
@@ -376,6 +383,7 @@ def update_mask(mask_id: int, data: dict):
 def toggle_mask(mask_id: int):
     from backend.db import SessionLocal
     from backend.models.pressure_mask import PressureMask
+    from backend.services.pressure_mask_service import invalidate_mask_index
 
     db = SessionLocal()
     try:
@@ -384,6 +392,7 @@ def toggle_mask(mask_id: int):
             raise HTTPException(404, "Mask not found")
         m.is_active = not m.is_active
         db.commit()
+        invalidate_mask_index(m.well_id)
         return {"ok": True, "id": m.id, "is_active": m.is_active}
     finally:
         db.close()
@@ -396,14 +405,17 @@ def toggle_mask(mask_id: int):
 def delete_mask(mask_id: int):
     from backend.db import SessionLocal
     from backend.models.pressure_mask import PressureMask
+    from backend.services.pressure_mask_service import invalidate_mask_index
 
     db = SessionLocal()
     try:
         m = db.query(PressureMask).filter(PressureMask.id == mask_id).first()
         if not m:
             raise HTTPException(404, "Mask not found")
+        well_id = m.well_id
         db.delete(m)
         db.commit()
+        invalidate_mask_index(well_id)
         return {"ok": True, "id": mask_id}
     finally:
         db.close()
@@ -4,6 +4,8 @@
 POST /api/pressure-spectrum/compute — считает гистограммы P_уст и ΔP за период
 + метрики стабильности. Возвращает snapshot для сохранения в блок
 (customer_report_block, kind='pressure_spectrum') через общий CRUD блоков.
+POST /api/pressure-spectrum/compute-batch — то же для нескольких скважин/периодов
+с общими критериями (сравнение по фонду).
 
 Переиспользуемый модуль: блок сохраняется в любую главу через params.chapter.
 """
@@ -11,13 +13,14 @@ from __future__ import annotations
 
 from datetime import date, datetime
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from backend.db import SessionLocal
 from backend.models.wells import Well
 from backend.services.pressure_spectrum_service import (
+    build_pressure_spectra,
     build_pressure_spectrum,
     DEFAULT_BIN_WIDTH_PRESSURE,
     DEFAULT_BIN_WIDTH_DP,
@@ -25,6 +28,8 @@ from backend.services.pressure_spectrum_service import (
 
 router = APIRouter(prefix="/api/pressure-spectrum", tags=["pressure-spectrum"])
 
+MAX_BATCH_ITEMS = 50
+
 
 def get_db():
     db = SessionLocal()
@@ -34,13 +39,9 @@ def get_db():
         db.close()
 
 
-class SpectrumRequest(BaseModel):
-    well_id: int
-    period_from: date
-    period_to: date
+class SpectrumCriteria(BaseModel):
     bin_width_pressure: float = DEFAULT_BIN_WIDTH_PRESSURE
     bin_width_dp: float = DEFAULT_BIN_WIDTH_DP
-    label: str | None = None
     # Регулируемые критерии стабильности (None → мягкие дефолты сервиса)
     cv_threshold: float | None = None
     outlier_threshold: float | None = None
@@ -51,6 +52,24 @@ class SpectrumRequest(BaseModel):
     remove_outliers: bool = False
 
 
+class SpectrumRequest(SpectrumCriteria):
+    well_id: int
+    period_from: date
+    period_to: date
+    label: str | None = None
+
+
+class SpectrumItem(BaseModel):
+    well_id: int
+    period_from: date
+    period_to: date
+    label: str | None = None
+
+
+class SpectrumBatchRequest(SpectrumCriteria):
+    items: list[SpectrumItem]
+
+
 @router.post("/compute")
 def compute_spectrum(req: SpectrumRequest, db: Session = Depends(get_db)):
     """Считает спектр распределения P_уст и ΔP за период. Возвращает snapshot."""
@@ -80,3 +99,28 @@ def compute_spectrum(req: SpectrumRequest, db: Session = Depends(get_db)):
         "ok": snapshot.get("block_status") not in ("no_data",),
         "snapshot": snapshot,
     }
+
+
+@router.post("/compute-batch")
+def compute_spectrum_batch(req: SpectrumBatchRequest, db: Session = Depends(get_db)):
+    """Спектры для нескольких (скважина, период) с общими критериями."""
+    if not req.items:
+        raise HTTPException(400, "Пустой список items")
+    if len(req.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(400, f"Не более {MAX_BATCH_ITEMS} элементов за запрос")
+
+    well_ids = {it.well_id for it in req.items}
+    numbers = {w.id: str(w.number) for w in db.query(Well).filter(Well.id.in_(well_ids))}
+    items = [{**it.model_dump(), "well_number": numbers.get(it.well_id)} for it in req.items]
+
+    snapshots = build_pressure_spectra(
+        db, items, **req.model_dump(exclude={"items"}),
+    )
+    computed_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    for snap in snapshots:
+        snap["computed_at"] = computed_at
+
+    return {
+        "ok": any(s.get("block_status") not in ("no_data",) for s in snapshots),
+        "snapshots": snapshots,
+    }
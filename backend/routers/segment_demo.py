@@ -29,6 +29,7 @@ from sqlalchemy import text
 
 from backend.db import SessionLocal, engine as pg_engine
 from backend.deps import get_current_user
+from backend.services import segment_base_cache
 from backend.services.timeseries_analyzer import (
     AnalyzerConfig,
     analyze_timeseries,
@@ -360,8 +361,7 @@ def api_analyze(
 ):
     """Запуск сегментного анализа на данных скважины (давление + дебит)."""
     try:
-        from backend.services.flow_rate.full_pipeline import compute_full_flow
-        from backend.services.flow_rate.data_access import get_well_info
+        from backend.services.flow_rate.data_access import flow_data_version, get_well_info
 
         # Парсинг дат (могут приходить как "2026-02-17" или "2026-02-17T00:00")
         d_from = datetime.fromisoformat(req.date_from.split('T')[0])
@@ -380,36 +380,17 @@ def api_analyze(
             )
         well_number = str(well_info.get("number", req.well_id))
 
-        # Получаем данные через полный pipeline (как страница адаптации)
-        try:
-            full = compute_full_flow(
-                well_id=req.well_id,
-                dt_start=utc_start,
-                dt_end=utc_end,
-                smooth=True,
-            )
-        except ValueError as e:
-            raise HTTPException(
-                status_code=404,
-                detail=str(e)
-            )
-
-        df_raw = full["df"]  # поминутные данные
-
-        if df_raw.empty:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Нет данных для скважины {well_number} за период {req.date_from} — {req.date_to}"
-            )
-
-        # Агрегируем поминутные данные в дневные
-        df_daily = _aggregate_to_hourly(df_raw)
-
-        if df_daily.empty:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Нет дневных данных для анализа"
-            )
+        # Часовые агрегаты не зависят от порогов — кэшируем их по версии
+        # данных, подбор порогов пересчитывает только analyze_timeseries.
+        df_daily = segment_base_cache.get_or_build(
+            ("segment_demo", str(req.well_id), utc_start, utc_end,
+             flow_data_version(req.well_id)),
+            lambda: _load_hourly_base(
+                req.well_id, utc_start, utc_end,
+                f"Нет данных для скважины {well_number} за период "
+                f"{req.date_from} — {req.date_to}",
+            ),
+        )
 
         # Конфигурация анализа
         config = AnalyzerConfig()
@@ -541,6 +522,35 @@ def api_analyze(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _load_hourly_base(
+    well_id: int, utc_start: str, utc_end: str, empty_detail: str,
+) -> pd.DataFrame:
+    """Полный pipeline дебита + часовая агрегация (база для /analyze).
+
+    HTTPException при отсутствии данных не кэшируется.
+    """
+    from backend.services.flow_rate.full_pipeline import compute_full_flow
+
+    try:
+        full = compute_full_flow(
+            well_id=well_id,
+            dt_start=utc_start,
+            dt_end=utc_end,
+            smooth=True,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    df_raw = full["df"]  # поминутные данные
+    if df_raw.empty:
+        raise HTTPException(status_code=404, detail=empty_detail)
+
+    df_daily = _aggregate_to_hourly(df_raw)
+    if df_daily.empty:
+        raise HTTPException(status_code=404, detail="Нет дневных данных для анализа")
+    return df_daily
+
+
 @router.get("/series-options")
 def api_series_options():
     """Список доступных временных рядов для анализа."""
@@ -25,11 +25,15 @@ from backend.models.wells import Well
 from backend.services.daily_report_service import (
     KUNGRAD_OFFSET,
     TEMP_DIR,
-    _load_masked_hourly,
     _compute_month_flow_from_raw,
     _ensure_dirs,
     _robust_trend,
 )
+from backend.services import artifact_cache
+from backend.services.build_profiler import profiled
+from backend.services.chart_render_pool import ChartBatch
+from backend.services.report_job_queue import report_stage
+from backend.services.well_data_context import WellDataContext
 
 log = logging.getLogger(__name__)
 
@@ -40,6 +44,9 @@ STATUS_ADAPTATION = "Адаптация"
 # Дефолтная длительность этапа адаптации при автодетекте (от первого вброса)
 DEFAULT_ADAPT_DURATION_DAYS = 10
 
+# Типы событий — маркеры на графиках и в таблицах событий
+_MARKER_EVENT_TYPES = ("purge", "reagent", "equip", "other")
+
 
 # ═══════════════════════════════════════════════════════════════════
 # Обогащение событий данными из БД
@@ -49,6 +56,7 @@ def _enrich_events_from_db(
     db: Session,
     events: list[dict],
     well_number: str,
+    ctx: WellDataContext | None = None,
 ) -> list[dict]:
     """Обогатить события данными из таблицы events.
 
@@ -59,6 +67,8 @@ def _enrich_events_from_db(
         db: SQLAlchemy session
         events: список событий (из snapshot.adaptation.events_for_chart)
         well_number: номер скважины (строка)
+        ctx: контекст сборки отчёта — события скважины берутся из него
+            (один запрос на отчёт вместо запроса на каждый блок)
 
     Returns:
         Обогащённый список событий (мутирует in-place и возвращает)
@@ -79,14 +89,21 @@ def _enrich_events_from_db(
 
     # Загружаем все события из БД для этой скважины и времён
     try:
-        rows = db.execute(text("""
-            SELECT
-                TO_CHAR(event_time, 'YYYY-MM-DD"T"HH24:MI') as t,
-                event_type, reagent, qty, description, p_tube, p_line
-            FROM events
-            WHERE well = :wno
-              AND event_type IN ('purge', 'reagent', 'equip', 'other')
-        """), {"wno": well_number}).fetchall()
+        if ctx is not None:
+            rows = [
+                (r.event_time.strftime("%Y-%m-%dT%H:%M"), r.event_type, r.reagent,
+                 r.qty, r.description, r.p_tube, r.p_line)
+                for r in ctx.events(types=_MARKER_EVENT_TYPES)
+            ]
+        else:
+            rows = db.execute(text("""
+                SELECT
+                    TO_CHAR(event_time, 'YYYY-MM-DD"T"HH24:MI') as t,
+                    event_type, reagent, qty, description, p_tube, p_line
+                FROM events
+                WHERE well = :wno
+                  AND event_type IN ('purge', 'reagent', 'equip', 'other')
+            """), {"wno": well_number}).fetchall()
 
         # Индексируем по времени (первые 16 символов: YYYY-MM-DDTHH:MM)
         db_events = {}
@@ -489,6 +506,8 @@ def collect_stage_stats(
     render_charts: bool = False, chart_tag: str = "",
     highlight_windows: list[dict] | None = None,
     dp_threshold: float = 0.1,
+    ctx: WellDataContext | None = None,
+    chart_batch: ChartBatch | None = None,
 ) -> dict[str, Any]:
     """Собрать статистику скважины за период (наблюдение или адаптация).
 
@@ -500,14 +519,16 @@ def collect_stage_stats(
             границы суток 00:00 / 23:59:59.
         render_charts: если True, рендерит PNG-графики и кладёт пути в результат.
         chart_tag: суффикс для имени PNG (например, "obs" или "adapt").
+        ctx: контекст сборки отчёта (давления, события, штуцер общие для всех
+            секций). None — свой контекст на один вызов.
+        chart_batch: общий батч графиков отчёта — PNG этапа рендерятся при
+            его run() (пути *_chart_path заполняются тогда же). None — графики
+            этапа рендерятся параллельно здесь же.
 
     Возвращает dict с числовыми значениями (raw). None означает «нет данных».
     """
-    from backend.services.flow_rate.data_access import get_pressure_data
-    from backend.services.flow_rate.cleaning import clean_pressure
-    from backend.services.flow_rate.calculator import (
-        calculate_flow_rate, calculate_cumulative,
-    )
+    if ctx is None:
+        ctx = WellDataContext(db, well)
 
     # Нормализация: всегда работаем с datetime (Kungrad-local naive)
     dt_from = _to_dt(date_from, end_of_day=False)
@@ -522,7 +543,7 @@ def collect_stage_stats(
     utc_end = dt_to - KUNGRAD_OFFSET
 
     # 1. Почасовые давления (маски уже применены)
-    hourly = _load_masked_hourly(well.id, utc_start, utc_end)
+    hourly = ctx.masked_hourly(utc_start, utc_end)
 
     p_tube_median = None
     p_line_median = None
@@ -604,14 +625,7 @@ def collect_stage_stats(
 
     if choke_mm and choke_mm > 0:
         try:
-            from backend.services.flow_rate.full_pipeline import compute_full_flow
-            full = compute_full_flow(
-                well_id=well.id,
-                dt_start=utc_start,
-                dt_end=utc_end,
-                smooth=True,
-                dp_threshold=dp_threshold,
-            )
+            full = ctx.full_flow(utc_start, utc_end, dp_threshold=dp_threshold)
             summary_flow = full["summary"]
             # Список простоев (Кунградское время — индекс df уже в Кунграде)
             dt_periods_df = full.get("downtime_periods")
@@ -692,40 +706,23 @@ def collect_stage_stats(
     # Один полный цикл продувки = 3 события (start/press/stop). Считаем
     # уникальные циклы по числу маркеров 'start' (а для легаси-данных без
     # phase — каждое событие как один цикл).
-    event_counts = db.execute(text("""
-        SELECT
-            COUNT(*) FILTER (
-                WHERE event_type = 'purge'
-                  AND (purge_phase = 'start' OR purge_phase IS NULL)
-            ) AS purges,
-            COUNT(*) FILTER (WHERE event_type = 'reagent') AS reagents,
-            COALESCE(SUM(qty) FILTER (WHERE event_type = 'reagent'), 0) AS reagent_qty
-        FROM events
-        WHERE well = :wno
-          AND event_time >= :start AND event_time <= :end
-    """), {
-        "wno": str(well.number), "start": local_start, "end": local_end,
-    }).fetchone()
-
-    purge_count = int(event_counts[0] or 0) if event_counts else 0
-    reagent_count = int(event_counts[1] or 0) if event_counts else 0
-    reagent_qty = float(event_counts[2] or 0.0) if event_counts else 0.0
+    stage_events = ctx.events(local_start, local_end)
+    purge_count = sum(
+        1 for r in stage_events
+        if r.event_type == "purge" and r.purge_phase in ("start", None)
+    )
+    reagent_events = [r for r in stage_events if r.event_type == "reagent"]
+    reagent_count = len(reagent_events)
+    reagent_qty = float(sum(r.qty or 0 for r in reagent_events))
 
     # Разбивка реагентов по типам
-    reagent_rows = db.execute(text("""
-        SELECT reagent, COUNT(*), COALESCE(SUM(qty), 0)
-        FROM events
-        WHERE well = :wno AND event_type = 'reagent'
-          AND event_time >= :start AND event_time <= :end
-          AND reagent IS NOT NULL
-        GROUP BY reagent ORDER BY reagent
-    """), {
-        "wno": str(well.number), "start": local_start, "end": local_end,
-    }).fetchall()
-
+    qty_by_reagent: dict[str, list] = {}
+    for r in reagent_events:
+        if r.reagent is not None:
+            qty_by_reagent.setdefault(r.reagent, []).append(r.qty)
     reagent_stats = [
-        {"name": r[0], "count": int(r[1] or 0), "total_qty": float(r[2] or 0.0)}
-        for r in reagent_rows
+        {"name": name, "count": len(qtys), "total_qty": float(sum(q or 0 for q in qtys))}
+        for name, qtys in sorted(qty_by_reagent.items())
     ]
 
     # Потери (простой × медианный дебит)
@@ -740,32 +737,17 @@ def collect_stage_stats(
     # чуть раньше старта данных (за тот же день). Чтобы «Установлено новые датчики»
     # попадало в таблицу событий, окно для equip расширяем до начала суток старта.
     _equip_start = local_start.replace(hour=0, minute=0, second=0, microsecond=0)
-    marker_rows = db.execute(text("""
-        SELECT event_time, event_type, reagent, qty, description, p_tube, p_line
-        FROM events
-        WHERE well = :wno
-          AND event_type IN ('purge', 'reagent', 'equip', 'other')
-          AND event_time <= :end
-          AND (
-                event_time >= :start
-                OR (event_type = 'equip' AND event_time >= :equip_start)
-          )
-        ORDER BY event_time
-    """), {
-        "wno": str(well.number), "start": local_start, "end": local_end,
-        "equip_start": _equip_start,
-    }).fetchall()
-    for r in marker_rows:
-        if r[0]:
+    for r in ctx.events(_equip_start, local_end, types=_MARKER_EVENT_TYPES):
+        if r.event_time >= local_start or r.event_type == "equip":
             # events хранятся в Kungrad-локальном времени → переводим в UTC
             event_markers.append({
-                "time_utc": r[0] - KUNGRAD_OFFSET,
-                "event_type": r[1],
-                "reagent": r[2],
-                "qty": float(r[3]) if r[3] else None,
-                "description": r[4],
-                "p_tube": float(r[5]) if r[5] else None,
-                "p_line": float(r[6]) if r[6] else None,
+                "time_utc": r.event_time - KUNGRAD_OFFSET,
+                "event_type": r.event_type,
+                "reagent": r.reagent,
+                "qty": float(r.qty) if r.qty else None,
+                "description": r.description,
+                "p_tube": float(r.p_tube) if r.p_tube else None,
+                "p_line": float(r.p_line) if r.p_line else None,
             })
 
     # 4. Графики
@@ -824,32 +806,27 @@ def collect_stage_stats(
                 "q": q,
             })
 
+    # PNG этапа — задания пула рендера (chart_render_pool): пути ложатся
+    # в результат после run() — здесь же или в общем батче отчёта.
+    stage_charts: list[tuple[str, Any, tuple, dict]] = []
     if render_charts and not hourly.empty:
-        try:
-            pressure_chart_path = _render_stage_pressure_chart(
-                hourly, well.number, chart_tag,
-                event_markers=event_markers,
-            )
-            dp_chart_path = _render_stage_dp_chart(
-                hourly, well.number, chart_tag, dp_trend,
-                event_markers=event_markers,
-            )
-            if df_flow is not None and not df_flow.empty:
-                flow_chart_path = _render_stage_flow_chart(
-                    df_flow, well.number, chart_tag,
-                    event_markers=event_markers,
-                )
-            # Комбинированный график на полную страницу
-            combined_chart_path = _render_stage_combined_chart(
-                hourly, df_flow, well.number, chart_tag,
-                event_markers=event_markers,
-                dp_trend=dp_trend, q_trend=q_trend,
-                highlight_windows=highlight_windows,
-            )
-        except Exception:
-            log.exception("Chart rendering failed for %s/%s", well.number, chart_tag)
+        stage_charts.append(("pressure_chart_path", _render_stage_pressure_chart,
+                             (hourly, well.number, chart_tag),
+                             {"event_markers": event_markers}))
+        stage_charts.append(("dp_chart_path", _render_stage_dp_chart,
+                             (hourly, well.number, chart_tag, dp_trend),
+                             {"event_markers": event_markers}))
+        if df_flow is not None and not df_flow.empty:
+            stage_charts.append(("flow_chart_path", _render_stage_flow_chart,
+                                 (df_flow, well.number, chart_tag),
+                                 {"event_markers": event_markers}))
+        # Комбинированный график на полную страницу
+        stage_charts.append(("combined_chart_path", _render_stage_combined_chart,
+                             (hourly, df_flow, well.number, chart_tag),
+                             {"event_markers": event_markers, "dp_trend": dp_trend,
+                              "q_trend": q_trend, "highlight_windows": highlight_windows}))
 
-    return {
+    result = {
         "date_from": dt_from,
         "date_to": dt_to,
         "duration_days": duration_days,
@@ -900,6 +877,15 @@ def collect_stage_stats(
         "events_for_chart": events_for_chart,
     }
 
+    if stage_charts:
+        batch = chart_batch if chart_batch is not None else ChartBatch()
+        for key, fn, args, kwargs in stage_charts:
+            batch.add(fn, *args, target=(result, key),
+                      label=f"{key[:-5]}:{well.number}:{chart_tag}", **kwargs)
+        if chart_batch is None:
+            batch.run()
+    return result
+
 
 # ═══════════════════════════════════════════════════════════════════
 # Рендеринг графиков для многодневных периодов
@@ -914,107 +900,133 @@ def collect_stage_stats(
 OPTIMAL_MAX_CV = 0.05
 
 
-def _window_metrics(
-    hourly: pd.DataFrame, df_flow: pd.DataFrame | None,
-    event_markers: list[dict] | None,
-    w_from: datetime, w_to: datetime,
-) -> dict | None:
-    """Рассчитать 5 метрик для одного окна.
+def _prefix(values: np.ndarray) -> np.ndarray:
+    """Префиксные суммы с ведущим нулём: sum(values[lo:hi]) = P[hi] − P[lo]."""
+    return np.concatenate(([0.0], np.cumsum(values, dtype=float)))
 
-    Индексы hourly/df_flow — UTC. w_from/w_to — Kungrad-local naive.
-    """
-    utc_from = w_from - KUNGRAD_OFFSET
-    utc_to = w_to - KUNGRAD_OFFSET
 
-    # Срез hourly
-    h = hourly.loc[utc_from:utc_to] if not hourly.empty else hourly
-    if h.empty or len(h) < 3:
-        return None
+def _ns(values) -> np.ndarray:
+    """Метки времени → int64 наносекунды (для searchsorted)."""
+    return pd.DatetimeIndex(values).as_unit("ns").asi8
 
-    # Покрытие окна данными: < 50% → отбраковать
-    window_hours_total = (w_to - w_from).total_seconds() / 3600.0
-    data_coverage = len(h) / max(window_hours_total, 1)
-    if data_coverage < 0.5:
-        return None
 
-    # Срез Q
+def _window_metrics_batch(
+    hourly: pd.DataFrame, df_flow: pd.DataFrame | None,
+    event_markers: list[dict] | None,
+    starts: list[datetime], window: timedelta,
+) -> list[dict | None]:
+    """Метрики _window_metrics для всех окон [start, start + window] за один проход.
+
+    Границы окон — searchsorted по индексам; число часов, рабочие часы,
+    суммы Q и моменты регрессии Q(t) — разности префиксных сумм, продувки —
+    searchsorted по отсортированным маркерам. Медиана по префиксам не
+    считается — она берётся nanmedian по матрице окон (окно × точка).
+    None — окно отбраковано (мало данных), как у _window_metrics.
+    """
+    out: list[dict | None] = [None] * len(starts)
+    if not starts or hourly.empty:
+        return out
+
+    window_hours_total = window.total_seconds() / 3600.0
+    window_days = window_hours_total / 24.0
+    from_ns = _ns([s - KUNGRAD_OFFSET for s in starts])
+    to_ns = from_ns + int(window / timedelta(microseconds=1)) * 1000
+
+    # Часы окна и КИВ: часов где ΔP > 0.1 / всего часов в окне
+    h_ns = _ns(hourly.index)
+    lo_h = np.searchsorted(h_ns, from_ns, side="left")
+    hi_h = np.searchsorted(h_ns, to_ns, side="right")
+    n_h = hi_h - lo_h
+    pt = hourly["p_tube"].to_numpy(dtype=float)
+    pl = hourly["p_line"].to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        working = np.isfinite(pt) & np.isfinite(pl) & ((pt - pl) > 0.1)
+    work_hours = _prefix(working.astype(float))
+    utilization = (work_hours[hi_h] - work_hours[lo_h]) / np.maximum(n_h, 1) * 100.0
+
+    # Рабочие точки Q (> 0) — свой отсортированный ряд
     if df_flow is not None and not df_flow.empty and "flow_rate" in df_flow.columns:
-        f = df_flow.loc[utc_from:utc_to]
-        q_vals = f["flow_rate"].dropna()
-        q_working = q_vals[q_vals > 0]
+        q_all = df_flow["flow_rate"].to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            q_ok = q_all > 0
+        q = q_all[q_ok]
+        q_ns = _ns(df_flow.index)[q_ok]
     else:
-        q_working = pd.Series([], dtype=float)
-
-    if len(q_working) < 3:
-        return None
-
-    q_mean = float(q_working.mean())
-    q_median = float(q_working.median())
-
+        q, q_ns = np.empty(0), np.empty(0, dtype=np.int64)
+    lo_q = np.searchsorted(q_ns, from_ns, side="left")
+    hi_q = np.searchsorted(q_ns, to_ns, side="right")
+    n_q = hi_q - lo_q
+
+    valid = (n_h >= 3) & (n_h / max(window_hours_total, 1) >= 0.5) & (n_q >= 3)
+    if not valid.any():
+        return out
+
+    # МНК Q(t), t — часы от первой рабочей точки (суммы по t точные для
+    # часовой сетки), Q центрирован глобальным средним — погрешность
+    # префиксных сумм падает, наклон и остатки от сдвига не зависят.
+    t = (q_ns - q_ns[0]) / 3.6e12 if q.size else np.empty(0)
+    center = float(q.mean()) if q.size else 0.0
+    qc = q - center
+    p_t, p_tt = _prefix(t), _prefix(t * t)
+    p_q, p_qq, p_tq = _prefix(qc), _prefix(qc * qc), _prefix(t * qc)
+
+    lo, hi = lo_q[valid], hi_q[valid]
+    n = (hi - lo).astype(float)
+    st, stt = p_t[hi] - p_t[lo], p_tt[hi] - p_tt[lo]
+    sq, sqq, stq = p_q[hi] - p_q[lo], p_qq[hi] - p_qq[lo], p_tq[hi] - p_tq[lo]
+    sxx = stt - st * st / n
+    sxy = stq - st * sq / n
+    syy = sqq - sq * sq / n
+    slope = sxy / sxx
     # CV считаем от остатков после удаления линейного тренда:
     # монотонный рост Q — это НЕ нестабильность, а позитивная динамика.
-    # Обычный std ошибочно штрафует такой рост. Residual std измеряет
-    # только "шум" вокруг тренда.
-    t0 = q_working.index.min()
-    t_h = np.array([(t - t0).total_seconds() / 3600.0 for t in q_working.index])
-    v = q_working.values
-    try:
-        coef = np.polyfit(t_h, v, 1)
-        residuals = v - np.polyval(coef, t_h)
-        residual_std = float(np.std(residuals))
-    except (np.linalg.LinAlgError, ValueError):
-        residual_std = float(q_working.std(ddof=0))
-    cv_q = residual_std / q_mean if q_mean > 0 else float("inf")
-
-    # КИВ в окне: часов где ΔP > 0.1 / всего часов в окне
-    working_mask = (
-        h["p_tube"].notna()
-        & h["p_line"].notna()
-        & ((h["p_tube"] - h["p_line"]) > 0.1)
-    )
-    utilization = float(working_mask.sum()) / max(len(h), 1) * 100.0
+    residual_var = np.maximum(syy - sxy * slope, 0.0) / n
+    q_mean = center + sq / n
+    cv_q = np.sqrt(residual_var) / q_mean
+
+    # Медиана: матрица окон, хвосты коротких окон — NaN
+    width = int(n.max())
+    idx = lo[:, None] + np.arange(width)[None, :]
+    block = q[np.minimum(idx, q.size - 1)]
+    block[idx >= hi[:, None]] = np.nan
+    q_median = np.nanmedian(block, axis=1)
 
     # Частота продувок (на сутки) в окне
-    purge_count = sum(
-        1 for ev in (event_markers or [])
+    purge_ns = np.sort(_ns([
+        ev["time_utc"] for ev in (event_markers or [])
         if ev.get("event_type") == "purge"
-        and utc_from <= ev["time_utc"] <= utc_to
-    )
-    window_days = window_hours_total / 24.0
-    purge_freq = purge_count / max(window_days, 0.1)  # в сутки
-
-    # Тренд Q (линейная регрессия)
-    q_trend_abs = 0.0
-    if len(q_working) >= 3:
-        t0 = q_working.index.min()
-        t_h = np.array([(t - t0).total_seconds() / 3600.0 for t in q_working.index])
-        v = q_working.values
-        try:
-            coef = np.polyfit(t_h, v, 1)
-            q_trend_abs = abs(float(coef[0]) * 24.0)  # тыс.м³/сут за сутки
-        except (np.linalg.LinAlgError, ValueError):
-            pass
+    ]))
+    purges = (np.searchsorted(purge_ns, to_ns[valid], side="right")
+              - np.searchsorted(purge_ns, from_ns[valid], side="left"))
+    purge_freq = purges / max(window_days, 0.1)
+
+    for j, k in enumerate(np.flatnonzero(valid)):
+        out[k] = {
+            "start": starts[k],
+            "end": starts[k] + window,
+            "q_mean": float(q_mean[j]),
+            "q_median": float(q_median[j]),
+            "cv_q": float(cv_q[j]),
+            "utilization_pct": float(utilization[k]),
+            "purge_freq_per_day": float(purge_freq[j]),
+            "q_trend_abs": abs(float(slope[j]) * 24.0),  # тыс.м³/сут за сутки
+            "data_points": int(n_h[k]),
+        }
+    return out
 
-    return {
-        "start": w_from,
-        "end": w_to,
-        "q_mean": q_mean,
-        "q_median": q_median,
-        "cv_q": cv_q,
-        "utilization_pct": utilization,
-        "purge_freq_per_day": purge_freq,
-        "q_trend_abs": q_trend_abs,
-        "data_points": len(h),
-    }
 
+def _window_metrics(
+    hourly: pd.DataFrame, df_flow: pd.DataFrame | None,
+    event_markers: list[dict] | None,
+    w_from: datetime, w_to: datetime,
+) -> dict | None:
+    """Рассчитать 5 метрик для одного окна.
 
-def _percentile_rank(value: float, all_values: list[float], higher_is_better: bool = True) -> float:
-    """Ранг значения среди всех (0..1). Если higher_is_better=False, инвертируем."""
-    if not all_values or len(all_values) < 2:
-        return 0.5
-    arr = np.array(all_values)
-    rank = float((arr < value).sum() + 0.5 * (arr == value).sum()) / len(arr)
-    return rank if higher_is_better else (1.0 - rank)
+    Индексы hourly/df_flow — UTC. w_from/w_to — Kungrad-local naive.
+    """
+    return _window_metrics_batch(
+        hourly, df_flow, event_markers, [w_from], w_to - w_from,
+    )[0]
 
 
 def _score_candidates(cands: list[dict]) -> list[dict]:
@@ -1023,27 +1035,27 @@ def _score_candidates(cands: list[dict]) -> list[dict]:
     Логика простая: оптимум = окно с наивысшим медианным дебитом.
     Окна с CV > OPTIMAL_MAX_CV (резкие колебания) отбрасываются.
     КИВ должен быть ≥ 70% (иначе окно содержит слишком много простоев).
+    Порядок — один устойчивый argsort (равные Q_median — в исходном порядке).
     """
     if not cands:
         return []
 
     # Фильтрация по CV и КИВ (явные отсечки, а не мягкий штраф)
-    viable = [
-        c for c in cands
-        if (c.get("cv_q") is not None and c["cv_q"] <= OPTIMAL_MAX_CV)
-        and (c.get("utilization_pct") is not None and c["utilization_pct"] >= 70)
-    ]
+    cv = np.array([np.nan if c.get("cv_q") is None else c["cv_q"] for c in cands], dtype=float)
+    util = np.array([np.nan if c.get("utilization_pct") is None else c["utilization_pct"]
+                     for c in cands], dtype=float)
+    with np.errstate(invalid="ignore"):
+        viable = (cv <= OPTIMAL_MAX_CV) & (util >= 70)
     # Если всё отсеклось — возвращаемся к исходному (с маяком в rationale)
-    source = viable if viable else cands
+    source = [c for c, ok in zip(cands, viable) if ok] or list(cands)
 
     # Назначим псевдо-score = нормализованный Q_median (0..1), чтобы UI продолжил
     # отображать "Score", но на самом деле это просто ранг по Q.
-    qs = [c["q_median"] for c in source]
-    q_min = min(qs)
-    q_max = max(qs)
-    q_span = (q_max - q_min) or 1.0
-    for c in source:
-        c["score"] = (c["q_median"] - q_min) / q_span
+    qs = np.array([c["q_median"] for c in source], dtype=float)
+    q_min = float(qs.min())
+    q_span = (float(qs.max()) - q_min) or 1.0
+    for c, q in zip(source, qs):
+        c["score"] = (float(q) - q_min) / q_span
         # Заполняем rank-поля на всякий случай (используются в UI/PDF)
         c["rank_q"] = c["score"]
         c["rank_stability"] = 1.0 - min(1.0, c.get("cv_q", 0) / OPTIMAL_MAX_CV)
@@ -1051,33 +1063,36 @@ def _score_candidates(cands: list[dict]) -> list[dict]:
         c["rank_purge"] = 1.0 if (c.get("purge_freq_per_day") or 0) == 0 else 0.0
 
     # Сортировка по убыванию Q_median
-    source.sort(key=lambda x: x["q_median"], reverse=True)
-    return source
+    return [source[i] for i in np.argsort(-qs, kind="stable")]
 
 
 def detect_optimal_windows(
     db: Session, well: Well, choke_mm: float | None,
     dt_from: datetime, dt_to: datetime,
     window_hours: int = 72, top_n: int = 3, step_hours: int = 6,
+    ctx: WellDataContext | None = None,
 ) -> list[dict]:
     """Найти top-N оптимальных подпериодов внутри [dt_from, dt_to].
 
     Алгоритм:
     1. Скользящее окно шириной window_hours, шаг step_hours.
-    2. Для каждого окна — 5 метрик: Q_median, CV, КИВ, продувок/сут, |тренд Q|.
-    3. Перцентиль-нормализация по всем кандидатам.
-    4. Composite Score с весами OPTIMAL_WEIGHTS.
-    5. Возврат top-N по убыванию Score.
+    2. Для каждого окна — 5 метрик: Q_median, CV, КИВ, продувок/сут, |тренд Q|
+       (все окна разом — _window_metrics_batch, префиксные суммы).
+    3. Отсечка по Q_median (≥ 50% медианы периода), CV и КИВ.
+    4. Возврат top-N по убыванию Q_median (_score_candidates).
 
     Если весь период короче window_hours — окно = весь период (один кандидат).
+    ctx — контекст сборки отчёта (None — свой на один вызов).
     """
     if not choke_mm or choke_mm <= 0:
         return []
+    if ctx is None:
+        ctx = WellDataContext(db, well)
 
     utc_start = dt_from - KUNGRAD_OFFSET
     utc_end = dt_to - KUNGRAD_OFFSET
 
-    hourly = _load_masked_hourly(well.id, utc_start, utc_end)
+    hourly = ctx.masked_hourly(utc_start, utc_end)
     if hourly.empty:
         return []
 
@@ -1086,19 +1101,10 @@ def detect_optimal_windows(
     # Маркеры событий (нужны для частоты продувок). Один полный цикл
     # продувки = 3 события (start/press/stop) → берём только маркер 'start'
     # как точку отсчёта цикла; для легаси-данных без phase — каждое.
-    local_start = dt_from
-    local_end = dt_to
-    rows = db.execute(text("""
-        SELECT event_time, event_type FROM events
-        WHERE well = :wno AND event_type = 'purge'
-          AND (purge_phase = 'start' OR purge_phase IS NULL)
-          AND event_time >= :start AND event_time <= :end
-    """), {
-        "wno": str(well.number), "start": local_start, "end": local_end,
-    }).fetchall()
     event_markers = [
-        {"time_utc": r[0] - KUNGRAD_OFFSET, "event_type": r[1]}
-        for r in rows if r[0]
+        {"time_utc": r.event_time - KUNGRAD_OFFSET, "event_type": r.event_type}
+        for r in ctx.events(dt_from, dt_to, types=("purge",))
+        if r.purge_phase in ("start", None)
     ]
 
     # Если период короче окна — берём весь период
@@ -1112,16 +1118,14 @@ def detect_optimal_windows(
             return [m]
         return []
 
-    # Скользящее окно
-    candidates: list[dict] = []
-    t = dt_from
-    while t + timedelta(hours=window_hours) <= dt_to + timedelta(minutes=1):
-        w_from = t
-        w_to = t + timedelta(hours=window_hours)
-        m = _window_metrics(hourly, df_flow, event_markers, w_from, w_to)
-        if m is not None:
-            candidates.append(m)
-        t += timedelta(hours=step_hours)
+    # Скользящее окно: все позиции шага step_hours, метрики — одним проходом
+    window = timedelta(hours=window_hours)
+    n_windows = (dt_to + timedelta(minutes=1) - dt_from - window) // timedelta(hours=step_hours) + 1
+    starts = [dt_from + timedelta(hours=step_hours * k) for k in range(max(n_windows, 0))]
+    candidates = [
+        m for m in _window_metrics_batch(hourly, df_flow, event_markers, starts, window)
+        if m is not None
+    ]
 
     if not candidates:
         return []
@@ -1150,6 +1154,7 @@ def detect_optimal_windows(
 def compute_monthly_stats(
     db: Session, well_id: int,
     months_back: int = 24,
+    ctx: WellDataContext | None = None,
 ) -> list[dict]:
     """Посчитать помесячную статистику скважины.
 
@@ -1161,20 +1166,18 @@ def compute_monthly_stats(
     - Авто-описание
 
     Загружает всю историю давлений (с масками), считает Q по часам,
-    группирует по году-месяцу, строит статистику.
+    группирует по году-месяцу, строит статистику. ctx — контекст сборки
+    отчёта (None — свой на один вызов).
     """
-    well = db.query(Well).filter(Well.id == well_id).first()
-    if not well:
-        return []
+    if ctx is None:
+        well = db.query(Well).filter(Well.id == well_id).first()
+        if not well:
+            return []
+        ctx = WellDataContext(db, well)
 
     # Штуцер (берём последний — для старых периодов может быть неточно,
     # но pipeline flow_rate использует ту же формулу везде)
-    row = db.execute(text("""
-        SELECT choke_diam_mm FROM well_construction
-        WHERE well_no = :wno
-        ORDER BY data_as_of DESC NULLS LAST LIMIT 1
-    """), {"wno": str(well.number)}).fetchone()
-    choke_mm = float(row[0]) if row and row[0] else None
+    choke_mm, _ = ctx.construction()
     if not choke_mm or choke_mm <= 0:
         return []
 
@@ -1189,7 +1192,7 @@ def compute_monthly_stats(
     utc_start = period_start_local - KUNGRAD_OFFSET
     utc_end = today - KUNGRAD_OFFSET
 
-    hourly = _load_masked_hourly(well_id, utc_start, utc_end)
+    hourly = ctx.masked_hourly(utc_start, utc_end)
     if hourly.empty:
         return []
 
@@ -1200,33 +1203,15 @@ def compute_monthly_stats(
     df_flow_local["year_month"] = df_flow_local.index.strftime("%Y-%m")
     df_flow_local["dp"] = (hourly["p_tube"] - hourly["p_line"]).clip(lower=0).values
 
-    # События помесячно — одним запросом. Один цикл продувки = 3 события
+    # События помесячно. Один цикл продувки = 3 события
     # (start/press/stop) → считаем только маркер 'start' как 1 цикл
     # (для легаси-данных без phase — каждое событие как 1 цикл).
-    events_rows = db.execute(text("""
-        SELECT
-            to_char(event_time, 'YYYY-MM') AS ym,
-            event_type,
-            COUNT(*) FILTER (
-                WHERE event_type <> 'purge'
-                   OR purge_phase = 'start'
-                   OR purge_phase IS NULL
-            ) AS cnt
-        FROM events
-        WHERE well = :wno
-          AND event_time >= :start
-          AND event_time <= :end
-          AND event_type IN ('purge', 'reagent')
-        GROUP BY ym, event_type
-    """), {
-        "wno": str(well.number),
-        "start": period_start_local,
-        "end": today,
-    }).fetchall()
-
     events_by_month: dict[str, dict] = {}
-    for r in events_rows:
-        events_by_month.setdefault(r[0], {})[r[1]] = int(r[2] or 0)
+    for r in ctx.events(period_start_local, today, types=("purge", "reagent")):
+        month = events_by_month.setdefault(r.event_time.strftime("%Y-%m"), {})
+        month.setdefault(r.event_type, 0)
+        if r.event_type != "purge" or r.purge_phase in ("start", None):
+            month[r.event_type] += 1
 
     # Агрегируем по месяцам
     result: list[dict] = []
@@ -1308,25 +1293,19 @@ def _compute_hourly_flow(
     from backend.services.flow_rate.config import DEFAULT_FLOW as cfg
 
     choke_sq = (choke_mm / cfg.C2) ** 2
-    q_values = []
-    for _, row in hourly.iterrows():
-        pt, pl = row["p_tube"], row["p_line"]
-        # NaN для отсутствующих данных
-        if pd.isna(pt) or pd.isna(pl) or pt <= 0:
-            q_values.append(np.nan)
-            continue
-        pt, pl = float(pt), float(pl)
+    pt = hourly["p_tube"].to_numpy(dtype=float)
+    pl = hourly["p_line"].to_numpy(dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
         dp = pt - pl
-        # Простой: ΔP < порога — Q = 0 (согласовано с красными зонами)
-        if dp < dp_threshold:
-            q_values.append(0.0)
-            continue
         ratio = dp / pt
-        if ratio < cfg.critical_ratio:
-            q = cfg.C1 * choke_sq * pt * (1.0 - ratio / 1.5) * (ratio / cfg.C3) ** 0.5
-        else:
-            q = 0.667 * cfg.C1 * choke_sq * pt * (0.5 / cfg.C3) ** 0.5
-        q_values.append(max(q * cfg.multiplier, 0.0))
+        q_sub = cfg.C1 * choke_sq * pt * (1.0 - ratio / 1.5) * np.sqrt(ratio / cfg.C3)
+        q_crit = 0.667 * cfg.C1 * choke_sq * pt * (0.5 / cfg.C3) ** 0.5
+        q = np.where(ratio < cfg.critical_ratio, q_sub, q_crit)
+        q_values = np.maximum(q * cfg.multiplier, 0.0)
+        # Простой: ΔP < порога — Q = 0 (согласовано с красными зонами)
+        q_values = np.where(dp < dp_threshold, 0.0, q_values)
+        # NaN для отсутствующих данных
+        q_values = np.where(np.isnan(pt) | np.isnan(pl) | (pt <= 0), np.nan, q_values)
 
     df = hourly.copy()
     df["flow_rate"] = q_values
@@ -2329,38 +2308,23 @@ def _collect_well_tech_data(
     # ── 3. Соседи: все скважины с координатами, кроме текущей ──
     if well.lat is not None and well.lon is not None:
         try:
-            from math import asin, cos, radians, sin, sqrt
-
-            def _haversine_km(la1, lo1, la2, lo2):
-                R = 6371.0
-                la1, lo1, la2, lo2 = map(radians, (la1, lo1, la2, lo2))
-                dlat = la2 - la1
-                dlon = lo2 - lo1
-                a = sin(dlat / 2) ** 2 + cos(la1) * cos(la2) * sin(dlon / 2) ** 2
-                return 2 * R * asin(sqrt(a))
-
-            others = (
-                db.query(Well)
-                .filter(Well.id != well.id,
-                        Well.lat.isnot(None), Well.lon.isnot(None))
-                .all()
+            from backend.services.map_spatial_service import get_index
+
+            nearest = get_index(db).nearest(
+                float(well.lat), float(well.lon),
+                kind="well", k=neighbor_limit, exclude_id=well.id,
             )
-            with_dist = [
+            out["neighbors"] = [
                 {
-                    "id": w.id,
-                    "number": str(w.number),
-                    "name": w.name,
-                    "lat": float(w.lat),
-                    "lon": float(w.lon),
-                    "distance_km": _haversine_km(
-                        float(well.lat), float(well.lon),
-                        float(w.lat), float(w.lon),
-                    ),
+                    "id": n["id"],
+                    "number": n["number"],
+                    "name": n["name"],
+                    "lat": n["lat"],
+                    "lon": n["lon"],
+                    "distance_km": n["distance_m"] / 1000.0,
                 }
-                for w in others
+                for n in nearest
             ]
-            with_dist.sort(key=lambda x: x["distance_km"])
-            out["neighbors"] = with_dist[:neighbor_limit]
         except Exception:
             log.warning("neighbors lookup failed for well %s", well.id)
 
@@ -2846,6 +2810,7 @@ def _enrich_period_with_customer_data(
     analysis: dict, render_charts: bool, p_idx: int,
     block_snapshot: dict | None = None,
     chart_dir: Path | None = None,
+    ctx: WellDataContext | None = None,
 ) -> None:
     """Дополняет analysis-словарь данными со страницы /customer-daily.
 
@@ -2869,6 +2834,8 @@ def _enrich_period_with_customer_data(
     chart_dir: эфемерный temp-каталог per-request (если None — TEMP_DIR).
     Используется чтобы PNG не накапливались в static/generated/temp.
 
+    ctx: контекст сборки отчёта — ряд well_daily берётся срезом из него.
+
     Изменяет analysis in-place. Все ошибки молча проглатываются — глава
     останется частичной, но не упадёт.
     """
@@ -2964,8 +2931,11 @@ def _enrich_period_with_customer_data(
         analysis["strict_compare_rows"] = []
 
     try:
-        df = load_for_well(db, str(well.number),
-                           d_from=period_from, d_to=period_to)
+        if ctx is not None:
+            df = ctx.customer_daily(period_from, period_to)
+        else:
+            df = load_for_well(db, str(well.number),
+                               d_from=period_from, d_to=period_to)
     except Exception:
         log.exception("load_for_well failed for %s %s..%s",
                       well.number, period_from, period_to)
@@ -3151,6 +3121,7 @@ def _build_chart_grid_rows(
 # Основной сборщик данных (для debug-эндпоинта Этапа 1)
 # ═══════════════════════════════════════════════════════════════════
 
+@profiled()
 def collect_report_data(
     db: Session, well_id: int,
     obs_from: date | datetime | None = None,
@@ -3203,10 +3174,18 @@ def collect_report_data(
     fast_chapter_only / fast_block_only — режимы быстрого превью одной главы
     или одного блока: пропускают тяжёлые расчёты глав, которые не отображаются
     в результирующем PDF. Уменьшают время с десятков секунд до единиц секунд.
+
+    Все секции берут данные скважины из одного WellDataContext: pressure_raw
+    (объединение диапазонов этапов), events, well_daily и штуцер читаются из
+    БД не более одного раза на сборку.
     """
     well = db.query(Well).filter(Well.id == well_id).first()
     if not well:
         return {"ok": False, "error": f"Скважина с id={well_id} не найдена"}
+    ctx = WellDataContext(db, well)
+    # Все PNG сборки (этапы, фолбэки блоков, роза) — один батч пула рендера,
+    # рендер одним run() перед возвратом.
+    charts = ChartBatch()
 
     warnings: list[str] = []
     obs_note: str | None = None
@@ -3275,13 +3254,7 @@ def collect_report_data(
         warnings = list(v.warnings)
 
     # Диаметр штуцера из well_construction
-    row = db.execute(text("""
-        SELECT choke_diam_mm, horizon FROM well_construction
-        WHERE well_no = :wno
-        ORDER BY data_as_of DESC NULLS LAST LIMIT 1
-    """), {"wno": str(well.number)}).fetchone()
-    choke_mm = float(row[0]) if row and row[0] else None
-    horizon = str(row[1]) if row and row[1] else None
+    choke_mm, horizon = ctx.construction()
 
     if not choke_mm:
         return {
@@ -3659,6 +3632,15 @@ def collect_report_data(
         except Exception:
             pass
 
+    # Диапазоны минутных давлений всех секций — pressure_raw читается одним
+    # запросом за их объединение (оптимум внутри адаптации; ручное окно и
+    # окна ИРВ вне объединения догружаются только недостающими краями).
+    ctx.cover(_to_dt(_io_from, False) - KUNGRAD_OFFSET, _to_dt(_io_to, True) - KUNGRAD_OFFSET)
+    ctx.cover(_to_dt(adapt_from, False) - KUNGRAD_OFFSET, _to_dt(adapt_to, True) - KUNGRAD_OFFSET)
+    if optimal_mode == "manual" and optimal_from and optimal_to:
+        ctx.cover(_to_dt(optimal_from, False) - KUNGRAD_OFFSET,
+                  _to_dt(optimal_to, True) - KUNGRAD_OFFSET)
+
     # Сбор статистики этапа наблюдения по ФАКТИЧЕСКИМ датам.
     # Для obs_stats: сначала ищем snapshot observation_analysis, если нет —
     # fallback на collect_stage_stats.
@@ -3674,7 +3656,7 @@ def collect_report_data(
         obs_stats = collect_stage_stats(
             db, well, choke_mm, _io_from, _io_to,
             render_charts=(_stage_render and _need_obs), chart_tag="obs",
-            dp_threshold=dp_threshold,
+            dp_threshold=dp_threshold, ctx=ctx, chart_batch=charts,
         )
         log.debug("obs_stats for well %s: live calculation (no matching snapshot)", well.number)
     # Описание: приоритет у явного override, затем snapshot, затем well_status.note
@@ -3704,7 +3686,7 @@ def collect_report_data(
             optimal_candidates = detect_optimal_windows(
                 db, well, choke_mm,
                 dt_adapt_from, dt_adapt_to,
-                window_hours=window_hours, top_n=3,
+                window_hours=window_hours, top_n=3, ctx=ctx,
             )
         except Exception:
             log.exception("detect_optimal_windows failed for well %s", well.id)
@@ -3713,7 +3695,7 @@ def collect_report_data(
         db, well, choke_mm, adapt_from, adapt_to,
         render_charts=(_stage_render and _need_adapt), chart_tag="adapt",
         highlight_windows=optimal_candidates if optimal_candidates else None,
-        dp_threshold=dp_threshold,
+        dp_threshold=dp_threshold, ctx=ctx, chart_batch=charts,
     )
     adapt_stats["description"] = (
         adapt_description_override
@@ -3755,7 +3737,7 @@ def collect_report_data(
                     selected_from, selected_to,
                     render_charts=(_stage_render and _need_optimal),
                     chart_tag="optimal",
-                    dp_threshold=dp_threshold,
+                    dp_threshold=dp_threshold, ctx=ctx, chart_batch=charts,
                 )
                 opt_stats["description"] = None
                 opt_stats["source"] = selected_source
@@ -3809,7 +3791,7 @@ def collect_report_data(
     if _need_reagent:
         try:
             reagent_effectiveness = analyze_reagent_for_stage(
-                well_id, adapt_from, adapt_to,
+                well_id, adapt_from, adapt_to, ctx=ctx,
             )
         except Exception:
             log.exception("Reagent effectiveness analysis failed for well %s", well.id)
@@ -4045,7 +4027,7 @@ def collect_report_data(
             if snap and snap.get("adaptation"):
                 evts = snap["adaptation"].get("events_for_chart")
                 if evts:
-                    _enrich_events_from_db(db, evts, str(well.number))
+                    _enrich_events_from_db(db, evts, str(well.number), ctx=ctx)
             observation_blocks.append({
                 "block_id":      b.get("id"),
                 "well_id":       well.id,
@@ -4082,7 +4064,7 @@ def collect_report_data(
             if snap and snap.get("adaptation"):
                 evts = snap["adaptation"].get("events_for_chart")
                 if evts:
-                    _enrich_events_from_db(db, evts, str(well.number))
+                    _enrich_events_from_db(db, evts, str(well.number), ctx=ctx)
             # «Оценка эффективности» (adaptation_effectiveness) с chapter='period' —
             # переиспользуем kind в главе «Отчёт за период» → в period_blocks.
             _eff_target = (period_blocks
@@ -4103,7 +4085,7 @@ def collect_report_data(
             if snap and snap.get("adaptation"):
                 evts = snap["adaptation"].get("events_for_chart")
                 if evts:
-                    _enrich_events_from_db(db, evts, str(well.number))
+                    _enrich_events_from_db(db, evts, str(well.number), ctx=ctx)
             period_blocks.append({
                 "block_id":      b.get("id"),
                 "well_id":       well.id,
@@ -4210,6 +4192,7 @@ def collect_report_data(
                 analysis = bsvc.compute_period_analysis(
                     db, str(well.number), pf, pt,
                     p.get("description") or p.get("block_title"),
+                    ctx=ctx,
                 )
                 analysis["baselines_comparison"] = bsvc.compare_to_baselines(
                     analysis, baselines,
@@ -4259,7 +4242,7 @@ def collect_report_data(
                 _enrich_period_with_customer_data(
                     db, well, pf, pt, analysis, render_charts, p_idx,
                     block_snapshot=p.get("data_snapshot") or None,
-                    chart_dir=chart_dir,
+                    chart_dir=chart_dir, ctx=ctx,
                 )
 
                 periods_data.append(analysis)
@@ -4281,7 +4264,7 @@ def collect_report_data(
                     rose_blocks_fmt.append(
                         _format_rose_block(
                             rb, render_charts=render_charts,
-                            chart_dir=chart_dir,
+                            chart_dir=chart_dir, chart_batch=charts,
                         ),
                     )
                 # Роза НЕСТАБИЛЬНОСТИ (графики через Plotly, как в гл. Адаптация).
@@ -4479,7 +4462,9 @@ def collect_report_data(
             observation_blocks_fmt.append(_format_param_correlation(ob))
         elif kind in ("observation_baseline", "observation_period", "observation_segment"):
             observation_blocks_fmt.append(
-                _format_observation_rfc_block(ob, render_charts=render_charts)
+                _format_observation_rfc_block(
+                    ob, render_charts=render_charts, chart_batch=charts,
+                )
             )
         else:
             # observation_analysis и другие
@@ -4538,6 +4523,9 @@ def collect_report_data(
         for wb in works_blocks
     ] if _need_works else []
 
+    report_stage("charts")
+    charts.run()
+
     return {
         "ok": True,
         "warnings": warnings,
@@ -4586,10 +4574,12 @@ def collect_report_data(
 
 def analyze_reagent_for_stage(
     well_id: int, date_from: date, date_to: date,
+    ctx: WellDataContext | None = None,
 ) -> dict[str, Any]:
     """Обёртка над analyze_reagent_effectiveness — возвращает компактный dict.
 
     Выделяет ключевые метрики: количество вбросов, ИРВ, лучший реагент, scores.
+    ctx — контекст сборки отчёта: сырое давление берётся из него.
     """
     from backend.services.reagent_effectiveness_service import (
         analyze_reagent_effectiveness, DEFAULT_CONFIG,
@@ -4604,6 +4594,7 @@ def analyze_reagent_for_stage(
         period_end=period_end,
         cfg=DEFAULT_CONFIG,
         include_pressure_data=False,
+        ctx=ctx,
     )
 
     # Компактный summary для UI
@@ -4795,6 +4786,42 @@ def _format_comparison(comparison: dict) -> dict:
     return out
 
 
+def _snapshot_chart_key(fn, snap: dict) -> str:
+    """Ключ artifact_cache для PNG «снапшот → график»."""
+    return artifact_cache.artifact_key(
+        f"{fn.__module__}.{fn.__name__}", snap, version=artifact_cache.renderer_version(fn),
+    )
+
+
+def _render_snapshot_chart(fn, snap: dict, png_path: Path | str) -> str | None:
+    """PNG неизменяемого снапшота: из artifact_cache или fn(snap, png_path).
+
+    Снапшот блока меняется только при редактировании — повторные сборки
+    отчёта берут готовый PNG из кэша. При выключенном кэше — рендер в
+    png_path, как раньше. None — рендерер не создал файл.
+    """
+    if artifact_cache.enabled():
+        return artifact_cache.render_png(fn, snap, _snapshot_chart_key(fn, snap))
+    result = fn(snap, png_path) or png_path
+    return str(result) if Path(result).exists() else None
+
+
+def _add_snapshot_chart(
+    batch: ChartBatch, fn, snap: dict, png_path: Path | str, target: tuple[dict, str],
+) -> None:
+    """_render_snapshot_chart через батч: попадание в кэш — сразу в target."""
+    if not artifact_cache.enabled():
+        batch.add(fn, snap, str(png_path), output=str(png_path), target=target)
+        return
+    key = _snapshot_chart_key(fn, snap)
+    hit = artifact_cache.lookup_png(key)
+    if hit:
+        target[0][target[1]] = hit
+    else:
+        batch.add(artifact_cache.render_png, fn, snap, key, target=target, label=fn.__name__)
+
+
+@profiled()
 def _format_comparison_block(
     c: dict, *, render_chart: bool = True,
     chart_dir: Path | None = None,
@@ -4835,9 +4862,7 @@ def _format_comparison_block(
             else:
                 _ensure_dirs()
                 png_path = (TEMP_DIR / f"cmp_block_{block_id}.png").resolve()
-            result = render_segments_comparison_chart(snap, png_path)
-            if result:
-                chart_path = str(result)
+            chart_path = _render_snapshot_chart(render_segments_comparison_chart, snap, png_path)
         except Exception:
             log.exception("comparison chart render failed for block %s", c.get("block_id"))
 
@@ -5527,6 +5552,7 @@ STABILITY_RECOMMENDATION_DEFAULT = (
 )
 
 
+@profiled()
 def _format_stability_block(b: dict) -> dict:
     """Готовит блок kind='stability_rose' под LaTeX. Графики — через Plotly
     (plotly_png_service снимает диви prev-{id}-strose / -strosebar), matplotlib
@@ -5638,6 +5664,7 @@ def _format_stability_block(b: dict) -> dict:
     }
 
 
+@profiled()
 def _format_works_block(b: dict) -> dict:
     """Форматирует блок kind='works_analysis' для LaTeX (глава «Стабильность в период работ»).
 
@@ -5866,9 +5893,11 @@ def _format_works_block(b: dict) -> dict:
     }
 
 
+@profiled()
 def _format_rose_block(
     b: dict, *, render_charts: bool = True,
     chart_dir: Path | None = None,
+    chart_batch: ChartBatch | None = None,
 ) -> dict:
     """Готовит блок kind='criteria_rose' под LaTeX.
 
@@ -5878,14 +5907,14 @@ def _format_rose_block(
           history{choke_mm, windows_count, ...}, ranks, contributions,
           score, weak_data, warnings, labels, labels_short, units }
 
-    При render_charts=True — рендерит 2 PNG: розу и бар-чарт «вклад в балл».
+    При render_charts=True — рендерит 2 PNG: розу и бар-чарт «вклад в балл»
+    (с chart_batch — при run() батча отчёта).
     """
     from backend.services.daily_report_service import _tex_escape
     snap = b.get("data_snapshot") or {}
     p = b.get("params") or {}
 
-    chart_rose_path = None
-    chart_contrib_path = None
+    chart_jobs: list[tuple[str, Any, Path]] = []
     if render_charts and snap.get("ok"):
         try:
             from backend.services.rose_chart_renderer import (
@@ -5901,10 +5930,10 @@ def _format_rose_block(
                 _ensure_dirs()
                 rose_path = (TEMP_DIR / f"rose_block_{block_id}.png").resolve()
                 bar_path = (TEMP_DIR / f"rose_bar_block_{block_id}.png").resolve()
-            r1 = render_rose_chart_png(snap, rose_path)
-            r2 = render_contributions_chart_png(snap, bar_path)
-            chart_rose_path = str(r1) if r1 else None
-            chart_contrib_path = str(r2) if r2 else None
+            chart_jobs = [
+                ("chart_rose_path", render_rose_chart_png, rose_path),
+                ("chart_contrib_path", render_contributions_chart_png, bar_path),
+            ]
         except Exception:
             log.exception("rose chart render failed for block %s", b.get("block_id"))
 
@@ -5979,7 +6008,7 @@ def _format_rose_block(
         "custom": "пользовательские веса",
     }.get(mode, mode)
 
-    return {
+    out = {
         "block_id":           b.get("block_id"),
         "title":              _tex_escape(str(b.get("title") or "")),
         "comment":            _tex_escape(str(b.get("comment") or "")),
@@ -6001,8 +6030,8 @@ def _format_rose_block(
         "history_to":         _tex_escape(str(history.get("history_to") or "")),
         "warnings":           [_tex_escape(str(w)) for w in (snap.get("warnings") or [])],
         "metric_rows":        metric_rows,
-        "chart_rose_path":    chart_rose_path,
-        "chart_contrib_path": chart_contrib_path,
+        "chart_rose_path":    None,
+        "chart_contrib_path": None,
         "has_data":           bool(snap.get("ok")),
         "parts":              parts,
         "prefix_note":        _pre,
@@ -6010,6 +6039,13 @@ def _format_rose_block(
         "prefix_note_tex":    _tex_escape(_pre) if _pre else "",
         "suffix_note_tex":    _tex_escape(_suf) if _suf else "",
     }
+    if chart_jobs:
+        batch = chart_batch if chart_batch is not None else ChartBatch()
+        for key, fn, path in chart_jobs:
+            _add_snapshot_chart(batch, fn, snap, path, (out, key))
+        if chart_batch is None:
+            batch.run()
+    return out
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -6048,6 +6084,7 @@ from backend.constants.segment_parts import (
 _DEFAULT_SEGMENT_PARTS = SEGMENT_ANALYSIS_RENDER_PARTS
 
 
+@profiled()
 def _format_segment_block(
     b: dict,
     *,
@@ -6125,9 +6162,8 @@ def _format_segment_block(
                 else:
                     _ensure_dirs()
                     png_path = (TEMP_DIR / f"segment_q_{block_id}.png").resolve()
-                result = render_segment_q_chart(snap, png_path)
-                chart_q_path = str(result) if result else None
-                if result is None:
+                chart_q_path = _render_snapshot_chart(render_segment_q_chart, snap, png_path)
+                if chart_q_path is None:
                     log.warning(
                         "segment block %s: render_segment_q_chart returned None "
                         "(check logs for details: dates=%d, segments=%d)",
@@ -6573,6 +6609,7 @@ def _build_cp_rows(cp_marks: list, segments_extended: list) -> list[dict]:
     return rows
 
 
+@profiled()
 def _format_observation_block(b: dict, *, render_charts: bool = True) -> dict:
     """Готовит блок kind='observation_analysis' под LaTeX.
 
@@ -6738,7 +6775,10 @@ _SEG_TYPE_LABELS = {
 _DIR_TEX = {"rising": r"$\uparrow$", "falling": r"$\downarrow$", "stable": r"$\rightarrow$"}
 
 
-def _format_observation_rfc_block(b: dict, *, render_charts: bool = True) -> dict:
+@profiled()
+def _format_observation_rfc_block(
+    b: dict, *, render_charts: bool = True, chart_batch: ChartBatch | None = None,
+) -> dict:
     """Готовит RFC-блоки наблюдения (observation_baseline/period/segment) под LaTeX §3.4.
 
     Зеркало chapter_render.js::_buildObservationBlockHtml — те же таблицы и строки,
@@ -6930,29 +6970,33 @@ def _format_observation_rfc_block(b: dict, *, render_charts: bool = True) -> dic
             })
 
     # ── Графики: matplotlib-фолбэк (Plotly-PNG приоритетнее, ключи в шаблоне) ──
+    # chart_batch — батч отчёта: пути ложатся в out при его run().
     out["chart_metrics"] = out["chart_ts"] = out["chart_cmp"] = out["chart_seg"] = None
     if render_charts:
         try:
             from backend.services import observation_chart_renderer as _ocr
             _ensure_dirs()
+            batch = chart_batch if chart_batch is not None else ChartBatch()
             base = (TEMP_DIR / f"obs_rfc_{block_id}").resolve()
             if kind == "observation_baseline" and part_on("chart_metrics"):
                 pth = f"{base}_metrics.png"
-                _ocr.render_baseline_chart(snap, pth)
-                out["chart_metrics"] = pth
+                _add_snapshot_chart(batch, _ocr.render_baseline_chart, snap, pth,
+                                    (out, "chart_metrics"))
             elif kind == "observation_period":
                 if part_on("chart_timeseries"):
                     pth = f"{base}_ts.png"
-                    _ocr.render_period_timeseries_chart(snap, pth)
-                    out["chart_ts"] = pth
+                    _add_snapshot_chart(batch, _ocr.render_period_timeseries_chart, snap, pth,
+                                        (out, "chart_ts"))
                 # chart_compare_b1 НЕ рендерим: snapshot хранит только дельты
                 # {abs, pct} без абсолютных baseline/current → HTML-график тоже
                 # не строится (deltas[k].baseline_value=null). Паритет: сравнение
                 # с B1 показывается ТАБЛИЦЕЙ (cmp_b1_rows) в HTML и PDF.
             elif kind == "observation_segment" and part_on("chart_segments"):
                 pth = f"{base}_seg.png"
-                _ocr.render_segment_chart(snap, pth)
-                out["chart_seg"] = pth
+                _add_snapshot_chart(batch, _ocr.render_segment_chart, snap, pth,
+                                    (out, "chart_seg"))
+            if chart_batch is None:
+                batch.run()
         except Exception:
             log.exception("observation rfc block matplotlib fallback failed for block %s", block_id)
 
@@ -7000,8 +7044,7 @@ def _format_segment_analysis_for_observation(b: dict, *, render_charts: bool = T
             from backend.services.observation_chart_renderer import render_segment_analysis_chart
             _ensure_dirs()
             abs_path = str((TEMP_DIR / f"seg_obs_{block_id}.png").resolve())
-            render_segment_analysis_chart(snap, abs_path)
-            seg_chart_path = abs_path
+            seg_chart_path = _render_snapshot_chart(render_segment_analysis_chart, snap, abs_path)
         except Exception:
             log.exception("segment_analysis matplotlib chart failed for block %s", block_id)
 
@@ -7228,6 +7271,7 @@ def _format_period_comparison(b: dict) -> dict:
     }
 
 
+@profiled()
 def _format_period_block(b: dict, *, render_charts: bool = True, db=None, chart_dir=None) -> dict:
     """Форматирование блока главы «Отчёт за период» (chapter='period').
 
@@ -7277,6 +7321,7 @@ def _format_period_block_with_meta(pb: dict, *, render_charts: bool = True, db=N
     return fmt
 
 
+@profiled()
 def _format_adaptation_block(b: dict, *, render_charts: bool = True, db=None) -> dict:
     """Готовит блок одного из видов §4 под LaTeX.
 
@@ -8186,6 +8231,7 @@ def _format_adaptation_block(b: dict, *, render_charts: bool = True, db=None) ->
     return base
 
 
+@profiled()
 def _build_observation_chapter_latex(db: Session, well_id: int) -> str:
     """g-fix-1: Загрузить observation-блоки (in_report=true) и собрать LaTeX-фрагмент.
 
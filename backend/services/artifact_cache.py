@@ -0,0 +1,270 @@
+"""
+artifact_cache.py — контентно-адресуемый кэш артефактов отчётов.
+
+Снапшотные блоки отчёта об адаптации (глава «Наблюдение», роза критериев,
+сравнение сегментов, сегментный анализ, фолбэки obs-блоков) неизменяемы,
+пока оператор их не отредактировал, но каждая сборка PDF заново рисует
+их PNG и заново формирует LaTeX-фрагменты.
+
+Кэш хранит результат по ключу = sha256 от канонического JSON
+(вид артефакта, снапшот + параметры блока, версия рендерера, стиль):
+
+  • запись — каталог CACHE_DIR/<ключ[:2]>/<ключ>/ (chart.png, fragment.tex,
+    картинки фрагмента) с маркером entry.json; собирается во временном
+    каталоге рядом и публикуется одним os.rename — читатель не увидит
+    полузаписанный PNG, параллельные сборки не мешают друг другу;
+  • версия рендерера — хэш исходника модуля (renderer_version): правка
+    кода графика сама инвалидирует старые записи;
+  • попадание обновляет mtime маркера; при превышении MAX_BYTES удаляются
+    самые давно использованные записи до LOW_WATER · MAX_BYTES;
+  • ARTIFACT_CACHE=0 в окружении — кэш выключен (enabled() → False),
+    вызывающие рисуют как раньше.
+
+Пути к закэшированным файлам абсолютные и живут дольше одной сборки:
+очистка временных каталогов отчёта их не трогает.
+"""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR = Path("backend/generated/artifact_cache")
+MAX_BYTES = 512 * 1024 * 1024
+LOW_WATER = 0.8
+
+_MARKER = "entry.json"
+_PNG_NAME = "chart.png"
+_TEXT_NAME = "fragment.tex"
+
+_lock = threading.Lock()
+_approx_bytes: Optional[int] = None          # None → пересчитать при записи
+_version_memo: dict[tuple[str, float], str] = {}
+
+
+def enabled() -> bool:
+    return os.environ.get("ARTIFACT_CACHE", "1") not in ("0", "false", "no")
+
+
+def _root() -> Path:
+    return CACHE_DIR.resolve()
+
+
+def renderer_version(*objs: Any) -> str:
+    """Версия рендерера: sha1 исходников модулей объектов (функций/модулей)."""
+    h = hashlib.sha1()
+    for obj in objs:
+        try:
+            path = inspect.getsourcefile(obj) or ""
+            mtime = os.path.getmtime(path)
+        except (TypeError, OSError):
+            h.update(repr(obj).encode())
+            continue
+        memo_key = (path, mtime)
+        if memo_key not in _version_memo:
+            _version_memo[memo_key] = hashlib.sha1(Path(path).read_bytes()).hexdigest()
+        h.update(_version_memo[memo_key].encode())
+    return h.hexdigest()[:16]
+
+
+def artifact_key(kind: str, payload: Any, *, version: str = "", style: Any = None) -> str:
+    """Ключ артефакта: sha256 канонического JSON (порядок ключей не важен)."""
+    blob = json.dumps(
+        {"kind": kind, "version": version, "style": style, "payload": payload},
+        sort_keys=True, default=str, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _entry_dir(key: str) -> Path:
+    return _root() / key[:2] / key
+
+
+def lookup(key: str) -> Optional[Path]:
+    """Каталог готовой записи (и отметка использования) или None."""
+    entry = _entry_dir(key)
+    marker = entry / _MARKER
+    if not marker.exists():
+        return None
+    try:
+        os.utime(marker)
+    except OSError:
+        pass
+    return entry
+
+
+def lookup_png(key: str) -> Optional[str]:
+    entry = lookup(key)
+    if entry is None:
+        return None
+    png = entry / _PNG_NAME
+    return str(png) if png.exists() else None
+
+
+def _publish(key: str, staging: Path, files: list[str]) -> Path:
+    """Маркер + атомарный rename staging → запись. Гонка — побеждает первый."""
+    (staging / _MARKER).write_text(
+        json.dumps({"key": key, "files": files}, ensure_ascii=False), encoding="utf-8",
+    )
+    entry = _entry_dir(key)
+    try:
+        os.rename(staging, entry)
+    except OSError:
+        # запись уже опубликована параллельной сборкой
+        shutil.rmtree(staging, ignore_errors=True)
+        if not (entry / _MARKER).exists():
+            raise
+        return entry
+    _account(sum(f.stat().st_size for f in entry.iterdir() if f.is_file()))
+    return entry
+
+
+def _staging(key: str) -> Path:
+    shard = _root() / key[:2]
+    shard.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(prefix=f".{key[:16]}.", dir=shard))
+
+
+def render_png(
+    fn: Callable[..., Any], snapshot: Any, key: str, *args: Any, **kwargs: Any,
+) -> Optional[str]:
+    """PNG fn(snapshot, path, *args, **kwargs) из кэша или нарисованный и закэшированный.
+
+    Функция уровня модуля — годится как задание ChartBatch. None — рендерер
+    не создал файл (нет данных); такой результат не кэшируется.
+    """
+    hit = lookup_png(key)
+    if hit:
+        return hit
+    _drop_broken(key)
+    staging = _staging(key)
+    try:
+        png = staging / _PNG_NAME
+        fn(snapshot, str(png), *args, **kwargs)
+        if not png.exists():
+            return None
+        return str(_publish(key, staging, [_PNG_NAME]) / _PNG_NAME)
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def cached_text(
+    key: str,
+    build: Callable[[str], str],
+    *,
+    relocate: Callable[[str, str, str], str] | None = None,
+) -> str:
+    """Текстовый фрагмент (с файлами) из кэша или собранный build(каталог).
+
+    build пишет сопутствующие файлы (картинки) в переданный каталог и
+    возвращает текст со ссылками на них. При публикации ссылки переводятся
+    на каталог записи через relocate(текст, старый, новый) — по умолчанию
+    простая замена подстроки. Исключение build пробрасывается, запись не
+    создаётся.
+    """
+    entry = lookup(key)
+    if entry is not None and (entry / _TEXT_NAME).exists():
+        return (entry / _TEXT_NAME).read_text(encoding="utf-8")
+    _drop_broken(key)
+    staging = _staging(key)
+    try:
+        text = build(str(staging))
+        final = _entry_dir(key)
+        text = (relocate or _replace)(text, str(staging), str(final))
+        (staging / _TEXT_NAME).write_text(text, encoding="utf-8")
+        files = sorted(p.name for p in staging.iterdir())
+        entry = _publish(key, staging, files)
+        return (entry / _TEXT_NAME).read_text(encoding="utf-8")
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def _replace(text: str, old: str, new: str) -> str:
+    return text.replace(old, new)
+
+
+def _drop_broken(key: str) -> None:
+    """Запись без нужного файла (удалён снаружи) — убрать, чтобы пересобрать."""
+    entry = _entry_dir(key)
+    if entry.exists():
+        shutil.rmtree(entry, ignore_errors=True)
+
+
+def owns(path: str | Path | None) -> bool:
+    """Файл лежит в кэше — чистка временных PNG отчёта не должна его удалять."""
+    if not path:
+        return False
+    try:
+        return Path(path).resolve().is_relative_to(_root())
+    except OSError:
+        return False
+
+
+# ─── Вытеснение ───────────────────────────────────────────────────────
+
+def _entries() -> list[tuple[float, int, Path]]:
+    """[(mtime маркера, размер, каталог)] всех опубликованных записей."""
+    out = []
+    root = _root()
+    if not root.exists():
+        return out
+    for shard in root.iterdir():
+        if not shard.is_dir():
+            continue
+        for entry in shard.iterdir():
+            marker = entry / _MARKER
+            if entry.name.startswith(".") or not marker.exists():
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+                out.append((marker.stat().st_mtime, size, entry))
+            except OSError:
+                continue
+    return out
+
+
+def _account(added: int) -> None:
+    global _approx_bytes
+    with _lock:
+        if _approx_bytes is None:
+            _approx_bytes = sum(size for _, size, _ in _entries())
+        else:
+            _approx_bytes += added
+        over = _approx_bytes > MAX_BYTES
+    if over:
+        evict()
+
+
+def evict(max_bytes: int | None = None) -> int:
+    """Удалить давно не использованные записи до LOW_WATER · max_bytes.
+
+    Возвращает число удалённых записей.
+    """
+    global _approx_bytes
+    limit = MAX_BYTES if max_bytes is None else max_bytes
+    with _lock:
+        entries = sorted(_entries(), key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total > limit:
+            target = int(limit * LOW_WATER)
+            for _, size, entry in entries:
+                if total <= target:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                removed += 1
+            log.info("[artifact_cache] evicted %d entries, %d bytes left", removed, total)
+        _approx_bytes = total
+    return removed
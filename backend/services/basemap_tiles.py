@@ -0,0 +1,360 @@
+"""
+basemap_tiles.py — локальное хранилище тайлов подложки (MBTiles) для карты
+скважины в PDF (well_map_renderer) и карты админки (/admin/map).
+
+Раньше каждый отчёт звал contextily.add_basemap: те же тайлы Esri того же
+месторождения скачивались заново при каждой сборке, а без сети карта
+молча теряла подложку. Теперь:
+
+  • тайлы провайдера лежат в одном файле MBTiles (SQLite, схема MBTiles 1.3:
+    tiles/metadata, строки в TMS — y отражён) в TILES_DIR/<провайдер>.mbtiles;
+  • prefetch(провайдер, bbox, зумы) — докачивает недостающие тайлы bbox
+    месторождения (scripts/prefetch_basemap_tiles.py, bbox по координатам
+    скважин — field_bbox); единственное место, где идёт сеть;
+  • basemap_png(провайдер, extent, size) — подложка для matplotlib: тайлы
+    читаются только из хранилища, склеиваются, обрезаются по extent
+    (EPSG:3857) и масштабируются до size. Не покрыт зум — берётся
+    ближайший меньший (до MAX_ZOOM_FALLBACK), не покрыт совсем — None,
+    карта рисуется без подложки. Готовая подложка кэшируется в
+    artifact_cache по (провайдер, bbox, size, зум, версия хранилища);
+  • tile(провайдер, z, x, y) — байты одного тайла для /admin/map/tiles.
+
+Версия хранилища (metadata.prefetched_at) меняется при каждой докачке —
+старые склейки в artifact_cache после неё не используются.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import sqlite3
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TileProvider:
+    name: str
+    url: str               # {z}/{x}/{y} — XYZ (Google) схема
+    attribution: str
+    max_zoom: int
+    fmt: str = "png"       # png | jpg (metadata.format)
+
+
+PROVIDERS: dict[str, TileProvider] = {
+    p.name: p for p in (
+        TileProvider(
+            "esri_imagery",
+            "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+            "Imagery © Esri — Source: Esri, Maxar, Earthstar Geographics, "
+            "and the GIS User Community",
+            19, "jpg",
+        ),
+        TileProvider(
+            "opentopomap",
+            "https://a.tile.opentopomap.org/{z}/{x}/{y}.png",
+            "© OpenStreetMap contributors, SRTM | © OpenTopoMap (CC-BY-SA)",
+            17,
+        ),
+        TileProvider(
+            "osm",
+            "https://tile.openstreetmap.org/{z}/{x}/{y}.png",
+            "© OpenStreetMap contributors",
+            19,
+        ),
+    )
+}
+
+TILES_DIR = Path("backend/generated/basemap")
+
+# Лимит одной докачки: защита от случайного bbox «на полмира» на z15+
+MAX_PREFETCH_TILES = 20_000
+# Насколько зумов вниз искать покрытый уровень, если запрошенный не скачан
+MAX_ZOOM_FALLBACK = 3
+USER_AGENT = "SurgIl-Dashboard basemap prefetch (+offline MBTiles cache)"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);
+"""
+_write_lock = threading.Lock()
+
+
+def provider(name: str) -> TileProvider:
+    try:
+        return PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"неизвестный провайдер тайлов: {name!r}") from None
+
+
+# ─── Хранилище MBTiles ────────────────────────────────────────────────
+
+class TileStore:
+    """Один файл MBTiles; соединение на операцию (годится для любых потоков)."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=30)
+
+    def _init(self, p: TileProvider) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+            conn.executemany(
+                "INSERT OR IGNORE INTO metadata (name, value) VALUES (?, ?)",
+                [("name", p.name), ("format", p.fmt), ("type", "baselayer"),
+                 ("version", "1.3"), ("attribution", p.attribution)],
+            )
+
+    def get(self, z: int, x: int, y: int) -> Optional[bytes]:
+        if not self.exists():
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, (1 << z) - 1 - y),
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, tiles: Iterable[tuple[int, int, int]]) -> dict[tuple[int, int, int], bytes]:
+        """{(z, x, y): байты} для имеющихся тайлов (XYZ-координаты)."""
+        tiles = list(tiles)
+        if not tiles or not self.exists():
+            return {}
+        out: dict[tuple[int, int, int], bytes] = {}
+        with closing(self._connect()) as conn:
+            for z, x, y in tiles:
+                row = conn.execute(
+                    "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                    (z, x, (1 << z) - 1 - y),
+                ).fetchone()
+                if row:
+                    out[(z, x, y)] = row[0]
+        return out
+
+    def put_many(self, items: Iterable[tuple[int, int, int, bytes]]) -> int:
+        rows = [(z, x, (1 << z) - 1 - y, data) for z, x, y, data in items]
+        if not rows:
+            return 0
+        with _write_lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) "
+                "VALUES (?, ?, ?, ?)", rows,
+            )
+        return len(rows)
+
+    def metadata(self) -> dict[str, str]:
+        if not self.exists():
+            return {}
+        with closing(self._connect()) as conn:
+            try:
+                return dict(conn.execute("SELECT name, value FROM metadata").fetchall())
+            except sqlite3.OperationalError:
+                return {}
+
+    def set_metadata(self, **values: str) -> None:
+        with _write_lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)",
+                list(values.items()),
+            )
+
+    def version(self) -> str:
+        """Меняется при каждой докачке — часть ключа кэша склеек."""
+        return self.metadata().get("prefetched_at", "")
+
+
+def store(name: str) -> TileStore:
+    provider(name)
+    return TileStore(TILES_DIR / f"{name}.mbtiles")
+
+
+def tile(name: str, z: int, x: int, y: int) -> Optional[bytes]:
+    """Байты тайла из хранилища или None."""
+    return store(name).get(z, x, y)
+
+
+# ─── Докачка ──────────────────────────────────────────────────────────
+
+def field_bbox(db, *, pad_km: float = 3.0) -> Optional[tuple[float, float, float, float]]:
+    """(west, south, east, north) по координатам скважин + отступ pad_km."""
+    from sqlalchemy import func
+
+    from backend.models.wells import Well
+
+    w, s, e, n = db.query(
+        func.min(Well.lon), func.min(Well.lat), func.max(Well.lon), func.max(Well.lat),
+    ).filter(Well.lat.isnot(None), Well.lon.isnot(None)).one()
+    if w is None:
+        return None
+    d_lat = pad_km / 111.32
+    d_lon = pad_km / (111.32 * max(math.cos(math.radians((s + n) / 2)), 0.01))
+    return (float(w) - d_lon, float(s) - d_lat, float(e) + d_lon, float(n) + d_lat)
+
+
+def _http_fetch(p: TileProvider) -> Callable[[int, int, int], Optional[bytes]]:
+    import httpx
+
+    client = httpx.Client(timeout=20, headers={"User-Agent": USER_AGENT},
+                          follow_redirects=True)
+
+    def fetch(z: int, x: int, y: int) -> Optional[bytes]:
+        r = client.get(p.url.format(z=z, x=x, y=y))
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return r.content
+
+    fetch.close = client.close
+    return fetch
+
+
+def prefetch(
+    name: str,
+    bbox: tuple[float, float, float, float],
+    zooms: Sequence[int],
+    *,
+    fetch: Callable[[int, int, int], Optional[bytes]] | None = None,
+    batch: int = 200,
+) -> dict:
+    """Докачать в хранилище тайлы bbox (west, south, east, north) на зумах zooms.
+
+    Уже имеющиеся тайлы не качаются. fetch(z, x, y) → байты | None —
+    по умолчанию HTTP-запрос к провайдеру. Возвращает счётчики.
+    """
+    import mercantile
+
+    p = provider(name)
+    zooms = sorted({z for z in zooms if 0 <= z <= p.max_zoom})
+    wanted = [(t.z, t.x, t.y) for t in mercantile.tiles(*bbox, zooms)]
+    if len(wanted) > MAX_PREFETCH_TILES:
+        raise ValueError(
+            f"prefetch {name}: {len(wanted)} тайлов > {MAX_PREFETCH_TILES}, "
+            f"сузьте bbox или зумы"
+        )
+    st = store(name)
+    st._init(p)
+    have = st.get_many(wanted)
+    missing = [t for t in wanted if t not in have]
+
+    own_fetch = fetch is None
+    fetch = fetch or _http_fetch(p)
+    stats = {"provider": name, "tiles": len(wanted), "cached": len(have),
+             "downloaded": 0, "failed": 0}
+    pending: list[tuple[int, int, int, bytes]] = []
+    try:
+        for z, x, y in missing:
+            try:
+                data = fetch(z, x, y)
+            except Exception as exc:
+                log.warning("[basemap] %s %d/%d/%d: %s", name, z, x, y, exc)
+                data = None
+            if not data:
+                stats["failed"] += 1
+                continue
+            pending.append((z, x, y, data))
+            if len(pending) >= batch:
+                stats["downloaded"] += st.put_many(pending)
+                pending.clear()
+        stats["downloaded"] += st.put_many(pending)
+    finally:
+        if own_fetch:
+            fetch.close()
+    st.set_metadata(
+        bounds=",".join(f"{v:.5f}" for v in bbox),
+        minzoom=str(min(zooms)) if zooms else "",
+        maxzoom=str(max(zooms)) if zooms else "",
+        prefetched_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    )
+    log.info("[basemap] prefetch %s", stats)
+    return stats
+
+
+# ─── Склейка подложки ─────────────────────────────────────────────────
+
+def compose(name: str, extent: tuple[float, float, float, float],
+            size: tuple[int, int], zoom: int):
+    """PIL-изображение size=(w, h) ровно на extent (x_min, y_min, x_max, y_max,
+    EPSG:3857) из тайлов хранилища; None — ни один зум не покрыт целиком."""
+    import mercantile
+    from PIL import Image
+
+    x_min, y_min, x_max, y_max = extent
+    west, south = mercantile.lnglat(x_min, y_min)
+    east, north = mercantile.lnglat(x_max, y_max)
+    st = store(name)
+    zoom = min(zoom, provider(name).max_zoom)
+    for z in range(zoom, max(zoom - MAX_ZOOM_FALLBACK, 0) - 1, -1):
+        tiles = list(mercantile.tiles(west, south, east, north, [z]))
+        data = st.get_many((t.z, t.x, t.y) for t in tiles)
+        if not tiles or len(data) < len(tiles):
+            continue
+        xs = [t.x for t in tiles]
+        ys = [t.y for t in tiles]
+        tx0, ty0 = min(xs), min(ys)
+        images = {k: Image.open(BytesIO(v)).convert("RGB") for k, v in data.items()}
+        ts = next(iter(images.values())).width
+        mosaic = Image.new("RGB", ((max(xs) - tx0 + 1) * ts, (max(ys) - ty0 + 1) * ts))
+        for (_, x, y), img in images.items():
+            mosaic.paste(img, ((x - tx0) * ts, (y - ty0) * ts))
+        # Границы мозаики в метрах → обрезка по extent
+        b0 = mercantile.xy_bounds(tx0, ty0, z)
+        left, top, res = b0.left, b0.top, (b0.right - b0.left) / ts
+        box = ((x_min - left) / res, (top - y_max) / res,
+               (x_max - left) / res, (top - y_min) / res)
+        if z < zoom:
+            log.info("[basemap] %s: зум %d не скачан, подложка с зума %d", name, zoom, z)
+        return mosaic.resize(size, Image.Resampling.BILINEAR, box=box)
+    return None
+
+
+def _write_basemap_png(spec: dict, output_path: str) -> None:
+    img = compose(spec["provider"], tuple(spec["extent"]), tuple(spec["size"]), spec["zoom"])
+    if img is not None:
+        img.save(output_path, format="PNG")
+
+
+def basemap_png(
+    name: str, extent: tuple[float, float, float, float],
+    size: tuple[int, int], *, zoom: int, output_path: str | Path | None = None,
+) -> Optional[str]:
+    """Путь к PNG подложки на extent (EPSG:3857) или None (нет тайлов).
+
+    С включённым artifact_cache — запись кэша по (провайдер, bbox, size,
+    зум, версия хранилища); без него — файл output_path.
+    """
+    from backend.services import artifact_cache
+
+    st = store(name)
+    if not st.exists():
+        return None
+    spec = {
+        "provider": name,
+        "extent": [round(v, 1) for v in extent],
+        "size": [int(size[0]), int(size[1])],
+        "zoom": int(zoom),
+    }
+    if artifact_cache.enabled():
+        key = artifact_cache.artifact_key(
+            "basemap", spec,
+            version=f"{artifact_cache.renderer_version(compose)}:{st.version()}",
+        )
+        return artifact_cache.render_png(_write_basemap_png, spec, key)
+    if output_path is None:
+        return None
+    _write_basemap_png(spec, str(output_path))
+    return str(output_path) if Path(output_path).exists() else None
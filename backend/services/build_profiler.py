@@ -0,0 +1,259 @@
+"""
+build_profiler.py — профиль сборки отчёта: время, запросы к БД, строки и
+память по именованным секциям.
+
+Когда отчёт (адаптация, месячный) собирается долго, по логам не видно,
+куда ушло время: collect_report_data, конкретный _format_*_block, графики
+или xelatex. Профиль отвечает на это для каждой сборки:
+
+  • profile_build() — активирует профиль в contextvar на время сборки
+    (очередь отчётов: run_job); вне него section/profiled — no-op;
+  • section("имя") / @profiled() — секция: wall-время, число запросов,
+    строк (rowcount курсора), время в SQL и память. Вложенные секции —
+    путь через «/» («collect_report_data/charts»), повторные вызовы одной
+    секции суммируются (calls);
+  • запросы считаются слушателями событий Engine SQLAlchemy
+    (before/after_cursor_execute) — на все движки процесса, включая
+    engine.connect() в data_access; запрос добавляется в счётчики секций
+    на стеке СВОЕГО контекста, поэтому параллельные секции в потоках
+    сборки скважин (copy_context, well_build_executor) не считают запросы
+    друг друга;
+  • память — текущий RSS (/proc/self/statm) на входе и выходе секции:
+    rss_grow_mb — сумма приростов, rss_max_mb — максимум замеров. Не
+    ru_maxrss: пик за жизнь процесса в долгоживущем воркере после первой
+    большой сборки больше не растёт. RSS общий на процесс — в
+    параллельных секциях прирост смешивается;
+  • to_dict() — компактный JSON: итоги + секции по убыванию времени.
+
+Результат кладётся в doc.meta["build_profile"] и result_summary задачи —
+виден на странице документа и в /admin/report-builds.
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+# Секций в профиле не больше: новые сверх лимита не записываются (итоги
+# профиля их учитывают).
+MAX_SECTIONS = 60
+
+_active: contextvars.ContextVar[Optional["BuildProfile"]] = contextvars.ContextVar(
+    "build_profile", default=None,
+)
+_path: contextvars.ContextVar[tuple[str, ...]] = contextvars.ContextVar(
+    "build_profile_path", default=(),
+)
+# Счётчики открытых секций текущего контекста (внешняя → внутренняя).
+_open: contextvars.ContextVar[tuple["_SectionCounters", ...]] = contextvars.ContextVar(
+    "build_profile_sections", default=(),
+)
+_listeners_lock = threading.Lock()
+_listeners_installed = False
+
+try:
+    _PAGE_MB = os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+except (AttributeError, ValueError, OSError):   # Windows
+    _PAGE_MB = None
+
+
+def _rss_mb() -> Optional[float]:
+    """Текущий RSS процесса, МБ (Linux); None — недоступно."""
+    if _PAGE_MB is None:
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * _PAGE_MB, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _SectionCounters:
+    """Запросы одной открытой секции (пишут потоки её контекста)."""
+
+    __slots__ = ("queries", "rows", "sql_ms")
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.sql_ms = 0.0
+
+
+class BuildProfile:
+    """Счётчики одной сборки; обновляются из нескольких потоков."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.t0 = time.perf_counter()
+        self.rss0 = _rss_mb()
+        self.rss_max = self.rss0
+        self.queries = 0
+        self.rows = 0
+        self.sql_ms = 0.0
+        self.sections: dict[str, dict] = {}
+
+    def on_query(self, rows: int, ms: float,
+                 open_sections: tuple[_SectionCounters, ...] = ()) -> None:
+        rows = max(rows, 0)
+        with self._lock:
+            self.queries += 1
+            self.rows += rows
+            self.sql_ms += ms
+            for c in open_sections:
+                c.queries += 1
+                c.rows += rows
+                c.sql_ms += ms
+
+    def note_rss(self, rss: Optional[float]) -> None:
+        if rss is None:
+            return
+        with self._lock:
+            if self.rss_max is None or rss > self.rss_max:
+                self.rss_max = rss
+
+    def add_section(self, name: str, ms: float, counters: _SectionCounters,
+                    rss_in: Optional[float], rss_out: Optional[float]) -> None:
+        with self._lock:
+            s = self.sections.get(name)
+            if s is None:
+                if len(self.sections) >= MAX_SECTIONS:
+                    return
+                s = self.sections[name] = {"name": name, "calls": 0, "ms": 0.0,
+                                           "queries": 0, "rows": 0, "sql_ms": 0.0,
+                                           "rss_grow_mb": 0.0, "rss_max_mb": None}
+            s["calls"] += 1
+            s["ms"] += ms
+            s["queries"] += counters.queries
+            s["rows"] += counters.rows
+            s["sql_ms"] += counters.sql_ms
+            if rss_in is not None and rss_out is not None:
+                s["rss_grow_mb"] += rss_out - rss_in
+                s["rss_max_mb"] = max(rss_in, rss_out, s["rss_max_mb"] or 0.0)
+
+    def to_dict(self) -> dict:
+        """Итоги + секции (по убыванию времени), числа округлены.
+
+        peak_rss_mb — максимум замеров RSS за эту сборку (не за жизнь
+        процесса), rss_grow_mb — RSS сейчас минус RSS на старте.
+        """
+        rss = _rss_mb()
+        self.note_rss(rss)
+        with self._lock:
+            sections = sorted(self.sections.values(), key=lambda s: -s["ms"])
+            return {
+                "total_ms": round((time.perf_counter() - self.t0) * 1000, 1),
+                "queries": self.queries,
+                "rows": self.rows,
+                "sql_ms": round(self.sql_ms, 1),
+                "peak_rss_mb": self.rss_max,
+                "rss_grow_mb": round(rss - self.rss0, 1) if rss is not None and self.rss0 is not None else None,
+                "sections": [
+                    {**s, "ms": round(s["ms"], 1), "sql_ms": round(s["sql_ms"], 1),
+                     "rss_grow_mb": round(s["rss_grow_mb"], 1)}
+                    for s in sections
+                ],
+            }
+
+
+def current() -> Optional[BuildProfile]:
+    return _active.get()
+
+
+# ─── События SQLAlchemy ───────────────────────────────────────────────
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get() is not None:
+        conn.info.setdefault("build_profile_t0", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    prof = _active.get()
+    if prof is None:
+        return
+    stack = conn.info.get("build_profile_t0")
+    ms = (time.perf_counter() - stack.pop()) * 1000 if stack else 0.0
+    try:
+        rows = int(cursor.rowcount)
+    except Exception:
+        rows = 0
+    prof.on_query(rows, ms, _open.get())
+
+
+def install_listeners() -> None:
+    """Подписаться на события всех Engine (один раз на процесс)."""
+    global _listeners_installed
+    with _listeners_lock:
+        if _listeners_installed:
+            return
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _listeners_installed = True
+
+
+# ─── API ──────────────────────────────────────────────────────────────
+
+@contextmanager
+def profile_build() -> Iterator[BuildProfile]:
+    """Активировать профиль на время сборки (вложенный вызов — тот же профиль)."""
+    prof = _active.get()
+    if prof is not None:
+        yield prof
+        return
+    install_listeners()
+    prof = BuildProfile()
+    token = _active.set(prof)
+    path_token = _path.set(())
+    open_token = _open.set(())
+    try:
+        yield prof
+    finally:
+        _open.reset(open_token)
+        _path.reset(path_token)
+        _active.reset(token)
+
+
+@contextmanager
+def section(name: str) -> Iterator[None]:
+    """Секция профиля; без активного профиля — no-op."""
+    prof = _active.get()
+    if prof is None:
+        yield
+        return
+    path = _path.get() + (name,)
+    counters = _SectionCounters()
+    token = _path.set(path)
+    open_token = _open.set(_open.get() + (counters,))
+    rss0 = _rss_mb()
+    prof.note_rss(rss0)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        rss1 = _rss_mb()
+        prof.note_rss(rss1)
+        _open.reset(open_token)
+        _path.reset(token)
+        prof.add_section("/".join(path), ms, counters, rss0, rss1)
+
+
+def profiled(name: str | None = None) -> Callable:
+    """Декоратор: вызов функции — секция name (по умолчанию — имя функции)."""
+    def wrap(fn: Callable) -> Callable:
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args: Any, **kwargs: Any):
+            if _active.get() is None:
+                return fn(*args, **kwargs)
+            with section(label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
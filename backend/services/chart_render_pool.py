@@ -0,0 +1,270 @@
+"""
+chart_render_pool.py — параллельный рендер PNG-графиков отчётов.
+
+Отчёты (адаптация, суточный) рисуют matplotlib-графики один за другим:
+графики этапов наблюдения/адаптации/оптимума, фолбэки блоков главы
+«Наблюдение», роза и вклад в балл, давление/ΔP/дебит суточного отчёта.
+Это чистый CPU под GIL — потоки не помогают.
+
+Сервис принимает список чистых заданий «данные → PNG» (ChartJob: функция
+уровня модуля + аргументы) и выполняет их в пуле процессов:
+
+  • пул один на процесс приложения, создаётся лениво, воркеры «тёплые» —
+    при старте импортируют matplotlib (Agg), прогревают кэш шрифтов и
+    модули рендереров (_WARM_MODULES);
+  • результаты — в порядке заданий, с временем каждого графика (ms);
+  • ошибка одного графика не роняет остальные (path=None, error);
+  • одно задание, workers ≤ 1 или сломанный пул → рендер в текущем
+    процессе (как раньше);
+  • зависший воркер: если за CHART_TIMEOUT_S не готов ни один график,
+    пул снимается (terminate), недоделанные графики рисуются в текущем
+    процессе — задача отчёта не ждёт вечно.
+
+Сборщики отчётов копят задания в ChartBatch (add с target=(dict, ключ)) и
+ждут один раз — run() раскладывает пути по target.
+
+Контекст процессов — spawn: воркеры не наследуют соединения БД и потоки
+веб-сервера.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+from backend.services.build_profiler import profiled
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+# Без прогресса дольше этого (ни один график не готов) — воркер завис.
+CHART_TIMEOUT_S = 120.0
+
+# Модули рендереров, которые воркер импортирует при старте.
+_WARM_MODULES: tuple[str, ...] = (
+    "backend.services.adaptation_report_service",
+    "backend.services.daily_report_service",
+    "backend.services.observation_chart_renderer",
+    "backend.services.rose_chart_renderer",
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class ChartJob:
+    """Задание рендера: fn(*args, **kwargs) → путь к PNG (str/Path) или None.
+
+    fn — функция уровня модуля (передаётся в воркер по имени). Рендереры,
+    которые ничего не возвращают, а пишут в заданный файл, — с output:
+    при успешном вызове путём считается output.
+    """
+    fn: Callable[..., Any]
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    output: Optional[str] = None
+    label: str = ""
+
+
+@dataclass
+class ChartResult:
+    path: Optional[str]
+    ms: float
+    label: str = ""
+    error: Optional[str] = None
+
+
+def _warm_worker(modules: tuple[str, ...]) -> None:
+    """Инициализатор воркера: Agg, кэш шрифтов, модули рендереров."""
+    import importlib
+
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(1, 1))
+        ax.set_title("прогрев")
+        fig.canvas.draw()
+        plt.close(fig)
+    except ImportError:
+        pass
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as exc:
+            log.warning("[chart_pool] warm import %s failed: %s", name, exc)
+
+
+def _run_job(fn: Callable[..., Any], args: tuple, kwargs: dict,
+             output: Optional[str]) -> tuple[Optional[str], float, Optional[str]]:
+    """Выполнить одно задание (в воркере или в текущем процессе)."""
+    t0 = time.perf_counter()
+    try:
+        ret = fn(*args, **kwargs)
+        path = str(ret) if ret else output
+        error = None
+    except Exception as exc:
+        log.exception("[chart_pool] %s failed", getattr(fn, "__name__", fn))
+        path, error = None, f"{type(exc).__name__}: {exc}"
+    return path, round((time.perf_counter() - t0) * 1000, 1), error
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+                initargs=(_WARM_MODULES,),
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Остановить пул воркеров (при выходе и в тестах)."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool, _pool_workers = None, 0
+
+
+def _kill_pool() -> None:
+    """Снять пул с зависшим воркером: terminate процессов, без ожидания."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        pool, _pool, _pool_workers = _pool, None, 0
+    if pool is None:
+        return
+    for proc in list((getattr(pool, "_processes", None) or {}).values()):
+        proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_pool)
+
+
+def render_charts(
+    jobs: Sequence[ChartJob], *, workers: int | None = None,
+    timeout: float | None = None,
+) -> list[ChartResult]:
+    """Отрендерить задания; результаты — в порядке jobs.
+
+    workers — размер пула (None → DEFAULT_WORKERS). При workers ≤ 1 или
+    одном задании — в текущем процессе. Если пул сломан (воркер упал) или
+    задание не сериализуется — оставшиеся рендерятся в текущем процессе.
+    timeout — сколько ждать хотя бы одного готового графика (None →
+    CHART_TIMEOUT_S); дольше — пул снимается, недоделанные графики
+    рендерятся в текущем процессе.
+    """
+    workers = DEFAULT_WORKERS if workers is None else workers
+    timeout = CHART_TIMEOUT_S if timeout is None else timeout
+    raw: list[Optional[tuple]] = [None] * len(jobs)
+
+    if workers > 1 and len(jobs) > 1:
+        try:
+            pool = _get_pool(workers)
+            futures = {
+                pool.submit(_run_job, j.fn, j.args, j.kwargs, j.output): i
+                for i, j in enumerate(jobs)
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    log.warning(
+                        "[chart_pool] no chart finished in %.0f s, killing pool; "
+                        "%d chart(s) render in-process", timeout, len(pending),
+                    )
+                    _kill_pool()
+                    break
+                for fut in done:
+                    raw[futures[fut]] = fut.result()
+        except BrokenProcessPool as exc:
+            log.warning("[chart_pool] pool broken, rendering in-process: %s", exc)
+            shutdown_pool()
+        except Exception as exc:
+            # pickle / запуск воркеров — не повод терять графики
+            log.warning("[chart_pool] pool submit failed, rendering in-process: %s", exc)
+
+    results = []
+    for i, job in enumerate(jobs):
+        path, ms, error = raw[i] or _run_job(job.fn, job.args, job.kwargs, job.output)
+        results.append(ChartResult(path=path, ms=ms, label=job.label, error=error))
+    return results
+
+
+class ChartBatch:
+    """Задания графиков одного отчёта: копятся через add, рендерятся одним run.
+
+    target=(dict, ключ) — куда положить путь к PNG после run (только при
+    успехе: при ошибке значение в dict не трогается).
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.workers = workers
+        self._jobs: list[ChartJob] = []
+        self._targets: list[Optional[tuple[dict, str]]] = []
+        self.results: list[ChartResult] = []
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def add(
+        self, fn: Callable[..., Any], *args: Any,
+        target: tuple[dict, str] | None = None,
+        output: str | Path | None = None,
+        label: str = "",
+        **kwargs: Any,
+    ) -> None:
+        self._jobs.append(ChartJob(
+            fn=fn, args=args, kwargs=kwargs,
+            output=str(output) if output is not None else None,
+            label=label or getattr(fn, "__name__", ""),
+        ))
+        self._targets.append(target)
+
+    def extend(self, other: "ChartBatch") -> None:
+        """Перенести ещё не выполненные задания другого батча (в их порядке)."""
+        self._jobs.extend(other._jobs)
+        self._targets.extend(other._targets)
+        other._jobs, other._targets = [], []
+
+    @profiled("charts")
+    def run(self) -> list[ChartResult]:
+        """Отрендерить накопленные задания и разложить пути по target."""
+        jobs, targets = self._jobs, self._targets
+        self._jobs, self._targets = [], []
+        if not jobs:
+            return []
+        t0 = time.perf_counter()
+        results = render_charts(jobs, workers=self.workers)
+        for res, target in zip(results, targets):
+            if target is not None and res.path:
+                target[0][target[1]] = res.path
+        self.results.extend(results)
+        log.debug(
+            "[chart_pool] %d charts in %.0f ms (%s)", len(jobs),
+            (time.perf_counter() - t0) * 1000,
+            ", ".join(f"{r.label}={r.ms}" for r in results),
+        )
+        return results
+
+    def timings(self) -> list[dict]:
+        """[{label, ms, ok}] по всем выполненным заданиям — для диагностики."""
+        return [{"label": r.label, "ms": r.ms, "ok": r.path is not None}
+                for r in self.results]
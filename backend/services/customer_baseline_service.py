@@ -126,17 +126,27 @@ def make_period_name(
 # Расчёт характерных значений за период
 # ═══════════════════════════════════════════════════════════════════
 
+def _load_daily(db: Session, well_number: str, d_from: date, d_to: date, ctx=None) -> pd.DataFrame:
+    """Ряд well_daily за период: срез из контекста отчёта или load_for_well."""
+    if ctx is not None:
+        return ctx.customer_daily(d_from, d_to)
+    return load_for_well(db, well_number, d_from=d_from, d_to=d_to)
+
+
 def compute_period_stats(
     db: Session, well_number: str,
     period_from: date, period_to: date,
+    *,
+    ctx=None,
 ) -> dict[str, Any]:
     """Посчитать сводные характеристики за период из well_daily.
 
     Возвращает dict с avg/median по Q (total + working), P (wellhead, flowline),
     ΔP, простоями (shutdown_min) и подсчётом дней с/без простоев.
+    ctx — WellDataContext сборки отчёта: ряд well_daily — срез из него.
     """
     _ensure_well_daily(db)
-    df = load_for_well(db, well_number, d_from=period_from, d_to=period_to)
+    df = _load_daily(db, well_number, period_from, period_to, ctx)
     if df.empty:
         return {
             "well": str(well_number),
@@ -213,6 +223,7 @@ def compute_period_analysis(
     *,
     well_id: int | None = None,
     window_days: int = 3,
+    ctx=None,
 ) -> dict[str, Any]:
     """Полный анализ периода: статистика + ряды для графиков + простои по дням.
 
@@ -222,12 +233,13 @@ def compute_period_analysis(
       - reagents: вбросы реагента (список, сводка по типам, периодичность)
       - best_window: наиболее эффективное окно внутри периода (detect_optimal_windows)
 
-    Используется в UI вкладки «Исходные данные» и в PDF-главе.
+    Используется в UI вкладки «Исходные данные» и в PDF-главе (там ctx —
+    WellDataContext отчёта: ряд well_daily читается один раз на отчёт).
     """
     _ensure_well_daily(db)
-    df = load_for_well(db, well_number, d_from=period_from, d_to=period_to)
+    df = _load_daily(db, well_number, period_from, period_to, ctx)
 
-    base = compute_period_stats(db, well_number, period_from, period_to)
+    base = compute_period_stats(db, well_number, period_from, period_to, ctx=ctx)
     base["description"] = description
     base["window_days"] = window_days
 
@@ -1273,6 +1273,37 @@ def load_for_well(
     return df
 
 
+def well_daily_version(
+    db: Session,
+    well: str,
+    d_from: date | None = None,
+    d_to: date | None = None,
+) -> tuple[int, datetime | None]:
+    """Версия данных скважины за период: (число строк, MAX(loaded_at)).
+
+    Upsert в well_daily всегда обновляет loaded_at, поэтому любая
+    перезагрузка сводки меняет версию. Используется как часть ключа
+    кэша базы сегментного анализа (segment_base_cache) — дешевле, чем
+    загружать ряд целиком.
+    """
+    sql = """
+        SELECT COUNT(*) AS n, MAX(loaded_at) AS last_loaded
+        FROM well_daily
+        WHERE well = :well
+    """
+    params: dict[str, Any] = {"well": str(well)}
+    if d_from:
+        sql += " AND date >= :d_from"
+        params["d_from"] = d_from
+    if d_to:
+        sql += " AND date <= :d_to"
+        params["d_to"] = d_to
+    row = db.execute(text(sql), params).mappings().first()
+    if not row:
+        return 0, None
+    return int(row["n"] or 0), row["last_loaded"]
+
+
 def well_availability(db: Session, well: str) -> dict[str, Any]:
     """Доступность данных по скважине во ВСЁМ хранилище well_daily.
 
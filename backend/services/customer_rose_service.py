@@ -95,6 +95,15 @@ MIN_WINDOW_DAYS: int = 7
 # Минимум окон в истории, иначе роза не строится.
 MIN_HISTORY_WINDOWS: int = 10
 
+# Сырые метрики округляются один раз при расчёте (и для периода, и для окон
+# истории): окно истории, совпадающее с текущим периодом, даёт ровно то же
+# значение, хотя считается другим способом (оконные суммы vs polyfit).
+RAW_METRIC_DECIMALS: int = 9
+
+
+def _round_metric(value: float | None) -> float | None:
+    return None if value is None else float(np.round(value, RAW_METRIC_DECIMALS))
+
 
 # ═══════════════════════════════════════════════════════════════════
 #  Расчёт 6 метрик для одного окна / периода
@@ -214,12 +223,12 @@ def compute_raw_metrics(
     p_fl_up = max(0.0, slope_pf) if slope_pf is not None else None
 
     return RawMetrics(
-        decline=decline,
-        p_wh_down=p_wh_down,
-        p_wh_cv=p_wh_cv,
-        p_fl_up=p_fl_up,
-        shutdown=shutdown_frac,
-        freq=freq_per_30d,
+        decline=_round_metric(decline),
+        p_wh_down=_round_metric(p_wh_down),
+        p_wh_cv=_round_metric(p_wh_cv),
+        p_fl_up=_round_metric(p_fl_up),
+        shutdown=_round_metric(shutdown_frac),
+        freq=_round_metric(freq_per_30d),
     )
 
 
@@ -287,36 +296,161 @@ def _filter_by_choke(df_all: pd.DataFrame, choke: float | None, tol: float = 0.0
     return df_all.loc[mask].reset_index(drop=True)
 
 
-def _iter_history_windows(
-    df_history: pd.DataFrame,
+def _history_window_bounds(
+    dates: pd.Series,
     window_days: int,
     step_days: int = 1,
-) -> list[RawMetrics]:
-    """Сгенерировать метрики по скользящим окнам.
+    min_rows: int = MIN_WINDOW_DAYS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Границы строк [lo; hi) скользящих календарных окон.
+
+    dates — отсортированные даты строк (дубликаты и пропуски дней
+    допустимы). Окно k — дни [d0 + k·step; d0 + k·step + window_days − 1],
+    последнее окно целиком помещается до последней даты. Окна, где строк
+    меньше min_rows, отбрасываются. Два searchsorted вместо фильтрации
+    всего DataFrame на каждом шаге.
+    """
+    days = pd.to_datetime(dates).to_numpy().astype("datetime64[D]").astype(np.int64)
+    if days.size == 0 or window_days < 1:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts = np.arange(days[0], days[-1] - window_days + 2, step_days)
+    lo = np.searchsorted(days, starts, side="left")
+    hi = np.searchsorted(days, starts + window_days - 1, side="right")
+    keep = (hi - lo) >= min_rows
+    return lo[keep], hi[keep]
+
 
-    Окна формируются по календарным датам внутри df_history (строки уже
-    отфильтрованы по штуцеру). Шаг = step_days. Окно валидно, если в нём
-    есть ≥ MIN_WINDOW_DAYS строк.
+# Относительный шум дисперсии из оконных сумм — ниже него дисперсия = 0.
+_VAR_NOISE_REL: float = 1e-12
+
+
+def _window_sums(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """sum(values[lo:hi]) по каждому окну.
+
+    Каждое окно суммируется по своим строкам (np.add.reduceat по парам
+    [lo, hi)), а не разностью префиксных сумм всего ряда: погрешность —
+    как у суммы внутри окна, без потери разрядов на длинной истории.
+    Окна непусты (hi > lo).
     """
+    if lo.size == 0:
+        return np.empty(0)
+    bounds = np.empty(2 * lo.size, dtype=np.intp)
+    bounds[0::2], bounds[1::2] = lo, hi
+    # hi может быть == len(values): хвостовой ноль держит индекс в диапазоне
+    padded = np.append(np.asarray(values, dtype=float), 0.0)
+    return np.add.reduceat(padded, bounds)[0::2]
+
+
+def _window_regression(
+    y: np.ndarray,
+    work: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Суммы для МНК y по номеру рабочей строки внутри каждого окна.
+
+    x — номер строки среди рабочих дней окна (как индекс df_qp после
+    reset_index в compute_raw_metrics), в регрессию идут только
+    конечные y. y центрируется глобальным средним — slope и дисперсия
+    от сдвига не зависят, а погрешность оконных сумм падает.
+    Суммы по x целочисленные и считаются точно.
+
+    Returns:
+        (m, slope, mean, var) по окнам; slope/mean/var = NaN, где точек < 2.
+    """
+    ok = work & np.isfinite(y)
+    center = float(y[ok].mean()) if ok.any() else 0.0
+    x = np.cumsum(work) - 1.0                 # глобальный номер рабочей строки
+    yc = np.where(ok, y - center, 0.0)
+    xo = np.where(ok, x, 0.0)
+
+    k0 = np.concatenate(([0.0], np.cumsum(work, dtype=float)))[lo]   # рабочих строк до окна
+    m = _window_sums(ok.astype(float), lo, hi)
+    sx_raw = _window_sums(xo, lo, hi)
+    sx = sx_raw - m * k0
+    sxx = _window_sums(xo * xo, lo, hi) - 2.0 * k0 * sx_raw + m * k0 * k0
+    sy = _window_sums(yc, lo, hi)
+    sxy = _window_sums(xo * yc, lo, hi) - k0 * sy
+    syy = _window_sums(yc * yc, lo, hi)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        enough = m >= 2
+        slope = np.where(enough, (m * sxy - sx * sy) / (m * sxx - sx * sx), np.nan)
+        mean_c = sy / m
+        mean = np.where(enough, center + mean_c, np.nan)
+        # E[y²] − E[y]² теряет ~1e-16·E[y²]: постоянный ряд даёт шум вместо 0
+        var = syy / m - mean_c * mean_c
+        var = np.where(var > _VAR_NOISE_REL * (syy / m), var, 0.0)
+        var = np.where(enough, var, np.nan)
+    return m, slope, mean, var
+
+
+def _history_window_metrics(
+    df_history: pd.DataFrame,
+    window_days: int,
+    step_days: int = 1,
+    shutdown_threshold: float = SHUTDOWN_THRESHOLD_MIN,
+) -> dict[str, np.ndarray]:
+    """6 метрик compute_raw_metrics для всех скользящих окон за один проход.
+
+    Окна — как раньше: календарные, внутри df_history (строки уже
+    отфильтрованы по штуцеру), шаг step_days, окно валидно при
+    ≥ MIN_WINDOW_DAYS строк. Суммы, МНК-наклоны и число эпизодов простоя
+    считаются оконными суммами numpy (_window_sums) вместо
+    O(окон) фильтраций DataFrame и вызовов pandas.
+
+    Returns:
+        {ключ SCORING_KEYS: массив по окнам}, NaN — «метрика не определена»
+        (там, где compute_raw_metrics вернул бы None).
+    """
+    empty = {k: np.empty(0) for k in SCORING_KEYS}
     if df_history.empty or window_days < MIN_WINDOW_DAYS:
-        return []
+        return empty
     d = df_history.sort_values("date").reset_index(drop=True)
-    d["date_only"] = pd.to_datetime(d["date"]).dt.date
-    dmin = d["date_only"].iloc[0]
-    dmax = d["date_only"].iloc[-1]
-
-    out: list[RawMetrics] = []
-    cur = dmin
-    one_day = pd.Timedelta(days=1)
-    win_delta = pd.Timedelta(days=window_days - 1)
-    step_delta = pd.Timedelta(days=step_days)
-    while cur + win_delta <= dmax:
-        win_to = cur + win_delta
-        sub = d[(d["date_only"] >= cur) & (d["date_only"] <= win_to)]
-        if len(sub) >= MIN_WINDOW_DAYS:
-            out.append(compute_raw_metrics(sub))
-        cur = cur + step_delta
-    return out
+    lo, hi = _history_window_bounds(d["date"], window_days, step_days)
+    if lo.size == 0:
+        return empty
+
+    def column(name: str) -> np.ndarray:
+        if name not in d.columns:
+            return np.full(len(d), np.nan)
+        return pd.to_numeric(d[name], errors="coerce").to_numpy(dtype=float)
+
+    sd_raw = column("shutdown_min")
+    sd_safe = np.where(np.isnan(sd_raw), 0.0, sd_raw)
+    n_rows = (hi - lo).astype(float)
+
+    # Простои — по всем строкам окна
+    with np.errstate(invalid="ignore"):
+        shutdown = _window_sums(sd_safe, lo, hi) / (n_rows * 1440.0)
+    is_down = sd_safe > shutdown_threshold
+    starts = is_down & ~np.concatenate(([False], is_down[:-1]))
+    # Серия, начатая до окна, внутри окна — тоже эпизод
+    carried = is_down[lo] & (lo > 0) & is_down[np.maximum(lo - 1, 0)]
+    episodes = _window_sums(starts.astype(float), lo, hi) + carried
+    freq = episodes * 30.0 / n_rows
+
+    # Q/P/CV — по рабочим дням
+    work = sd_safe <= shutdown_threshold
+    _, slope_q, _, _ = _window_regression(column("q_gas_total"), work, lo, hi)
+    _, slope_pw, mean_pw, var_pw = _window_regression(column("p_wellhead"), work, lo, hi)
+    _, slope_pf, _, _ = _window_regression(column("p_flowline"), work, lo, hi)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cv = np.where(mean_pw != 0, np.sqrt(var_pw) / np.abs(mean_pw), np.nan)
+
+    metrics = {
+        "decline":   np.maximum(0.0, -slope_q),
+        "p_wh_down": np.maximum(0.0, -slope_pw),
+        "p_wh_cv":   cv,
+        "p_fl_up":   np.maximum(0.0, slope_pf),
+        "shutdown":  shutdown,
+        "freq":      freq,
+    }
+    return {
+        k: np.where(np.isfinite(v), np.round(v, RAW_METRIC_DECIMALS), np.nan)
+        for k, v in metrics.items()
+    }
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -383,14 +517,15 @@ def compute_rose(
 
     # 6. История: фильтруем по штуцеру и считаем окна
     df_hist = _filter_by_choke(df_all, choke) if choke is not None else df_all
-    history_windows = _iter_history_windows(
+    history_windows = _history_window_metrics(
         df_hist, window_days=period_days, step_days=history_step_days,
     )
+    windows_count = int(history_windows["decline"].size)
 
     history_meta = {
         "choke_mm": choke,
         "rows_total": int(len(df_hist)),
-        "windows_count": len(history_windows),
+        "windows_count": windows_count,
         "window_days": period_days,
         "step_days": history_step_days,
         "history_from": (
@@ -403,7 +538,7 @@ def compute_rose(
         ),
     }
 
-    if len(history_windows) < MIN_HISTORY_WINDOWS:
+    if windows_count < MIN_HISTORY_WINDOWS:
         hist_rows = int(len(df_hist))
         choke_lbl = f"{choke} мм" if choke is not None else "(штуцер не задан)"
         hint = ""
@@ -424,7 +559,7 @@ def compute_rose(
             "ok": False,
             "error": (
                 f"Истории на штуцере {choke_lbl} недостаточно для расчёта рангов: "
-                f"{len(history_windows)} окон длины {period_days} дн., нужно "
+                f"{windows_count} окон длины {period_days} дн., нужно "
                 f"≥{MIN_HISTORY_WINDOWS}{hint}"
             ),
             "history": history_meta,
@@ -432,13 +567,10 @@ def compute_rose(
         }
 
     # 7. Распределения по 6 метрикам + ранги текущего значения
-    distributions: dict[str, list[float]] = {k: [] for k in SCORING_KEYS}
-    for w in history_windows:
-        d = w.as_dict()
-        for k in SCORING_KEYS:
-            v = d.get(k)
-            if v is not None and math.isfinite(v):
-                distributions[k].append(float(v))
+    distributions: dict[str, list[float]] = {
+        k: history_windows[k][np.isfinite(history_windows[k])].tolist()
+        for k in SCORING_KEYS
+    }
 
     history_median = {k: (float(np.median(distributions[k])) if distributions[k] else None)
                       for k in SCORING_KEYS}
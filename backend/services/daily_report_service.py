@@ -8,7 +8,6 @@
 from __future__ import annotations
 
 import logging
-import subprocess
 from datetime import datetime, date, time, timedelta
 from pathlib import Path
 
@@ -19,6 +18,9 @@ from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from backend.models.wells import Well
+from backend.services.build_profiler import profiled
+from backend.services.report_data_loader import ReportDataLoader
+from backend.services.report_job_queue import report_stage
 
 log = logging.getLogger(__name__)
 
@@ -89,16 +91,20 @@ def _smart_event_label(event_type: str, description: str) -> str:
 
 def _count_anomalies_from_events(
     db, well_number: str, start: datetime, end: datetime,
+    rows: list | None = None,
 ) -> dict:
     """Count anomaly events by keyword search in description + event_type.
 
+    rows — already loaded (event_type, description, purge_phase) of the
+    period (ReportDataLoader); None → query events.
     Returns dict with: hydrate, choke_purge, manometer_purge counts.
     """
-    rows = db.execute(text("""
-        SELECT event_type, description, purge_phase
-        FROM events
-        WHERE well = :wno AND event_time >= :start AND event_time <= :end
-    """), {"wno": well_number, "start": start, "end": end}).fetchall()
+    if rows is None:
+        rows = db.execute(text("""
+            SELECT event_type, description, purge_phase
+            FROM events
+            WHERE well = :wno AND event_time >= :start AND event_time <= :end
+        """), {"wno": well_number, "start": start, "end": end}).fetchall()
 
     hydrate = 0
     choke_purge = 0
@@ -150,102 +156,20 @@ def _get_latex_env() -> Environment:
     return env
 
 
-def _find_xelatex() -> str:
-    from backend.utils.latex import find_xelatex
-    return find_xelatex()
-
-
 def _compile_latex(tex_source: str, base_name: str) -> Path:
-    """Compile LaTeX → PDF via xelatex (2 passes)."""
-    _ensure_dirs()
-
-    xelatex_bin = _find_xelatex()
+    """Compile LaTeX → PDF via latex_compile_service (проходы — по необходимости).
 
-    tex_file = TEMP_DIR / f"{base_name}.tex"
-    tex_file.write_text(tex_source, encoding="utf-8")
-
-    abs_temp = str(TEMP_DIR.resolve())
-    # Use just the filename since cwd is set to the directory
-    tex_filename = f"{base_name}.tex"
-
-    temp_pdf = TEMP_DIR / f"{base_name}.pdf"
-
-    for pass_num in range(2):
-        result = subprocess.run(
-            [xelatex_bin, "-interaction=nonstopmode",
-             f"-output-directory={abs_temp}", tex_filename],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=abs_temp,
-        )
-        if result.returncode != 0:
-            stderr = result.stderr.decode("utf-8", errors="ignore")
-            stdout = result.stdout.decode("utf-8", errors="ignore")
-            # nonstopmode may produce PDF despite warnings — only fail if no PDF
-            if not temp_pdf.exists():
-                # Сохраняем артефакты для постмортема (не удаляем на выходе!).
-                # .tex и .log остаются в TEMP_DIR, рядом дублируем «снимок»
-                # в /tmp с временной меткой — чтобы reload не затёр их при
-                # следующей сборке. Эти файлы критичны для диагностики:
-                # из .log можно увидеть точную LaTeX-ошибку (line N).
-                import shutil as _sh, time as _t
-                ts = _t.strftime("%Y%m%d_%H%M%S")
-                debug_dir = Path("/tmp") / f"xelatex_fail_{ts}_{base_name}"
-                try:
-                    debug_dir.mkdir(parents=True, exist_ok=True)
-                    _sh.copy2(tex_file, debug_dir / f"{base_name}.tex")
-                    log_file = TEMP_DIR / f"{base_name}.log"
-                    if log_file.exists():
-                        _sh.copy2(log_file, debug_dir / f"{base_name}.log")
-                    (debug_dir / "stdout.txt").write_text(stdout, encoding="utf-8")
-                    (debug_dir / "stderr.txt").write_text(stderr, encoding="utf-8")
-                except Exception:
-                    log.exception("xelatex debug-dump failed")
-
-                # Из xelatex .log вытаскиваем строки с «! ...» — это и есть
-                # реальные ошибки LaTeX (в отличие от stdout, который может
-                # быть пустым при crash до парсинга).
-                err_lines: list[str] = []
-                log_file = TEMP_DIR / f"{base_name}.log"
-                if log_file.exists():
-                    try:
-                        log_text = log_file.read_text(encoding="utf-8", errors="ignore")
-                        for i, line in enumerate(log_text.split("\n")):
-                            if line.startswith("!") or "Error" in line:
-                                # +5 строк контекста после ошибки
-                                ctx = log_text.split("\n")[i:i+6]
-                                err_lines.extend(ctx)
-                                if len(err_lines) > 30:
-                                    break
-                    except Exception:
-                        pass
-
-                log.error(
-                    "xelatex pass %d failed (no PDF). Debug saved to %s\n"
-                    "LATEX ERRORS:\n%s\nSTDERR: %s\nSTDOUT (last 2000): %s",
-                    pass_num + 1, debug_dir,
-                    "\n".join(err_lines) or "(none in .log)",
-                    stderr[-500:], stdout[-2000:],
-                )
-                raise RuntimeError(
-                    f"xelatex compilation failed (pass {pass_num + 1}). "
-                    f"Debug: {debug_dir}\nErrors:\n" + ("\n".join(err_lines[:10]) or stdout[-500:])
-                )
-            log.warning("xelatex pass %d returned non-zero but PDF exists (warnings)", pass_num + 1)
-    final_pdf = PDF_DIR / f"{base_name}.pdf"
-
-    if not temp_pdf.exists():
-        raise FileNotFoundError(f"PDF not created: {temp_pdf}")
-
-    temp_pdf.rename(final_pdf)
-
-    # Cleanup
-    for ext in (".aux", ".log", ".out", ".tex"):
-        f = TEMP_DIR / f"{base_name}{ext}"
-        if f.exists():
-            f.unlink()
+    Изолированный рабочий каталог внутри TEMP_DIR; при ошибке — копия в
+    /tmp/xelatex_fail_* и RuntimeError (LatexCompileError) с ошибками из .log.
+    """
+    from backend.services.latex_compile_service import compile_latex
 
-    return final_pdf
+    _ensure_dirs()
+    report_stage("latex")
+    return compile_latex(
+        tex_source, base_name, PDF_DIR,
+        work_root=TEMP_DIR, tolerate_errors=True,
+    ).pdf_path
 
 
 def _tex_escape(s: str) -> str:
@@ -416,41 +340,15 @@ def _linear_trend(values: list, duration_hours: float) -> dict | None:
 def _mann_kendall(y: np.ndarray) -> tuple[float, float]:
     """Mann-Kendall test для наличия монотонного тренда.
 
+    S-статистика — сортировкой слиянием (trend_stats), без матрицы n×n.
+
     Returns
     -------
     (z, p_value): Z-статистика и двусторонний p-value.
     """
-    from scipy import stats as _stats
-
-    n = len(y)
-    if n < 4:
-        return 0.0, 1.0
-
-    # S-статистика — векторно через сумму sign(y[j]-y[i]) для всех j>i.
-    diffs = y[None, :] - y[:, None]   # (n, n)
-    iu = np.triu_indices(n, k=1)
-    s = float(np.sign(diffs[iu]).sum())
-
-    # Дисперсия с поправкой на ties.
-    var_s = n * (n - 1) * (2 * n + 5) / 18.0
-    _, counts = np.unique(y, return_counts=True)
-    ties = counts[counts > 1]
-    if ties.size:
-        var_s -= float(np.sum(ties * (ties - 1) * (2 * ties + 5))) / 18.0
-
-    if var_s <= 0:
-        return 0.0, 1.0
-
-    # Z с поправкой непрерывности.
-    if s > 0:
-        z = (s - 1.0) / np.sqrt(var_s)
-    elif s < 0:
-        z = (s + 1.0) / np.sqrt(var_s)
-    else:
-        z = 0.0
+    from backend.services.trend_stats import mann_kendall
 
-    p = 2.0 * (1.0 - float(_stats.norm.cdf(abs(z))))
-    return float(z), float(p)
+    return mann_kendall(y)
 
 
 def _robust_trend(values: list, hours_x: list) -> dict | None:
@@ -474,7 +372,7 @@ def _robust_trend(values: list, hours_x: list) -> dict | None:
       method  — 'theil-sen + mann-kendall'.
     Если данных < 4 точек — None.
     """
-    from scipy import stats as _stats
+    from backend.services.trend_stats import theil_sen
 
     pairs = [
         (float(x), float(v))
@@ -488,9 +386,10 @@ def _robust_trend(values: list, hours_x: list) -> dict | None:
     y = np.array([p[1] for p in pairs], dtype=float)
 
     # Theil-Sen: медианный slope. Возвращает (slope, intercept, low, high).
-    # alpha=0.95 → 95%-доверительный интервал для slope.
+    # alpha=0.95 → 95%-доверительный интервал для slope. До 2000 точек —
+    # scipy.theilslopes, дальше — O(n log n) выбор наклонов (trend_stats).
     try:
-        slope_h, intercept_h, low_h, high_h = _stats.theilslopes(y, x, 0.95)
+        slope_h, intercept_h, low_h, high_h = theil_sen(y, x, 0.95)
     except Exception:
         return None
 
@@ -711,18 +610,32 @@ def _kungrad_day_utc_range(report_date: date):
     return day_start_utc, day_end_utc
 
 
+@profiled()
 def build_well_day_data(
     db: Session,
     well: Well,
     report_date: date,
     downtime_threshold_min: int = 5,
     comparison_days: int = 7,
+    data: ReportDataLoader | None = None,
+    chart_batch=None,
+    render_charts: bool = True,
 ) -> dict:
     """
     Aggregate all daily data for a single well.
 
     Uses pressure_raw for detailed analytics: statistics with median,
     purge detection, downtime detection, ΔP trend, flow rate.
+
+    data — report loader of a multi-well report (summary): status,
+    construction, pressure, events and flow_result come from its set-based
+    loads. Its period must cover the month to report_date, the previous day
+    and the comparison window.
+
+    chart_batch — shared ChartBatch of the whole report: the well's charts
+    are queued into it (paths land in the returned dict after the caller's
+    batch.run()) instead of being rendered here. render_charts=False skips
+    the charts altogether (summary report: it does not show them).
     """
     from backend.services.flow_rate.data_access import (
         get_pressure_data, get_purge_events,
@@ -744,18 +657,22 @@ def build_well_day_data(
     day_end_local = datetime.combine(report_date, time(23, 59, 59))
 
     # ── 1. Well header ──
-    row = db.execute(text("""
-        SELECT status FROM well_status
-        WHERE well_id = :wid
-        ORDER BY dt_start DESC LIMIT 1
-    """), {"wid": well.id}).fetchone()
-    status = row[0] if row else ""
-
-    row = db.execute(text("""
-        SELECT choke_diam_mm, horizon FROM well_construction
-        WHERE well_no = :wno
-        ORDER BY data_as_of DESC NULLS LAST LIMIT 1
-    """), {"wno": well_number}).fetchone()
+    if data is not None:
+        status = data.latest_status(well.id)
+        row = data.construction(well.id)
+    else:
+        row = db.execute(text("""
+            SELECT status FROM well_status
+            WHERE well_id = :wid
+            ORDER BY dt_start DESC LIMIT 1
+        """), {"wid": well.id}).fetchone()
+        status = row[0] if row else ""
+
+        row = db.execute(text("""
+            SELECT choke_diam_mm, horizon FROM well_construction
+            WHERE well_no = :wno
+            ORDER BY data_as_of DESC NULLS LAST LIMIT 1
+        """), {"wno": well_number}).fetchone()
     choke_mm = float(row[0]) if row and row[0] else None
     horizon_raw = str(row[1]).replace("\n", ", ").replace("\r", "") if row and row[1] else ""
     horizon = _tex_escape(horizon_raw) if horizon_raw else "---"
@@ -764,7 +681,9 @@ def build_well_day_data(
     utc_start_str = day_start_utc.isoformat()
     utc_end_str = day_end_utc.isoformat()
 
-    df_raw = get_pressure_data(well.id, utc_start_str, utc_end_str)
+    # срез набора давлений отчёта; тот же контракт, что get_pressure_data
+    load_raw = data.raw_pressure if data is not None else get_pressure_data
+    df_raw = load_raw(well.id, utc_start_str, utc_end_str)
     pressure_stats = None
     dp_trend = None
     purge_count = 0
@@ -778,6 +697,7 @@ def build_well_day_data(
     chart_path = None
     flow_chart_path = None
     dp_chart_path = None
+    chart_jobs: list[tuple] = []
     flow_stats = None
     raw_avg_flow = None
     raw_median_flow = None
@@ -792,13 +712,21 @@ def build_well_day_data(
     p_line_count = 0
 
     # ── 2a. Events query (moved before charts for overlay) ──
-    event_rows = db.execute(text("""
-        SELECT event_time, event_type, description, p_tube, p_line, reagent, qty
-        FROM events
-        WHERE well = :wno
-          AND event_time >= :start AND event_time <= :end
-        ORDER BY event_time
-    """), {"wno": well_number, "start": day_start_local, "end": day_end_local}).fetchall()
+    if data is not None:
+        day_events = data.events(well.id, day_start_local, day_end_local)
+        event_rows = [
+            (r.event_time, r.event_type, r.description, r.p_tube, r.p_line, r.reagent, r.qty)
+            for r in day_events
+        ]
+    else:
+        day_events = None
+        event_rows = db.execute(text("""
+            SELECT event_time, event_type, description, p_tube, p_line, reagent, qty
+            FROM events
+            WHERE well = :wno
+              AND event_time >= :start AND event_time <= :end
+            ORDER BY event_time
+        """), {"wno": well_number, "start": day_start_local, "end": day_end_local}).fetchall()
 
     events = []
     event_type_counts: dict[str, int] = {}
@@ -909,11 +837,9 @@ def build_well_day_data(
             if trend:
                 dp_trend = trend
 
-        # ΔP chart with trend overlay
-        try:
-            dp_chart_path = _render_dp_chart(df, well_number, report_date, dp_trend)
-        except Exception:
-            log.exception("DP chart rendering failed for well %s", well_number)
+        # ΔP-график рисуется в шаге 6, но по кадру этого момента — как до
+        # батча: детекция продувок/простоев ниже работает с df.
+        df_dp_chart = df.copy() if render_charts else None
 
         # ── 3. Purge + Downtime detection (unified) ──
         purge_ranges = []
@@ -921,7 +847,8 @@ def build_well_day_data(
         # 3a. Purge sessions from events (start/press/stop = 1 session)
         try:
             ps_result = _count_purge_sessions_from_events(
-                db, well_number, day_start_local, day_end_local)
+                db, well_number, day_start_local, day_end_local,
+                rows=_purge_rows(day_events))
             purge_count = ps_result["complete"]
             purge_incomplete_count = ps_result["incomplete"]
 
@@ -1039,19 +966,22 @@ def build_well_day_data(
                 log.exception("Flow calc for chart failed for well %s", well_number)
 
         # Try flow_result first (pre-computed baseline)
-        fr = db.execute(text("""
-            SELECT
-                fr.avg_flow_rate, fr.median_flow_rate,
-                fr.min_flow_rate, fr.max_flow_rate,
-                fr.cumulative_flow, fr.purge_loss,
-                fr.downtime_minutes, fr.data_points
-            FROM flow_result fr
-            JOIN flow_scenario fs ON fs.id = fr.scenario_id
-            WHERE fs.well_id = :wid
-              AND fs.is_baseline = TRUE
-              AND fr.result_date = :rd
-            LIMIT 1
-        """), {"wid": well.id, "rd": report_date}).fetchone()
+        if data is not None:
+            fr = data.flow_result_day(well.id, report_date)
+        else:
+            fr = db.execute(text("""
+                SELECT
+                    fr.avg_flow_rate, fr.median_flow_rate,
+                    fr.min_flow_rate, fr.max_flow_rate,
+                    fr.cumulative_flow, fr.purge_loss,
+                    fr.downtime_minutes, fr.data_points
+                FROM flow_result fr
+                JOIN flow_scenario fs ON fs.id = fr.scenario_id
+                WHERE fs.well_id = :wid
+                  AND fs.is_baseline = TRUE
+                  AND fr.result_date = :rd
+                LIMIT 1
+            """), {"wid": well.id, "rd": report_date}).fetchone()
 
         # Compute clean avg from df_flow (only working minutes where flow_rate > 0)
         clean_avg_flow = None
@@ -1136,17 +1066,20 @@ def build_well_day_data(
 
             # Weekly average + median (past N days)
             week_start = report_date - timedelta(days=comparison_days)
-            week_row = db.execute(text("""
-                SELECT
-                    AVG(fr.median_flow_rate),
-                    PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY fr.median_flow_rate),
-                    COUNT(*)
-                FROM flow_result fr
-                JOIN flow_scenario fs ON fs.id = fr.scenario_id
-                WHERE fs.well_id = :wid
-                  AND fs.is_baseline = TRUE
-                  AND fr.result_date BETWEEN :ws AND :rd
-            """), {"wid": well.id, "ws": week_start, "rd": report_date}).fetchone()
+            if data is not None:
+                week_row = data.flow_result_stats(well.id, week_start, report_date)[1:]
+            else:
+                week_row = db.execute(text("""
+                    SELECT
+                        AVG(fr.median_flow_rate),
+                        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY fr.median_flow_rate),
+                        COUNT(*)
+                    FROM flow_result fr
+                    JOIN flow_scenario fs ON fs.id = fr.scenario_id
+                    WHERE fs.well_id = :wid
+                      AND fs.is_baseline = TRUE
+                      AND fr.result_date BETWEEN :ws AND :rd
+                """), {"wid": well.id, "ws": week_start, "rd": report_date}).fetchone()
 
             if week_row:
                 if week_row[0]:
@@ -1155,18 +1088,21 @@ def build_well_day_data(
                     week_median_flow = float(week_row[1])
 
             # Month-to-date: cumulative, average, median, working days
-            month_row = db.execute(text("""
-                SELECT
-                    SUM(fr.cumulative_flow),
-                    AVG(fr.median_flow_rate),
-                    PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY fr.median_flow_rate),
-                    COUNT(*)
-                FROM flow_result fr
-                JOIN flow_scenario fs ON fs.id = fr.scenario_id
-                WHERE fs.well_id = :wid
-                  AND fs.is_baseline = TRUE
-                  AND fr.result_date BETWEEN :ms AND :rd
-            """), {"wid": well.id, "ms": month_start, "rd": report_date}).fetchone()
+            if data is not None:
+                month_row = data.flow_result_stats(well.id, month_start, report_date)
+            else:
+                month_row = db.execute(text("""
+                    SELECT
+                        SUM(fr.cumulative_flow),
+                        AVG(fr.median_flow_rate),
+                        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY fr.median_flow_rate),
+                        COUNT(*)
+                    FROM flow_result fr
+                    JOIN flow_scenario fs ON fs.id = fr.scenario_id
+                    WHERE fs.well_id = :wid
+                      AND fs.is_baseline = TRUE
+                      AND fr.result_date BETWEEN :ms AND :rd
+                """), {"wid": well.id, "ms": month_start, "rd": report_date}).fetchone()
 
             if month_row:
                 if month_row[0]:
@@ -1183,7 +1119,7 @@ def build_well_day_data(
                 try:
                     result = _compute_month_flow_from_raw(
                         db, well, choke_mm, month_start, report_date,
-                        get_pressure_data, clean_pressure,
+                        load_raw, clean_pressure,
                         calculate_flow_rate, calculate_cumulative,
                         comparison_days=comparison_days,
                     )
@@ -1268,31 +1204,45 @@ def build_well_day_data(
                 )
 
         # ── 6. Charts ──
-        try:
-            chart_path = _render_pressure_chart(
-                df, well_number, report_date,
-                event_markers=event_markers if event_markers else None,
-            )
-        except Exception:
-            log.exception("Chart rendering failed for well %s", well_number)
-
-        try:
+        # Три PNG (давление, дебит, ΔP с трендом) — одним батчем пула рендера;
+        # при общем батче отчёта — задания откладываются до return.
+        if render_charts:
+            chart_jobs.append(("chart_path", _render_pressure_chart,
+                               (df, well_number, report_date),
+                               {"event_markers": event_markers if event_markers else None}))
             if df_flow_for_chart is not None:
-                flow_chart_path = _render_flow_chart(df_flow_for_chart, well_number, report_date)
-        except Exception:
-            log.exception("Flow chart rendering failed for well %s", well_number)
+                chart_jobs.append(("flow_chart_path", _render_flow_chart,
+                                   (df_flow_for_chart, well_number, report_date), {}))
+            chart_jobs.append(("dp_chart_path", _render_dp_chart,
+                               (df_dp_chart, well_number, report_date, dp_trend), {}))
+        if chart_jobs and chart_batch is None:
+            from backend.services.chart_render_pool import ChartBatch
+
+            charts: dict[str, str | None] = {}
+            batch = ChartBatch()
+            for key, fn, args, kwargs in chart_jobs:
+                batch.add(fn, *args, target=(charts, key), **kwargs)
+            chart_jobs = []
+            report_stage("charts")
+            batch.run()
+            chart_path = charts.get("chart_path")
+            flow_chart_path = charts.get("flow_chart_path")
+            dp_chart_path = charts.get("dp_chart_path")
 
     # ── 7. Reagent stats + intervals + prev day comparison ──
-    reagent_rows = db.execute(text("""
-        SELECT reagent, SUM(qty) AS total_qty, COUNT(*) AS cnt
-        FROM events
-        WHERE well = :wno
-          AND event_type = 'reagent'
-          AND event_time >= :start AND event_time <= :end
-          AND reagent IS NOT NULL
-        GROUP BY reagent
-        ORDER BY reagent
-    """), {"wno": well_number, "start": day_start_local, "end": day_end_local}).fetchall()
+    if day_events is not None:
+        reagent_rows = _reagent_totals(day_events)
+    else:
+        reagent_rows = db.execute(text("""
+            SELECT reagent, SUM(qty) AS total_qty, COUNT(*) AS cnt
+            FROM events
+            WHERE well = :wno
+              AND event_type = 'reagent'
+              AND event_time >= :start AND event_time <= :end
+              AND reagent IS NOT NULL
+            GROUP BY reagent
+            ORDER BY reagent
+        """), {"wno": well_number, "start": day_start_local, "end": day_end_local}).fetchall()
 
     reagent_stats = []
     for rr in reagent_rows:
@@ -1304,15 +1254,22 @@ def build_well_day_data(
 
     # Reagent intervals (avg hours between injections)
     reagent_intervals = []
-    interval_rows = db.execute(text("""
-        SELECT reagent, event_time
-        FROM events
-        WHERE well = :wno
-          AND event_type = 'reagent'
-          AND event_time >= :start AND event_time <= :end
-          AND reagent IS NOT NULL
-        ORDER BY reagent, event_time
-    """), {"wno": well_number, "start": day_start_local, "end": day_end_local}).fetchall()
+    if day_events is not None:
+        interval_rows = sorted(
+            ((r.reagent, r.event_time) for r in day_events
+             if r.event_type == "reagent" and r.reagent is not None),
+            key=lambda x: x[0],
+        )
+    else:
+        interval_rows = db.execute(text("""
+            SELECT reagent, event_time
+            FROM events
+            WHERE well = :wno
+              AND event_type = 'reagent'
+              AND event_time >= :start AND event_time <= :end
+              AND reagent IS NOT NULL
+            ORDER BY reagent, event_time
+        """), {"wno": well_number, "start": day_start_local, "end": day_end_local}).fetchall()
 
     reagent_times: dict[str, list[datetime]] = {}
     for ri_row in interval_rows:
@@ -1333,12 +1290,15 @@ def build_well_day_data(
             })
         elif len(times_list) == 1:
             # Single injection today — use prev day's last injection
-            prev_last = db.execute(text("""
-                SELECT MAX(event_time) FROM events
-                WHERE well = :wno AND event_type = 'reagent'
-                  AND reagent = :rname AND event_time < :today_start
-            """), {"wno": well_number, "rname": rname,
-                   "today_start": day_start_local}).scalar()
+            if data is not None:
+                prev_last = data.last_reagent_before(well.id, rname, day_start_local)
+            else:
+                prev_last = db.execute(text("""
+                    SELECT MAX(event_time) FROM events
+                    WHERE well = :wno AND event_type = 'reagent'
+                      AND reagent = :rname AND event_time < :today_start
+                """), {"wno": well_number, "rname": rname,
+                       "today_start": day_start_local}).scalar()
             if prev_last:
                 diff_h = (times_list[0] - prev_last).total_seconds() / 3600.0
                 reagent_intervals.append({
@@ -1359,15 +1319,21 @@ def build_well_day_data(
     prev_start = datetime.combine(prev_date_r, time(0, 0))
     prev_end = datetime.combine(prev_date_r, time(23, 59, 59))
 
-    prev_reagent_rows = db.execute(text("""
-        SELECT reagent, COUNT(*) AS cnt
-        FROM events
-        WHERE well = :wno
-          AND event_type = 'reagent'
-          AND event_time >= :start AND event_time <= :end
-          AND reagent IS NOT NULL
-        GROUP BY reagent
-    """), {"wno": well_number, "start": prev_start, "end": prev_end}).fetchall()
+    if data is not None:
+        prev_reagent_rows = [
+            (name, cnt) for name, _, cnt
+            in _reagent_totals(data.events(well.id, prev_start, prev_end))
+        ]
+    else:
+        prev_reagent_rows = db.execute(text("""
+            SELECT reagent, COUNT(*) AS cnt
+            FROM events
+            WHERE well = :wno
+              AND event_type = 'reagent'
+              AND event_time >= :start AND event_time <= :end
+              AND reagent IS NOT NULL
+            GROUP BY reagent
+        """), {"wno": well_number, "start": prev_start, "end": prev_end}).fetchall()
 
     prev_counts = {r[0]: int(r[1]) for r in prev_reagent_rows}
 
@@ -1413,7 +1379,7 @@ def build_well_day_data(
         "purge_d_mm": int(DEFAULT_PURGE.choke_diameter_m * 1000),
     }
 
-    return {
+    wd = {
         "well_number": well_number,
         "well_name": _tex_escape(well.name or ""),
         "report_date": report_date.strftime("%d.%m.%Y"),
@@ -1476,6 +1442,57 @@ def build_well_day_data(
         "reagent_intervals": reagent_intervals,
         "reagent_prev_day": reagent_prev_day,
     }
+    for key, fn, args, kwargs in chart_jobs:
+        chart_batch.add(fn, *args, target=(wd, key), **kwargs)
+    return wd
+
+
+def _failed_well_row(well: Well, report_date: date, error: str) -> dict:
+    """Warning row for a well whose data could not be built (report goes on)."""
+    return {
+        "well_number": str(well.number),
+        "well_name": _tex_escape(well.name or ""),
+        "report_date": report_date.strftime("%d.%m.%Y"),
+        "status": "---",
+        "substatus": "",
+        "build_error": _tex_escape(error[:200]),
+        "events": [],
+        "event_type_stats": [],
+        "reagent_stats": [],
+        "reagent_intervals": [],
+        "reagent_prev_day": [],
+    }
+
+
+@profiled()
+def _build_wells(db: Session, wells: list, fn, failed_row) -> tuple[list[dict], dict]:
+    """Per-well build in the well executor's thread pool.
+
+    Returns (rows in wells order, doc.meta["well_build"] summary); a failed
+    well becomes failed_row(well, error).
+    """
+    from time import perf_counter
+    from backend.services import well_build_executor
+
+    workers = well_build_executor.default_workers()
+    t0 = perf_counter()
+    results = well_build_executor.run_per_well(wells, fn, db=db, workers=workers)
+    build = well_build_executor.build_meta(results, (perf_counter() - t0) * 1000, workers)
+    rows = [r.value if r.error is None else failed_row(r.well, r.error) for r in results]
+    return rows, build
+
+
+def _record_well_build(doc, build: dict) -> None:
+    """Store the well build timings in doc.meta["well_build"]."""
+    from sqlalchemy.orm.attributes import flag_modified
+
+    meta = dict(doc.meta or {})
+    meta["well_build"] = build
+    doc.meta = meta
+    try:
+        flag_modified(doc, "meta")
+    except Exception:
+        pass   # not an ORM instance (tests / previews)
 
 
 # ── PDF generation ───────────────────────────────────────
@@ -1506,15 +1523,32 @@ def generate_daily_report_pdf(doc, db: Session) -> str:
     if not wells:
         raise ValueError("Не найдены скважины для отчёта")
 
-    # Build data for each well
-    wells_data = []
-    for w in wells:
-        wd = build_well_day_data(
-            db, w, report_date,
+    # Build data for each well: wells in the executor's thread pool, their
+    # charts queued per well and rendered as one process-pool batch.
+    from time import perf_counter
+    from backend.services.chart_render_pool import ChartBatch
+
+    well_charts = {w.id: ChartBatch() for w in wells}
+
+    def build(wdb, w):
+        return build_well_day_data(
+            wdb, w, report_date,
             downtime_threshold_min=downtime_threshold_min,
             comparison_days=comparison_days,
+            chart_batch=well_charts[w.id],
         )
-        wells_data.append(wd)
+
+    wells_data, build_info = _build_wells(
+        db, wells, build, lambda w, err: _failed_well_row(w, report_date, err))
+    charts = ChartBatch()
+    for w in wells:
+        charts.extend(well_charts[w.id])
+    if len(charts):
+        report_stage("charts")
+        t0 = perf_counter()
+        charts.run()
+        build_info["charts_ms"] = round((perf_counter() - t0) * 1000, 1)
+    _record_well_build(doc, build_info)
 
     now_kungrad = datetime.utcnow() + KUNGRAD_OFFSET
 
@@ -1559,9 +1593,21 @@ def _load_masked_hourly(
     Empty DataFrame if no data.
     """
     from backend.services.flow_rate.data_access import get_pressure_data
-    from backend.services.flow_rate.cleaning import clean_pressure
 
     df_raw = get_pressure_data(well_id, utc_start.isoformat(), utc_end.isoformat())
+    return _masked_hourly_from_raw(df_raw, well_id, utc_start, utc_end)
+
+
+def _masked_hourly_from_raw(
+    df_raw: pd.DataFrame, well_id: int, utc_start: datetime, utc_end: datetime,
+) -> pd.DataFrame:
+    """Clean + verified masks + hourly resample over already loaded pressure_raw.
+
+    Same steps as _load_masked_hourly without the DB read (used by
+    WellDataContext, which slices one shared raw frame). df_raw is not modified.
+    """
+    from backend.services.flow_rate.cleaning import clean_pressure
+
     if df_raw.empty:
         return pd.DataFrame()
 
@@ -1591,6 +1637,16 @@ def _load_masked_hourly(
     return hourly
 
 
+def _masked_hourly(
+    well_id: int, utc_start: datetime, utc_end: datetime,
+    data: ReportDataLoader | None = None,
+) -> pd.DataFrame:
+    """_load_masked_hourly, or the same frame from the report loader's pressure."""
+    if data is not None:
+        return data.masked_hourly(well_id, utc_start, utc_end)
+    return _load_masked_hourly(well_id, utc_start, utc_end)
+
+
 # ── Loss base Q: working-hours-only median ─────────────────
 
 # Minimum Q (тыс.м³/сут) to count hour as "working"
@@ -1600,11 +1656,13 @@ Q_WORKING_THRESHOLD = 2.0
 def _compute_loss_base_q(
     db: Session, well_id: int, choke_mm: float | None,
     period_end: datetime, window_hours: int = 24,
+    data: ReportDataLoader | None = None,
 ) -> float | None:
     """Compute base Q for loss estimation: median of working hours only.
 
     Uses masked pressure data (pressure_raw + verified masks → hourly resample).
     Looks back `window_hours` from `period_end`, takes only hours where Q > threshold.
+    data — report loader: hourly data from its preloaded pressure.
     """
     if not choke_mm or choke_mm <= 0:
         return None
@@ -1612,7 +1670,7 @@ def _compute_loss_base_q(
     from backend.services.flow_rate.config import DEFAULT_FLOW as cfg
 
     period_start = period_end - timedelta(hours=window_hours)
-    hourly = _load_masked_hourly(well_id, period_start, period_end)
+    hourly = _masked_hourly(well_id, period_start, period_end, data)
 
     if hourly.empty:
         return None
@@ -1646,6 +1704,7 @@ def _compute_loss_base_q(
 def _get_daily_avg_flow(
     db: Session, well_id: int, choke_mm: float | None,
     start_date: date, end_date: date,
+    data: ReportDataLoader | None = None,
 ) -> list[tuple[date, float]]:
     """Compute avg daily flow rate from masked pressure data.
 
@@ -1660,7 +1719,7 @@ def _get_daily_avg_flow(
     utc_start = datetime.combine(start_date, time(0, 0)) - KUNGRAD_OFFSET
     utc_end = datetime.combine(end_date, time(23, 59, 59)) - KUNGRAD_OFFSET
 
-    hourly = _load_masked_hourly(well_id, utc_start, utc_end)
+    hourly = _masked_hourly(well_id, utc_start, utc_end, data)
     if hourly.empty:
         return []
 
@@ -1700,9 +1759,11 @@ def _get_daily_avg_flow(
 
 # ── Mini flow charts for summary report ────────────────────
 
+@profiled()
 def _render_monthly_flow_grid(
     db: Session, wells: list, report_date: date,
     chart_style: str = "line",
+    data: ReportDataLoader | None = None,
 ) -> str | None:
     """Render a grid of mini flow-rate charts (one per well) → single PNG.
 
@@ -1723,14 +1784,17 @@ def _render_monthly_flow_grid(
 
     chart_data = []
     for w in wells:
-        row = db.execute(text("""
-            SELECT choke_diam_mm FROM well_construction
-            WHERE well_no = :wno
-            ORDER BY data_as_of DESC NULLS LAST LIMIT 1
-        """), {"wno": str(w.number)}).fetchone()
-        choke_mm = float(row[0]) if row and row[0] else None
-
-        daily = _get_daily_avg_flow(db, w.id, choke_mm, month_start, report_date)
+        if data is not None:
+            choke_mm = data.choke_mm(w.id)
+        else:
+            row = db.execute(text("""
+                SELECT choke_diam_mm FROM well_construction
+                WHERE well_no = :wno
+                ORDER BY data_as_of DESC NULLS LAST LIMIT 1
+            """), {"wno": str(w.number)}).fetchone()
+            choke_mm = float(row[0]) if row and row[0] else None
+
+        daily = _get_daily_avg_flow(db, w.id, choke_mm, month_start, report_date, data=data)
         if len(daily) >= 2:
             chart_data.append({
                 "well_number": str(w.number),
@@ -1815,18 +1879,22 @@ def _classify_purge_event(desc: str, phase: str) -> str:
 
 def _count_purge_sessions_from_events(
     db: Session, well_number: str, day_start: datetime, day_end: datetime,
+    rows: list | None = None,
 ) -> dict:
     """Count purge sessions using start/press/stop grouping from events table.
 
+    rows — already loaded purge (event_time, description, purge_phase) of
+    the period ordered by time (ReportDataLoader); None → query events.
     Returns dict with: total, complete, incomplete, by_type, avg_duration_min.
     """
-    rows = db.execute(text("""
-        SELECT event_time, description, purge_phase
-        FROM events
-        WHERE well = :wno AND event_type = 'purge'
-          AND event_time >= :start AND event_time <= :end
-        ORDER BY event_time
-    """), {"wno": well_number, "start": day_start, "end": day_end}).fetchall()
+    if rows is None:
+        rows = db.execute(text("""
+            SELECT event_time, description, purge_phase
+            FROM events
+            WHERE well = :wno AND event_type = 'purge'
+              AND event_time >= :start AND event_time <= :end
+            ORDER BY event_time
+        """), {"wno": well_number, "start": day_start, "end": day_end}).fetchall()
 
     if not rows:
         return {"total": 0, "complete": 0, "incomplete": 0,
@@ -2066,9 +2134,11 @@ def _compute_reagent_totals(wells_data: list[dict]) -> tuple[list[dict], str]:
     return result, _fmt(grand_qty, 1) if grand_qty > 0 else "---"
 
 
+@profiled()
 def _compute_multiday_trend(
     db: Session, well_id: int, well_number: str, choke_mm: float | None,
     report_date: date, trend_days: int, trend_target: str,
+    data: ReportDataLoader | None = None,
 ) -> dict | None:
     """Compute trend from masked pressure data over N days.
 
@@ -2085,7 +2155,7 @@ def _compute_multiday_trend(
     utc_start = datetime.combine(start_date, time(0, 0)) - KUNGRAD_OFFSET
     utc_end = datetime.combine(report_date, time(23, 59, 59)) - KUNGRAD_OFFSET
 
-    hourly = _load_masked_hourly(well_id, utc_start, utc_end)
+    hourly = _masked_hourly(well_id, utc_start, utc_end, data)
     if len(hourly) < 6:
         return None
 
@@ -2140,7 +2210,7 @@ def _compute_multiday_trend(
     # % change: avg Q today vs avg Q yesterday
     delta_pct = None
     yesterday = report_date - timedelta(days=1)
-    daily = _get_daily_avg_flow(db, well_id, choke_mm, yesterday, report_date)
+    daily = _get_daily_avg_flow(db, well_id, choke_mm, yesterday, report_date, data=data)
     daily_map = {d[0]: d[1] for d in daily}
     q_today = daily_map.get(report_date)
     q_yesterday = daily_map.get(yesterday)
@@ -2186,19 +2256,39 @@ def generate_summary_report_pdf(doc, db: Session) -> str:
     day_start_local = datetime.combine(report_date, time(0, 0))
     day_end_local = datetime.combine(report_date, time(23, 59, 59))
 
-    wells_data = []
-    for w in wells:
+    # All wells' data in a handful of set-based queries, partitioned per well:
+    # month to date (flow_result / month fallback) + comparison and trend
+    # windows + the previous day. Minute pressure: the month only for the
+    # flow grid, otherwise the trend window.
+    month_start = report_date.replace(day=1)
+    near_start = report_date - timedelta(days=max(trend_days - 1, 1))
+    data = ReportDataLoader(
+        db, wells,
+        min(month_start, near_start, report_date - timedelta(days=comparison_days)),
+        report_date,
+        pressure_from=min(month_start, near_start) if include_charts else near_start,
+    )
+
+    # Wells in the executor's thread pool: the loader is fully loaded first
+    # and only read from the threads. Per-well charts are not shown in the
+    # summary and are not rendered.
+    data.preload()
+
+    def build(wdb, w):
         wd = build_well_day_data(
-            db, w, report_date,
+            wdb, w, report_date,
             downtime_threshold_min=downtime_threshold_min,
             comparison_days=comparison_days,
+            data=data, render_charts=False,
         )
         wd = _enrich_for_summary(wd)
+        day_events = data.events(w.id, day_start_local, day_end_local)
 
         # Event-based purge sessions (start/press/stop from events table)
         try:
             ps = _count_purge_sessions_from_events(
-                db, str(w.number), day_start_local, day_end_local)
+                wdb, str(w.number), day_start_local, day_end_local,
+                rows=_purge_rows(day_events))
             wd["s_purge_total"] = ps["total"]
             wd["s_purge_full"] = ps["complete"]
             wd["s_purge_incomplete"] = ps["incomplete"]
@@ -2216,7 +2306,8 @@ def generate_summary_report_pdf(doc, db: Session) -> str:
         # Anomalies by keyword search
         try:
             anomalies = _count_anomalies_from_events(
-                db, str(w.number), day_start_local, day_end_local)
+                wdb, str(w.number), day_start_local, day_end_local,
+                rows=[(r.event_type, r.description, r.purge_phase) for r in day_events])
             wd["s_hydrate_count"] = anomalies["hydrate"]
             wd["s_purge_choke"] = anomalies["choke_purge"]
             wd["s_purge_manometer"] = anomalies["manometer_purge"]
@@ -2226,14 +2317,23 @@ def generate_summary_report_pdf(doc, db: Session) -> str:
         # Compute multi-day trend
         try:
             trend = _compute_multiday_trend(
-                db, w.id, str(w.number), wd.get("choke_mm_raw"),
-                report_date, trend_days, trend_target)
+                wdb, w.id, str(w.number), wd.get("choke_mm_raw"),
+                report_date, trend_days, trend_target, data=data)
             wd["summary_trend"] = trend
         except Exception:
             log.exception("Trend computation failed for well %s", w.number)
             wd["summary_trend"] = None
 
-        wells_data.append(wd)
+        return wd
+
+    wells_data, build_info = _build_wells(
+        db, wells, build,
+        lambda w, err: _enrich_for_summary(_failed_well_row(w, report_date, err)))
+    _record_well_build(doc, build_info)
+    build_errors = [
+        {"well_number": w["well_number"], "error": w["build_error"]}
+        for w in wells_data if w.get("build_error")
+    ]
 
     # Sort by status (group) then by well number
     wells_data.sort(key=lambda w: (w.get("status", ""), w.get("well_number", "")))
@@ -2276,8 +2376,10 @@ def generate_summary_report_pdf(doc, db: Session) -> str:
     # Mini flow charts (optional)
     flow_grid_path = None
     if include_charts:
+        report_stage("charts")
         try:
-            flow_grid_path = _render_monthly_flow_grid(db, wells, report_date, chart_style)
+            flow_grid_path = _render_monthly_flow_grid(
+                db, wells, report_date, chart_style, data=data)
         except Exception:
             log.exception("Flow grid chart rendering failed")
 
@@ -2299,6 +2401,7 @@ def generate_summary_report_pdf(doc, db: Session) -> str:
         "trend_label": trend_label,
         "daily_extract": daily_extract,
         "flow_grid_path": flow_grid_path,
+        "build_errors": build_errors,
     }
 
     env = _get_latex_env()
@@ -2322,21 +2425,25 @@ def generate_summary_report_pdf(doc, db: Session) -> str:
 
 def _build_status_segments(
     db: Session, well_id: int, period_start: date, period_end: date,
+    rows: list | None = None,
 ) -> list[dict]:
     """Build list of status segments for a well within a period.
 
     Each segment: {status, date_from, date_to}.
     Day of status change belongs to the NEW status.
+    rows — already selected (status, start date, end date) intervals
+    (ReportDataLoader.status_rows); None → query well_status.
     Returns at least one segment. Wells without status records get 'Не задан'.
     """
-    rows = db.execute(text("""
-        SELECT status, dt_start::date, dt_end::date
-        FROM well_status
-        WHERE well_id = :wid
-          AND (dt_end IS NULL OR dt_end::date >= :ps)
-          AND dt_start::date <= :pe
-        ORDER BY dt_start
-    """), {"wid": well_id, "ps": period_start, "pe": period_end}).fetchall()
+    if rows is None:
+        rows = db.execute(text("""
+            SELECT status, dt_start::date, dt_end::date
+            FROM well_status
+            WHERE well_id = :wid
+              AND (dt_end IS NULL OR dt_end::date >= :ps)
+              AND dt_start::date <= :pe
+            ORDER BY dt_start
+        """), {"wid": well_id, "ps": period_start, "pe": period_end}).fetchall()
 
     if not rows:
         return [{"status": "Не задан", "date_from": period_start, "date_to": period_end}]
@@ -2369,6 +2476,34 @@ def _build_status_segments(
     return merged if merged else [{"status": "Не задан", "date_from": period_start, "date_to": period_end}]
 
 
+def _purge_rows(rows) -> list[tuple] | None:
+    """(event_time, description, purge_phase) of purge events among loaded rows.
+
+    None (rows not loaded) → _count_purge_sessions_from_events queries events.
+    """
+    if rows is None:
+        return None
+    return [(r.event_time, r.description, r.purge_phase) for r in rows if r.event_type == "purge"]
+
+
+def _reagent_totals(rows) -> list[tuple]:
+    """(reagent, SUM(qty), COUNT(*)) of reagent events, ordered by reagent.
+
+    Python twin of the GROUP BY over events for rows already loaded by the
+    report loader: NULL qty is skipped by SUM (all NULL → None).
+    """
+    groups: dict[str, list] = {}
+    for r in rows:
+        if r.event_type == "reagent" and r.reagent is not None:
+            groups.setdefault(r.reagent, []).append(r.qty)
+    out = []
+    for name in sorted(groups):
+        qtys = [q for q in groups[name] if q is not None]
+        out.append((name, sum(qtys) if qtys else None, len(groups[name])))
+    return out
+
+
+@profiled()
 def _aggregate_monthly_well(
     db: Session, well, month_start: date, month_end: date,
     choke_mm: float | None, downtime_threshold_min: int,
@@ -2376,11 +2511,14 @@ def _aggregate_monthly_well(
     status_override: str | None = None,
     segment_start: date | None = None,
     segment_end: date | None = None,
+    data: ReportDataLoader | None = None,
 ) -> dict:
     """Aggregate one well's data over a period (full month or status segment).
 
     If segment_start/segment_end provided, uses those dates instead of month.
     status_override: force status label (for segment mode).
+    data: report loader — status, construction, events and pressure come from
+    its set-based loads instead of per-well queries.
     Returns dict compatible with summary template (s_* fields).
     """
     well_number = str(well.number)
@@ -2392,33 +2530,39 @@ def _aggregate_monthly_well(
     local_end = datetime.combine(eff_end, time(23, 59, 59))
     # (local_end already set above from eff_end)
 
-    # Status
-    row = db.execute(text("""
-        SELECT status FROM well_status
-        WHERE well_id = :wid ORDER BY dt_start DESC LIMIT 1
-    """), {"wid": well.id}).fetchone()
-    status = row[0] if row else ""
-
-    # Substatus (active at end of segment)
-    sub_row = db.execute(text("""
-        SELECT sub_status FROM well_sub_status
-        WHERE well_id = :wid AND dt_end IS NULL
-        ORDER BY dt_start DESC LIMIT 1
-    """), {"wid": well.id}).fetchone()
-    substatus = sub_row[0] if sub_row else ""
-
-    # Horizon
-    row = db.execute(text("""
-        SELECT horizon FROM well_construction
-        WHERE well_no = :wno
-        ORDER BY data_as_of DESC NULLS LAST LIMIT 1
-    """), {"wno": well_number}).fetchone()
-    horizon = _tex_escape(str(row[0]).replace("\n", ", ")) if row and row[0] else "---"
+    if data is not None:
+        status = data.latest_status(well.id)
+        substatus = data.substatus(well.id)
+        horizon_raw = data.construction(well.id)[1]
+    else:
+        # Status
+        row = db.execute(text("""
+            SELECT status FROM well_status
+            WHERE well_id = :wid ORDER BY dt_start DESC LIMIT 1
+        """), {"wid": well.id}).fetchone()
+        status = row[0] if row else ""
+
+        # Substatus (active at end of segment)
+        sub_row = db.execute(text("""
+            SELECT sub_status FROM well_sub_status
+            WHERE well_id = :wid AND dt_end IS NULL
+            ORDER BY dt_start DESC LIMIT 1
+        """), {"wid": well.id}).fetchone()
+        substatus = sub_row[0] if sub_row else ""
+
+        # Horizon
+        row = db.execute(text("""
+            SELECT horizon FROM well_construction
+            WHERE well_no = :wno
+            ORDER BY data_as_of DESC NULLS LAST LIMIT 1
+        """), {"wno": well_number}).fetchone()
+        horizon_raw = row[0] if row else None
+    horizon = _tex_escape(str(horizon_raw).replace("\n", ", ")) if horizon_raw else "---"
 
     # Pressure stats + utilization from masked hourly data
     utc_start = datetime.combine(eff_start, time(0, 0)) - KUNGRAD_OFFSET
     utc_end = datetime.combine(eff_end, time(23, 59, 59)) - KUNGRAD_OFFSET
-    hourly = _load_masked_hourly(well.id, utc_start, utc_end)
+    hourly = _masked_hourly(well.id, utc_start, utc_end, data)
 
     if not hourly.empty:
         pt_valid = hourly["p_tube"].dropna()
@@ -2436,7 +2580,7 @@ def _aggregate_monthly_well(
         pr_p_tube_median = None
 
     # Flow stats from daily averages (already uses masked data)
-    daily_flow = _get_daily_avg_flow(db, well.id, choke_mm, eff_start, eff_end)
+    daily_flow = _get_daily_avg_flow(db, well.id, choke_mm, eff_start, eff_end, data=data)
     q_values = [d[1] for d in daily_flow if d[1] > 0]
 
     s_median_flow = _fmt(float(np.median(q_values))) if q_values else "---"
@@ -2467,14 +2611,21 @@ def _aggregate_monthly_well(
         db, well.id, choke_mm,
         datetime.combine(eff_end, time(23, 59, 59)),
         window_hours=loss_window_hours,
+        data=data,
     )
     if loss_q is None:
         # Fallback to monthly median
         loss_q = float(np.median(q_values)) if q_values else 0
     downtime_loss = loss_q * (downtime_hours / 24.0) if loss_q > 0 else 0
 
+    # Events of the period (from the report loader, if any)
+    evt_all = data.events(well.id, local_start, local_end) if data is not None else None
+
     # Purge sessions from events (whole month)
-    ps = _count_purge_sessions_from_events(db, well_number, local_start, local_end)
+    ps = _count_purge_sessions_from_events(
+        db, well_number, local_start, local_end,
+        rows=_purge_rows(evt_all),
+    )
 
     # Purge atmospheric loss estimate:
     # For each complete purge session, estimate gas vented to atmosphere
@@ -2501,10 +2652,13 @@ def _aggregate_monthly_well(
 
     # Events
     # Structured event categorization
-    evt_rows = db.execute(text("""
-        SELECT event_type, description, purge_phase FROM events
-        WHERE well = :wno AND event_time >= :start AND event_time <= :end
-    """), {"wno": well_number, "start": local_start, "end": local_end}).fetchall()
+    if evt_all is not None:
+        evt_rows = [(r.event_type, r.description, r.purge_phase) for r in evt_all]
+    else:
+        evt_rows = db.execute(text("""
+            SELECT event_type, description, purge_phase FROM events
+            WHERE well = :wno AND event_time >= :start AND event_time <= :end
+        """), {"wno": well_number, "start": local_start, "end": local_end}).fetchall()
 
     # Categorize each event into structured blocks
     cat_reagent = 0
@@ -2616,13 +2770,16 @@ def _aggregate_monthly_well(
     }
 
     # Reagents
-    reagent_rows = db.execute(text("""
-        SELECT reagent, SUM(qty), COUNT(*) FROM events
-        WHERE well = :wno AND event_type = 'reagent'
-          AND event_time >= :start AND event_time <= :end
-          AND reagent IS NOT NULL
-        GROUP BY reagent ORDER BY reagent
-    """), {"wno": well_number, "start": local_start, "end": local_end}).fetchall()
+    if evt_all is not None:
+        reagent_rows = _reagent_totals(evt_all)
+    else:
+        reagent_rows = db.execute(text("""
+            SELECT reagent, SUM(qty), COUNT(*) FROM events
+            WHERE well = :wno AND event_type = 'reagent'
+              AND event_time >= :start AND event_time <= :end
+              AND reagent IS NOT NULL
+            GROUP BY reagent ORDER BY reagent
+        """), {"wno": well_number, "start": local_start, "end": local_end}).fetchall()
 
     reagent_stats = []
     for rr in reagent_rows:
@@ -2632,13 +2789,6 @@ def _aggregate_monthly_well(
             "count": int(rr[2]),
         })
 
-    # Hydrate events
-    hyd_count = db.execute(text("""
-        SELECT COUNT(*) FROM events
-        WHERE well = :wno AND event_time >= :start AND event_time <= :end
-          AND (LOWER(description) LIKE '%%гидрат%%' OR LOWER(event_type) LIKE '%%гидрат%%')
-    """), {"wno": well_number, "start": local_start, "end": local_end}).scalar() or 0
-
     return {
         "well_number": well_number,
         "well_name": _tex_escape(well.name or ""),
@@ -2743,17 +2893,19 @@ def generate_monthly_report_pdf(doc, db: Session) -> str:
     if not wells:
         raise ValueError("Не найдены скважины для отчёта")
 
+    # All wells' data in a handful of set-based queries, partitioned per well.
+    # From the day before the month: one-day segments on the 1st trend over 2 days.
+    data = ReportDataLoader(db, wells, month_start - timedelta(days=1), month_end)
+
     # Build segments: each well × each status period = one row in report
     wells_data = []
     for w in wells:
-        row = db.execute(text("""
-            SELECT choke_diam_mm FROM well_construction
-            WHERE well_no = :wno
-            ORDER BY data_as_of DESC NULLS LAST LIMIT 1
-        """), {"wno": str(w.number)}).fetchone()
-        choke_mm = float(row[0]) if row and row[0] else None
+        choke_mm = data.choke_mm(w.id)
 
-        segments = _build_status_segments(db, w.id, month_start, month_end)
+        segments = _build_status_segments(
+            db, w.id, month_start, month_end,
+            rows=data.status_rows(w.id, month_start, month_end),
+        )
 
         # Filter by status if specified
         if status_filter:
@@ -2768,6 +2920,7 @@ def generate_monthly_report_pdf(doc, db: Session) -> str:
                 status_override=seg["status"],
                 segment_start=seg["date_from"],
                 segment_end=seg["date_to"],
+                data=data,
             )
 
             # Skip segments with no data at all
@@ -2779,7 +2932,7 @@ def generate_monthly_report_pdf(doc, db: Session) -> str:
             try:
                 trend = _compute_multiday_trend(
                     db, w.id, str(w.number), choke_mm,
-                    seg["date_to"], max(seg_days, 2), trend_target)
+                    seg["date_to"], max(seg_days, 2), trend_target, data=data)
                 wd["summary_trend"] = trend
             except Exception:
                 log.exception("Monthly trend failed for well %s seg %s", w.number, seg["status"])
@@ -2799,8 +2952,10 @@ def generate_monthly_report_pdf(doc, db: Session) -> str:
     # Charts
     flow_grid_path = None
     if include_charts:
+        report_stage("charts")
         try:
-            flow_grid_path = _render_monthly_flow_grid(db, wells, month_end, chart_style)
+            flow_grid_path = _render_monthly_flow_grid(
+                db, wells, month_end, chart_style, data=data)
         except Exception:
             log.exception("Monthly flow grid chart failed")
 
@@ -0,0 +1,464 @@
+"""
+fleet_snapshot.py — снимок парка скважин для дашборда /visual и
+постраничная лента таймлайна.
+
+visual_page на каждый заход собирал плитки последовательными запросами
+(статусы, подстатусы, давления, дебит, события) и вдобавок грузил в HTML
+все события за 90 дней для таймлайна. Теперь:
+
+  • FleetSnapshot — данные плитки для ВСЕХ скважин: статус, подстатус,
+    последнее давление и ΔP (pressure_latest), дебит за сегодня и вчера,
+    два последних события. Собирается несколькими наборными запросами
+    (build_snapshot: один SELECT с DISTINCT ON / LATERAL + давления +
+    дебит), результат — простые данные без ORM-объектов;
+  • get_snapshot(db) — кэш процесса на интервал пайплайна давлений
+    (SNAPSHOT_TTL_SECONDS) с проверкой ревизии: дешёвый запрос max(id) /
+    count активных статусов / max(pressure_latest.updated_at) ловит записи
+    из других процессов (бот событий, cron-пайплайн). Записи самого
+    приложения (статус, подстатус, карточка скважины, POST
+    /api/pressure/refresh) вызывают invalidate();
+  • timeline_page(...) — страница событий таймлайна для
+    GET /api/visual/timeline (limit/offset): страница /visual рендерится
+    сразу, visual_timeline.js догружает ленту.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+
+from sqlalchemy import text
+
+log = logging.getLogger(__name__)
+
+# Интервал пайплайна давлений днём (scripts/schedule_config.json: 5 мин)
+SNAPSHOT_TTL_SECONDS = 300
+TIMELINE_DAYS = 90
+TIMELINE_PAGE_LIMIT = 2000
+RECENT_EVENTS_PER_TILE = 2
+
+_lock = threading.Lock()
+_snapshot: Optional["FleetSnapshot"] = None
+
+
+@dataclass(frozen=True)
+class TileEvent:
+    event_time: Optional[datetime]
+    event_type: Optional[str]
+    description: Optional[str]
+
+
+@dataclass
+class WellTile:
+    well_id: int
+    number: Optional[str]
+    name: Optional[str]
+    status: Optional[str] = None
+    status_start: Optional[datetime] = None
+    substatus: Optional[str] = None
+    substatus_start: Optional[datetime] = None
+    p_tube: Optional[float] = None
+    p_line: Optional[float] = None
+    p_diff: Optional[float] = None
+    pressure_updated: Optional[datetime] = None
+    flow_today: Optional[float] = None
+    flow_yesterday: Optional[float] = None
+    recent_events: list[TileEvent] = field(default_factory=list)
+
+    def pressure_stats(self) -> dict:
+        """Давления в формате get_wells_pressure_stats (период 10m / 1h)."""
+        return {
+            "p_tube_avg": self.p_tube,
+            "p_line_avg": self.p_line,
+            "p_diff_avg": self.p_diff,
+            "reading_count": 1,
+            "updated_at": self.pressure_updated,
+            "has_data": self.p_tube is not None or self.p_line is not None,
+        }
+
+
+@dataclass
+class FleetSnapshot:
+    revision: tuple
+    tiles: dict[int, WellTile] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def tile(self, well_id: int) -> Optional[WellTile]:
+        return self.tiles.get(well_id)
+
+    def well_keys_with_status(self, statuses: Sequence[str]) -> list[str]:
+        wanted = set(statuses)
+        return [t.number for t in self.tiles.values() if t.number and t.status in wanted]
+
+
+# ─── Сборка ───────────────────────────────────────────────────────────
+
+_TILE_SQL = text("""
+    SELECT w.id, w.number, w.name,
+           st.status, st.dt_start,
+           sst.sub_status, sst.dt_start,
+           ev.event_time, ev.event_type, ev.description
+    FROM wells w
+    LEFT JOIN (
+        SELECT DISTINCT ON (well_id) well_id, status, dt_start
+        FROM well_status
+        WHERE dt_end IS NULL
+        ORDER BY well_id, dt_start DESC
+    ) st ON st.well_id = w.id
+    LEFT JOIN (
+        SELECT DISTINCT ON (well_id) well_id, sub_status, dt_start
+        FROM well_sub_status
+        WHERE dt_end IS NULL
+        ORDER BY well_id, dt_start DESC
+    ) sst ON sst.well_id = w.id
+    LEFT JOIN LATERAL (
+        SELECT e.event_time, e.event_type, e.description
+        FROM events e
+        WHERE e.well = COALESCE(w.number::text, w.id::text)
+        ORDER BY e.event_time DESC NULLS LAST
+        LIMIT :recent
+    ) ev ON TRUE
+    ORDER BY w.id, ev.event_time DESC NULLS LAST
+""")
+
+_REVISION_SQL = text("""
+    SELECT (SELECT max(id) FROM events),
+           (SELECT max(id) FROM well_status),
+           (SELECT count(*) FROM well_status WHERE dt_end IS NULL),
+           (SELECT max(id) FROM well_sub_status),
+           (SELECT count(*) FROM well_sub_status WHERE dt_end IS NULL),
+           (SELECT max(updated_at) FROM pressure_latest),
+           (SELECT count(*) FROM wells)
+""")
+
+
+def _kungrad_today():
+    return (datetime.utcnow() + timedelta(hours=5)).date()
+
+
+def _revision(db) -> tuple:
+    # Дата (Кунград) — в ревизии: «сегодня/вчера» дебита сменяются в полночь
+    return (*db.execute(_REVISION_SQL).one(), _kungrad_today())
+
+
+def daily_flow_for_tiles(
+    well_ids: list[int],
+) -> tuple[dict[int, float | None], dict[int, float | None]]:
+    """
+    Средний суточный дебит за сегодня и вчера для списка скважин.
+
+    Использует pressure_hourly (уже агрегированные средние за час),
+    формулу истечения газа через штуцер (та же, что в flow_rate/calculator.py),
+    и choke_diam_mm из well_construction.
+
+    Returns: (flow_today, flow_yesterday) — dict[well_id] → float | None
+    """
+    from backend.db import engine as pg_engine
+
+    if not well_ids:
+        return {}, {}
+
+    # Кунград UTC+5: «сегодня» = 00:00 .. now по UTC+5
+    now_kungrad = datetime.utcnow() + timedelta(hours=5)
+    today_start_utc = (
+        now_kungrad.replace(hour=0, minute=0, second=0, microsecond=0)
+        - timedelta(hours=5)
+    )
+    yesterday_start_utc = today_start_utc - timedelta(days=1)
+
+    well_id_csv = ",".join(str(int(w)) for w in well_ids)
+
+    # 1) Медианные давления за сегодня и вчера (из pressure_hourly)
+    # Медиана вместо AVG — защита от ложных скачков датчиков (tube=1.7 вместо 17)
+    sql_pressure = text(f"""
+        SELECT
+            well_id,
+            CASE WHEN hour_start >= :today THEN 'today' ELSE 'yesterday' END AS day,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY CASE WHEN p_tube_avg > 0 AND p_tube_avg <= 85 THEN p_tube_avg END) AS p_tube,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY CASE WHEN p_line_avg > 0 AND p_line_avg <= 85 THEN p_line_avg END) AS p_line
+        FROM pressure_hourly
+        WHERE well_id IN ({well_id_csv})
+          AND hour_start >= :yesterday
+        GROUP BY well_id, day
+    """)
+
+    # 2) Штуцеры для всех скважин (batch)
+    sql_choke = text(f"""
+        SELECT DISTINCT ON (w.id)
+            w.id AS well_id,
+            wc.choke_diam_mm
+        FROM wells w
+        JOIN well_construction wc ON w.number::text = wc.well_no
+        WHERE w.id IN ({well_id_csv})
+          AND wc.choke_diam_mm IS NOT NULL
+        ORDER BY w.id, wc.data_as_of DESC NULLS LAST
+    """)
+
+    flow_today: dict[int, float | None] = {}
+    flow_yesterday: dict[int, float | None] = {}
+
+    try:
+        with pg_engine.connect() as conn:
+            # Давления
+            pressure_rows = conn.execute(
+                sql_pressure,
+                {"today": today_start_utc, "yesterday": yesterday_start_utc},
+            ).fetchall()
+
+            # Штуцеры
+            choke_rows = conn.execute(sql_choke).fetchall()
+    except Exception:
+        return {}, {}
+
+    choke_map: dict[int, float] = {r[0]: float(r[1]) for r in choke_rows}
+
+    # Формула (идентична calculator.py DEFAULT_FLOW)
+    C1 = 2.919
+    C2 = 4.654
+    C3 = 286.95
+    multiplier = 4.1
+    crit_ratio = 0.5
+
+    def _q(p_tube: float, p_line: float, choke_mm: float) -> float:
+        if p_tube <= p_line or p_tube <= 0:
+            return 0.0
+        r = (p_tube - p_line) / p_tube
+        choke_sq = (choke_mm / C2) ** 2
+        if r < crit_ratio:
+            q = C1 * choke_sq * p_tube * (1.0 - r / 1.5) * math.sqrt(max(r / C3, 0.0))
+        else:
+            q = 0.667 * C1 * choke_sq * p_tube * math.sqrt(0.5 / C3)
+        return max(q * multiplier, 0.0)
+
+    for row in pressure_rows:
+        wid, day_label, pt, pl = row[0], row[1], row[2], row[3]
+        choke = choke_map.get(wid)
+        if pt is None or pl is None or choke is None:
+            val = None
+        else:
+            val = round(_q(float(pt), float(pl), choke), 2)
+        if day_label == "today":
+            flow_today[wid] = val
+        else:
+            flow_yesterday[wid] = val
+
+    return flow_today, flow_yesterday
+
+
+def build_snapshot(db, *, revision: tuple | None = None) -> FleetSnapshot:
+    """Снимок всех скважин: запрос плиток + давления + дебит."""
+    from backend.services.pressure_aggregate_service import get_wells_pressure_stats
+
+    snap = FleetSnapshot(revision=revision if revision is not None else _revision(db))
+    rows = db.execute(_TILE_SQL, {"recent": RECENT_EVENTS_PER_TILE})
+    for wid, number, name, status, st_start, sub, sub_start, ev_time, ev_type, ev_desc in rows:
+        t = snap.tiles.get(wid)
+        if t is None:
+            t = snap.tiles[wid] = WellTile(
+                well_id=wid, number=str(number) if number else None, name=name,
+                status=status, status_start=st_start,
+                substatus=sub, substatus_start=sub_start,
+            )
+        if ev_time is not None or ev_type is not None:
+            t.recent_events.append(TileEvent(ev_time, ev_type, ev_desc))
+    ids = list(snap.tiles)
+    try:
+        for wid, ps in get_wells_pressure_stats(db, ids, "1h").items():
+            t = snap.tiles.get(wid)
+            if t is not None and ps.get("has_data"):
+                t.p_tube, t.p_line, t.p_diff = ps["p_tube_avg"], ps["p_line_avg"], ps["p_diff_avg"]
+                t.pressure_updated = ps["updated_at"]
+    except Exception:
+        log.warning("[fleet_snapshot] pressure stats failed", exc_info=True)
+    flow_today, flow_yesterday = daily_flow_for_tiles(ids)
+    for wid, t in snap.tiles.items():
+        t.flow_today = flow_today.get(wid)
+        t.flow_yesterday = flow_yesterday.get(wid)
+    return snap
+
+
+def get_snapshot(db) -> FleetSnapshot:
+    """Снимок из кэша процесса или пересобранный (TTL / ревизия / invalidate)."""
+    global _snapshot
+    rev = _revision(db)
+    with _lock:
+        snap = _snapshot
+    if (snap is not None and snap.revision == rev
+            and time.monotonic() - snap.loaded_at < SNAPSHOT_TTL_SECONDS):
+        return snap
+    t0 = time.perf_counter()
+    snap = build_snapshot(db, revision=rev)
+    with _lock:
+        _snapshot = snap
+    log.info("[fleet_snapshot] rebuilt: %d wells in %.0f ms",
+             len(snap.tiles), (time.perf_counter() - t0) * 1000)
+    return snap
+
+
+def invalidate() -> None:
+    """Сбросить снимок (запись статуса / подстатуса / скважины / пайплайн)."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+# ─── Таймлайн ─────────────────────────────────────────────────────────
+
+# Кольори для реагентів
+REAGENT_COLORS_BASE = {
+    'Пенний реагент': '#ff6b6b',
+    'Інгібітор': '#4ecdc4',
+    'Surfactant': '#95e1d3',
+    'Foamer': '#f38181',
+    'ПАР': '#aa96da',
+    'Деемульгатор': '#fcbad3',
+}
+COLOR_PALETTE = [
+    '#ff6b6b', '#4ecdc4', '#95e1d3', '#f38181',
+    '#aa96da', '#fcbad3', '#ffffd2', '#a8e6cf',
+    '#ffd3b6', '#ffaaa5', '#ff8b94', '#c7ceea'
+]
+
+
+def reagent_colors(names) -> dict[str, str]:
+    """Цвета реагентов: базовые по имени, остальные — палитра по порядку имён."""
+    return {
+        r: REAGENT_COLORS_BASE.get(r, COLOR_PALETTE[i % len(COLOR_PALETTE)])
+        for i, r in enumerate(sorted(names))
+    }
+
+
+def _timeline_query(db, snapshot: FleetSnapshot, *, wells, statuses, event_types,
+                    reagents, days: int):
+    """События за последние days суток с фильтрами формы /visual (tl_*)."""
+    from sqlalchemy import or_
+
+    from backend.models.events import Event
+
+    now = datetime.now()
+    date_from = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    date_to = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+    # Скважины: выбранные, иначе с активным статусом из statuses, иначе все с номером
+    if wells:
+        wells_to_show = list(wells)
+    elif statuses:
+        wells_to_show = snapshot.well_keys_with_status(statuses)
+    else:
+        wells_to_show = [t.number for t in snapshot.tiles.values() if t.number]
+
+    q = db.query(Event).filter(Event.event_time >= date_from, Event.event_time <= date_to)
+    if wells_to_show:
+        q = q.filter(Event.well.in_(wells_to_show))
+    if event_types:
+        q = q.filter(Event.event_type.in_(list(event_types)))
+    if reagents:
+        # Фильтр реагентов отсекает только вбросы других реагентов
+        q = q.filter(or_(
+            Event.event_type.is_(None), Event.event_type != "reagent",
+            Event.reagent.is_(None), Event.reagent.in_(list(reagents)),
+        ))
+    return q
+
+
+def timeline_facets(
+    db,
+    snapshot: FleetSnapshot,
+    *,
+    wells: Sequence[str] = (),
+    statuses: Sequence[str] = (),
+    event_types: Sequence[str] = (),
+    reagents: Sequence[str] = (),
+    days: int = TIMELINE_DAYS,
+) -> tuple[list[str], list[str]]:
+    """(реагенты, типы событий) таймлайна при тех же фильтрах — DISTINCT в SQL."""
+    from backend.models.events import Event
+
+    q = _timeline_query(db, snapshot, wells=wells, statuses=statuses,
+                        event_types=event_types, reagents=reagents, days=days)
+    reagent_names = sorted(
+        r for (r,) in q.filter(Event.event_type == "reagent", Event.reagent.isnot(None))
+        .with_entities(Event.reagent).distinct()
+    )
+    types = sorted(
+        t for (t,) in q.filter(Event.event_type.isnot(None), Event.event_type != "reagent")
+        .with_entities(Event.event_type).distinct()
+    )
+    return reagent_names, types
+
+
+def timeline_page(
+    db,
+    snapshot: FleetSnapshot,
+    *,
+    wells: Sequence[str] = (),
+    statuses: Sequence[str] = (),
+    event_types: Sequence[str] = (),
+    reagents: Sequence[str] = (),
+    sort: str = "desc",
+    days: int = TIMELINE_DAYS,
+    limit: int = TIMELINE_PAGE_LIMIT,
+    offset: int = 0,
+) -> dict:
+    """Страница событий таймлайна: {"events", "injections", "next_offset"}.
+
+    Формат элементов — как у window.reagentsData в visual.html;
+    next_offset = None на последней странице.
+    """
+    from backend.models.events import Event
+    from backend.models.users import User
+
+    q = _timeline_query(db, snapshot, wells=wells, statuses=statuses,
+                        event_types=event_types, reagents=reagents, days=days)
+    order = Event.event_time.asc() if sort == "asc" else Event.event_time.desc()
+    rows = q.order_by(order, Event.id).offset(offset).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    user_ids = {e.user_id for e in rows if e.user_id}
+    users = {}
+    if user_ids:
+        for u in db.query(User).filter(User.id.in_(user_ids)).all():
+            users[u.id] = u.username or u.full_name or f"User {u.id}"
+
+    events, injections = [], []
+    for evt in rows:
+        if not evt.event_time:
+            continue
+        username = users.get(evt.user_id) if evt.user_id else None
+        if evt.event_type == 'reagent' and evt.reagent:
+            injections.append({
+                't': evt.event_time.isoformat(),
+                'well': str(evt.well) if evt.well else '',
+                'reagent': evt.reagent,
+                'qty': float(evt.qty) if evt.qty else 1.0,
+                'description': evt.description or '',
+                'user_id': evt.user_id,
+                'username': username,
+                'geo_status': evt.geo_status or 'Не указан',
+            })
+        else:
+            events.append({
+                't': evt.event_time.isoformat(),
+                'well': str(evt.well) if evt.well else '',
+                'type': evt.event_type or 'other',
+                'description': evt.description or '',
+                'p_tube': float(evt.p_tube) if evt.p_tube is not None else None,
+                'p_line': float(evt.p_line) if evt.p_line is not None else None,
+                'user_id': evt.user_id,
+                'username': username,
+                'geo_status': evt.geo_status or 'Не указан',
+                'purge_phase': evt.purge_phase,
+            })
+
+    return {
+        "events": events,
+        "injections": injections,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if has_more else None,
+    }
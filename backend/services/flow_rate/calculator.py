@@ -19,12 +19,15 @@ def calculate_flow_rate(
     df: pd.DataFrame,
     choke_mm: float,
     cfg: FlowRateConfig = DEFAULT_FLOW,
+    *,
+    copy: bool = True,
 ) -> pd.DataFrame:
     """
     Мгновенный дебит для каждой строки.
 
     Ожидает колонки: p_tube, p_line (кгс/см²).
     Добавляет: flow_rate (тыс. м³/сут).
+    copy=False — колонка добавляется в переданный df на месте.
     """
     wh = df["p_tube"].values.astype(float)
     lp = df["p_line"].values.astype(float)
@@ -51,15 +54,17 @@ def calculate_flow_rate(
     q_base = np.where(r < cfg.critical_ratio, q_sub, q_crit)
     q = np.where(wh > lp, q_base * cfg.multiplier, 0.0)
 
-    df = df.copy()
+    if copy:
+        df = df.copy()
     df["flow_rate"] = np.maximum(q, 0.0)
     return df
 
 
-def calculate_cumulative(df: pd.DataFrame) -> pd.DataFrame:
+def calculate_cumulative(df: pd.DataFrame, *, copy: bool = True) -> pd.DataFrame:
     """
     Накопленный дебит методом трапеций.
     Добавляет: cumulative_flow (тыс. м³).
+    copy=False — колонка добавляется в переданный df на месте.
     """
     q = df["flow_rate"].values
 
@@ -72,7 +77,8 @@ def calculate_cumulative(df: pd.DataFrame) -> pd.DataFrame:
     q_prev = np.roll(q, 1)
     q_prev[0] = 0.0
 
-    df = df.copy()
+    if copy:
+        df = df.copy()
     df["cumulative_flow"] = np.cumsum((q_prev + q) * dt_days / 2.0)
     return df
 
@@ -80,6 +86,8 @@ def calculate_cumulative(df: pd.DataFrame) -> pd.DataFrame:
 def calculate_purge_loss(
     df: pd.DataFrame,
     cfg: PurgeLossConfig = DEFAULT_PURGE,
+    *,
+    copy: bool = True,
 ) -> pd.DataFrame:
     """
     Потери газа при продувках (стравливание в атмосферу).
@@ -88,6 +96,7 @@ def calculate_purge_loss(
     газ стравливается через штуцер.
 
     Добавляет: purge_flag, purge_loss_per_min, cumulative_purge_loss.
+    copy=False — колонки добавляются в переданный df на месте.
     """
     wh = df["p_tube"].values.astype(float)
     lp = df["p_line"].values.astype(float)
@@ -118,7 +127,8 @@ def calculate_purge_loss(
     # Обнуляем если нет продувки или ΔP ≤ 0
     loss_per_min = np.where(is_purge & (delta_p > 0), loss_per_min, 0.0)
 
-    df = df.copy()
+    if copy:
+        df = df.copy()
     df["purge_flag"] = is_purge.astype(int)
     df["purge_loss_per_min"] = loss_per_min
 
@@ -24,6 +24,8 @@ DEFAULT_MAX_FILL_MIN = 20
 def clean_pressure(
     df: pd.DataFrame,
     max_fill_min: int = DEFAULT_MAX_FILL_MIN,
+    *,
+    copy: bool = True,
 ) -> pd.DataFrame:
     """
     Базовая очистка давления + заполнение коротких пропусков.
@@ -41,8 +43,11 @@ def clean_pressure(
         длиннее — остаются NaN. ``0`` или меньше → без лимита (историческое
         поведение: ffill/bfill заполняет всё). По умолчанию
         ``DEFAULT_MAX_FILL_MIN`` (20). Регулируется в дашборде.
+    copy : bool
+        ``False`` — очистка на месте в переданном df (без копии кадра).
     """
-    df = df.copy()
+    if copy:
+        df = df.copy()
     for col in ("p_tube", "p_line"):
         if col not in df.columns:
             continue
@@ -51,14 +56,19 @@ def clean_pressure(
 
     if max_fill_min is None or max_fill_min <= 0:
         # Без лимита — историческое поведение (заполнить любую дыру).
-        return df.ffill().bfill()
+        df.ffill(inplace=True)
+        df.bfill(inplace=True)
+        return df
 
     # Интерполяция только КОРОТКИХ внутренних дыр (≤ max_fill_min точек ≈ минут
     # при поминутном шаге). limit_area="inside" не трогает края.
     method = "time" if isinstance(df.index, pd.DatetimeIndex) else "linear"
-    df = df.interpolate(method=method, limit=int(max_fill_min), limit_area="inside")
+    df.interpolate(
+        method=method, limit=int(max_fill_min), limit_area="inside", inplace=True,
+    )
     # Края — короткий ffill/bfill в пределах того же лимита; длинные хвосты NaN.
-    df = df.ffill(limit=int(max_fill_min)).bfill(limit=int(max_fill_min))
+    df.ffill(limit=int(max_fill_min), inplace=True)
+    df.bfill(limit=int(max_fill_min), inplace=True)
     return df
 
 
@@ -67,10 +77,13 @@ def smooth_pressure(
     window: int = 17,
     polyorder: int = 3,
     passes: int = 2,
+    *,
+    copy: bool = True,
 ) -> pd.DataFrame:
     """
     Фильтр Савицкого-Голая (двойной проход).
     Сохраняет оригинальные данные в p_tube_raw / p_line_raw.
+    copy=False — колонки меняются в переданном df на месте.
 
     Требует scipy. Если scipy не установлен — возвращает df без изменений.
     """
@@ -79,7 +92,8 @@ def smooth_pressure(
     except ImportError:
         return df
 
-    df = df.copy()
+    if copy:
+        df = df.copy()
 
     for col in ("p_tube", "p_line"):
         if col not in df.columns:
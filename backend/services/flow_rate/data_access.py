@@ -52,6 +52,47 @@ def get_pressure_data(
     return df
 
 
+def get_pressure_data_many(
+    well_ids: list[int],
+    start: str,
+    end: str,
+) -> dict[int, pd.DataFrame]:
+    """
+    pressure_raw нескольких скважин одним запросом.
+
+    Returns
+    -------
+    {well_id: DataFrame} — кадры как у get_pressure_data (колонки
+    [p_tube, p_line], индекс measured_at); пустой кадр для скважин без данных.
+    """
+    query = text("""
+        SELECT well_id, measured_at, p_tube, p_line
+        FROM pressure_raw
+        WHERE well_id = ANY(:well_ids)
+          AND measured_at BETWEEN :start AND :end
+          AND (p_tube IS NOT NULL OR p_line IS NOT NULL)
+        ORDER BY well_id, measured_at
+    """)
+    ids = sorted({int(w) for w in well_ids})
+    with pg_engine.connect() as conn:
+        df = pd.read_sql(
+            query, conn,
+            params={"well_ids": ids, "start": start, "end": end},
+            parse_dates=["measured_at"],
+            index_col="measured_at",
+        )
+    out = {
+        int(wid): part[["p_tube", "p_line"]]
+        for wid, part in df.groupby("well_id", sort=False)
+    }
+    empty = df[["p_tube", "p_line"]].iloc[0:0]
+    log.info(
+        "pressure_raw: %d wells, period %s..%s → %d rows",
+        len(ids), start, end, len(df),
+    )
+    return {wid: out.get(wid, empty.copy()) for wid in ids}
+
+
 def get_choke_mm(well_id: int) -> Optional[float]:
     """
     Диаметр штуцера (мм) из well_construction.
@@ -175,3 +216,21 @@ def list_wells_with_pressure(days: int = 7) -> list[dict]:
         {"id": r[0], "number": r[1], "name": r[2], "current_status": r[3]}
         for r in rows
     ]
+
+
+def flow_data_version(well_id: int) -> tuple:
+    """
+    Версия входных данных compute_full_flow (для ключей кэшей производных).
+
+    Новое давление меняет pressure_latest.updated_at, правка масок —
+    revision индекса масок. Прочие изменения (события, штуцер) ловит TTL
+    кэша-потребителя.
+    """
+    from backend.services.pressure_mask_service import get_mask_index
+
+    with pg_engine.connect() as conn:
+        updated_at = conn.execute(
+            text("SELECT updated_at FROM pressure_latest WHERE well_id = :w"),
+            {"w": well_id},
+        ).scalar()
+    return updated_at, get_mask_index(well_id).revision
@@ -21,6 +21,10 @@ Pipeline:
 
 Возвращает {df, summary, downtime_periods, purge_cycles}.
 DataFrame `df` — поминутные точки ПОСЛЕ всех преобразований; индекс — Кунградское время.
+
+Шаги 2–12 вынесены в `run_flow_pipeline` (без БД): этапы работают на одном
+рабочем кадре на месте (`copy=False`), без ~8 копий кадра за вызов.
+`compact=True` — результат в MinuteFrame (float32, см. minute_frame.py).
 """
 from __future__ import annotations
 
@@ -49,6 +53,7 @@ def compute_full_flow(
     critical_ratio: float = 0.5,
     exclude_periods: str = "",
     dp_threshold: float = 0.1,
+    compact: bool = False,
 ) -> dict:
     """
     Полный расчёт дебита для одной скважины за период.
@@ -65,6 +70,10 @@ def compute_full_flow(
         Порог заполнения пропусков давления (минут). Короткие дыри
         интерполируются, длиннее — остаются NaN. По умолчанию 20. См.
         clean_pressure. Регулируется в дашборде (страница скважины).
+    compact : bool
+        Вернуть результат в компактном виде: ключ ``frame`` —
+        MinuteFrame (float32), ``df`` — pandas-вид на его массивы.
+        Для потребителей, удерживающих много кадров (отчёты, кэши).
 
     Возвращает
     ----------
@@ -79,6 +88,7 @@ def compute_full_flow(
       - downtime_periods : pd.DataFrame — найденные периоды простоев
       - purge_cycles : list — обнаруженные циклы продувок
       - data_points : int
+      - frame : MinuteFrame — только при compact=True
 
     Бросает
     -------
@@ -91,19 +101,6 @@ def compute_full_flow(
         get_choke_mm,
         get_purge_events,
     )
-    from backend.services.flow_rate.cleaning import clean_pressure, smooth_pressure
-    from backend.services.flow_rate.calculator import (
-        calculate_flow_rate,
-        calculate_cumulative,
-        calculate_purge_loss,
-    )
-    from backend.services.flow_rate.downtime import detect_downtime_periods
-    from backend.services.flow_rate.summary import build_summary
-    from backend.services.flow_rate.config import FlowRateConfig
-    from backend.services.flow_rate.purge_detector import (
-        PurgeDetector,
-        recalculate_purge_loss_with_cycles,
-    )
 
     # Нормализация входных дат к ISO-строкам
     if isinstance(dt_start, datetime):
@@ -130,32 +127,101 @@ def compute_full_flow(
             f"Проверьте таблицу well_construction."
         )
 
-    # 2. Очистка + заполнение коротких пропусков (≤ max_fill_min мин)
-    df = clean_pressure(df, max_fill_min=max_fill_min)
-
-    # 3. Verified-маски (ДО сдвига UTC → Кунград)
+    # Маски (verified + неверифицированные активные) для шага 3
+    masks: list = []
     try:
-        from backend.services.pressure_mask_service import (
-            load_active_masks, apply_masks as _apply_masks,
-        )
+        from backend.services.pressure_mask_service import load_active_masks
         ms = datetime.fromisoformat(dt_start_iso) if isinstance(dt_start_iso, str) else dt_start_iso
         me = datetime.fromisoformat(dt_end_iso) if isinstance(dt_end_iso, str) else dt_end_iso
         masks = load_active_masks(well_id, ms, me)
-        if masks:
-            df, _mc = _apply_masks(df, masks)
+    except Exception as e:
+        log.warning("[full_pipeline] failed to load pressure masks: %s", e)
+
+    events_df = get_purge_events(well_id, dt_start_iso, dt_end_iso)
+
+    # get_pressure_data вернул свежий кадр — конвейер им владеет, копии не нужны.
+    return run_flow_pipeline(
+        df, choke,
+        masks=masks,
+        events_df=events_df,
+        well_id=well_id,
+        smooth=smooth,
+        max_fill_min=max_fill_min,
+        multiplier=multiplier,
+        C1=C1, C2=C2, C3=C3,
+        critical_ratio=critical_ratio,
+        exclude_periods=exclude_periods,
+        dp_threshold=dp_threshold,
+        compact=compact,
+        copy=False,
+    )
+
+
+def run_flow_pipeline(
+    df: pd.DataFrame,
+    choke: float,
+    *,
+    masks: list | None = None,
+    events_df: pd.DataFrame | None = None,
+    well_id: int = 0,
+    smooth: bool = True,
+    max_fill_min: int = DEFAULT_MAX_FILL_MIN,
+    multiplier: float = 4.1,
+    C1: float = 2.919,
+    C2: float = 4.654,
+    C3: float = 286.95,
+    critical_ratio: float = 0.5,
+    exclude_periods: str = "",
+    dp_threshold: float = 0.1,
+    compact: bool = False,
+    copy: bool = True,
+) -> dict:
+    """
+    Шаги 2–12 конвейера над уже загруженными данными (без обращений к БД).
+
+    df — сырые точки [p_tube, p_line], индекс UTC. Этапы работают на ОДНОМ
+    рабочем кадре на месте (copy=False у каждого этапа); copy=True (дефолт)
+    делает одну копию входного df на входе, чтобы не менять кадр вызывающего.
+    Формат результата — как у compute_full_flow.
+    """
+    from backend.services.flow_rate.cleaning import clean_pressure, smooth_pressure
+    from backend.services.flow_rate.calculator import (
+        calculate_flow_rate,
+        calculate_cumulative,
+        calculate_purge_loss,
+    )
+    from backend.services.flow_rate.downtime import detect_downtime_periods
+    from backend.services.flow_rate.summary import build_summary
+    from backend.services.flow_rate.config import FlowRateConfig
+    from backend.services.flow_rate.purge_detector import (
+        PurgeDetector,
+        recalculate_purge_loss_with_cycles,
+    )
+
+    if copy:
+        df = df.copy()
+
+    # 2. Очистка + заполнение коротких пропусков (≤ max_fill_min мин)
+    df = clean_pressure(df, max_fill_min=max_fill_min, copy=False)
+
+    # 3. Маски (ДО сдвига UTC → Кунград)
+    if masks:
+        try:
+            from backend.services.pressure_mask_service import apply_masks as _apply_masks
+            df, _mc = _apply_masks(df, masks, copy=False)
             log.info(
                 "[full_pipeline] well=%d applied %d pressure masks, %d points",
                 well_id, len(masks), _mc,
             )
-    except Exception as e:
-        log.warning("[full_pipeline] failed to apply pressure masks: %s", e)
+        except Exception as e:
+            log.warning("[full_pipeline] failed to apply pressure masks: %s", e)
 
     # 4. UTC → Кунград (+5h) для отображения и согласования с events
     df.index = df.index + timedelta(hours=5)
 
     # 5. Сглаживание (опционально)
     if smooth:
-        df = smooth_pressure(df)
+        df = smooth_pressure(df, copy=False)
 
     # 6. Расчёт дебита
     cfg = FlowRateConfig(
@@ -163,25 +229,24 @@ def compute_full_flow(
         C1=C1, C2=C2, C3=C3,
         critical_ratio=critical_ratio,
     )
-    df = calculate_flow_rate(df, choke, cfg)
+    df = calculate_flow_rate(df, choke, cfg, copy=False)
 
     # 7. Предварительный расчёт потерь
-    df = calculate_purge_loss(df)
+    df = calculate_purge_loss(df, copy=False)
 
     # 8. Детекция продувок
     exclude_ids = set()
     if exclude_periods:
         exclude_ids = {s.strip() for s in exclude_periods.split(",") if s.strip()}
 
-    events_df = get_purge_events(well_id, dt_start_iso, dt_end_iso)
     detector = PurgeDetector()
     purge_cycles = detector.detect(df, events_df, exclude_ids)
 
     # 9. Пересчёт потерь только в фазах venting
-    df = recalculate_purge_loss_with_cycles(df, purge_cycles)
+    df = recalculate_purge_loss_with_cycles(df, purge_cycles, copy=False)
 
     # 10. Накопленный дебит
-    df = calculate_cumulative(df)
+    df = calculate_cumulative(df, copy=False)
 
     # 11. Простои: (dp < dp_threshold) OR purge_flag — единое условие.
     periods = detect_downtime_periods(df, dp_threshold=dp_threshold, include_purge=True)
@@ -196,7 +261,7 @@ def compute_full_flow(
     df["flow_rate"] = np.where(downtime_mask, 0.0, df["flow_rate"].values)
 
     # 11b. Пересчитать накопленный дебит после обнуления.
-    df = calculate_cumulative(df)
+    df = calculate_cumulative(df, copy=False)
 
     # 12. Сводка по точкам
     summary = build_summary(
@@ -204,7 +269,7 @@ def compute_full_flow(
         dp_threshold=dp_threshold,
     )
 
-    return {
+    result = {
         "df": df,
         "summary": summary,
         "downtime_periods": periods,
@@ -212,6 +277,12 @@ def compute_full_flow(
         "data_points": len(df),
         "choke_mm": choke,
     }
+    if compact:
+        from backend.services.flow_rate.minute_frame import MinuteFrame
+        frame = MinuteFrame.from_frame(df)
+        result["frame"] = frame
+        result["df"] = frame.to_frame()
+    return result
 
 
 def build_chart_payload(
@@ -0,0 +1,169 @@
+"""
+Компактное поминутное представление данных дебитного тракта.
+
+`MinuteFrame` держит ОДИН массив времени (int64, нс от эпохи) и колонки
+float32. Накопительные колонки (cumulative_*) хранятся во float64: сумма
+по году поминутных точек во float32 теряет точность (~1e-4 отн.).
+
+Зачем: каждый этап flow_rate исторически делал `df = df.copy()`, и кадр
+float64 из ~10 колонок дублировался ~8 раз за вызов compute_full_flow.
+Теперь этапы принимают `copy=False` и меняют рабочий кадр на месте, а
+результат хранится в MinuteFrame (вдвое меньше памяти на удерживаемых
+кадрах: кэши, отчёты с десятками скважин).
+
+Для существующих потребителей — `to_frame()`: pandas-вид на те же массивы
+(без копирования колонок).
+
+Использование:
+    mf = MinuteFrame.from_frame(df)
+    mf["flow_rate"] = q                 # приводится к float32 на месте
+    view = mf.to_frame()                # pd.DataFrame, индекс DatetimeIndex
+    snapshot = mf.copy()                # явная копия — только по запросу
+"""
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+# Колонки-накопители: во float32 сумма за год «плывёт» — храним float64.
+ACCUMULATOR_COLUMNS = frozenset({"cumulative_flow", "cumulative_purge_loss"})
+
+# Флаги — компактнее всего в int8.
+FLAG_COLUMNS = frozenset({"purge_flag"})
+
+
+def _column_dtype(name: str, dtype: np.dtype) -> np.dtype:
+    if name in ACCUMULATOR_COLUMNS:
+        return np.dtype(np.float64)
+    if name in FLAG_COLUMNS:
+        return np.dtype(np.int8)
+    return dtype
+
+
+class MinuteFrame:
+    """Поминутный кадр: int64-время + словарь колонок float32."""
+
+    __slots__ = ("ts", "_cols", "dtype")
+
+    def __init__(
+        self,
+        ts: np.ndarray,
+        columns: dict[str, np.ndarray] | None = None,
+        dtype: np.dtype | type = np.float32,
+    ):
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.dtype = np.dtype(dtype)
+        self._cols: dict[str, np.ndarray] = {}
+        for name, values in (columns or {}).items():
+            self[name] = values
+
+    # ─────────────── Конструирование ───────────────
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        columns: Iterable[str] | None = None,
+        dtype: np.dtype | type = np.float32,
+    ) -> "MinuteFrame":
+        """Из pandas-кадра с DatetimeIndex. Нечисловые колонки пропускаются."""
+        idx = pd.DatetimeIndex(df.index)
+        if idx.tz is not None:
+            idx = idx.tz_convert("UTC").tz_localize(None)
+        ts = idx.as_unit("ns").asi8
+        names = list(columns) if columns is not None else list(df.columns)
+        cols = {}
+        for name in names:
+            if name not in df.columns:
+                continue
+            s = df[name]
+            if not (pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s)):
+                continue
+            cols[name] = s.to_numpy()
+        return cls(ts, cols, dtype=dtype)
+
+    def copy(self) -> "MinuteFrame":
+        """Явная глубокая копия (этапы конвейера сами НЕ копируют)."""
+        out = MinuteFrame(self.ts.copy(), dtype=self.dtype)
+        out._cols = {k: v.copy() for k, v in self._cols.items()}
+        return out
+
+    # ─────────────── Доступ к колонкам ───────────────
+
+    def __len__(self) -> int:
+        return int(self.ts.size)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._cols
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._cols)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._cols[name]
+
+    def __setitem__(self, name: str, values) -> None:
+        """Записать колонку. Существующая колонка перезаписывается на месте."""
+        target_dtype = _column_dtype(name, self.dtype)
+        arr = np.asarray(values)
+        if arr.ndim == 0:
+            arr = np.full(self.ts.size, arr, dtype=target_dtype)
+        if arr.shape != self.ts.shape:
+            raise ValueError(
+                f"MinuteFrame: колонка {name!r} длины {arr.size}, "
+                f"ожидается {self.ts.size}"
+            )
+        current = self._cols.get(name)
+        if current is not None and current.dtype == target_dtype:
+            current[...] = arr
+        else:
+            self._cols[name] = arr.astype(target_dtype, copy=True)
+
+    def __delitem__(self, name: str) -> None:
+        del self._cols[name]
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._cols)
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self.ts.view("M8[ns]"))
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.ts.nbytes + sum(v.nbytes for v in self._cols.values()))
+
+    # ─────────────── Срезы ───────────────
+
+    def slice_time(self, start, end) -> "MinuteFrame":
+        """Срез [start; end] по времени через searchsorted — вид без копии."""
+        lo = int(np.searchsorted(self.ts, pd.Timestamp(start).value, side="left"))
+        hi = int(np.searchsorted(self.ts, pd.Timestamp(end).value, side="right"))
+        out = MinuteFrame(self.ts[lo:hi], dtype=self.dtype)
+        out._cols = {k: v[lo:hi] for k, v in self._cols.items()}
+        return out
+
+    # ─────────────── pandas-вид ───────────────
+
+    def to_frame(self, columns: Iterable[str] | None = None) -> pd.DataFrame:
+        """
+        pandas-вид для существующих потребителей.
+
+        Колонки не копируются (каждая — отдельный блок). Запись в вид
+        меняет MinuteFrame; для независимого кадра — `.to_frame().copy()`.
+        """
+        names = list(columns) if columns is not None else list(self._cols)
+        return pd.DataFrame(
+            {n: self._cols[n] for n in names},
+            index=self.index,
+            copy=False,
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"MinuteFrame(rows={len(self)}, columns={self.columns}, "
+            f"nbytes={self.nbytes})"
+        )
@@ -680,6 +680,8 @@ def recalculate_purge_loss_with_cycles(
     df: pd.DataFrame,
     cycles: list[PurgeCycle],
     purge_loss_cfg: PurgeLossConfig | None = None,
+    *,
+    copy: bool = True,
 ) -> pd.DataFrame:
     """
     Корректный учёт продувок: обнуление flow_rate + пересчёт потерь.
@@ -692,13 +694,15 @@ def recalculate_purge_loss_with_cycles(
     3. purge_flag = 1 на весь цикл — скважина не работает
 
     Если нет обнаруженных циклов — оставляем текущую логику.
+    copy=False — колонки переписываются в переданном df на месте.
     """
     active_cycles = [c for c in cycles if not c.excluded]
 
     if not active_cycles:
         return df
 
-    df = df.copy()
+    if copy:
+        df = df.copy()
     cfg = purge_loss_cfg or DEFAULT_PURGE
 
     # ── Маски ──
@@ -1,14 +1,13 @@
 """
 Генерация LaTeX PDF-отчёта по сценарию анализа дебита.
 
-Переиспользует xelatex-компиляцию из DocumentGenerator,
-но с собственным шаблоном и контекстом.
+Компиляция — общий latex_compile_service,
+шаблон и контекст — собственные.
 """
 from __future__ import annotations
 
 import logging
 import os
-import subprocess
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
@@ -17,7 +16,6 @@ from jinja2 import Environment, FileSystemLoader
 from sqlalchemy.orm import Session
 
 from backend.models.flow_analysis import FlowScenario, FlowResult, FlowCorrection
-from backend.utils.latex import find_xelatex as _find_xelatex
 
 log = logging.getLogger(__name__)
 
@@ -52,42 +50,11 @@ def _get_latex_env() -> Environment:
 
 
 def _compile_latex(tex_source: str, base_name: str) -> Path:
-    """Компиляция LaTeX → PDF через xelatex (2 прохода)."""
-    _ensure_dirs()
-
-    tex_file = TEMP_DIR / f"{base_name}.tex"
-    tex_file.write_text(tex_source, encoding="utf-8")
-
-    for pass_num in range(2):
-        result = subprocess.run(
-            [_find_xelatex(), "-interaction=nonstopmode",
-             f"-output-directory={TEMP_DIR}", str(tex_file)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=str(TEMP_DIR),
-        )
-        if result.returncode != 0:
-            stderr = result.stderr.decode("utf-8", errors="ignore")
-            stdout = result.stdout.decode("utf-8", errors="ignore")
-            # Ищем конкретную ошибку в логе
-            log.error("xelatex pass %d failed:\n%s", pass_num + 1, stderr[-500:])
-            raise RuntimeError(f"xelatex compilation failed (pass {pass_num + 1})")
-
-    temp_pdf = TEMP_DIR / f"{base_name}.pdf"
-    final_pdf = PDF_DIR / f"{base_name}.pdf"
+    """Компиляция LaTeX → PDF через latex_compile_service."""
+    from backend.services.latex_compile_service import compile_latex
 
-    if not temp_pdf.exists():
-        raise FileNotFoundError(f"PDF not created: {temp_pdf}")
-
-    temp_pdf.rename(final_pdf)
-
-    # Cleanup temp files
-    for ext in (".aux", ".log", ".out", ".tex"):
-        f = TEMP_DIR / f"{base_name}{ext}"
-        if f.exists():
-            f.unlink()
-
-    return final_pdf
+    _ensure_dirs()
+    return compile_latex(tex_source, base_name, PDF_DIR, work_root=TEMP_DIR).pdf_path
 
 
 def generate_flow_report(
@@ -16,8 +16,6 @@ from pathlib import Path
 
 from jinja2 import Environment, FileSystemLoader
 
-from backend.utils.latex import find_xelatex as _find_xelatex
-
 log = logging.getLogger(__name__)
 
 LATEX_TEMPLATES_DIR = Path("backend/templates/latex")
@@ -54,45 +52,11 @@ def _get_latex_env() -> Environment:
 
 
 def _compile_latex(tex_source: str, base_name: str) -> Path:
-    import subprocess
-    _ensure_dirs()
+    """Компиляция LaTeX → PDF через latex_compile_service."""
+    from backend.services.latex_compile_service import compile_latex
 
-    abs_temp = TEMP_DIR.resolve()
-    tex_file = abs_temp / f"{base_name}.tex"
-    tex_file.write_text(tex_source, encoding="utf-8")
-
-    for pass_num in range(2):
-        result = subprocess.run(
-            [_find_xelatex(), "-interaction=nonstopmode",
-             f"-output-directory={abs_temp}", str(tex_file)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            cwd=str(abs_temp),
-        )
-        if result.returncode != 0:
-            stderr = result.stderr.decode("utf-8", errors="ignore")
-            stdout = result.stdout.decode("utf-8", errors="ignore")
-            # Ищем строки с ошибками в логе
-            error_lines = [l for l in stdout.split('\n') if '!' in l or 'Error' in l]
-            log.error("xelatex pass %d failed. Errors:\n%s\nStderr:\n%s",
-                      pass_num + 1, '\n'.join(error_lines[-20:]), stderr[-500:])
-            # Не удаляем .tex для отладки
-            raise RuntimeError(f"xelatex compilation failed (pass {pass_num + 1})")
-
-    temp_pdf = abs_temp / f"{base_name}.pdf"
-    final_pdf = PDF_DIR.resolve() / f"{base_name}.pdf"
-
-    if not temp_pdf.exists():
-        raise FileNotFoundError(f"PDF not created: {temp_pdf}")
-
-    temp_pdf.rename(final_pdf)
-
-    for ext in (".aux", ".log", ".out", ".tex"):
-        f = abs_temp / f"{base_name}{ext}"
-        if f.exists():
-            f.unlink()
-
-    return final_pdf
+    _ensure_dirs()
+    return compile_latex(tex_source, base_name, PDF_DIR, work_root=TEMP_DIR).pdf_path
 
 
 def _fmt(val, decimals=3) -> str:
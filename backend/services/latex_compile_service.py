@@ -0,0 +1,258 @@
+"""
+latex_compile_service.py — единая компиляция LaTeX → PDF (xelatex).
+
+Раньше каждый генератор (суточный/помесячный отчёт и отчёт об адаптации
+через daily_report_service._compile_latex, отчёты по дебиту и сегментам
+flow_rate, DocumentGenerator, акты в роутерах документов) сам запускал
+xelatex: всегда два прохода, в общем TEMP_DIR — параллельные сборки с
+одинаковым base_name затирали .aux/.log друг друга.
+
+Сервис:
+
+  • каждая компиляция — в своём рабочем каталоге (mkdtemp внутри
+    work_root); work_root остаётся в TEXINPUTS, так что относительные
+    \\includegraphics / \\input, рассчитанные на старый cwd, находятся;
+  • проходы — по необходимости: следующий запускается, только если
+    изменились .aux/.toc/.out/.lof/.lot (без служебных строк \\relax и
+    \\@abspage@last) или лог просит перезапуск («Rerun to get …»,
+    «Label(s) may have changed»); не больше max_passes. Документ без
+    ссылок и оглавления собирается за один проход;
+  • ограниченный пул: одновременно не больше DEFAULT_WORKERS процессов
+    xelatex на процесс приложения; compile_latex_async отдаёт Future;
+  • время каждого прохода — в CompileResult.passes и в логе;
+  • при ошибке рабочий каталог копируется в /tmp/xelatex_fail_<ts>_<имя>
+    (.tex, .log, stdout/stderr) — для постмортема.
+
+Предкомпилированный формат преамбулы (mylatexformat) не используется:
+XeTeX не сохраняет в формат шрифты, загруженные fontspec, а именно они —
+основная стоимость преамбулы шаблонов.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from backend.services.build_profiler import profiled
+from backend.utils.latex import find_xelatex
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 3
+DEFAULT_MAX_PASSES = 3
+
+# Вспомогательные файлы, которые xelatex читает на следующем проходе.
+_RERUN_EXTS = (".aux", ".toc", ".out", ".lof", ".lot")
+# Служебные строки .aux, не влияющие на вёрстку следующего прохода.
+_AUX_NOISE = re.compile(r"^\\relax\s*$|^\\gdef\s*\\@abspage@last\{\d+\}\s*$")
+_RERUN_HINTS = (
+    "Rerun to get",
+    "Label(s) may have changed",
+    "Rerun LaTeX",
+)
+
+_executor = ThreadPoolExecutor(max_workers=DEFAULT_WORKERS, thread_name_prefix="xelatex")
+
+
+class LatexCompileError(RuntimeError):
+    """xelatex не собрал PDF.
+
+    pass_num — номер упавшего прохода (с 1); errors — строки «! …» из .log
+    с контекстом; output — stdout xelatex; debug_dir — копия рабочего
+    каталога (или None).
+    """
+
+    def __init__(self, message: str, *, pass_num: int, errors: list[str],
+                 output: str = "", stderr: str = "", debug_dir: Optional[Path] = None):
+        super().__init__(message)
+        self.pass_num = pass_num
+        self.errors = errors
+        self.output = output
+        self.stderr = stderr
+        self.debug_dir = debug_dir
+
+
+@dataclass
+class CompileResult:
+    pdf_path: Path
+    passes: list[dict] = field(default_factory=list)   # [{pass, ms, returncode}]
+    total_ms: float = 0.0
+
+
+def _aux_state(workdir: Path, jobname: str) -> str:
+    """Отпечаток файлов, от которых зависит следующий проход."""
+    h = hashlib.sha1()
+    for ext in _RERUN_EXTS:
+        f = workdir / f"{jobname}{ext}"
+        if not f.exists():
+            continue
+        lines = f.read_text(encoding="utf-8", errors="ignore").splitlines()
+        if ext == ".aux":
+            lines = [ln for ln in lines if not _AUX_NOISE.match(ln)]
+        if lines:
+            h.update(ext.encode())
+            h.update("\n".join(lines).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _log_errors(log_text: str) -> list[str]:
+    """Строки «! …» / Error из .log с 5 строками контекста (не больше ~30)."""
+    lines = log_text.split("\n")
+    out: list[str] = []
+    for i, line in enumerate(lines):
+        if line.startswith("!") or "Error" in line:
+            out.extend(lines[i:i + 6])
+            if len(out) > 30:
+                break
+    return out
+
+
+def _dump_debug(workdir: Path, jobname: str, stdout: str, stderr: str) -> Optional[Path]:
+    ts = time.strftime("%Y%m%d_%H%M%S")
+    debug_dir = Path(tempfile.gettempdir()) / f"xelatex_fail_{ts}_{jobname}"
+    try:
+        shutil.copytree(workdir, debug_dir, dirs_exist_ok=True)
+        (debug_dir / "stdout.txt").write_text(stdout, encoding="utf-8")
+        (debug_dir / "stderr.txt").write_text(stderr, encoding="utf-8")
+        return debug_dir
+    except Exception:
+        log.exception("xelatex debug-dump failed")
+        return None
+
+
+@profiled("xelatex")
+def compile_latex(
+    tex_source: str,
+    jobname: str,
+    output_dir: str | Path,
+    *,
+    work_root: str | Path | None = None,
+    max_passes: int = DEFAULT_MAX_PASSES,
+    halt_on_error: bool = False,
+    tolerate_errors: bool = False,
+    timeout: float | None = None,
+) -> CompileResult:
+    """Собрать tex_source в output_dir/<jobname>.pdf (ждёт слот пула).
+
+    work_root — где создавать рабочий каталог (и что добавить в TEXINPUTS);
+    None → output_dir. tolerate_errors=True: ненулевой код xelatex при
+    созданном PDF — предупреждение, а не ошибка (nonstopmode).
+    """
+    return compile_latex_async(
+        tex_source, jobname, output_dir,
+        work_root=work_root, max_passes=max_passes, halt_on_error=halt_on_error,
+        tolerate_errors=tolerate_errors, timeout=timeout,
+    ).result()
+
+
+def compile_latex_async(
+    tex_source: str,
+    jobname: str,
+    output_dir: str | Path,
+    **kwargs,
+) -> "Future[CompileResult]":
+    """compile_latex в пуле: Future[CompileResult] (ошибка — LatexCompileError)."""
+    return _executor.submit(_compile, tex_source, jobname, output_dir, **kwargs)
+
+
+def _compile(
+    tex_source: str,
+    jobname: str,
+    output_dir: str | Path,
+    *,
+    work_root: str | Path | None = None,
+    max_passes: int = DEFAULT_MAX_PASSES,
+    halt_on_error: bool = False,
+    tolerate_errors: bool = False,
+    timeout: float | None = None,
+) -> CompileResult:
+    t_start = time.perf_counter()
+    output_dir = Path(output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    root = Path(work_root).resolve() if work_root is not None else output_dir
+    root.mkdir(parents=True, exist_ok=True)
+    workdir = Path(tempfile.mkdtemp(prefix=f"_latex_{jobname}_", dir=root))
+
+    tex_file = workdir / f"{jobname}.tex"
+    tex_file.write_text(tex_source, encoding="utf-8")
+    pdf_file = workdir / f"{jobname}.pdf"
+    env = dict(os.environ)
+    env["TEXINPUTS"] = f".{os.pathsep}{root}{os.pathsep}{env.get('TEXINPUTS', '')}"
+    cmd = [find_xelatex(), "-interaction=nonstopmode"]
+    if halt_on_error:
+        cmd.append("-halt-on-error")
+    cmd += [f"-jobname={jobname}", tex_file.name]
+
+    passes: list[dict] = []
+    try:
+        state = _aux_state(workdir, jobname)
+        for pass_num in range(1, max(1, max_passes) + 1):
+            t0 = time.perf_counter()
+            try:
+                result = subprocess.run(
+                    cmd, cwd=str(workdir), env=env, timeout=timeout,
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                )
+            except subprocess.TimeoutExpired:
+                debug_dir = _dump_debug(workdir, jobname, "", "timeout")
+                raise LatexCompileError(
+                    f"xelatex timeout (pass {pass_num}, {timeout} s). Debug: {debug_dir}",
+                    pass_num=pass_num, errors=[], debug_dir=debug_dir,
+                )
+            passes.append({"pass": pass_num, "returncode": result.returncode,
+                           "ms": round((time.perf_counter() - t0) * 1000, 1)})
+            stdout = result.stdout.decode("utf-8", errors="ignore")
+            stderr = result.stderr.decode("utf-8", errors="ignore")
+            log_file = workdir / f"{jobname}.log"
+            log_text = (log_file.read_text(encoding="utf-8", errors="ignore")
+                        if log_file.exists() else "")
+
+            if result.returncode != 0:
+                if not (tolerate_errors and pdf_file.exists()):
+                    errors = _log_errors(log_text)
+                    debug_dir = _dump_debug(workdir, jobname, stdout, stderr)
+                    log.error(
+                        "xelatex pass %d failed (%s). Debug saved to %s\n"
+                        "LATEX ERRORS:\n%s\nSTDERR: %s\nSTDOUT (last 2000): %s",
+                        pass_num, jobname, debug_dir,
+                        "\n".join(errors) or "(none in .log)",
+                        stderr[-500:], stdout[-2000:],
+                    )
+                    raise LatexCompileError(
+                        f"xelatex compilation failed (pass {pass_num}). "
+                        f"Debug: {debug_dir}\nErrors:\n"
+                        + ("\n".join(errors[:10]) or stdout[-500:]),
+                        pass_num=pass_num, errors=errors, output=stdout,
+                        stderr=stderr, debug_dir=debug_dir,
+                    )
+                log.warning("xelatex pass %d returned non-zero but PDF exists (warnings)",
+                            pass_num)
+
+            new_state = _aux_state(workdir, jobname)
+            rerun = new_state != state or any(h in log_text for h in _RERUN_HINTS)
+            state = new_state
+            if not rerun:
+                break
+
+        if not pdf_file.exists():
+            raise FileNotFoundError(f"PDF not created: {pdf_file}")
+        final_pdf = output_dir / f"{jobname}.pdf"
+        shutil.move(str(pdf_file), str(final_pdf))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    total_ms = round((time.perf_counter() - t_start) * 1000, 1)
+    log.info(
+        "xelatex %s: %d pass(es) %s, total %.0f ms", jobname, len(passes),
+        "/".join(f"{p['ms']:.0f}" for p in passes), total_ms,
+    )
+    return CompileResult(pdf_path=final_pdf, passes=passes, total_ms=total_ms)
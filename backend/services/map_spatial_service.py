@@ -0,0 +1,266 @@
+"""
+map_spatial_service.py — пространственный индекс скважин и объектов карты
+(антенн): матрицы расстояний, ближайшие и объекты в радиусе.
+
+Раньше расстояния считались по парам: скважина → антенна в браузере
+(haversineMeters) с записью результата в well_antenna_distance, соседи
+скважины в отчёте — циклом по всем скважинам с math-haversine. Записанные
+расстояния не обновлялись при переносе скважины или антенны.
+
+SpatialIndex строится один раз на набор координат:
+
+  • координаты скважин и map_object — массивы numpy; проекция pyproj в
+    азимутальную равнопромежуточную (AEQD) с центром в центре месторождения,
+    на ней — KD-дерево (scipy cKDTree) по каждому слою: well, object,
+    antenna (объекты с icon_type = "antenna");
+  • nearest / within — кандидаты из дерева, итоговое расстояние и порядок —
+    по haversine (как инструмент измерения на карте);
+  • distance_matrix_m — полная матрица расстояний векторно (haversine или
+    геодезическая WGS84 через pyproj.Geod);
+  • get_index(db) читает только (id, lat, lon) и сравнивает подпись
+    координат: индекс пересобирается лишь при их изменении (любой путь
+    правки — карта, карточка скважины, синхронизация); с sync=True
+    сохранённые well_antenna_distance обновляются, если ещё не пересчитаны
+    по текущим координатам (кто бы ни пересобрал индекс).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6_371_000.0
+ANTENNA_ICON = "antenna"
+LAYERS = ("well", "object", "antenna")
+# Сохранённое расстояние обновляется, если разошлось больше чем на (м)
+STORED_TOLERANCE_M = 0.05
+
+_lock = threading.Lock()
+_cached: Optional["SpatialIndex"] = None
+# Подпись координат, по которой последний раз пересчитаны well_antenna_distance
+_synced_signature: Optional[str] = None
+
+
+# ─── Векторные расстояния ─────────────────────────────────────────────
+
+def haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Расстояние по сфере (м); аргументы — скаляры или массивы (broadcast)."""
+    la1, lo1, la2, lo2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((la2 - la1) / 2) ** 2
+         + np.cos(la1) * np.cos(la2) * np.sin((lo2 - lo1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distance_matrix_m(lat_a, lon_a, lat_b, lon_b, *, method: str = "haversine") -> np.ndarray:
+    """Матрица (len(a), len(b)) расстояний в метрах.
+
+    method: "haversine" — сфера R = 6371 км (как на карте);
+            "geodesic"  — эллипсоид WGS84 (pyproj.Geod.inv).
+    """
+    lat_a, lon_a = np.asarray(lat_a, float)[:, None], np.asarray(lon_a, float)[:, None]
+    lat_b, lon_b = np.asarray(lat_b, float)[None, :], np.asarray(lon_b, float)[None, :]
+    if method == "haversine":
+        return haversine_m(lat_a, lon_a, lat_b, lon_b)
+    if method == "geodesic":
+        from pyproj import Geod
+
+        shape = np.broadcast_shapes(lat_a.shape, lat_b.shape)
+        if 0 in shape:
+            return np.zeros(shape)
+        _, _, dist = Geod(ellps="WGS84").inv(
+            np.broadcast_to(lon_a, shape).ravel(), np.broadcast_to(lat_a, shape).ravel(),
+            np.broadcast_to(lon_b, shape).ravel(), np.broadcast_to(lat_b, shape).ravel(),
+        )
+        return np.asarray(dist).reshape(shape)
+    raise ValueError(f"неизвестный метод расстояния: {method!r}")
+
+
+# ─── Индекс ───────────────────────────────────────────────────────────
+
+@dataclass
+class _Layer:
+    ids: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    meta: list[dict]
+    xy: np.ndarray
+    tree: Any = field(default=None)
+    pos: dict[int, int] = field(default_factory=dict)
+
+
+class SpatialIndex:
+    """Слои well / object / antenna: координаты, проекция и KD-деревья.
+
+    wells   — [(id, lat, lon, {"number", "name"})],
+    objects — [(id, lat, lon, {"name", "icon_type"})]; после сборки только
+    читается (безопасно из нескольких потоков).
+    """
+
+    def __init__(self, wells: Sequence[tuple], objects: Sequence[tuple], *, signature: str = ""):
+        from pyproj import Transformer
+        from scipy.spatial import cKDTree
+
+        self.signature = signature
+        lats = [p[1] for p in (*wells, *objects)]
+        lons = [p[2] for p in (*wells, *objects)]
+        lat0 = float(np.mean(lats)) if lats else 0.0
+        lon0 = float(np.mean(lons)) if lons else 0.0
+        self._proj = Transformer.from_crs(
+            "EPSG:4326",
+            f"+proj=aeqd +lat_0={lat0} +lon_0={lon0} +datum=WGS84 +units=m",
+            always_xy=True,
+        )
+        antennas = [p for p in objects if (p[3] or {}).get("icon_type") == ANTENNA_ICON]
+        self.layers: dict[str, _Layer] = {}
+        for kind, points in (("well", wells), ("object", objects), ("antenna", antennas)):
+            lat = np.array([p[1] for p in points], dtype=float)
+            lon = np.array([p[2] for p in points], dtype=float)
+            x, y = self._proj.transform(lon, lat)
+            xy = np.column_stack([np.atleast_1d(x), np.atleast_1d(y)]) if len(points) else np.zeros((0, 2))
+            ids = np.array([p[0] for p in points], dtype=np.int64)
+            self.layers[kind] = _Layer(
+                ids=ids, lat=lat, lon=lon, meta=[dict(p[3] or {}) for p in points], xy=xy,
+                tree=cKDTree(xy) if len(points) else None,
+                pos={int(i): n for n, i in enumerate(ids)},
+            )
+
+    def _layer(self, kind: str) -> _Layer:
+        if kind not in self.layers:
+            raise ValueError(f"неизвестный слой: {kind!r} (ожидается {', '.join(LAYERS)})")
+        return self.layers[kind]
+
+    def coords(self, kind: str, point_id: int) -> Optional[tuple[float, float]]:
+        layer = self._layer(kind)
+        n = layer.pos.get(int(point_id))
+        return None if n is None else (float(layer.lat[n]), float(layer.lon[n]))
+
+    def _rows(self, layer: _Layer, idx: np.ndarray, dist: np.ndarray) -> list[dict]:
+        order = np.argsort(dist, kind="stable")
+        return [
+            {"id": int(layer.ids[idx[o]]), **layer.meta[idx[o]],
+             "lat": float(layer.lat[idx[o]]), "lon": float(layer.lon[idx[o]]),
+             "distance_m": round(float(dist[o]), 1)}
+            for o in order
+        ]
+
+    def nearest(self, lat: float, lon: float, *, kind: str = "antenna", k: int = 1,
+                exclude_id: int | None = None) -> list[dict]:
+        """k ближайших точек слоя (по возрастанию расстояния)."""
+        layer = self._layer(kind)
+        n = len(layer.ids)
+        if layer.tree is None or k <= 0:
+            return []
+        # Запас кандидатов: порядок на проекции и по сфере может чуть расходиться
+        want = min(n, k + 4 + (exclude_id is not None))
+        x, y = self._proj.transform(lon, lat)
+        _, idx = layer.tree.query([x, y], k=want)
+        idx = np.atleast_1d(idx)
+        if exclude_id is not None:
+            idx = idx[layer.ids[idx] != exclude_id]
+        dist = haversine_m(lat, lon, layer.lat[idx], layer.lon[idx])
+        return self._rows(layer, idx, dist)[:k]
+
+    def within(self, lat: float, lon: float, radius_m: float, *, kind: str = "antenna",
+               exclude_id: int | None = None) -> list[dict]:
+        """Точки слоя в радиусе radius_m (по возрастанию расстояния)."""
+        layer = self._layer(kind)
+        if layer.tree is None or radius_m < 0:
+            return []
+        x, y = self._proj.transform(lon, lat)
+        idx = np.array(layer.tree.query_ball_point([x, y], r=radius_m * 1.01 + 1.0), dtype=np.int64)
+        if exclude_id is not None and len(idx):
+            idx = idx[layer.ids[idx] != exclude_id]
+        dist = haversine_m(lat, lon, layer.lat[idx], layer.lon[idx])
+        keep = dist <= radius_m
+        return self._rows(layer, idx[keep], dist[keep])
+
+    def matrix(self, kind_a: str = "well", kind_b: str = "antenna", *,
+               method: str = "haversine") -> np.ndarray:
+        a, b = self._layer(kind_a), self._layer(kind_b)
+        return distance_matrix_m(a.lat, a.lon, b.lat, b.lon, method=method)
+
+    @cached_property
+    def well_object_matrix(self) -> np.ndarray:
+        """Скважины × все объекты карты, м (считается один раз на индекс)."""
+        return self.matrix("well", "object")
+
+    def well_object_distance(self, well_id: int, object_id: int) -> Optional[float]:
+        i = self.layers["well"].pos.get(int(well_id))
+        j = self.layers["object"].pos.get(int(object_id))
+        if i is None or j is None:
+            return None
+        return round(float(self.well_object_matrix[i, j]), 1)
+
+
+# ─── Кэш процесса ─────────────────────────────────────────────────────
+
+def _load_points(db) -> tuple[list[tuple], list[tuple]]:
+    from backend.models.map_object import MapObject
+    from backend.models.wells import Well
+
+    wells = [
+        (r.id, float(r.lat), float(r.lon), {"number": str(r.number), "name": r.name})
+        for r in db.query(Well.id, Well.lat, Well.lon, Well.number, Well.name)
+        .filter(Well.lat.isnot(None), Well.lon.isnot(None)).order_by(Well.id)
+    ]
+    objects = [
+        (r.id, float(r.lat), float(r.lon), {"name": r.name, "icon_type": r.icon_type or "default"})
+        for r in db.query(MapObject.id, MapObject.lat, MapObject.lon, MapObject.name,
+                          MapObject.icon_type).order_by(MapObject.id)
+    ]
+    return wells, objects
+
+
+def _signature(wells: Sequence[tuple], objects: Sequence[tuple]) -> str:
+    h = hashlib.sha1()
+    for kind, points in (("w", wells), ("o", objects)):
+        for p in points:
+            h.update(f"{kind}{p[0]}:{p[1]:.7f}:{p[2]:.7f}:{sorted(p[3].items())};".encode())
+    return h.hexdigest()
+
+
+def get_index(db, *, sync: bool = False) -> SpatialIndex:
+    """Индекс текущих координат; пересборка — только при их изменении.
+
+    sync=True: если сохранённые well_antenna_distance ещё не пересчитаны по
+    текущим координатам — обновить их (коммит в db); для эндпоинтов карты.
+    """
+    global _cached, _synced_signature
+    wells, objects = _load_points(db)
+    sig = _signature(wells, objects)
+    with _lock:
+        if _cached is not None and _cached.signature == sig:
+            index = _cached
+        else:
+            index = SpatialIndex(wells, objects, signature=sig)
+            _cached = index
+            log.info("[map_spatial] index rebuilt: %d wells, %d objects", len(wells), len(objects))
+        need_sync = sync and _synced_signature != sig
+    if need_sync:
+        sync_stored_distances(db, index)
+        with _lock:
+            _synced_signature = sig
+    return index
+
+
+def sync_stored_distances(db, index: SpatialIndex) -> int:
+    """Пересчитать well_antenna_distance по текущим координатам; число обновлённых."""
+    from backend.models.well_antenna_distance import WellAntennaDistance
+
+    changed = 0
+    for row in db.query(WellAntennaDistance).all():
+        d = index.well_object_distance(row.well_id, row.map_object_id)
+        if d is not None and abs(d - (row.distance_m or 0.0)) > STORED_TOLERANCE_M:
+            row.distance_m = d
+            changed += 1
+    if changed:
+        db.commit()
+        log.info("[map_spatial] well_antenna_distance: %d rows updated", changed)
+    return changed
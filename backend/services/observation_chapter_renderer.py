@@ -19,6 +19,7 @@ NEW API:
     - stdlib html.escape, math, os
     - dataclasses
     - matplotlib через observation_chart_renderer (только при skip_figures=False)
+    - artifact_cache — файловый кэш LaTeX-фрагментов блоков и их PNG
     - структурный HTML, LaTeX text-mode
 """
 from __future__ import annotations
@@ -2386,11 +2387,15 @@ def render_observation_chapter_latex(
     *,
     output_dir: str = "backend/generated/observation_charts",
     skip_figures: bool = False,
+    use_cache: bool = True,
 ) -> str:
     r"""LaTeX fragment для вставки в adaptation_report.tex через Jinja2.
 
-    При skip_figures=False — генерирует PNG в output_dir и включает
-    \\includegraphics ссылки в LaTeX.
+    При skip_figures=False — генерирует PNG и включает \\includegraphics
+    ссылки в LaTeX. С use_cache фрагмент блока и его PNG берутся из
+    artifact_cache (ключ — snapshot/params/comment/title/статус + версия
+    рендереров): перерисовывается только изменённый блок, картинки лежат в
+    каталоге записи кэша. Без кэша — PNG в output_dir, как раньше.
     """
     parts = [r"\section*{Глава наблюдения}", ""]
     if not blocks:
@@ -2398,18 +2403,23 @@ def render_observation_chapter_latex(
         return "\n".join(parts)
 
     os.makedirs(output_dir, exist_ok=True)
+    cache = None
+    if use_cache and not skip_figures:
+        from backend.services import artifact_cache
+        if artifact_cache.enabled():
+            cache = artifact_cache
 
     for block in blocks:
-        ctx = RenderContext(
-            output_dir=output_dir,
-            block_id=block.get("block_id"),
-            title=block.get("title") or "",
-            block_status=block.get("block_status") or "ok",
-            skip_figures=skip_figures,
-        )
         try:
-            result = render_block(block, ctx)
-            parts.append(result.latex)
+            if cache is not None:
+                latex = cache.cached_text(
+                    _block_cache_key(block, cache),
+                    lambda out_dir, block=block: _render_block_latex(block, out_dir, False),
+                    relocate=_relocate_latex_paths,
+                )
+            else:
+                latex = _render_block_latex(block, output_dir, skip_figures)
+            parts.append(latex)
             parts.append("")
         except Exception as exc:
             block_id = block.get("block_id", "?")
@@ -2420,3 +2430,31 @@ def render_observation_chapter_latex(
             parts.append("")
 
     return "\n".join(parts)
+
+
+def _render_block_latex(block: dict, output_dir: str, skip_figures: bool) -> str:
+    ctx = RenderContext(
+        output_dir=output_dir,
+        block_id=block.get("block_id"),
+        title=block.get("title") or "",
+        block_status=block.get("block_status") or "ok",
+        skip_figures=skip_figures,
+    )
+    return render_block(block, ctx).latex
+
+
+def _block_cache_key(block: dict, cache: Any) -> str:
+    """Ключ LaTeX-фрагмента блока: всё, что читает render_block, + версии кода."""
+    from backend.services import observation_chart_renderer
+
+    payload = {
+        k: block.get(k)
+        for k in ("block_id", "kind", "title", "block_status", "snapshot", "params", "comment")
+    }
+    version = cache.renderer_version(render_block, observation_chart_renderer)
+    return cache.artifact_key("observation_chapter_block", payload, version=version)
+
+
+def _relocate_latex_paths(text: str, old: str, new: str) -> str:
+    """Пути картинок встречаются и как есть, и через latex_escape."""
+    return text.replace(latex_escape(old), latex_escape(new)).replace(old, new)
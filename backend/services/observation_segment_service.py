@@ -37,6 +37,11 @@ from sqlalchemy.orm import Session
 # Импорт на module level, чтобы тесты могли патчить через
 # `mock.patch("backend.services.observation_segment_service.load_observation_data", ...)`.
 from backend.services.observation_data_service import load_observation_data
+from backend.services.timeseries_analyzer import (
+    cost_local_maxima,
+    dip_changepoints,
+    level_shift_cost,
+)
 
 log = logging.getLogger(__name__)
 
@@ -577,36 +582,15 @@ def _detect_changepoints(
     changepoints: set[int] = set()
 
     # === 1. Базовая детекция по скачку среднего уровня ===
-    cost = np.zeros(n)
-    for i in range(min_seg_pts, n - min_seg_pts):
-        left  = y_clean[:i]
-        right = y_clean[i:]
-        mean_diff = abs(np.mean(right) - np.mean(left))
-        jump = abs(y_clean[i] - y_clean[i - 1]) if i > 0 else 0.0
-        cost[i] = mean_diff + jump * 0.5
-
-    for i in range(min_seg_pts, n - min_seg_pts):
-        if cost[i] < threshold:
-            continue
-        ws = max(0, i - min_seg_pts)
-        we = min(n, i + min_seg_pts + 1)
-        if cost[i] == np.max(cost[ws:we]):
-            changepoints.add(i)
+    # Префиксные суммы вместо среза на каждую точку (на hourly/15min — O(n²))
+    cost = level_shift_cost(y_clean, min_seg_pts)
+    changepoints.update(cost_local_maxima(cost, min_seg_pts, threshold).tolist())
 
     # === 2. Детекция коротких аномальных провалов ===
     dip_drop_pct  = 25.0  # [requires_calibration]
     dip_rec_pct   = 25.0  # [requires_calibration]
     dip_win_pts   = _days_to_points(7, aggregation)
-    for i in range(1, n - 1):
-        if y_clean[i - 1] != 0:
-            drop_pct = (y_clean[i] - y_clean[i - 1]) / y_clean[i - 1] * 100.0
-            if drop_pct < -dip_drop_pct:
-                changepoints.add(i)
-                for j in range(i + 1, min(i + 1 + dip_win_pts, n)):
-                    rec_pct = (y_clean[j] - y_clean[i]) / y_clean[i] * 100.0 if y_clean[i] != 0 else 0.0
-                    if rec_pct > dip_rec_pct:
-                        changepoints.add(j)
-                        break
+    changepoints.update(dip_changepoints(y_clean, dip_drop_pct, dip_rec_pct, dip_win_pts))
 
     # === 3. Сортировка и отсечение edge ===
     edge_pts = max(1, _days_to_points(2, aggregation))
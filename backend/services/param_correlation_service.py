@@ -13,6 +13,11 @@ param_correlation_service — «Зависимость двух параметр
   • оба сигнала — чистый LoRa-физический (dp/q/p_tube/p_line) → ПОМИНУТНО (плотно).
   • иначе (участвует УзКорГаз или LoRa-суточный) → ПОСУТОЧНО (одна точка = день),
     с выравниванием по дате. Это позволяет сравнивать LoRa ↔ УзКорГаз (Q, P, ΔP).
+
+Матрица зависимостей (build_param_correlation_matrix) — все нецикличные пары
+набора сигналов за один проход: каждый ряд грузится один раз (минутные
+каналы — из кэша pressure_stats_engine), регрессии всех пар —
+pressure_stats_engine.pair_regressions.
 """
 from __future__ import annotations
 
@@ -96,21 +101,6 @@ def _as_date(v) -> date:
     return date.fromisoformat(str(v)[:10])
 
 
-def _minute_series(df, key: str) -> np.ndarray:
-    """Поминутный сигнал LoRa из DataFrame."""
-    p_tube = df["p_tube"].to_numpy(dtype=float)
-    p_line = df["p_line"].to_numpy(dtype=float)
-    if key == "dp":
-        return np.clip(p_tube - p_line, 0.0, None)
-    if key == "q":
-        return df["flow_rate"].to_numpy(dtype=float) if "flow_rate" in df.columns else np.full(len(df), np.nan)
-    if key == "p_tube":
-        return np.where(p_tube > 0, p_tube, np.nan)
-    if key == "p_line":
-        return np.where(p_line > 0, p_line, np.nan)
-    return np.full(len(df), np.nan)
-
-
 def _daily_map(db, well_number, key: str, d_from: date, d_to: date) -> dict:
     """Суточный ряд {date_str: value} через customer_daily.time_series."""
     src, metric = DAILY_SIGNAL_MAP[key]
@@ -185,19 +175,19 @@ def build_param_correlation(
         # ── Поминутно (плотное облако, чистый LoRa) ──
         snapshot["resolution"] = "minute"
         try:
-            from backend.services.flow_rate.full_pipeline import compute_full_flow
+            from backend.services import pressure_stats_engine as engine
             ds = _iso_utc(period_from, is_end=False)
             de = _iso_utc(period_to, is_end=True)
-            df = compute_full_flow(well_id, ds, de, smooth=True)["df"]
+            channels = engine.load_channels(well_id, ds, de)
         except Exception as exc:  # noqa: BLE001
             snapshot["block_status"] = "no_data"
             snapshot["error"] = f"compute_full_flow failed: {exc}"
             return snapshot
-        if df is None or df.empty:
+        if channels is None:
             snapshot["block_status"] = "no_data"
             return snapshot
-        xv = _minute_series(df, x_signal)
-        yv = _minute_series(df, y_signal)
+        xv = np.asarray(channels[x_signal])
+        yv = np.asarray(channels[y_signal])
         mask = np.isfinite(xv) & np.isfinite(yv)
         xv, yv = xv[mask], yv[mask]
         n = int(xv.size)
@@ -244,3 +234,131 @@ def build_param_correlation(
     snapshot["n_points"] = n
     snapshot["points"] = {"x": xs, "y": ys, "dates": dates}
     return snapshot
+
+
+def _daily_values(mapping: dict, dates: list[str]) -> np.ndarray:
+    """Суточный ряд на общую сетку дат (нечисловое/пропуск → NaN), округление
+    как у облака точек пары."""
+    out = np.full(len(dates), np.nan)
+    for i, d in enumerate(dates):
+        try:
+            out[i] = round(float(mapping.get(d)), 3)
+        except (TypeError, ValueError):
+            continue
+    return out
+
+
+def build_param_correlation_matrix(
+    db,
+    *,
+    well_id: int,
+    well_number: str | None = None,
+    period_from: date | str,
+    period_to: date | str,
+    signals: list[str] | None = None,
+    label: str | None = None,
+) -> dict[str, Any]:
+    """Матрица зависимостей: регрессия и R² для всех нецикличных пар signals.
+
+    signals=None — все сигналы SIGNAL_META. Разрешение — как у пары: все
+    сигналы LoRa-физические → поминутно, иначе посуточно по общим датам.
+    Цикличные пары (_is_circular) не считаются и перечислены в skipped.
+    Облака точек не хранятся — для графика пары есть build_param_correlation.
+    """
+    keys = [k for k in dict.fromkeys(signals or SIGNAL_META) if k in SIGNAL_META]
+    pairs: list[tuple[str, str]] = []
+    skipped: list[list[str]] = []
+    for i, x in enumerate(keys):
+        for y in keys[i + 1:]:
+            if _is_circular(x, y):
+                skipped.append([x, y])
+            else:
+                pairs.append((x, y))
+
+    pf = period_from if isinstance(period_from, str) else period_from.isoformat()
+    pt = period_to if isinstance(period_to, str) else period_to.isoformat()
+    minute_path = all(k in LORA_MINUTE_KEYS for k in keys)
+
+    snapshot: dict[str, Any] = {
+        "_v": "param_correlation_matrix_v1",
+        "schema_version": "1.0",
+        "computed_at": None,
+        "block_status": "ok",
+        "well_id": well_id,
+        "well_number": well_number,
+        "label": label or "Матрица зависимостей параметров",
+        "period": {"from": str(pf)[:10], "to": str(pt)[:10]},
+        "signals": [{"key": k, **SIGNAL_META[k]} for k in keys],
+        "resolution": "minute" if minute_path else "daily",
+        "pairs": [],
+        "skipped": skipped,
+    }
+    if not pairs:
+        snapshot["block_status"] = "no_data"
+        snapshot["error"] = "Нет нецикличных пар среди выбранных сигналов"
+        return snapshot
+
+    from backend.services import pressure_stats_engine as engine
+
+    if minute_path:
+        try:
+            channels = engine.load_channels(
+                well_id, _iso_utc(period_from, is_end=False), _iso_utc(period_to, is_end=True),
+            )
+        except Exception as exc:  # noqa: BLE001
+            snapshot["block_status"] = "no_data"
+            snapshot["error"] = f"compute_full_flow failed: {exc}"
+            return snapshot
+        min_points = MIN_POINTS_MINUTE
+    else:
+        d_from, d_to = _as_date(period_from), _as_date(period_to)
+        maps = {k: _daily_map(db, well_number, k, d_from, d_to) for k in keys}
+        dates = sorted(set().union(*maps.values()))
+        channels = {k: _daily_values(maps[k], dates) for k in keys} if dates else None
+        min_points = MIN_POINTS_DAILY
+
+    if channels is None:
+        snapshot["block_status"] = "no_data"
+        return snapshot
+
+    for (x, y), (n, reg) in zip(pairs, engine.pair_regressions(channels, pairs)):
+        status = "no_data" if n == 0 else ("insufficient_data" if n < min_points else "ok")
+        snapshot["pairs"].append({
+            "x": x, "y": y, "n_points": n, "status": status, "regression": reg,
+        })
+    if all(p["status"] == "no_data" for p in snapshot["pairs"]):
+        snapshot["block_status"] = "no_data"
+    return snapshot
+
+
+def build_param_correlation_matrices(
+    db,
+    items: list[dict[str, Any]],
+    *,
+    signals: list[str] | None = None,
+    max_workers: int | None = None,
+) -> list[dict[str, Any]]:
+    """Матрицы зависимостей для нескольких (скважина, период).
+
+    items — [{well_id, well_number?, period_from, period_to, label?}].
+    Поминутные матрицы считаются параллельно; посуточные читают БД через
+    общую сессию db и идут последовательно.
+    """
+    from backend.services import pressure_stats_engine as engine
+
+    keys = [k for k in (signals or SIGNAL_META) if k in SIGNAL_META]
+    minute_path = bool(keys) and all(k in LORA_MINUTE_KEYS for k in keys)
+
+    def _one(item: dict[str, Any]) -> dict[str, Any]:
+        return build_param_correlation_matrix(
+            db,
+            well_id=item["well_id"],
+            well_number=item.get("well_number"),
+            period_from=item["period_from"],
+            period_to=item["period_to"],
+            signals=signals,
+            label=item.get("label"),
+        )
+
+    workers = engine.DEFAULT_WORKERS if max_workers is None else max_workers
+    return engine.run_items(_one, items, workers if minute_path else 1)
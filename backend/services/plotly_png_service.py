@@ -16,6 +16,10 @@ HTML: window.renderChapter(blocks, cfg) из chapter_render.js.
 Файлы кладутся в out_dir (временная папка сборки) и не хранятся — вызывающий
 код чистит папку после компиляции. Дублей не возникает.
 
+Шаги 2–3 по умолчанию выполняет тёплый демон (plotly_render_daemon): Chromium
+и страница с Plotly уже загружены, блоки делятся между вкладками, PNG
+приходят байтами по Unix-сокету. Нет демона — одноразовый режим выше.
+
 CLI (вызов из пайплайна отдельным процессом — изоляция от event-loop):
   python -m backend.services.plotly_png_service --well 17 --out /tmp/build \
       --chapter adaptation --base-url http://127.0.0.1:8000
@@ -25,10 +29,15 @@ from __future__ import annotations
 
 import argparse
 import json
+import logging
 import shutil
 from datetime import date, datetime
 from pathlib import Path
 
+from backend.services.build_profiler import profiled
+
+log = logging.getLogger(__name__)
+
 
 def _json_serial(obj):
     """JSON serializer for objects not serializable by default."""
@@ -136,9 +145,95 @@ def _autocrop(path: str, pad: int = 6) -> None:
         pass
 
 
+# ── Перерендер графиков под ПЕЧАТЬ: размер PNG = целевой ширине в .tex ──
+# Главное: график генерируется СРАЗУ под нужную ширину (а не узким и потом
+# растягивается в LaTeX → мыло/огромные шрифты). И жёстко задаём ширину
+# САМОГО элемента — иначе .js-plotly-plot держит width:100% (≈850px) и
+# скриншот захватывает пустую полосу родителя справа от графика.
+# Классы по ширине отображения: half=0.49\textwidth, mid=0.7, full=1.0.
+PRINT_RELAYOUT_JS = """() => {
+  document.querySelectorAll('.js-plotly-plot').forEach(function(el){
+    var id = el.id || '';
+    var half = (/^scc-.*-chart-(q|dp)$/.test(id)) || (/^ps-.*-chart-(ptube|dp)$/.test(id));
+    var mid  = (/^pc-.*-chart$/.test(id));
+    var pie  = (/-pie$/.test(id));              // донат реагентов — квадрат, крупнее
+    var dev  = (/^scc-.*-chart-dev$/.test(id)); // отклонение — уже по ширине, выше
+    var w, h, ff, tf;
+    if (pie)       { w = 480;  h = 480; ff = 14; tf = 16; }
+    else if (dev)  { w = 1120; h = 300; ff = 14; tf = 16; }  // полная ширина, ниже исходного (440)
+    else if (half) { w = 560;  h = 380; ff = 13; tf = 14; }
+    else if (mid)  { w = 820;  h = 540; ff = 14; tf = 16; }
+    else           { w = 1120; h = 440; ff = 15; tf = 18; }  // full-width
+    try {
+      Plotly.relayout(el, {
+        width: w, height: h, autosize: false,
+        'font.size': ff, 'title.font.size': tf,
+        'font.family': 'Arial, Helvetica, sans-serif'
+      });
+    } catch(e) {}
+    // bounding box элемента == ширине графика → нет пустой полосы
+    el.style.width = w + 'px';
+    el.style.maxWidth = w + 'px';
+    el.style.height = h + 'px';
+    el.style.flex = '0 0 ' + w + 'px';
+    el.style.display = 'block';
+  });
+}"""
+
+
+def _select_blocks(blocks_payload, chapter, kinds):
+    """Блоки главы для рендера — зеркало фильтра в _HTML_TMPL (kind + ch===CH)."""
+    raw = blocks_payload or {}
+    items = raw.get("blocks") or raw.get("items") or []
+    kinds = kinds or ADAPTATION_KINDS
+    out = []
+    for b in items:
+        if b.get("kind") not in kinds:
+            continue
+        ch = (b.get("params") or {}).get("chapter") or None
+        if chapter and ch != chapter:
+            continue
+        if not b.get("id") and b.get("block_id"):
+            b = {**b, "id": b["block_id"]}
+        out.append(b)
+    return out
+
+
+@profiled("plotly_charts")
 def render_chart_pngs(blocks_payload, out_dir, chapter="adaptation",
                       kinds=None, scale=3, timeout_ms=20000):
-    """Отрисовать графики главы в PNG. Возвращает {chart_id: png_path}."""
+    """Отрисовать графики главы в PNG. Возвращает {chart_id: png_path}.
+
+    Сначала — тёплый демон (plotly_render_daemon): без запуска Chromium и
+    загрузки Plotly на каждую сборку, блоки по вкладкам параллельно. Демон
+    не запущен / не ответил — одноразовый режим (свой Chromium на вызов).
+    """
+    from backend.services import plotly_render_daemon as daemon
+
+    if daemon.enabled():
+        blocks = json.loads(json.dumps(_select_blocks(blocks_payload, chapter, kinds),
+                                       ensure_ascii=False, default=_json_serial))
+        try:
+            pngs = daemon.render(blocks, scale=scale, timeout_ms=timeout_ms)
+        except daemon.DaemonUnavailable as e:
+            log.warning("plotly daemon unavailable, one-shot render: %s", e)
+        else:
+            out = Path(out_dir)
+            out.mkdir(parents=True, exist_ok=True)
+            result = {}
+            for cid, png_bytes in pngs.items():
+                png = out / ("chart_%s.png" % cid)
+                png.write_bytes(png_bytes)
+                _autocrop(str(png))
+                result[cid] = str(png)
+            return result
+    return _render_chart_pngs_oneshot(blocks_payload, out_dir, chapter=chapter,
+                                      kinds=kinds, scale=scale, timeout_ms=timeout_ms)
+
+
+def _render_chart_pngs_oneshot(blocks_payload, out_dir, chapter="adaptation",
+                               kinds=None, scale=3, timeout_ms=20000):
+    """Одноразовый режим: свой Chromium и страница с вшитыми блоками."""
     from playwright.sync_api import sync_playwright
 
     out = Path(out_dir)
@@ -176,43 +271,9 @@ def render_chart_pngs(blocks_payload, out_dir, chapter="adaptation",
             b.close()
             raise RuntimeError("renderChapter error: " + str(err))
         pg.wait_for_timeout(1200)
-        # ── Перерендер графиков под ПЕЧАТЬ: размер PNG = целевой ширине в .tex ──
-        # Главное: график генерируется СРАЗУ под нужную ширину (а не узким и потом
-        # растягивается в LaTeX → мыло/огромные шрифты). И жёстко задаём ширину
-        # САМОГО элемента — иначе .js-plotly-plot держит width:100% (≈850px) и
-        # скриншот захватывает пустую полосу родителя справа от графика.
-        # Классы по ширине отображения: half=0.49\textwidth, mid=0.7, full=1.0.
+        # ── Перерендер графиков под ПЕЧАТЬ (PRINT_RELAYOUT_JS) ──
         try:
-            pg.evaluate(
-                """() => {
-                  document.querySelectorAll('.js-plotly-plot').forEach(function(el){
-                    var id = el.id || '';
-                    var half = (/^scc-.*-chart-(q|dp)$/.test(id)) || (/^ps-.*-chart-(ptube|dp)$/.test(id));
-                    var mid  = (/^pc-.*-chart$/.test(id));
-                    var pie  = (/-pie$/.test(id));              // донат реагентов — квадрат, крупнее
-                    var dev  = (/^scc-.*-chart-dev$/.test(id)); // отклонение — уже по ширине, выше
-                    var w, h, ff, tf;
-                    if (pie)       { w = 480;  h = 480; ff = 14; tf = 16; }
-                    else if (dev)  { w = 1120; h = 300; ff = 14; tf = 16; }  // полная ширина, ниже исходного (440)
-                    else if (half) { w = 560;  h = 380; ff = 13; tf = 14; }
-                    else if (mid)  { w = 820;  h = 540; ff = 14; tf = 16; }
-                    else           { w = 1120; h = 440; ff = 15; tf = 18; }  // full-width
-                    try {
-                      Plotly.relayout(el, {
-                        width: w, height: h, autosize: false,
-                        'font.size': ff, 'title.font.size': tf,
-                        'font.family': 'Arial, Helvetica, sans-serif'
-                      });
-                    } catch(e) {}
-                    // bounding box элемента == ширине графика → нет пустой полосы
-                    el.style.width = w + 'px';
-                    el.style.maxWidth = w + 'px';
-                    el.style.height = h + 'px';
-                    el.style.flex = '0 0 ' + w + 'px';
-                    el.style.display = 'block';
-                  });
-                }"""
-            )
+            pg.evaluate(PRINT_RELAYOUT_JS)
             pg.wait_for_timeout(800)
         except Exception:
             pass
@@ -0,0 +1,435 @@
+"""
+plotly_render_daemon — долгоживущий рендерер Plotly-графиков глав в PNG.
+
+plotly_png_service на каждую сборку отчёта поднимал sync_playwright(),
+запускал новый Chromium и заново грузил Plotly (3.5 МБ) + chapter_render.js
+— секунды на старт до первого графика. Демон держит всё это тёплым:
+
+  • один Chromium на процесс, вкладки (TabPool) с уже загруженной
+    страницей-оболочкой: Plotly + chapter_render.js + #root; на вкладке
+    вызывается renderChapter(блоки), графики перерисовываются под печать
+    (тот же PRINT_RELAYOUT_JS, что в одноразовом режиме) и снимаются в PNG;
+  • блоки запроса делятся между вкладками (графики блока зависят только от
+    самого блока, id — от block_id), вкладки рендерят параллельно;
+  • вкладка переиспользуется: перед рендером Plotly.purge + очистка #root;
+    раз в RECYCLE_AFTER рендеров (и после ошибки Playwright) — новая;
+  • протокол — Unix-сокет SOCKET_PATH, кадры «4 байта длины (big-endian) +
+    тело»: запрос — JSON {"op": "render", "blocks", "scale", "timeout_ms"}
+    или {"op": "ping"}; ответ — JSON {"ok", "charts": [id…]} и далее по
+    кадру PNG на каждый id, либо {"ok": false, "error", "render_error"}.
+
+Клиент — render(): ошибка связи / протокола / Playwright → DaemonUnavailable
+(вызывающий откатывается на одноразовый режим), ошибка renderChapter →
+RuntimeError, как в одноразовом режиме. Второй экземпляр демона на тот же
+сокет не стартует (flock на SOCKET_PATH.lock).
+
+Запуск (при старте приложения — spawn(settings.PLOTLY_RENDER_TABS)):
+    python -m backend.services.plotly_render_daemon --tabs 3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+log = logging.getLogger(__name__)
+
+SOCKET_PATH = os.environ.get("PLOTLY_RENDER_SOCKET", "backend/generated/plotly_render.sock")
+DEFAULT_TABS = 3
+RECYCLE_AFTER = 50
+VIEWPORT = {"width": 1300, "height": 1600}
+
+_HEADER = struct.Struct(">I")
+_MAX_FRAME = 256 * 1024 * 1024
+
+_SHELL_TMPL = """<!doctype html><html><head><meta charset="utf-8">
+<script src="plotly.min.js"></script>
+<script src="chapter_render.js"></script>
+<style>body{font-family:'Times New Roman',serif;padding:16px;width:1200px;background:#fff;}
+.js-plotly-plot .svg-container{position:relative!important;}
+.js-plotly-plot .main-svg{position:absolute!important;top:0!important;left:0!important;}
+.modebar,.modebar-container{display:none!important;}</style>
+</head><body><div id="root"></div></body></html>
+"""
+
+# Блоки уже отфильтрованы клиентом (plotly_png_service._select_blocks).
+_RENDER_CALL_JS = """(blocks) => {
+  var root = document.getElementById('root');
+  if (window.Plotly) {
+    root.querySelectorAll('.js-plotly-plot').forEach(function(el){
+      try { Plotly.purge(el); } catch(e) {}
+    });
+  }
+  root.innerHTML = '';
+  try {
+    window.renderChapter(blocks, {containerId: "root", chapterTitle: "Глава"});
+    return null;
+  } catch(e) { return String(e && e.stack || e); }
+}"""
+
+
+class DaemonUnavailable(RuntimeError):
+    """Демон не ответил / сломался — рендерить одноразовым режимом."""
+
+
+# ─── Кадры ────────────────────────────────────────────────────────────
+
+def _send_frame(sock: socket.socket, body: bytes) -> None:
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(min(n - len(buf), 1 << 20))
+        if not chunk:
+            raise ConnectionError("plotly_render_daemon: соединение закрыто")
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if size > _MAX_FRAME:
+        raise ConnectionError(f"plotly_render_daemon: кадр {size} байт")
+    return _recv_exact(sock, size)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if size > _MAX_FRAME:
+        raise ValueError(f"кадр {size} байт")
+    return await reader.readexactly(size)
+
+
+def _write_frame(writer: asyncio.StreamWriter, body: bytes) -> None:
+    writer.write(_HEADER.pack(len(body)) + body)
+
+
+# ─── Клиент ───────────────────────────────────────────────────────────
+
+def enabled() -> bool:
+    """Демон включён и, похоже, запущен (сокет существует)."""
+    if os.environ.get("PLOTLY_RENDER_DAEMON", "1") in ("0", "false", "no"):
+        return False
+    return os.path.exists(SOCKET_PATH)
+
+
+def _request(message: dict, timeout: float) -> tuple[dict, socket.socket]:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(SOCKET_PATH)
+        _send_frame(sock, json.dumps(message, ensure_ascii=False).encode("utf-8"))
+        head = json.loads(_recv_frame(sock).decode("utf-8"))
+    except (OSError, ValueError) as e:
+        sock.close()
+        raise DaemonUnavailable(f"plotly_render_daemon: {e}") from e
+    return head, sock
+
+
+def ping(timeout: float = 2.0) -> Optional[dict]:
+    """Состояние демона ({"ok", "tabs", "renders"}) или None, если не отвечает."""
+    try:
+        head, sock = _request({"op": "ping"}, timeout)
+    except DaemonUnavailable:
+        return None
+    sock.close()
+    return head
+
+
+def render(blocks: list, *, scale: int = 3, timeout_ms: int = 20000) -> dict[str, bytes]:
+    """Отрисовать графики блоков в демоне. Возвращает {chart_id: PNG-байты}.
+
+    blocks — уже отфильтрованные и JSON-сериализуемые блоки главы.
+    """
+    head, sock = _request(
+        {"op": "render", "blocks": blocks, "scale": scale, "timeout_ms": timeout_ms},
+        timeout_ms / 1000 + 30,
+    )
+    try:
+        if not head.get("ok"):
+            if head.get("render_error"):
+                raise RuntimeError(head.get("error") or "renderChapter error")
+            raise DaemonUnavailable(f"plotly_render_daemon: {head.get('error')}")
+        try:
+            return {cid: _recv_frame(sock) for cid in head.get("charts") or []}
+        except OSError as e:
+            raise DaemonUnavailable(f"plotly_render_daemon: {e}") from e
+    finally:
+        sock.close()
+
+
+# ─── Вкладки ──────────────────────────────────────────────────────────
+
+class RenderChapterError(RuntimeError):
+    """renderChapter бросил исключение — повтор в другом режиме не поможет."""
+
+
+class TabPool:
+    """Тёплый Chromium и до tabs вкладок с загруженной оболочкой главы.
+
+    device_scale_factor задаётся на контекст, поэтому контекст — на каждый
+    встреченный scale; общее число вкладок ограничено tabs.
+    """
+
+    def __init__(self, tabs: int = DEFAULT_TABS, warm_scale: int = 3):
+        self.tabs = max(1, tabs)
+        self.warm_scale = warm_scale
+        self.renders = 0
+        self._sem = asyncio.Semaphore(self.tabs)
+        self._idle: list[tuple[int, Any, int]] = []     # (scale, page, использований)
+        self._contexts: dict[int, Any] = {}
+        self._pw = None
+        self._browser = None
+        self._work: Optional[Path] = None
+
+    async def start(self) -> None:
+        from playwright.async_api import async_playwright
+
+        from backend.services import plotly_png_service as pps
+
+        self._work = Path(tempfile.mkdtemp(prefix="plotly_daemon_"))
+        shutil.copy(pps._PLOTLY_JS, self._work / "plotly.min.js")
+        shutil.copy(pps._RENDER_JS, self._work / "chapter_render.js")
+        (self._work / "shell.html").write_text(_SHELL_TMPL, encoding="utf-8")
+        self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch()
+        pages = await asyncio.gather(*(self._new_page(self.warm_scale) for _ in range(self.tabs)))
+        self._idle = [(self.warm_scale, pg, 0) for pg in pages]
+        log.info("[plotly_daemon] chromium warm, %d tab(s)", self.tabs)
+
+    async def close(self) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+        if self._pw is not None:
+            await self._pw.stop()
+        if self._work is not None:
+            shutil.rmtree(self._work, ignore_errors=True)
+
+    async def _new_page(self, scale: int):
+        ctx = self._contexts.get(scale)
+        if ctx is None:
+            ctx = await self._browser.new_context(device_scale_factor=scale, viewport=VIEWPORT)
+            self._contexts[scale] = ctx
+        pg = await ctx.new_page()
+        await pg.goto((self._work / "shell.html").as_uri())
+        await pg.wait_for_function("!!window.Plotly && typeof window.renderChapter === 'function'")
+        return pg
+
+    async def _acquire(self, scale: int) -> tuple[Any, int]:
+        await self._sem.acquire()
+        for i, (s, pg, uses) in enumerate(self._idle):
+            if s == scale:
+                del self._idle[i]
+                return pg, uses
+        if self._idle:
+            # свободная вкладка другого масштаба — закрыть, чтобы не превысить tabs
+            _, old, _ = self._idle.pop(0)
+            await old.close()
+        try:
+            return await self._new_page(scale), 0
+        except BaseException:
+            self._sem.release()
+            raise
+
+    async def _release(self, scale: int, page, uses: int, healthy: bool) -> None:
+        try:
+            if healthy and uses < RECYCLE_AFTER:
+                self._idle.append((scale, page, uses))
+            else:
+                await page.close()
+        finally:
+            self._sem.release()
+
+    async def _render_chunk(self, blocks: list, scale: int, part: int, timeout_ms: int) -> dict:
+        from backend.services import plotly_png_service as pps
+
+        page, uses = await self._acquire(scale)
+        healthy = False
+        try:
+            err = await page.evaluate(_RENDER_CALL_JS, blocks)
+            if err:
+                healthy = True
+                raise RenderChapterError("renderChapter error: " + str(err))
+            await page.wait_for_timeout(1200)
+            try:
+                await page.evaluate(pps.PRINT_RELAYOUT_JS)
+                await page.wait_for_timeout(800)
+            except Exception:
+                pass
+            out = {}
+            for i, el in enumerate(await page.query_selector_all(".js-plotly-plot")):
+                cid = await el.get_attribute("id") or ("chart_%d_%d" % (part, i))
+                try:
+                    out[cid] = await el.screenshot(type="png", timeout=timeout_ms)
+                except Exception:
+                    continue
+            healthy = True
+            return out
+        finally:
+            await self._release(scale, page, uses + 1, healthy)
+
+    async def render(self, blocks: list, scale: int = 3, timeout_ms: int = 20000) -> dict[str, bytes]:
+        """Графики блоков, блоки поровну по вкладкам. {chart_id: PNG-байты}."""
+        if not blocks:
+            return {}
+        n = min(self.tabs, len(blocks))
+        parts = await asyncio.wait_for(
+            asyncio.gather(*(self._render_chunk(blocks[i::n], scale, i, timeout_ms)
+                             for i in range(n))),
+            timeout=timeout_ms / 1000 * 2,
+        )
+        self.renders += 1
+        merged: dict[str, bytes] = {}
+        for part in parts:
+            merged.update(part)
+        return merged
+
+
+# ─── Сервер ───────────────────────────────────────────────────────────
+
+async def _handle(pool, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        req = json.loads((await _read_frame(reader)).decode("utf-8"))
+        if req.get("op") == "ping":
+            head, pngs = {"ok": True, "tabs": pool.tabs, "renders": pool.renders}, {}
+        elif req.get("op") == "render":
+            try:
+                pngs = await pool.render(req.get("blocks") or [], int(req.get("scale") or 3),
+                                         int(req.get("timeout_ms") or 20000))
+                head = {"ok": True, "charts": list(pngs)}
+            except RenderChapterError as e:
+                head, pngs = {"ok": False, "error": str(e), "render_error": True}, {}
+            except Exception as e:
+                log.exception("[plotly_daemon] render failed")
+                head, pngs = {"ok": False, "error": f"{type(e).__name__}: {e}"}, {}
+        else:
+            head, pngs = {"ok": False, "error": f"unknown op {req.get('op')!r}"}, {}
+        _write_frame(writer, json.dumps(head, ensure_ascii=False).encode("utf-8"))
+        for png in pngs.values():
+            _write_frame(writer, png)
+        await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(pool, path: str = SOCKET_PATH, *, started: Optional[asyncio.Event] = None,
+                stop: Optional[asyncio.Event] = None) -> None:
+    """Слушать Unix-сокет path до stop (или навсегда)."""
+    if os.path.exists(path):
+        os.unlink(path)                                   # сокет прошлого (упавшего) демона
+    server = await asyncio.start_unix_server(lambda r, w: _handle(pool, r, w), path=path)
+    if started is not None:
+        started.set()
+    try:
+        async with server:
+            if stop is None:
+                await server.serve_forever()
+            else:
+                await stop.wait()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def _take_lock(path: str):
+    """flock на path.lock; None — демон на этом сокете уже запущен."""
+    import fcntl
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    fh = open(path + ".lock", "w")
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return None
+    return fh
+
+
+async def _run(tabs: int, path: str) -> None:
+    import signal
+
+    pool = TabPool(tabs)
+    await pool.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await serve(pool, path, stop=stop)
+    finally:
+        await pool.close()
+
+
+def run_daemon(tabs: int = DEFAULT_TABS, path: str = SOCKET_PATH) -> int:
+    lock = _take_lock(path)
+    if lock is None:
+        log.info("[plotly_daemon] already running on %s", path)
+        return 0
+    try:
+        asyncio.run(_run(tabs, path))
+    finally:
+        lock.close()
+    return 0
+
+
+# ─── Запуск из приложения ─────────────────────────────────────────────
+
+_process: Optional[subprocess.Popen] = None
+
+
+def spawn(tabs: int = DEFAULT_TABS) -> Optional[subprocess.Popen]:
+    """Запустить демон отдельным процессом, если он ещё не отвечает.
+
+    Без Playwright не запускается — рендер идёт одноразовым режимом.
+    """
+    global _process
+    import importlib.util
+
+    if tabs <= 0 or _process is not None or ping() is not None:
+        return _process
+    if importlib.util.find_spec("playwright") is None:
+        log.info("[plotly_daemon] playwright не установлен — одноразовый режим")
+        return None
+    _process = subprocess.Popen(
+        [sys.executable, "-m", "backend.services.plotly_render_daemon", "--tabs", str(tabs)],
+    )
+    return _process
+
+
+def stop_spawned(timeout: float = 10.0) -> None:
+    global _process
+    if _process is None:
+        return
+    _process.terminate()
+    try:
+        _process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        _process.kill()
+    _process = None
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Тёплый рендерер Plotly-графиков глав")
+    ap.add_argument("--tabs", type=int, default=DEFAULT_TABS)
+    ap.add_argument("--socket", default=SOCKET_PATH)
+    a = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    return run_daemon(a.tabs, a.socket)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
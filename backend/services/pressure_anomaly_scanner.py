@@ -0,0 +1,348 @@
+"""
+pressure_anomaly_scanner.py — инкрементальный сканер аномалий ΔP по фонду.
+
+auto_create_masks(well_id, days) на каждый вызов заново читает pressure_raw
+за все `days` и отдельно — маркеры продувок. Для регулярного прогона по
+всем скважинам это повторная работа по уже проанализированным данным.
+
+Сканер хранит водяной знак на скважину (pressure_anomaly_scan.scanned_until)
+и после каждого прогона пайплайна давлений анализирует только новые минуты
+плюс контекстный запас (по умолчанию 24 ч: скользящая медиана ΔP — 6 ч,
+базовый уровень до аномалии — 6 ч, порог MAD — по всему окну).
+
+  1. Состояние фонда — ОДИН запрос: pressure_latest ⟕ pressure_anomaly_scan.
+     Скважины без новых точек после водяного знака пропускаются.
+  2. Анализ — параллельно по скважинам (ThreadPoolExecutor): сырые данные
+     с (scanned_until − context) и маркеры продувок, ядро find_dp_anomalies.
+     В кандидаты идут только аномалии, заканчивающиеся после водяного знака.
+  3. Запись — одна транзакция: активные маски всех скважин одним запросом,
+     проверка пересечений, add_all, водяные знаки; общий batch_id.
+     Маски создаются кандидатами (source = SCAN_SOURCE, is_verified=False):
+     к дебиту, графикам и отчётам они не применяются, пока оператор не
+     подтвердит их в /api/pressure-masks/verify-batch.
+
+Первый прогон скважины (водяного знака нет) — окно INITIAL_LOOKBACK,
+как у auto_create_masks(days=7).
+
+Запуск:
+    python -m backend.services.pressure_anomaly_scanner [--wells 12,15] [--workers 4]
+Из пайплайна: services/pressure_pipeline.py, шаг 6.
+"""
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+
+from backend.db import engine as pg_engine
+from backend.services.pressure_mask_service import (
+    KUNGRAD_OFFSET,
+    SCAN_SOURCE,
+    _anomaly_candidates,
+    _group_purge_rows,
+    _load_purge_rows,
+    _load_raw_5min,
+    _new_masks_without_overlap,
+    find_dp_anomalies,
+)
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT = timedelta(hours=24)
+INITIAL_LOOKBACK = timedelta(days=7)
+DEFAULT_WORKERS = 4
+
+# Продувка start→stop длится до 4 ч — маркер start может быть раньше окна
+_PURGE_LOOKBACK = timedelta(hours=4)
+
+
+# ──────────────────── Состояние фонда ────────────────────
+
+
+def _load_scan_state(well_ids: Optional[Iterable[int]] = None) -> list[dict]:
+    """
+    Скважины для сканирования: последняя точка (pressure_latest) и водяной знак.
+
+    Returns: [{well_id, latest_at, scanned_until}]
+    """
+    where = ""
+    params: dict = {}
+    if well_ids is not None:
+        where = "WHERE pl.well_id = ANY(:ids)"
+        params["ids"] = [int(w) for w in well_ids]
+
+    with pg_engine.connect() as conn:
+        rows = conn.execute(
+            text(f"""
+                SELECT pl.well_id, pl.measured_at, s.scanned_until
+                FROM pressure_latest pl
+                LEFT JOIN pressure_anomaly_scan s ON s.well_id = pl.well_id
+                {where}
+                ORDER BY pl.well_id
+            """),
+            params,
+        ).fetchall()
+
+    return [
+        {"well_id": r[0], "latest_at": r[1], "scanned_until": r[2]}
+        for r in rows
+    ]
+
+
+def _has_new_data(state: dict) -> bool:
+    """Есть ли точки после водяного знака (неизвестно — считаем, что есть)."""
+    if state["scanned_until"] is None or state["latest_at"] is None:
+        return True
+    return state["latest_at"] > state["scanned_until"]
+
+
+# ──────────────────── Анализ одной скважины ────────────────────
+
+
+def scan_well(
+    well_id: int,
+    scanned_until: Optional[datetime],
+    now: Optional[datetime] = None,
+    context: timedelta = DEFAULT_CONTEXT,
+    dp_threshold_sigma: float = 3.0,
+    min_duration_min: int = 30,
+) -> dict:
+    """
+    Анализ новых минут одной скважины. В БД не пишет.
+
+    Returns: {well_id, rows, found, candidates, scanned_until, duration_ms}
+    scanned_until — новый водяной знак (начало последнего 5-минутного бина;
+    незавершённый бин пересчитается в следующем прогоне за счёт контекста).
+    """
+    t0 = time.perf_counter()
+    now = now or datetime.utcnow()
+    if scanned_until is None:
+        dt_start = now - INITIAL_LOOKBACK
+    else:
+        dt_start = scanned_until - context
+
+    result = {
+        "well_id": well_id,
+        "rows": 0,
+        "found": 0,
+        "candidates": [],
+        "scanned_until": scanned_until,
+    }
+
+    df, result["rows"] = _load_raw_5min(well_id, dt_start, now)
+    if df is None or df.empty:
+        result["duration_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return result
+
+    purge_rows = _load_purge_rows(
+        well_id, dt_start + KUNGRAD_OFFSET - _PURGE_LOOKBACK,
+    )
+    purge_windows = [
+        (p["dt_start"], p["dt_end"]) for p in _group_purge_rows(purge_rows)
+    ]
+
+    anomalies = find_dp_anomalies(
+        df,
+        dp_threshold_sigma=dp_threshold_sigma,
+        min_duration_min=min_duration_min,
+        exclude_windows=purge_windows,
+    )
+    # Аномалии, целиком лежащие в контексте, уже разобраны прошлым прогоном
+    if scanned_until is not None:
+        anomalies = [
+            a for a in anomalies
+            if datetime.fromisoformat(a["dt_end"]) > scanned_until
+        ]
+
+    result["found"] = len(anomalies)
+    result["candidates"] = _anomaly_candidates(anomalies)
+    result["scanned_until"] = df.index[-1].to_pydatetime()
+    result["duration_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return result
+
+
+# ──────────────────── Запись результатов ────────────────────
+
+
+def _write_results(scans: list[dict], source: str, batch_id: str) -> dict:
+    """
+    Маски и водяные знаки всех скважин — одной транзакцией.
+
+    Returns: {created: {well_id: N}, skipped_overlap: N}
+    """
+    from backend.db import SessionLocal
+    from backend.models.pressure_anomaly_scan import PressureAnomalyScan
+    from backend.models.pressure_mask import PressureMask
+
+    with_candidates = [s["well_id"] for s in scans if s["candidates"]]
+    created: dict[int, int] = {}
+    skipped_total = 0
+    now = datetime.utcnow()
+
+    db = SessionLocal()
+    try:
+        existing_by_well: dict[int, list] = {w: [] for w in with_candidates}
+        if with_candidates:
+            for m in (
+                db.query(PressureMask)
+                .filter(
+                    PressureMask.well_id.in_(with_candidates),
+                    PressureMask.is_active == True,
+                )
+                .all()
+            ):
+                existing_by_well[m.well_id].append(m)
+
+        new_masks = []
+        for s in scans:
+            well_id = s["well_id"]
+            if s["candidates"]:
+                masks, skipped = _new_masks_without_overlap(
+                    well_id, s["candidates"], existing_by_well[well_id],
+                    source, batch_id,
+                )
+                new_masks.extend(masks)
+                skipped_total += skipped
+                created[well_id] = len(masks)
+
+            if s["scanned_until"] is None:
+                continue
+            db.merge(PressureAnomalyScan(
+                well_id=well_id,
+                scanned_until=s["scanned_until"],
+                last_run_at=now,
+                last_rows=s["rows"],
+                last_found=s["found"],
+                last_created=created.get(well_id, 0),
+                last_duration_ms=s["duration_ms"],
+            ))
+
+        db.add_all(new_masks)
+        db.commit()
+    finally:
+        db.close()
+
+    # Кандидаты не входят в индекс масок — invalidate_mask_index не нужен
+    return {"created": created, "skipped_overlap": skipped_total}
+
+
+# ──────────────────── Прогон по фонду ────────────────────
+
+
+def scan_fleet(
+    well_ids: Optional[Iterable[int]] = None,
+    context_hours: float = DEFAULT_CONTEXT.total_seconds() / 3600,
+    max_workers: int = DEFAULT_WORKERS,
+    source: str = SCAN_SOURCE,
+    dp_threshold_sigma: float = 3.0,
+    min_duration_min: int = 30,
+) -> dict:
+    """
+    Инкрементальный прогон детектора аномалий ΔP по фонду.
+
+    Args:
+        well_ids: Ограничить скважинами (None — все из pressure_latest).
+        context_hours: Контекстный запас до водяного знака.
+        max_workers: Параллельность анализа (потоки; запись — одна транзакция).
+        source: SCAN_SOURCE — маски-кандидаты (ждут подтверждения); другой
+            источник — маски применяются сразу, как у auto_create_masks.
+
+    Returns:
+        {wells_total, wells_scanned, wells_skipped, rows_loaded, found,
+         created, skipped_overlap, batch_id, errors, timings_ms, wells}
+    """
+    t_start = time.perf_counter()
+    timings: dict[str, float] = {}
+    context = timedelta(hours=context_hours)
+    now = datetime.utcnow()
+
+    t0 = time.perf_counter()
+    states = _load_scan_state(well_ids)
+    todo = [s for s in states if _has_new_data(s)]
+    timings["state"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    scans: list[dict] = []
+    errors: dict[int, str] = {}
+
+    def _scan(state: dict) -> dict:
+        return scan_well(
+            state["well_id"], state["scanned_until"], now=now, context=context,
+            dp_threshold_sigma=dp_threshold_sigma,
+            min_duration_min=min_duration_min,
+        )
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {s["well_id"]: pool.submit(_scan, s) for s in todo}
+        for well_id, fut in futures.items():
+            try:
+                scans.append(fut.result())
+            except Exception as e:
+                log.error("[anomaly_scan] well=%d ошибка анализа: %s", well_id, e)
+                errors[well_id] = str(e)
+    timings["analyse"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    batch_id = str(uuid.uuid4())[:8]
+    t0 = time.perf_counter()
+    written = _write_results(scans, source, batch_id) if scans else {
+        "created": {}, "skipped_overlap": 0,
+    }
+    timings["write"] = round((time.perf_counter() - t0) * 1000, 1)
+    timings["total"] = round((time.perf_counter() - t_start) * 1000, 1)
+
+    created_total = sum(written["created"].values())
+    result = {
+        "wells_total": len(states),
+        "wells_scanned": len(scans),
+        "wells_skipped": len(states) - len(todo),
+        "rows_loaded": sum(s["rows"] for s in scans),
+        "found": sum(s["found"] for s in scans),
+        "created": created_total,
+        "skipped_overlap": written["skipped_overlap"],
+        "batch_id": batch_id if created_total else None,
+        "errors": errors,
+        "timings_ms": timings,
+        "wells": [
+            {
+                "well_id": s["well_id"],
+                "rows": s["rows"],
+                "found": s["found"],
+                "created": written["created"].get(s["well_id"], 0),
+                "duration_ms": s["duration_ms"],
+            }
+            for s in scans
+        ],
+    }
+    log.info(
+        "[anomaly_scan] wells=%d scanned=%d skipped=%d rows=%d found=%d "
+        "created=%d errors=%d за %.0f мс",
+        result["wells_total"], result["wells_scanned"], result["wells_skipped"],
+        result["rows_loaded"], result["found"], result["created"],
+        len(errors), timings["total"],
+    )
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(
+        description="Инкрементальный сканер аномалий ΔP по фонду",
+    )
+    parser.add_argument("--wells", help="ID скважин через запятую")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--context-hours", type=float,
+        default=DEFAULT_CONTEXT.total_seconds() / 3600,
+    )
+    args = parser.parse_args()
+
+    ids = [int(w) for w in args.wells.split(",")] if args.wells else None
+    res = scan_fleet(ids, context_hours=args.context_hours, max_workers=args.workers)
+    print(json.dumps(res, indent=2, ensure_ascii=False, default=str))
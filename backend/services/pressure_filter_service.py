@@ -6,7 +6,8 @@ pressure_filter_service — фильтрация и очистка времен
 
 Фильтры:
   1. flag_false_zeros   — убирает 0.0 (ложные нули датчиков)
-  2. hampel_filter      — обнаружение и замена спайков (Hampel identifier)
+  2. hampel_filter      — обнаружение и замена спайков (Hampel identifier);
+                          hampel_filter_pair — оба канала за один проход
   2a. instant_spike_filter — обнаружение мгновенных скачков |ΔP| > порог
   3. fill_gaps           — заполнение коротких пропусков (ffill / interpolation)
   4. filter_pressure_pair — координированная обработка пары p_tube + p_line
@@ -44,6 +45,160 @@ def flag_false_zeros(series: pd.Series) -> tuple[pd.Series, int]:
 # 2. Hampel-фильтр (обнаружение спайков)
 # ═══════════════════════════════════════════════════════════
 
+# Размер блока потоковой обработки (строк). Память на блок:
+# rows × каналы × окно × 8 байт (~11 МБ на 100k строк, 2 канала, окно 7).
+HAMPEL_CHUNK_ROWS = 100_000
+
+# Окна шире — через pandas rolling (skiplist, O(n log w)); уже — сортирующая
+# сеть по сдвинутым колонкам (см. _centered_rolling_median).
+_SORT_WINDOW_MAX = 31
+
+
+def _centered_rolling_median(
+    values: np.ndarray,
+    window_half: int,
+    min_periods: int = 3,
+) -> np.ndarray:
+    """
+    Центрированная скользящая медиана по оси 0 для массива (n, k).
+
+    Семантика 1:1 с pandas `rolling(2h+1, center=True, min_periods).median()`:
+    NaN не учитываются, у краёв окно усечено, при чётном числе значений —
+    (a + b) / 2, при числе значений < min_periods — NaN.
+    """
+    n, k = values.shape
+    window_size = 2 * window_half + 1
+    if window_size > _SORT_WINDOW_MAX:
+        return (
+            pd.DataFrame(values)
+            .rolling(window=window_size, center=True, min_periods=min_periods)
+            .median()
+            .to_numpy()
+        )
+
+    # Окна как w сдвинутых колонок; NaN → +inf (уходят в конец при сортировке)
+    padded = np.full((n + 2 * window_half, k), np.inf)
+    padded[window_half:window_half + n] = np.where(np.isnan(values), np.inf, values)
+    cols = [padded[t:t + n].copy() for t in range(window_size)]
+    count = np.zeros((n, k), dtype=np.int64)
+    for c in cols:
+        count += c != np.inf
+
+    # Сортирующая сеть: O(w log² w) векторных min/max вместо сортировки
+    # миллиона крошечных окон
+    for i, j in _sorting_network(window_size):
+        lo_v = np.minimum(cols[i], cols[j])
+        np.maximum(cols[i], cols[j], out=cols[j])
+        cols[i] = lo_v
+    ordered = np.stack(cols)                     # (w, n, k)
+
+    lo = np.maximum(count - 1, 0) // 2
+    hi = count // 2
+    a = np.take_along_axis(ordered, lo[None], axis=0)[0]
+    b = np.take_along_axis(ordered, hi[None], axis=0)[0]
+    median = np.where(lo == hi, a, (a + b) / 2)
+    median[count < min_periods] = np.nan
+    return median
+
+
+_NETWORKS: dict[int, list[tuple[int, int]]] = {}
+
+
+def _sorting_network(size: int) -> list[tuple[int, int]]:
+    """
+    Компараторы сети Бэтчера (odd-even merge sort) для `size` элементов.
+
+    Сеть строится для ближайшей степени двойки; компараторы с индексом
+    ≥ size отброшены — недостающие позиции считаются +inf.
+    """
+    if size in _NETWORKS:
+        return _NETWORKS[size]
+    n = 1
+    while n < size:
+        n *= 2
+    pairs = []
+    p = 1
+    while p < n:
+        k = p
+        while k >= 1:
+            for j in range(k % p, n - k, 2 * k):
+                for i in range(min(k, n - j - k)):
+                    a, b = i + j, i + j + k
+                    if (a // (2 * p)) == (b // (2 * p)) and b < size:
+                        pairs.append((a, b))
+            k //= 2
+        p *= 2
+    _NETWORKS[size] = pairs
+    return pairs
+
+
+def _hampel_block(
+    values: np.ndarray,
+    window_half: int,
+    n_sigma: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Hampel для блока (n, k): (медиана окна, маска спайков)."""
+    K = 1.4826          # MAD → σ scale factor
+    min_abs_dev = 1.0   # минимальный абсолютный порог (атм)
+
+    rolling_median = _centered_rolling_median(values, window_half)
+    # MAD = median(|x - median|) — вторая скользящая медиана по отклонениям
+    deviation = np.abs(values - rolling_median)
+    rolling_mad = _centered_rolling_median(deviation, window_half)
+
+    # Порог: max(n_sigma * K * MAD, min_abs_dev); NaN-порог — не спайк
+    threshold = np.maximum(K * rolling_mad, min_abs_dev / n_sigma) * n_sigma
+    with np.errstate(invalid="ignore"):
+        is_spike = deviation > threshold
+    # NaN в значении или медиане → deviation NaN → сравнение False
+    return rolling_median, is_spike
+
+
+def hampel_filter_array(
+    values: np.ndarray,
+    window_half: int = 3,
+    n_sigma: float = 3.5,
+    chunk_rows: int = HAMPEL_CHUNK_ROWS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Потоковый Hampel для нескольких каналов за один проход.
+
+    values — (n,) или (n, k). Ряд обрабатывается блоками по chunk_rows
+    с перекрытием 2·window_half (медиана + медиана отклонений), поэтому
+    пиковая память не зависит от длины ряда, а результат совпадает с
+    расчётом по всему ряду.
+
+    Returns:
+        (отфильтрованный массив той же формы, маска спайков той же формы)
+    """
+    arr = np.asarray(values, dtype=float)
+    one_dim = arr.ndim == 1
+    if one_dim:
+        arr = arr[:, None]
+    n, k = arr.shape
+
+    result = arr.copy()
+    spikes = np.zeros((n, k), dtype=bool)
+    if n < 2 * window_half + 1:
+        return (result[:, 0], spikes[:, 0]) if one_dim else (result, spikes)
+
+    overlap = 2 * window_half
+    step = max(int(chunk_rows), 1)
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        lo = max(start - overlap, 0)
+        hi = min(stop + overlap, n)
+        median, is_spike = _hampel_block(arr[lo:hi], window_half, n_sigma)
+        core = slice(start - lo, stop - lo)
+        median, is_spike = median[core], is_spike[core]
+
+        spikes[start:stop] = is_spike
+        block = result[start:stop]
+        block[is_spike] = median[is_spike]
+
+    return (result[:, 0], spikes[:, 0]) if one_dim else (result, spikes)
+
+
 def hampel_filter(
     series: pd.Series,
     window_half: int = 3,
@@ -61,6 +216,9 @@ def hampel_filter(
         4. σ_est = 1.4826 * MAD (масштаб к нормальному распределению)
         5. Если |x[i] - m| > n_sigma * σ_est → спайк → заменить на m
 
+    Расчёт — hampel_filter_array (блоками, без pandas rolling).
+    Для пары каналов — hampel_filter_pair (один проход).
+
     Args:
         series: временной ряд давления
         window_half: полуширина окна (полное окно = 2*window_half + 1)
@@ -73,32 +231,45 @@ def hampel_filter(
     if len(series) < window_size:
         return series, 0
 
-    K = 1.4826          # MAD → σ scale factor
-    min_abs_dev = 1.0   # минимальный абсолютный порог (атм)
+    filtered, is_spike = hampel_filter_array(
+        series.to_numpy(dtype=float), window_half, n_sigma,
+    )
+    spike_count = int(is_spike.sum())
+    result = series.copy()
+    if spike_count > 0:
+        result[is_spike] = filtered[is_spike]
 
-    # Rolling median и MAD — vectorized через pandas
-    rolling_median = series.rolling(window=window_size, center=True, min_periods=3).median()
+    return result, spike_count
 
-    # MAD = median(|x - median|) — нужен .apply, но на маленьком окне это быстро
-    # Альтернатива: вычислить отклонение и применить rolling median к нему
-    deviation = (series - rolling_median).abs()
-    rolling_mad = deviation.rolling(window=window_size, center=True, min_periods=3).median()
 
-    # Порог: max(n_sigma * K * MAD, min_abs_dev)
-    sigma_est = K * rolling_mad
-    threshold = sigma_est.clip(lower=min_abs_dev / n_sigma) * n_sigma
+def hampel_filter_pair(
+    s_tube: pd.Series,
+    s_line: pd.Series,
+    window_half: int = 3,
+    n_sigma: float = 3.5,
+) -> tuple[pd.Series, pd.Series, int]:
+    """
+    Hampel для пары каналов на общем индексе — один проход по данным.
 
-    # Спайки: отклонение от медианы больше порога
-    is_spike = deviation > threshold
-    # Не считаем NaN спайками
-    is_spike = is_spike & series.notna() & rolling_median.notna()
+    Returns:
+        (p_tube, p_line, суммарное количество спайков)
+    """
+    window_size = 2 * window_half + 1
+    if len(s_tube) < window_size:
+        return s_tube, s_line, 0
 
-    spike_count = int(is_spike.sum())
-    result = series.copy()
-    if spike_count > 0:
-        result[is_spike] = rolling_median[is_spike]
+    stacked = np.column_stack([
+        s_tube.to_numpy(dtype=float), s_line.to_numpy(dtype=float),
+    ])
+    filtered, is_spike = hampel_filter_array(stacked, window_half, n_sigma)
 
-    return result, spike_count
+    out = []
+    for j, s in enumerate((s_tube, s_line)):
+        res = s.copy()
+        if is_spike[:, j].any():
+            res[is_spike[:, j]] = filtered[is_spike[:, j], j]
+        out.append(res)
+    return out[0], out[1], int(is_spike.sum())
 
 
 # ═══════════════════════════════════════════════════════════
@@ -297,9 +468,7 @@ def filter_pressure_pair(
 
     # ── Шаг 2: Hampel-фильтр (спайки) ──
     if filter_spikes:
-        s_tube, sp1 = hampel_filter(s_tube)
-        s_line, sp2 = hampel_filter(s_line)
-        stats["spikes_detected"] = sp1 + sp2
+        s_tube, s_line, stats["spikes_detected"] = hampel_filter_pair(s_tube, s_line)
 
     # ── Шаг 2a: Мгновенные скачки |ΔP| > порог ──
     if spike_threshold > 0:
@@ -315,7 +484,8 @@ def filter_pressure_pair(
 
     # Конвертируем обратно в списки (NaN → None)
     def to_list(s):
-        return [None if pd.isna(v) else round(float(v), 3) for v in s]
+        # v != v — NaN; tolist() отдаёт python float без поштучного float()
+        return [None if v != v else round(v, 3) for v in s.to_numpy(dtype=float).tolist()]
 
     return {
         "p_tube": to_list(s_tube),
@@ -6,8 +6,11 @@ pressure_mask_service.py — Применение масок коррекции
 """
 from __future__ import annotations
 
+import hashlib
 import logging
+import time
 from datetime import datetime, timedelta
+from threading import Lock
 from typing import Optional
 
 import numpy as np
@@ -18,25 +21,29 @@ from backend.db import engine as pg_engine
 
 log = logging.getLogger(__name__)
 
+# Источник масок инкрементального сканера (pressure_anomaly_scanner). Такие
+# маски — кандидаты: до подтверждения (verify-batch → is_verified) они видны
+# только в /api/pressure-masks/pending и не применяются к графикам, дебиту и
+# отчётам.
+SCAN_SOURCE = "scan"
+
+# Маски, которые применяются к данным: активные, кроме неподтверждённых
+# кандидатов сканера.
+_APPLIED_MASKS_SQL = (
+    f"is_active = true AND NOT (source = '{SCAN_SOURCE}' AND is_verified = false)"
+)
+
 
 # ──────────────────── Загрузка масок из БД ────────────────────
 
 
-def load_active_masks(
+def _query_masks(
     well_id: int,
     dt_start: datetime,
     dt_end: datetime,
     verified_only: bool = False,
 ) -> list:
-    """
-    Загружает активные маски для скважины, пересекающиеся с периодом.
-    Возвращает список объектов-словарей (не ORM, чтобы не тянуть сессию).
-
-    Parameters
-    ----------
-    verified_only : bool
-        Если True — возвращает только подтверждённые маски (is_verified = true).
-    """
+    """Прямой запрос применяемых масок за период (без индекса)."""
     verified_clause = "AND is_verified = true" if verified_only else ""
     with pg_engine.connect() as conn:
         rows = conn.execute(
@@ -46,7 +53,7 @@ def load_active_masks(
                        manual_delta_p, reason, is_verified
                 FROM pressure_mask
                 WHERE well_id = :well_id
-                  AND is_active = true
+                  AND {_APPLIED_MASKS_SQL}
                   {verified_clause}
                   AND dt_start < :period_end
                   AND dt_end > :period_start
@@ -58,30 +65,245 @@ def load_active_masks(
                 "period_end": dt_end,
             },
         ).fetchall()
+    return [_row_to_mask(r) for r in rows]
 
-    masks = []
-    for r in rows:
-        masks.append({
-            "id": r[0],
-            "well_id": r[1],
-            "problem_type": r[2],
-            "affected_sensor": r[3],
-            "correction_method": r[4],
-            "dt_start": r[5],
-            "dt_end": r[6],
-            "manual_delta_p": r[7],
-            "reason": r[8],
-            "is_verified": r[9],
+
+def _row_to_mask(r) -> dict:
+    return {
+        "id": r[0],
+        "well_id": r[1],
+        "problem_type": r[2],
+        "affected_sensor": r[3],
+        "correction_method": r[4],
+        "dt_start": r[5],
+        "dt_end": r[6],
+        "manual_delta_p": r[7],
+        "reason": r[8],
+        "is_verified": r[9],
+    }
+
+
+def load_active_masks(
+    well_id: int,
+    dt_start: datetime,
+    dt_end: datetime,
+    verified_only: bool = False,
+    use_index: bool = True,
+) -> list:
+    """
+    Загружает активные маски для скважины, пересекающиеся с периодом.
+    Возвращает список объектов-словарей (не ORM, чтобы не тянуть сессию).
+    Неподтверждённые кандидаты сканера (source = SCAN_SOURCE) не входят.
+
+    Parameters
+    ----------
+    verified_only : bool
+        Если True — возвращает только подтверждённые маски (is_verified = true).
+    use_index : bool
+        True (дефолт) — ответ из кэшированного индекса масок скважины
+        (см. get_mask_index); False — прямой запрос в БД.
+    """
+    if not use_index:
+        return _query_masks(well_id, dt_start, dt_end, verified_only)
+    return get_mask_index(well_id).query(dt_start, dt_end, verified_only)
+
+
+# ──────────────────── Индекс масок скважины ────────────────────
+#
+# Графики, дебит и отчёты зовут load_active_masks на каждый запрос. Индекс
+# держит ВСЕ применяемые маски скважины (один запрос, без кандидатов
+# сканера), отсортированные по dt_start, и отвечает на «маски за период»
+# через searchsorted.
+#
+# revision — хэш содержимого масок (id, метод, датчик, границы, параметр,
+# верификация): одинаков во всех процессах, меняется при любой правке маски.
+# Инвалидация: явная (invalidate_mask_index из CRUD-эндпоинтов и
+# auto_create_masks) + TTL — для правок из других процессов (планировщик).
+
+MASK_INDEX_TTL_SECONDS = 60
+
+
+def _naive_utc(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts
+
+
+class WellMaskIndex:
+    """Отсортированные активные маски одной скважины + производные данные."""
+
+    def __init__(self, well_id: int, masks: list[dict]):
+        self.well_id = well_id
+        self.masks = sorted(masks, key=lambda m: (m["dt_start"], m["id"]))
+        self.starts = np.array(
+            [_naive_utc(m["dt_start"]).to_datetime64() for m in self.masks],
+            dtype="datetime64[ns]",
+        )
+        self.ends = np.array(
+            [_naive_utc(m["dt_end"]).to_datetime64() for m in self.masks],
+            dtype="datetime64[ns]",
+        )
+        self.revision = self._make_revision(self.masks)
+        self.loaded_at = time.monotonic()
+        # Производные; ключ — сама маска (_mask_key) + период сезонности,
+        # при новой ревизии профили оставшихся масок переносятся (_store_index):
+        self.seasonal_profiles: dict[tuple, dict] = {}
+        self.bridge_params: dict[tuple, tuple] = {}
+
+    @staticmethod
+    def _make_revision(masks: list[dict]) -> str:
+        key = repr([
+            (
+                m["id"], m["affected_sensor"], m["correction_method"],
+                str(m["dt_start"]), str(m["dt_end"]),
+                m["manual_delta_p"], bool(m["is_verified"]),
+            )
+            for m in masks
+        ])
+        return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+    def query(
+        self,
+        dt_start: datetime,
+        dt_end: datetime,
+        verified_only: bool = False,
+    ) -> list[dict]:
+        """Маски с dt_start < period_end и dt_end > period_start (как SQL)."""
+        if not self.masks:
+            return []
+        hi = int(np.searchsorted(
+            self.starts, _naive_utc(dt_end).to_datetime64(), side="left",
+        ))
+        sel = np.flatnonzero(self.ends[:hi] > _naive_utc(dt_start).to_datetime64())
+        out = []
+        for i in sel:
+            m = self.masks[i]
+            if verified_only and not m["is_verified"]:
+                continue
+            m = dict(m)
+            m["revision"] = self.revision
+            out.append(m)
+        return out
+
+
+_mask_index: dict[int, WellMaskIndex] = {}
+_mask_index_lock = Lock()
+
+
+def get_mask_index(well_id: int) -> WellMaskIndex:
+    """Индекс масок скважины: из кэша или одним запросом в БД."""
+    with _mask_index_lock:
+        idx = _mask_index.get(well_id)
+    if idx is not None and time.monotonic() - idx.loaded_at < MASK_INDEX_TTL_SECONDS:
+        return idx
+
+    with pg_engine.connect() as conn:
+        rows = conn.execute(
+            text(f"""
+                SELECT id, well_id, problem_type, affected_sensor,
+                       correction_method, dt_start, dt_end,
+                       manual_delta_p, reason, is_verified
+                FROM pressure_mask
+                WHERE well_id = :well_id
+                  AND {_APPLIED_MASKS_SQL}
+                ORDER BY dt_start, id
+            """),
+            {"well_id": well_id},
+        ).fetchall()
+    return _store_index(WellMaskIndex(well_id, [_row_to_mask(r) for r in rows]))
+
+
+def _store_index(fresh: WellMaskIndex) -> WellMaskIndex:
+    with _mask_index_lock:
+        old = _mask_index.get(fresh.well_id)
+        if old is not None and old.revision == fresh.revision:
+            # Маски не менялись — сохраняем уже посчитанные профили.
+            old.loaded_at = fresh.loaded_at
+            return old
+        if old is not None:
+            # Профили ключуются по самой маске (_mask_key) — правка соседней
+            # маски их не портит; переносим профили масок, которые остались.
+            keys = {_mask_key(m) for m in fresh.masks}
+            fresh.seasonal_profiles = {
+                k: v for k, v in old.seasonal_profiles.items() if k[0] in keys
+            }
+            fresh.bridge_params = {
+                k: v for k, v in old.bridge_params.items() if k[0] in keys
+            }
+        _mask_index[fresh.well_id] = fresh
+    log.debug(
+        "[mask_index] well=%d loaded %d masks rev=%s",
+        fresh.well_id, len(fresh.masks), fresh.revision,
+    )
+    return fresh
+
+
+def preload_mask_indexes(well_ids) -> int:
+    """Индексы масок нескольких скважин одним запросом (отчёты по списку).
+
+    Загружаются только отсутствующие / устаревшие по TTL индексы.
+    Возвращает число загруженных индексов.
+    """
+    now = time.monotonic()
+    with _mask_index_lock:
+        need = sorted({
+            int(w) for w in well_ids
+            if w not in _mask_index
+            or now - _mask_index[w].loaded_at >= MASK_INDEX_TTL_SECONDS
         })
-    return masks
+    if not need:
+        return 0
+    with pg_engine.connect() as conn:
+        rows = conn.execute(
+            text(f"""
+                SELECT id, well_id, problem_type, affected_sensor,
+                       correction_method, dt_start, dt_end,
+                       manual_delta_p, reason, is_verified
+                FROM pressure_mask
+                WHERE well_id = ANY(:well_ids)
+                  AND {_APPLIED_MASKS_SQL}
+                ORDER BY well_id, dt_start, id
+            """),
+            {"well_ids": need},
+        ).fetchall()
+    by_well: dict[int, list[dict]] = {w: [] for w in need}
+    for r in rows:
+        by_well[r[1]].append(_row_to_mask(r))
+    for w, masks in by_well.items():
+        _store_index(WellMaskIndex(w, masks))
+    return len(need)
+
+
+def invalidate_mask_index(well_id: int | None = None) -> None:
+    """Сбросить индекс масок (одной скважины или всех) после записи в pressure_mask."""
+    with _mask_index_lock:
+        if well_id is None:
+            _mask_index.clear()
+        else:
+            _mask_index.pop(well_id, None)
 
 
 # ──────────────────── Применение масок ────────────────────
+#
+# Окно маски на отсортированном индексе — это срез позиций [lo; hi),
+# найденный двумя searchsorted (O(log n)), а не булева маска по всему
+# кадру (O(n) на каждую маску). Все помощники работают через позиционные
+# срезы (iloc) — стоимость пропорциональна длине окна, а не периода.
+
+
+def _mask_bounds(index: pd.Index, dt_start, dt_end) -> tuple[int, int]:
+    """Позиции [lo; hi) точек с dt_start <= t <= dt_end."""
+    lo = int(index.searchsorted(dt_start, side="left"))
+    hi = int(index.searchsorted(dt_end, side="right"))
+    return lo, max(lo, hi)
 
 
 def apply_masks(
     df: pd.DataFrame,
     masks: list[dict],
+    *,
+    copy: bool = True,
 ) -> tuple[pd.DataFrame, int]:
     """
     Применяет маски коррекции к DataFrame давления.
@@ -95,12 +317,16 @@ def apply_masks(
     -------
     (corrected_df, total_corrected_points)
 
-    Оригинальный df не изменяется (делается копия).
+    Оригинальный df не изменяется (делается копия). copy=False — коррекции
+    пишутся в переданный df на месте (конвейер дебита владеет своим кадром).
     """
     if not masks or df.empty:
         return df, 0
 
-    df = df.copy()
+    if copy:
+        df = df.copy()
+    if not df.index.is_monotonic_increasing:
+        df.sort_index(inplace=True)
     total_corrected = 0
 
     for mask in masks:
@@ -109,11 +335,12 @@ def apply_masks(
         dt_start = mask["dt_start"]
         dt_end = mask["dt_end"]
 
-        # Маска по времени
-        time_mask = (df.index >= dt_start) & (df.index <= dt_end)
-        n_affected = int(time_mask.sum())
+        # Окно маски по времени — срез позиций
+        lo, hi = _mask_bounds(df.index, dt_start, dt_end)
+        n_affected = hi - lo
         if n_affected == 0:
             continue
+        window = slice(lo, hi)
 
         # Если affected_sensor == 'both' — применяем ко обоим, иначе к одному
         sensors_to_fix = ["p_tube", "p_line"] if sensor == "both" else [sensor]
@@ -122,21 +349,21 @@ def apply_masks(
             total_corrected += n_affected
 
             if method == "median_1d":
-                _apply_median(df, time_mask, affected, dt_start, window_days=1)
+                _apply_median(df, window, affected, dt_start, window_days=1)
 
             elif method == "median_3d":
-                _apply_median(df, time_mask, affected, dt_start, window_days=3)
+                _apply_median(df, window, affected, dt_start, window_days=3)
 
             elif method == "delta_reconstruct":
                 _apply_delta_reconstruct(
-                    df, time_mask, affected, dt_start,
+                    df, window, affected, dt_start,
                     manual_delta_p=mask.get("manual_delta_p"),
                 )
 
             elif method == "interpolate":
                 _apply_bridge(
-                    df, time_mask, affected, dt_start, dt_end,
-                    noise_factor=0.0, anchor_window_min=30,
+                    df, window, affected, dt_start, dt_end,
+                    noise_factor=0.0, anchor_window_min=30, mask=mask,
                 )
 
             elif method == "interpolate_noise":
@@ -145,8 +372,9 @@ def apply_masks(
                 if noise_factor is None or noise_factor < 0:
                     noise_factor = 1.0
                 _apply_bridge(
-                    df, time_mask, affected, dt_start, dt_end,
+                    df, window, affected, dt_start, dt_end,
                     noise_factor=float(noise_factor), anchor_window_min=30,
+                    mask=mask,
                 )
 
             elif method == "bridge_median":
@@ -157,18 +385,19 @@ def apply_masks(
                 if noise_factor is None or noise_factor < 0:
                     noise_factor = 1.0
                 _apply_bridge(
-                    df, time_mask, affected, dt_start, dt_end,
+                    df, window, affected, dt_start, dt_end,
                     noise_factor=float(noise_factor), anchor_window_min=60,
+                    mask=mask,
                 )
 
             elif method == "seasonal_reconstruct":
                 _apply_seasonal_reconstruct(
-                    df, time_mask, affected, dt_start, dt_end,
+                    df, window, affected, dt_start, dt_end,
                     mask.get("well_id"), mask,
                 )
 
             elif method == "exclude":
-                df.loc[time_mask, affected] = np.nan
+                df.iloc[window, df.columns.get_loc(affected)] = np.nan
 
             log.debug(
                 "mask %s: method=%s sensor=%s %d points",
@@ -199,12 +428,16 @@ def _robust_anchor(
     Если в окне нет валидных точек — расширяет до 3×window. Возвращает None,
     если всё равно пусто (нет чистых данных с этой стороны).
     """
+    col = df[affected]
+
     def _window_data(w_min: int) -> pd.Series:
         if side == "left":
-            m = (df.index >= dt_ref - timedelta(minutes=w_min)) & (df.index < dt_ref)
+            lo = df.index.searchsorted(dt_ref - timedelta(minutes=w_min), side="left")
+            hi = df.index.searchsorted(dt_ref, side="left")
         else:
-            m = (df.index > dt_ref) & (df.index <= dt_ref + timedelta(minutes=w_min))
-        return df.loc[m, affected].dropna()
+            lo = df.index.searchsorted(dt_ref, side="right")
+            hi = df.index.searchsorted(dt_ref + timedelta(minutes=w_min), side="right")
+        return col.iloc[lo:hi].dropna()
 
     s = _window_data(window_min)
     s = s[s > zero_thr]
@@ -224,6 +457,30 @@ def _robust_anchor(
     return med
 
 
+def _clean_tail_before(
+    df: pd.DataFrame,
+    affected: str,
+    dt_start: datetime,
+    n_points: int,
+    zero_thr: float = 0.1,
+) -> pd.Series:
+    """
+    Последние n_points чистых (не-NaN, > zero_thr) значений до dt_start.
+
+    Просматривает историю блоками с удвоением — не фильтрует весь префикс.
+    """
+    hi = int(df.index.searchsorted(dt_start, side="left"))
+    col = df[affected]
+    span = max(n_points * 2, 64)
+    while True:
+        lo = max(0, hi - span)
+        chunk = col.iloc[lo:hi].dropna()
+        chunk = chunk[chunk > zero_thr]
+        if len(chunk) >= n_points or lo == 0:
+            return chunk.tail(n_points)
+        span *= 2
+
+
 def _estimate_noise_std(
     df: pd.DataFrame,
     affected: str,
@@ -231,9 +488,7 @@ def _estimate_noise_std(
     zero_thr: float = 0.1,
 ) -> float:
     """σ шума из MAD detrended значений за 6ч ПЕРЕД маской (ложные нули отфильтрованы)."""
-    clean_window = df.loc[df.index < dt_start, affected].dropna()
-    clean_window = clean_window[clean_window > zero_thr]
-    clean_window = clean_window.tail(6 * 60)
+    clean_window = _clean_tail_before(df, affected, dt_start, 6 * 60, zero_thr)
     if len(clean_window) < 20:
         return 0.05
     detrended = clean_window - clean_window.rolling(30, center=True, min_periods=5).mean()
@@ -244,36 +499,229 @@ def _estimate_noise_std(
     return max(0.02, min(mad * 1.4826, 0.5))
 
 
+def _mask_key(mask: dict | None, dt_start=None) -> str:
+    """
+    Стабильный ключ маски по её собственным полям: id, границы, датчик,
+    метод, параметр.
+
+    Не включает ревизию масок скважины: правка или добавление другой маски
+    не меняет шум и кэши этой. dt_start — для реконструкции без маски.
+    """
+    m = mask or {}
+
+    def ts(value):
+        return None if value is None else _naive_utc(value).value
+
+    return repr((
+        m.get("id"), ts(m.get("dt_start", dt_start)), ts(m.get("dt_end")),
+        m.get("affected_sensor"), m.get("correction_method"), m.get("manual_delta_p"),
+    ))
+
+
+def _mask_rng(
+    mask: dict | None,
+    affected: str,
+    dt_start,
+) -> np.random.Generator:
+    """
+    Генератор шума реконструкции, засеянный от ключа маски (_mask_key) и
+    датчика.
+
+    Ключ не зависит от запрошенного периода: дневной и месячный отчёт,
+    график и дебит получают бит-в-бит одинаковые p_tube/p_line в одной и той
+    же минуте маски — поверх них можно ставить кэш. Правка маски меняет её
+    ключ → новый шум; правка соседних масок шум не трогает. Датчик в ключе —
+    у маски 'both' p_tube и p_line не получают одинаковый шум (иначе он
+    гасится в ΔP).
+    """
+    key = f"{_mask_key(mask, dt_start)}:{affected}"
+    seed = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed)
+
+
+# Сетка шума маски: реализация строится на всю маску с этим шагом, окну
+# запроса достаётся срез по смещению от начала маски.
+MASK_NOISE_STEP = pd.Timedelta(minutes=1)
+
+
+def _mask_noise(
+    mask: dict | None,
+    affected: str,
+    sigma: float,
+    dt_start,
+    dt_end,
+    at: pd.Index,
+) -> np.ndarray:
+    """Коррелированный шум маски [dt_start; dt_end] в точках at."""
+    start = pd.Timestamp(dt_start)
+    n = int((pd.Timestamp(dt_end) - start) // MASK_NOISE_STEP) + 1
+    offsets = np.clip(np.asarray((at - start) // MASK_NOISE_STEP, dtype=np.int64), 0, n - 1)
+    noise = _correlated_noise(_mask_rng(mask, affected, dt_start), sigma, n)
+    return noise[offsets]
+
+
+def _correlated_noise(
+    rng: np.random.Generator,
+    sigma: float,
+    n: int,
+    reset_len: int = 15,
+) -> np.ndarray:
+    """
+    Коррелированный шум: случайное блуждание со сбросом каждые reset_len
+    точек, нормированное к σ = sigma. Весь участок — одним вектором.
+
+    Сброс эквивалентен прежнему циклу `c[i:] -= c[i]` по i = reset_len,
+    2·reset_len, …: в блоке k ≥ 1 значение = c[j] − c[k·reset_len].
+    """
+    white = rng.normal(0, sigma * 0.3, size=n)
+    correlated = np.cumsum(white)
+    if n > reset_len:
+        base = correlated[(np.arange(n) // reset_len) * reset_len]
+        base[:reset_len] = 0.0
+        correlated -= base
+    std = correlated.std()
+    if std > 0:
+        correlated = correlated / std * sigma
+    return correlated
+
+
+# Контекст моста: якоря и σ шума берутся из сырых давлений в фиксированном
+# окне вокруг маски (не из кадра вызывающего) — дневной и месячный отчёт
+# получают одинаковые значения в одной минуте маски. До маски — запас на
+# 6ч чистых точек для σ, после — на расширенное (3×) якорное окно.
+BRIDGE_CONTEXT_BEFORE = timedelta(hours=12)
+BRIDGE_CONTEXT_AFTER = timedelta(hours=3)
+# Сезонная реконструкция: до маски — 5 периодов (вход STL), после — граница.
+SEASONAL_CONTEXT_AFTER = timedelta(hours=1)
+
+
+def _load_raw_context(well_id: int, dt_start, dt_end) -> Optional[pd.DataFrame]:
+    """Сырые p_tube / p_line скважины за [dt_start; dt_end] (UTC); None — нет строк."""
+    with pg_engine.connect() as conn:
+        rows = conn.execute(
+            text("""
+                SELECT measured_at, p_tube, p_line
+                FROM pressure_raw
+                WHERE well_id = :well_id
+                  AND measured_at >= :start
+                  AND measured_at <= :end
+                ORDER BY measured_at
+            """),
+            {"well_id": well_id, "start": dt_start, "end": dt_end},
+        ).fetchall()
+    if not rows:
+        return None
+    df = pd.DataFrame(rows, columns=["measured_at", "p_tube", "p_line"])
+    df["measured_at"] = pd.to_datetime(df["measured_at"])
+    return df.set_index("measured_at").astype(float)
+
+
+def _mask_context(
+    df: pd.DataFrame,
+    mask: dict | None,
+    affected: str,
+    ctx_start,
+    ctx_end,
+) -> pd.DataFrame:
+    """
+    Опорные данные маски за [ctx_start; ctx_end], независимые от периода запроса.
+
+    С well_id — сырые давления скважины из pressure_raw, точки под масками
+    скважины (в т.ч. этой) выброшены: опора не берётся из заведомо плохих
+    данных. Без well_id (или без БД) — тот же интервал из df.
+    """
+    well_id = (mask or {}).get("well_id")
+    if well_id is not None:
+        try:
+            ctx = _load_raw_context(well_id, ctx_start, ctx_end)
+            if ctx is not None:
+                ctx = ctx.sort_index()
+                for other in get_mask_index(well_id).query(ctx_start, ctx_end):
+                    if other["affected_sensor"] in (affected, "both"):
+                        lo, hi = _mask_bounds(ctx.index, other["dt_start"], other["dt_end"])
+                        ctx.iloc[lo:hi, ctx.columns.get_loc(affected)] = np.nan
+                return ctx
+        except Exception as e:
+            log.warning("[mask] well %s: raw context unavailable: %s", well_id, e)
+    lo, hi = _mask_bounds(df.index, ctx_start, ctx_end)
+    return df.iloc[lo:hi]
+
+
+def _bridge_params(
+    df: pd.DataFrame,
+    mask: dict | None,
+    affected: str,
+    dt_start: datetime,
+    dt_end: datetime,
+    anchor_window_min: int,
+) -> tuple[Optional[float], Optional[float], float]:
+    """
+    (якорь слева, якорь справа, σ шума) моста по контексту маски.
+
+    Контекст — _mask_context за [dt_start − BRIDGE_CONTEXT_BEFORE;
+    dt_end + BRIDGE_CONTEXT_AFTER]. Кэшируются в индексе масок по ключу
+    маски, если окно контекста уже в прошлом.
+    """
+    ctx_start = pd.Timestamp(dt_start) - BRIDGE_CONTEXT_BEFORE
+    ctx_end = pd.Timestamp(dt_end) + BRIDGE_CONTEXT_AFTER
+    well_id = (mask or {}).get("well_id")
+    cache = key = None
+    if well_id is not None:
+        try:
+            cache = get_mask_index(well_id).bridge_params
+            key = (_mask_key(mask), affected, anchor_window_min)
+            if key in cache:
+                return cache[key]
+        except Exception as e:
+            log.debug("[bridge] params cache unavailable: %s", e)
+    ctx = _mask_context(df, mask, affected, ctx_start, ctx_end)
+
+    params = (
+        _robust_anchor(ctx, affected, dt_start, side="left", window_min=anchor_window_min),
+        _robust_anchor(ctx, affected, dt_end, side="right", window_min=anchor_window_min),
+        _estimate_noise_std(ctx, affected, dt_start),
+    )
+    if cache is not None and _naive_utc(ctx_end) < pd.Timestamp.now(tz="UTC").tz_localize(None):
+        cache[key] = params
+    return params
+
+
 def _apply_bridge(
     df: pd.DataFrame,
-    time_mask: pd.Series,
+    window: slice,
     affected: str,
     dt_start: datetime,
     dt_end: datetime,
     noise_factor: float = 1.0,
     anchor_window_min: int = 30,
+    mask: dict | None = None,
 ) -> None:
     """
     Мост через пропуск: робастная медиана по обе стороны + линия + шум.
 
     noise_factor = 0 → чистая прямая; 1 → естественный шум (σ из MAD за 6ч);
-    >1 — усиленный. Якорь игнорирует нули и спайки, устойчив к ложным нулям LoRa.
+    >1 — усиленный. Шум детерминирован (см. _mask_rng), якоря и σ — из
+    контекста маски (_bridge_params), линия — по времени от dt_start до
+    dt_end: значение в минуте маски не зависит от периода запроса.
+    Якорь игнорирует нули и спайки, устойчив к ложным нулям LoRa.
     Если с одной стороны нет чистых данных — якорь зеркалится с другой стороны.
     Если нет ни с одной — fallback к обычному linear interpolate по всему столбцу.
     """
-    n_affected = int(time_mask.sum())
-    if n_affected == 0:
+    n_affected = window.stop - window.start
+    if n_affected <= 0:
         return
+    col_pos = df.columns.get_loc(affected)
 
-    anchor_left = _robust_anchor(df, affected, dt_start, side="left", window_min=anchor_window_min)
-    anchor_right = _robust_anchor(df, affected, dt_end, side="right", window_min=anchor_window_min)
+    anchor_left, anchor_right, base_std = _bridge_params(
+        df, mask, affected, dt_start, dt_end, anchor_window_min,
+    )
 
     if anchor_left is None and anchor_right is None:
         log.warning(
             "[bridge] %s: no clean anchors for %s..%s — fallback to whole-column interpolate",
             affected, dt_start, dt_end,
         )
-        df.loc[time_mask, affected] = np.nan
+        df.iloc[window, col_pos] = np.nan
         df[affected] = df[affected].interpolate(method="linear")
         return
 
@@ -282,34 +730,33 @@ def _apply_bridge(
     if anchor_right is None:
         anchor_right = anchor_left
 
-    df.loc[time_mask, affected] = np.linspace(anchor_left, anchor_right, n_affected)
+    at = df.index[window]
+    span = pd.Timestamp(dt_end) - pd.Timestamp(dt_start)
+    if span > pd.Timedelta(0):
+        frac = np.clip(np.asarray((at - pd.Timestamp(dt_start)) / span, dtype=float), 0.0, 1.0)
+    else:
+        frac = np.zeros(n_affected)
+    line = anchor_left + (anchor_right - anchor_left) * frac
 
     if noise_factor and noise_factor > 0:
-        noise_std = _estimate_noise_std(df, affected, dt_start) * noise_factor
+        noise_std = base_std * noise_factor
         if noise_std > 0.001:
-            white = np.random.normal(0, noise_std * 0.3, size=n_affected)
-            correlated = np.cumsum(white)
-            reset_len = 15
-            for i in range(reset_len, len(correlated), reset_len):
-                correlated[i:] -= correlated[i]
-            if correlated.std() > 0:
-                correlated = correlated / correlated.std() * noise_std
-            df.loc[time_mask, affected] += correlated
+            line = line + _mask_noise(mask, affected, noise_std, dt_start, dt_end, at)
+
+    df.iloc[window, col_pos] = line
 
 
 def _apply_median(
     df: pd.DataFrame,
-    time_mask: pd.Series,
+    window: slice,
     affected: str,
     dt_start: datetime,
     window_days: int,
 ) -> None:
     """Заменяет affected_sensor медианой за window_days ДО начала проблемы."""
-    window_start = dt_start - timedelta(days=window_days)
-    pre_data = df.loc[
-        (df.index >= window_start) & (df.index < dt_start),
-        affected,
-    ]
+    lo = df.index.searchsorted(dt_start - timedelta(days=window_days), side="left")
+    hi = df.index.searchsorted(dt_start, side="left")
+    pre_data = df[affected].iloc[lo:hi]
     if pre_data.empty or pre_data.isna().all():
         # Нет данных до проблемы — fallback к общей медиане
         median_val = df[affected].median()
@@ -317,12 +764,12 @@ def _apply_median(
         median_val = pre_data.median()
 
     if pd.notna(median_val):
-        df.loc[time_mask, affected] = median_val
+        df.iloc[window, df.columns.get_loc(affected)] = median_val
 
 
 def _apply_delta_reconstruct(
     df: pd.DataFrame,
-    time_mask: pd.Series,
+    window: slice,
     affected: str,
     dt_start: datetime,
     manual_delta_p: Optional[float] = None,
@@ -338,10 +785,9 @@ def _apply_delta_reconstruct(
         median_dp = manual_delta_p
     else:
         # Считаем медиану ΔP за 1 день ДО проблемы
-        pre_start = dt_start - timedelta(days=1)
-        pre_data = df.loc[
-            (df.index >= pre_start) & (df.index < dt_start)
-        ]
+        lo = df.index.searchsorted(dt_start - timedelta(days=1), side="left")
+        hi = df.index.searchsorted(dt_start, side="left")
+        pre_data = df.iloc[lo:hi]
         if pre_data.empty:
             log.warning("delta_reconstruct: no pre-data, skipping mask")
             return
@@ -352,16 +798,151 @@ def _apply_delta_reconstruct(
             return
 
     good_col = "p_tube" if affected == "p_line" else "p_line"
+    good = df[good_col].iloc[window].to_numpy()
 
     if affected == "p_line":
-        df.loc[time_mask, "p_line"] = df.loc[time_mask, good_col] - median_dp
+        df.iloc[window, df.columns.get_loc("p_line")] = good - median_dp
     else:
-        df.loc[time_mask, "p_tube"] = df.loc[time_mask, good_col] + median_dp
+        df.iloc[window, df.columns.get_loc("p_tube")] = good + median_dp
+
+
+# Период сезонности по скважине: well_id → (ревизия вбросов, период).
+# Ревизия — (число, max id) событий 'reagent' скважины: новый вброс меняет её,
+# и период пересчитывается, не дожидаясь правки масок.
+_reagent_period: dict[int, tuple[tuple, int]] = {}
+_reagent_period_lock = Lock()
+
+_REAGENT_REVISION_SQL = text("""
+    SELECT CAST(w.number AS TEXT), count(e.id), max(e.id)
+    FROM wells w
+    LEFT JOIN events e
+      ON e.well = CAST(w.number AS TEXT) AND e.event_type = 'reagent'
+    WHERE w.id = :wid
+    GROUP BY w.number
+""")
+
+
+def _period_from_injections(times: list) -> Optional[int]:
+    """Период (5-мин точки) по медиане интервалов между вбросами; None — мало данных."""
+    if len(times) < 3:
+        return None
+    intervals_h = [
+        (times[i + 1] - times[i]).total_seconds() / 3600
+        for i in range(len(times) - 1)
+    ]
+    # Отсекаем дубли (<30 мин) и аномально длинные (>72ч)
+    clean_intervals = [x for x in intervals_h if 0.5 < x < 72]
+    if not clean_intervals:
+        return None
+    return max(12, int(float(np.median(clean_intervals)) * 12))
+
+
+def _reagent_period_5min(well_id: int | None) -> int:
+    """
+    Период сезонности (в 5-мин точках) по интервалам вбросов реагентов.
+
+    Кэшируется по скважине на ревизию событий-вбросов: на каждый вызов —
+    один агрегатный запрос, полный список вбросов читается только после
+    нового вброса.
+    """
+    period_5min = 144  # fallback: 12ч
+    if well_id is None:
+        return period_5min
+
+    try:
+        from backend.db import SessionLocal
+        db = SessionLocal()
+        try:
+            # well_id → well number (events хранят номер как текст)
+            row = db.execute(_REAGENT_REVISION_SQL, {"wid": well_id}).fetchone()
+            if row is None:
+                return period_5min
+            well_num, revision = row[0], (row[1], row[2])
+            with _reagent_period_lock:
+                cached = _reagent_period.get(well_id)
+            if cached is not None and cached[0] == revision:
+                return cached[1]
+
+            evt_rows = db.execute(
+                text("""
+                    SELECT event_time FROM events
+                    WHERE well = :w AND event_type = 'reagent'
+                    ORDER BY event_time
+                """),
+                {"w": well_num},
+            ).fetchall()
+            period = _period_from_injections([r[0] for r in evt_rows])
+            if period is not None:
+                period_5min = period
+                log.info(
+                    "[seasonal] well %d: %d injections → period=%d",
+                    well_id, len(evt_rows), period_5min,
+                )
+        finally:
+            db.close()
+    except Exception as e:
+        log.warning("[seasonal] failed to get injection period: %s", e)
+        return period_5min
+
+    with _reagent_period_lock:
+        _reagent_period[well_id] = (revision, period_5min)
+    return period_5min
+
+
+def _seasonal_profile(
+    stl_input: pd.Series,
+    period_5min: int,
+    well_id: int | None,
+    mask: dict | None,
+    affected: str,
+) -> Optional[dict]:
+    """
+    STL-профиль для реконструкции: цикл сезонности (с клампом) + σ остатка.
+
+    Считается один раз на (ключ маски, датчик, период, опорные данные) и
+    хранится в индексе масок скважины (переживает правку других масок); повторные графики/дебит/отчёты за тот
+    же период берут готовый профиль. None — STL не удался.
+    """
+    cache = None
+    key = None
+    if well_id is not None and mask is not None and mask.get("id") is not None:
+        try:
+            cache = get_mask_index(well_id).seasonal_profiles
+            digest = hashlib.sha1(
+                np.ascontiguousarray(stl_input.to_numpy(dtype=float)).tobytes()
+            ).hexdigest()[:16]
+            key = (_mask_key(mask), affected, period_5min, digest)
+            if key in cache:
+                return cache[key]
+        except Exception as e:
+            log.debug("[seasonal] profile cache unavailable: %s", e)
+            cache = None
+
+    try:
+        from statsmodels.tsa.seasonal import STL
+
+        stl_fit = STL(stl_input, period=period_5min, robust=True).fit()
+    except Exception as e:
+        log.warning("[seasonal] STL failed: %s — falling back to interpolate", e)
+        return None
+
+    # Клампим амплитуду сезонности: если STL «выучил» продувки как сезонность,
+    # амплитуда будет огромной. Ограничиваем до ±3*MAD сезонной компоненты.
+    seasonal_raw = stl_fit.seasonal.tail(period_5min).values
+    seasonal_mad = np.median(np.abs(seasonal_raw - np.median(seasonal_raw)))
+    seasonal_limit = max(seasonal_mad * 3 * 1.4826, 0.5)  # минимум ±0.5 атм
+    profile = {
+        "seasonal_cycle": np.clip(seasonal_raw, -seasonal_limit, seasonal_limit),
+        "resid_std": float(stl_fit.resid.tail(period_5min).std()),
+    }
+    if cache is not None and key is not None:
+        cache[key] = profile
+    return profile
 
 
 def _apply_seasonal_reconstruct(
     df: pd.DataFrame,
-    time_mask: pd.Series,
+    window: slice,
     affected: str,
     dt_start: datetime,
     dt_end: datetime,
@@ -378,61 +959,28 @@ def _apply_seasonal_reconstruct(
     2. STL(robust=True, period=из_вбросов) → тренд, сезонность, остаток
     3. Тренд: линейная экстраполяция
     4. Сезонность: повтор последнего полного цикла
-    5. Шум: коррелированный, σ из остатка STL
+    5. Шум: коррелированный, σ из остатка STL, детерминированный (_mask_rng)
     """
-    n_gap = int(time_mask.sum())
-    if n_gap == 0:
+    n_gap = window.stop - window.start
+    if n_gap <= 0:
         return
+    col_pos = df.columns.get_loc(affected)
 
     # Параметры из маски
     noise_factor = (mask or {}).get("manual_delta_p")
     if noise_factor is None or noise_factor < 0:
         noise_factor = 1.0
 
-    # ── 1. Период из вбросов реагентов ──
-    period_5min = 144  # fallback: 12ч
-    if well_id is not None:
-        try:
-            from backend.db import SessionLocal
-            db = SessionLocal()
-            try:
-                # well_id → well number (events хранят номер как текст)
-                well_row = db.execute(
-                    text("SELECT number FROM wells WHERE id = :wid"),
-                    {"wid": well_id},
-                ).fetchone()
-                if well_row:
-                    well_num = str(well_row[0])
-                    evt_rows = db.execute(
-                        text("""
-                            SELECT event_time FROM events
-                            WHERE well = :w AND event_type = 'reagent'
-                            ORDER BY event_time
-                        """),
-                        {"w": well_num},
-                    ).fetchall()
-                    if len(evt_rows) >= 3:
-                        times = [r[0] for r in evt_rows]
-                        intervals_h = [
-                            (times[i + 1] - times[i]).total_seconds() / 3600
-                            for i in range(len(times) - 1)
-                        ]
-                        # Отсекаем дубли (<30 мин) и аномально длинные (>72ч)
-                        clean_intervals = [x for x in intervals_h if 0.5 < x < 72]
-                        if clean_intervals:
-                            med_h = float(np.median(clean_intervals))
-                            period_5min = max(12, int(med_h * 12))
-                            log.info(
-                                "[seasonal] well %d: median injection interval %.1fh → period=%d",
-                                well_id, med_h, period_5min,
-                            )
-            finally:
-                db.close()
-        except Exception as e:
-            log.warning("[seasonal] failed to get injection period: %s", e)
+    # ── 1. Период из вбросов реагентов (кэш на ревизию вбросов) ──
+    period_5min = _reagent_period_5min(well_id)
 
-    # ── 2. Подготовка чистых данных ДО маски ──
-    before = df.loc[df.index < dt_start, affected].dropna()
+    # ── 2. Подготовка чистых данных ДО маски (контекст маски, не период запроса) ──
+    ctx = _mask_context(
+        df, mask, affected,
+        pd.Timestamp(dt_start) - pd.Timedelta(minutes=5 * period_5min * 5),
+        pd.Timestamp(dt_end) + SEASONAL_CONTEXT_AFTER,
+    )
+    before = ctx[affected].iloc[:ctx.index.searchsorted(dt_start, side="left")].dropna()
     # Нужно минимум 2 полных цикла для STL
     min_pts = period_5min * 2 + 10
     # Ресэмплим до 5 мин
@@ -443,18 +991,16 @@ def _apply_seasonal_reconstruct(
             "[seasonal] well %d: only %d clean points (need %d), falling back to interpolate",
             well_id or 0, len(before_5), min_pts,
         )
-        df.loc[time_mask, affected] = np.nan
+        df.iloc[window, col_pos] = np.nan
         df[affected] = df[affected].interpolate(method="linear")
         return
 
-    # ── 3. STL ──
-    try:
-        from statsmodels.tsa.seasonal import STL
-
-        stl_fit = STL(before_5.tail(period_5min * 5), period=period_5min, robust=True).fit()
-    except Exception as e:
-        log.warning("[seasonal] STL failed: %s — falling back to interpolate", e)
-        df.loc[time_mask, affected] = np.nan
+    # ── 3. STL-профиль (кэш на ревизию масок) ──
+    profile = _seasonal_profile(
+        before_5.tail(period_5min * 5), period_5min, well_id, mask, affected,
+    )
+    if profile is None:
+        df.iloc[window, col_pos] = np.nan
         df[affected] = df[affected].interpolate(method="linear")
         return
 
@@ -467,39 +1013,35 @@ def _apply_seasonal_reconstruct(
 
     # Реальное давление на границах (медиана 5 точек для сглаживания)
     val_before = before.tail(5).median()
-    after = df.loc[df.index > dt_end, affected].dropna()
+    after = ctx[affected].iloc[
+        ctx.index.searchsorted(dt_end, side="right"):
+    ].dropna()
     val_after = after.head(5).median() if len(after) >= 3 else val_before
     # Линейный тренд от val_before к val_after
     gap_trend = np.linspace(val_before, val_after, n_gap_5min)
 
     # ── 5. Сезонность: повтор последнего цикла ──
-    # Клампим амплитуду сезонности: если STL «выучил» продувки как сезонность,
-    # амплитуда будет огромной. Ограничиваем до ±3*MAD сезонной компоненты.
-    seasonal_raw = stl_fit.seasonal.tail(period_5min).values
-    seasonal_mad = np.median(np.abs(seasonal_raw - np.median(seasonal_raw)))
-    seasonal_limit = max(seasonal_mad * 3 * 1.4826, 0.5)  # минимум ±0.5 атм
-    seasonal_cycle = np.clip(seasonal_raw, -seasonal_limit, seasonal_limit)
+    seasonal_cycle = profile["seasonal_cycle"]
     gap_seasonal = np.tile(seasonal_cycle, n_gap_5min // period_5min + 1)[:n_gap_5min]
 
     # ── 6. Шум: коррелированный, σ из остатка STL ──
-    resid_std = float(stl_fit.resid.tail(period_5min).std())
+    resid_std = profile["resid_std"]
     if np.isnan(resid_std) or resid_std < 0.01:
         resid_std = 0.05
     resid_std = min(resid_std, 0.5)
     resid_std *= noise_factor  # масштаб от ползунка шума
 
-    white = np.random.normal(0, resid_std * 0.3, n_gap_5min) if resid_std > 0.001 else np.zeros(n_gap_5min)
-    corr_noise = np.cumsum(white)
-    for i in range(15, len(corr_noise), 15):
-        corr_noise[i:] -= corr_noise[i]
-    if corr_noise.std() > 0:
-        corr_noise = corr_noise / corr_noise.std() * resid_std
+    if resid_std > 0.001:
+        rng = _mask_rng(mask, affected, dt_start)
+        corr_noise = _correlated_noise(rng, resid_std, n_gap_5min)
+    else:
+        corr_noise = np.zeros(n_gap_5min)
 
     # ── 7. Собираем реконструкцию (5-мин) ──
     recon_5min = gap_trend + gap_seasonal + corr_noise
 
     # ── 8. Интерполируем обратно к исходной частоте (1-мин) ──
-    gap_idx = df.index[time_mask]
+    gap_idx = df.index[window]
     recon_5min_idx = pd.date_range(dt_start, periods=n_gap_5min, freq="5min")
     recon_series = pd.Series(recon_5min, index=recon_5min_idx)
     # Объединяем 5-мин и оригинальные timestamps, интерполируем
@@ -507,7 +1049,7 @@ def _apply_seasonal_reconstruct(
     recon_full = recon_series.reindex(combined_idx).interpolate(method="linear")
     # Берём значения только для оригинальных gap-timestamp'ов
     recon_at_gap = recon_full.reindex(gap_idx).ffill().bfill()
-    df.loc[time_mask, affected] = recon_at_gap.values
+    df.iloc[window, col_pos] = recon_at_gap.values
 
     log.info(
         "[seasonal] well %d sensor=%s: period=%d, recon %d→%d pts, resid_std=%.3f",
@@ -518,24 +1060,17 @@ def _apply_seasonal_reconstruct(
 # ──────────────────── Авто-детекция аномалий ────────────────────
 
 
-def detect_anomalies(
+def _load_raw_5min(
     well_id: int,
-    days: int = 30,
-    dp_threshold_sigma: float = 3.0,
-    min_duration_min: int = 30,
-    exclude_windows: list[tuple[datetime, datetime]] | None = None,
-) -> list[dict]:
+    dt_start: datetime,
+    dt_end: datetime,
+    min_rows: int = 100,
+) -> tuple[pd.DataFrame | None, int]:
     """
-    Базовая эвристика: ищет участки с аномальным ΔP.
-    exclude_windows — список (dt_start, dt_end) окон продувок, которые НЕ считаются аномалиями.
+    Сырые давления скважины за [dt_start; dt_end] (UTC) → 5-минутные медианы.
 
-    Returns
-    -------
-    list of {dt_start, dt_end, affected_sensor, confidence, suggested_method, dp_deviation}
+    Returns: (df | None, число сырых строк). None — если строк меньше min_rows.
     """
-    dt_end = datetime.utcnow()
-    dt_start = dt_end - timedelta(days=days)
-
     with pg_engine.connect() as conn:
         rows = conn.execute(
             text("""
@@ -551,15 +1086,65 @@ def detect_anomalies(
             {"well_id": well_id, "start": dt_start, "end": dt_end},
         ).fetchall()
 
-    if len(rows) < 100:
-        return []
+    if len(rows) < min_rows:
+        return None, len(rows)
 
     df = pd.DataFrame(rows, columns=["measured_at", "p_tube", "p_line"])
     df["measured_at"] = pd.to_datetime(df["measured_at"])
     df = df.set_index("measured_at").sort_index()
 
     # Ресэмплинг до 5-минутного интервала для скорости
-    df = df.resample("5min").median().dropna(how="all")
+    return df.resample("5min").median().dropna(how="all"), len(rows)
+
+
+def detect_anomalies(
+    well_id: int,
+    days: int = 30,
+    dp_threshold_sigma: float = 3.0,
+    min_duration_min: int = 30,
+    exclude_windows: list[tuple[datetime, datetime]] | None = None,
+) -> list[dict]:
+    """
+    Базовая эвристика: ищет участки с аномальным ΔP.
+    exclude_windows — список (dt_start, dt_end) окон продувок, которые НЕ считаются аномалиями.
+
+    Returns
+    -------
+    list of {dt_start, dt_end, affected_sensor, confidence, suggested_method, dp_deviation}
+    """
+    dt_end = datetime.utcnow()
+    dt_start = dt_end - timedelta(days=days)
+
+    df, _ = _load_raw_5min(well_id, dt_start, dt_end)
+    if df is None:
+        return []
+
+    results = find_dp_anomalies(
+        df,
+        dp_threshold_sigma=dp_threshold_sigma,
+        min_duration_min=min_duration_min,
+        exclude_windows=exclude_windows,
+    )
+
+    log.info(
+        "[detect_anomalies] well=%d days=%d found=%d anomalies (excluded %d purge windows)",
+        well_id, days, len(results), len(exclude_windows or []),
+    )
+    return results
+
+
+def find_dp_anomalies(
+    df: pd.DataFrame,
+    dp_threshold_sigma: float = 3.0,
+    min_duration_min: int = 30,
+    exclude_windows: list[tuple[datetime, datetime]] | None = None,
+) -> list[dict]:
+    """
+    Ядро detect_anomalies без БД: 5-минутный кадр (p_tube, p_line) → аномалии ΔP.
+
+    Кадр не изменяется. Формат результата — как у detect_anomalies.
+    """
+    df = df[["p_tube", "p_line"]].copy()
     if df.empty:
         return []
 
@@ -602,27 +1187,19 @@ def detect_anomalies(
             purge_mask = (df.index >= w_start - margin) & (df.index <= w_end + margin)
             df.loc[purge_mask, "is_anomaly"] = False
 
-    # Группировка последовательных аномалий
-    anomalies = []
-    in_anomaly = False
-    start_idx = None
-
-    for idx, row in df.iterrows():
-        if row["is_anomaly"] and not in_anomaly:
-            in_anomaly = True
-            start_idx = idx
-        elif not row["is_anomaly"] and in_anomaly:
-            in_anomaly = False
-            duration = (idx - start_idx).total_seconds() / 60
-            if duration >= min_duration_min:
-                anomalies.append((start_idx, idx))
-
-    # Закрыть последнюю аномалию
-    if in_anomaly and start_idx is not None:
-        last_idx = df.index[-1]
-        duration = (last_idx - start_idx).total_seconds() / 60
-        if duration >= min_duration_min:
-            anomalies.append((start_idx, last_idx))
+    # Группировка последовательных аномалий: конец серии — первая
+    # не-аномальная точка после неё (или последняя точка кадра)
+    flags = df["is_anomaly"].to_numpy(dtype=bool)
+    edges = np.diff(np.concatenate(([0], flags.astype(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_stops = np.minimum(np.flatnonzero(edges == -1), len(df) - 1)
+    starts_ts = df.index[run_starts]
+    stops_ts = df.index[run_stops]
+    durations = (stops_ts - starts_ts).total_seconds() / 60
+    anomalies = [
+        (a, b) for a, b, d in zip(starts_ts, stops_ts, durations)
+        if d >= min_duration_min
+    ]
 
     # Определить affected_sensor для каждой аномалии
     results = []
@@ -669,10 +1246,6 @@ def detect_anomalies(
             "dp_deviation": dp_deviation,
         })
 
-    log.info(
-        "[detect_anomalies] well=%d days=%d found=%d anomalies (excluded %d purge windows)",
-        well_id, days, len(results), len(exclude_windows or []),
-    )
     return results
 
 
@@ -682,20 +1255,10 @@ def detect_anomalies(
 KUNGRAD_OFFSET = timedelta(hours=5)
 
 
-def _detect_purge_events(well_id: int, days: int) -> list[dict]:
-    """
-    Загружает маркированные продувки из events для скважины.
-    Группирует start→stop в сессии и возвращает маски.
-
-    events.event_time хранится в локальном времени (Кунград, UTC+5).
-    Возвращает dt_start/dt_end в **UTC** (для совместимости с pressure_raw).
-    """
-    # events хранятся в локальном времени — запрашиваем с запасом
-    dt_end_local = datetime.utcnow() + KUNGRAD_OFFSET
-    dt_start_local = dt_end_local - timedelta(days=days)
-
+def _load_purge_rows(well_id: int, dt_start_local: datetime) -> list:
+    """Маркеры продувок (start/press/stop) скважины с dt_start_local (локальное время)."""
     with pg_engine.connect() as conn:
-        rows = conn.execute(
+        return conn.execute(
             text("""
                 SELECT e.event_time, e.purge_phase, e.p_tube, e.p_line
                 FROM events e
@@ -709,10 +1272,14 @@ def _detect_purge_events(well_id: int, days: int) -> list[dict]:
             {"well_id": well_id, "dt_start": dt_start_local},
         ).fetchall()
 
-    if not rows:
-        return []
 
-    # Группируем start → stop (press опционален)
+def _group_purge_rows(rows) -> list[dict]:
+    """
+    Группирует маркеры start → stop (press опционален) в окна продувок.
+
+    rows — (event_time, purge_phase, p_tube, p_line), event_time в локальном
+    времени, по возрастанию. Возвращает dt_start/dt_end в **UTC**.
+    """
     MAX_GAP = timedelta(hours=4)
     results = []
     current_start = None
@@ -742,6 +1309,26 @@ def _detect_purge_events(well_id: int, days: int) -> list[dict]:
             "dt_end": current_start + timedelta(hours=1) - KUNGRAD_OFFSET,
             "reason": "Продувка (незакрытая)",
         })
+    return results
+
+
+def _detect_purge_events(well_id: int, days: int) -> list[dict]:
+    """
+    Загружает маркированные продувки из events для скважины.
+    Группирует start→stop в сессии и возвращает маски.
+
+    events.event_time хранится в локальном времени (Кунград, UTC+5).
+    Возвращает dt_start/dt_end в **UTC** (для совместимости с pressure_raw).
+    """
+    # events хранятся в локальном времени — запрашиваем с запасом
+    dt_end_local = datetime.utcnow() + KUNGRAD_OFFSET
+    dt_start_local = dt_end_local - timedelta(days=days)
+
+    rows = _load_purge_rows(well_id, dt_start_local)
+    if not rows:
+        return []
+
+    results = _group_purge_rows(rows)
 
     log.info(
         "[_detect_purge_events] well=%d days=%d found=%d purges",
@@ -750,6 +1337,69 @@ def _detect_purge_events(well_id: int, days: int) -> list[dict]:
     return results
 
 
+def _anomaly_candidates(dp_anomalies: list[dict]) -> list[dict]:
+    """Аномалии ΔP → кандидаты в маски sensor_fault (продувки НЕ создаются)."""
+    return [
+        {
+            "dt_start": datetime.fromisoformat(a["dt_start"]),
+            "dt_end": datetime.fromisoformat(a["dt_end"]),
+            "problem_type": "sensor_fault",
+            "affected_sensor": a["affected_sensor"],
+            "correction_method": a.get("suggested_method", "delta_reconstruct"),
+            "confidence": a.get("confidence"),
+            "reason": f"ΔP deviation {a.get('dp_deviation', '?')} atm, "
+                      f"duration {a.get('duration_hours', '?')}h",
+        }
+        for a in dp_anomalies
+    ]
+
+
+def _new_masks_without_overlap(
+    well_id: int,
+    candidates: list[dict],
+    existing: list,
+    source: str,
+    batch_id: str,
+) -> tuple[list, int]:
+    """
+    Кандидаты → новые объекты PressureMask, пропуская пересечения.
+
+    existing — активные маски скважины (объекты с dt_start/dt_end);
+    дополняется созданными, чтобы кандидаты не пересекались между собой.
+    Returns: (новые маски, число пропущенных).
+    """
+    from backend.models.pressure_mask import PressureMask
+
+    new_masks = []
+    skipped = 0
+    for c in candidates:
+        dt_start = c["dt_start"]
+        dt_end = c["dt_end"]
+
+        # Проверка пересечения с существующими масками
+        if any(ex.dt_start < dt_end and ex.dt_end > dt_start for ex in existing):
+            skipped += 1
+            continue
+
+        m = PressureMask(
+            well_id=well_id,
+            problem_type=c["problem_type"],
+            affected_sensor=c["affected_sensor"],
+            correction_method=c["correction_method"],
+            dt_start=dt_start,
+            dt_end=dt_end,
+            is_active=True,
+            is_verified=c["problem_type"] == "purge",  # продувки из маркеров = verified
+            source=source,
+            detection_confidence=c.get("confidence"),
+            batch_id=batch_id,
+            reason=c["reason"],
+        )
+        existing.append(m)
+        new_masks.append(m)
+    return new_masks, skipped
+
+
 def auto_create_masks(
     well_id: int,
     days: int = 7,
@@ -762,6 +1412,9 @@ def auto_create_masks(
 
     Не создаёт дубликаты (проверяет пересечение с существующими масками).
     Returns: {created: N, skipped_overlap: M, batch_id: str}
+
+    Для регулярного прогона по всему фонду — инкрементальный
+    services/pressure_anomaly_scanner.scan_fleet.
     """
     import uuid
     from backend.db import SessionLocal
@@ -777,19 +1430,7 @@ def auto_create_masks(
     )
 
     # Только sensor_fault — продувки НЕ создаются автоматически
-    candidates = []
-
-    for a in dp_anomalies:
-        candidates.append({
-            "dt_start": datetime.fromisoformat(a["dt_start"]),
-            "dt_end": datetime.fromisoformat(a["dt_end"]),
-            "problem_type": "sensor_fault",
-            "affected_sensor": a["affected_sensor"],
-            "correction_method": a.get("suggested_method", "delta_reconstruct"),
-            "confidence": a.get("confidence"),
-            "reason": f"ΔP deviation {a.get('dp_deviation', '?')} atm, "
-                      f"duration {a.get('duration_hours', '?')}h",
-        })
+    candidates = _anomaly_candidates(dp_anomalies)
 
     if not candidates:
         return {"created": 0, "skipped_overlap": 0, "batch_id": None}
@@ -807,43 +1448,14 @@ def auto_create_masks(
             .all()
         )
 
-        created = 0
-        skipped = 0
-
-        for c in candidates:
-            dt_start = c["dt_start"]
-            dt_end = c["dt_end"]
-
-            # Проверка пересечения с существующими масками того же типа
-            overlaps = False
-            for ex in existing:
-                if ex.dt_start < dt_end and ex.dt_end > dt_start:
-                    overlaps = True
-                    break
-
-            if overlaps:
-                skipped += 1
-                continue
-
-            m = PressureMask(
-                well_id=well_id,
-                problem_type=c["problem_type"],
-                affected_sensor=c["affected_sensor"],
-                correction_method=c["correction_method"],
-                dt_start=dt_start,
-                dt_end=dt_end,
-                is_active=True,
-                is_verified=c["problem_type"] == "purge",  # продувки из маркеров = verified
-                source=source,
-                detection_confidence=c.get("confidence"),
-                batch_id=batch_id,
-                reason=c["reason"],
-            )
-            db.add(m)
-            existing.append(m)
-            created += 1
-
+        new_masks, skipped = _new_masks_without_overlap(
+            well_id, candidates, existing, source, batch_id,
+        )
+        created = len(new_masks)
+        db.add_all(new_masks)
         db.commit()
+        if created:
+            invalidate_mask_index(well_id)
 
         log.info(
             "[auto_create_masks] well=%d created=%d skipped=%d batch=%s",
@@ -7,11 +7,13 @@
   3. Агрегация pressure.db → PostgreSQL (hourly)
   4. Синхронизация сырых данных → PostgreSQL (pressure_raw)
   5. Обновление pressure_latest из pressure_raw (PostgreSQL)
+  6. Инкрементальный скан аномалий ΔP (pressure_anomaly_scanner)
+  7. Проверка устаревания данных
 
 Оптимизации:
   - Шаг 2 возвращает affected_well_ids и min_timestamp
-  - Шаги 3-5 обрабатывают только затронутые скважины и период
-  - Если ничего не изменилось — шаги 3-5 пропускаются
+  - Шаги 3-6 обрабатывают только затронутые скважины и период
+  - Если ничего не изменилось — шаги 3-6 пропускаются
 
 Может запускаться:
   - Вручную: python -m backend.services.pressure_pipeline
@@ -81,7 +83,7 @@ def run_pipeline(skip_sync: bool = False) -> dict:
             if k not in ("affected_well_ids", "min_timestamp")
         }
 
-        # === Шаги 3-5: только если есть новые данные ===
+        # === Шаги 3-6: только если есть новые данные ===
         affected_wells = import_result.get("affected_well_ids", set())
         min_timestamp = import_result.get("min_timestamp")
 
@@ -112,13 +114,20 @@ def run_pipeline(skip_sync: bool = False) -> dict:
             if latest_result.get("error"):
                 results["success"] = False
                 results["error"] = f"update_latest: {latest_result['error']}"
+
+            # === Шаг 6: Скан аномалий ΔP по новым минутам ===
+            # Ошибки сканера НЕ роняют пайплайн — маски лишь кандидаты
+            results["steps"]["anomaly_scan"] = _step_anomaly_scan(
+                well_ids=affected_wells,
+            )
         else:
-            log.info("Шаги 3-5 пропущены (нет новых данных)")
+            log.info("Шаги 3-6 пропущены (нет новых данных)")
             results["steps"]["aggregate"] = {"skipped": True, "reason": "no new data"}
             results["steps"]["sync_raw"] = {"skipped": True, "reason": "no new data"}
             results["steps"]["update_latest"] = {"skipped": True, "reason": "no new data"}
+            results["steps"]["anomaly_scan"] = {"skipped": True, "reason": "no new data"}
 
-        # === Шаг 6: Проверка устаревания данных ===
+        # === Шаг 7: Проверка устаревания данных ===
         results["steps"]["staleness_alert"] = _step_staleness_alert()
 
     except Exception as e:
@@ -138,14 +147,14 @@ def run_pipeline(skip_sync: bool = False) -> dict:
 
 def _step_staleness_alert() -> dict:
     """
-    Шаг 6: Проверить актуальность данных давления.
+    Шаг 7: Проверить актуальность данных давления.
 
     Если MAX(pressure_latest.measured_at) старше PRESSURE_STALE_ALERT_MIN минут
     и кулдаун (PRESSURE_STALE_COOLDOWN_MIN) прошёл — отправить Telegram-алерт.
 
     Алерт независимый: ошибки не меняют success пайплайна.
     """
-    log.info("=== Шаг 6: Проверка устаревания данных ===")
+    log.info("=== Шаг 7: Проверка устаревания данных ===")
     try:
         from backend.settings import settings
         from backend.db import SessionLocal
@@ -411,6 +420,23 @@ def _step_update_latest(well_ids: set[int] = None) -> dict:
         return {"error": str(e)}
 
 
+def _step_anomaly_scan(well_ids: set[int] = None) -> dict:
+    """Шаг 6: Инкрементальный скан аномалий ΔP (только новые минуты)."""
+    log.info("=== Шаг 6: Скан аномалий ΔP ===")
+    try:
+        from backend.services.pressure_anomaly_scanner import scan_fleet
+        result = scan_fleet(well_ids=well_ids)
+        result.pop("wells", None)
+        log.info(
+            f"Anomaly scan: {result['wells_scanned']} скважин, "
+            f"{result['found']} аномалий, {result['created']} масок"
+        )
+        return result
+    except Exception as e:
+        log.error(f"Anomaly scan ошибка: {e}")
+        return {"error": str(e)}
+
+
 # === Запуск из командной строки ===
 if __name__ == "__main__":
     import argparse
@@ -18,6 +18,9 @@ Snapshot хранит И метрики, И данные графика (bins+co
 (nIQR = IQR/медиана); нормальность — по асимметрии+эксцессу (не Шапиро, т.к. на
 тысячах минутных точек он гиперчувствителен); классификация стабильности по nIQR.
 Пороги помечены [требует калибровки] — уточняются на реальных данных.
+
+Минутные каналы — из pressure_stats_engine (кэш по версии данных), несколько
+скважин/периодов за один вызов — build_pressure_spectra.
 """
 from __future__ import annotations
 
@@ -113,7 +116,7 @@ def _compute_signal_spectrum(values: np.ndarray, *, bin_width: float,
     # Опциональное удаление выбросов (по галочке). По умолчанию — НЕ убираем.
     removed_pct = 0.0
     if remove_outliers and n >= 4:
-        _p25, _p75 = np.percentile(x, [25, 75])
+        _p25, _p75 = np.percentile(x, (25, 75))
         _iqr = _p75 - _p25
         if _iqr > 0:
             lo = _p25 - OUTLIER_IQR_K * _iqr
@@ -136,7 +139,7 @@ def _compute_signal_spectrum(values: np.ndarray, *, bin_width: float,
     median = float(np.median(x))
     mean = float(np.mean(x))
     std = float(np.std(x, ddof=1)) if n > 1 else 0.0
-    p10, p25, p75, p90 = (float(np.percentile(x, p)) for p in (10, 25, 75, 90))
+    p10, p25, p75, p90 = (float(v) for v in np.percentile(x, (10, 25, 75, 90)))
     iqr = p75 - p25
     w90 = p90 - p10
     mad = float(np.median(np.abs(x - median)))
@@ -309,30 +312,23 @@ def build_pressure_spectrum(
         "flags": {},
     }
 
-    # ── Данные через единый pipeline (тот же, что страница скважины) ──
+    # ── Данные через единый pipeline (тот же, что страница скважины);
+    #    каналы кэшируются движком по версии данных ──
     try:
-        from backend.services.flow_rate.full_pipeline import compute_full_flow
+        from backend.services import pressure_stats_engine as engine
         ds = _iso_utc(period_from, is_end=False)
         de = _iso_utc(period_to, is_end=True)
-        result = compute_full_flow(well_id, ds, de, smooth=True)
-        df = result["df"]
+        channels = engine.load_channels(well_id, ds, de)
     except Exception as exc:  # noqa: BLE001
         snapshot["block_status"] = "no_data"
         snapshot["error"] = f"compute_full_flow failed: {exc}"
         return snapshot
 
-    if df is None or df.empty:
+    if channels is None:
         snapshot["block_status"] = "no_data"
         return snapshot
 
-    p_tube = df["p_tube"].to_numpy(dtype=float)
-    p_line = df["p_line"].to_numpy(dtype=float)
-    # ΔP = max(0, p_tube − p_line) — соглашение проекта (перепад ≥ 0)
-    dp = np.clip(p_tube - p_line, 0.0, None)
-    # false-zeros: устьевое > 0
-    p_tube_valid = np.where(p_tube > 0, p_tube, np.nan)
-
-    series_map = {"p_tube": p_tube_valid, "dp": dp}
+    series_map = {"p_tube": channels["p_tube"], "dp": channels["dp"]}
     bin_map = {"p_tube": bw_p, "dp": bw_dp}
     left_zero = {"p_tube": False, "dp": True}
 
@@ -370,3 +366,34 @@ def build_pressure_spectrum(
     }
 
     return snapshot
+
+
+def build_pressure_spectra(
+    db,
+    items: list[dict[str, Any]],
+    *,
+    max_workers: int | None = None,
+    **criteria: Any,
+) -> list[dict[str, Any]]:
+    """Спектры для нескольких (скважина, период) — сравнение по фонду.
+
+    items — [{well_id, well_number?, period_from, period_to, label?}];
+    criteria — общие параметры build_pressure_spectrum (бины, пороги).
+    Элементы считаются параллельно (pressure_stats_engine.run_items),
+    результаты — в порядке items.
+    """
+    from backend.services import pressure_stats_engine as engine
+
+    def _one(item: dict[str, Any]) -> dict[str, Any]:
+        return build_pressure_spectrum(
+            db,
+            well_id=item["well_id"],
+            well_number=item.get("well_number"),
+            period_from=item["period_from"],
+            period_to=item["period_to"],
+            label=item.get("label"),
+            **criteria,
+        )
+
+    workers = engine.DEFAULT_WORKERS if max_workers is None else max_workers
+    return engine.run_items(_one, items, workers)
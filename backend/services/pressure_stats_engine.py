@@ -0,0 +1,159 @@
+"""
+pressure_stats_engine — общий движок статистики по минутному кадру LoRa.
+
+Спектр давления (pressure_spectrum_service) и зависимость параметров
+(param_correlation_service) берут одни и те же минутные каналы из
+compute_full_flow. Раньше каждый блок гнал полный pipeline заново на
+каждый вызов и на каждую пару параметров; здесь:
+
+  • load_channels — один прогон compute_full_flow на (скважина, период),
+    из кадра остаются только каналы P_уст/P_лин/ΔP/Q (float64, read-only).
+    Кэш по версии данных (flow_data_version: pressure_latest.updated_at +
+    ревизия масок), LRU + TTL — повторный спектр/корреляция той же
+    скважины и периода не трогают БД;
+  • pair_regressions — МНК-регрессия и R² для всех пар каналов разом:
+    попарно-полные суммы через матричные произведения масок (k×n), без
+    polyfit на каждую пару;
+  • run_items — независимые (скважина, период) параллельно (потоки: время
+    уходит на чтение pressure_raw и numpy, GIL отпускается).
+
+Каналы в кэше разделяются между запросами — не мутировать.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+CHANNEL_CACHE_TTL_SECONDS = 30 * 60
+CHANNEL_CACHE_MAX_ENTRIES = 16   # год минутных данных ≈ 17 МБ на запись
+
+_cache: "OrderedDict[tuple, tuple[float, Optional[dict[str, np.ndarray]]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def frame_channels(df) -> dict[str, np.ndarray]:
+    """Каналы из кадра compute_full_flow (ключи — как SIGNAL_META корреляции).
+
+    p_tube/p_line — только > 0 (false-zeros → NaN); ΔP = max(0, P_уст − P_лин)
+    по сырым давлениям (соглашение проекта); q — flow_rate.
+    """
+    p_tube = df["p_tube"].to_numpy(dtype=float)
+    p_line = df["p_line"].to_numpy(dtype=float)
+    out = {
+        "p_tube": np.where(p_tube > 0, p_tube, np.nan),
+        "p_line": np.where(p_line > 0, p_line, np.nan),
+        "dp": np.clip(p_tube - p_line, 0.0, None),
+        "q": (df["flow_rate"].to_numpy(dtype=float) if "flow_rate" in df.columns
+              else np.full(len(df), np.nan)),
+    }
+    for arr in out.values():
+        arr.flags.writeable = False
+    return out
+
+
+def load_channels(well_id: int, ds: str, de: str) -> Optional[dict[str, np.ndarray]]:
+    """Каналы скважины за период UTC [ds, de] (None — нет данных).
+
+    Исключения compute_full_flow пробрасываются и не кэшируются.
+    """
+    from backend.services.flow_rate.data_access import flow_data_version
+
+    key = (int(well_id), ds, de, flow_data_version(int(well_id)))
+    now = time.monotonic()
+    with _cache_lock:
+        item = _cache.get(key)
+        if item is not None and now - item[0] < CHANNEL_CACHE_TTL_SECONDS:
+            _cache.move_to_end(key)
+            return item[1]
+
+    from backend.services.flow_rate.full_pipeline import compute_full_flow
+
+    df = compute_full_flow(int(well_id), ds, de, smooth=True)["df"]
+    value = None if df is None or df.empty else frame_channels(df)
+
+    with _cache_lock:
+        _cache[key] = (time.monotonic(), value)
+        _cache.move_to_end(key)
+        while len(_cache) > CHANNEL_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return value
+
+
+def invalidate(well_id: Optional[int] = None) -> int:
+    """Сбросить каналы скважины (или все). Возвращает число записей."""
+    with _cache_lock:
+        keys = [k for k in _cache if well_id is None or k[0] == int(well_id)]
+        for k in keys:
+            del _cache[k]
+    return len(keys)
+
+
+def pair_regressions(
+    channels: dict[str, np.ndarray], pairs: Sequence[tuple[str, str]],
+) -> list[tuple[int, Optional[dict]]]:
+    """МНК y = slope·x + intercept и R² для пар (x, y) по попарно-полным точкам.
+
+    Все суммы — одним проходом: F — маска конечных значений (k×n), X0 —
+    каналы, центрированные по своему среднему, с нулями вместо NaN.
+    N = F·Fᵀ, Σx = X0·Fᵀ, Σx² = X0²·Fᵀ, Σxy = X0·X0ᵀ. Элемент — (число
+    общих точек, регрессия в формате param_correlation_service._regression);
+    регрессия None — < 2 точек или X без разброса.
+    """
+    keys = sorted({k for p in pairs for k in p})
+    idx = {k: i for i, k in enumerate(keys)}
+    X = np.vstack([np.asarray(channels[k], dtype=float) for k in keys])
+    F = np.isfinite(X)
+    centers = np.array([np.mean(row[f]) if f.any() else 0.0 for row, f in zip(X, F)])
+    X0 = np.where(F, X - centers[:, None], 0.0)
+    Ff = F.astype(float)
+    N = Ff @ Ff.T
+    S1 = X0 @ Ff.T
+    S2 = (X0 * X0) @ Ff.T
+    SP = X0 @ X0.T
+
+    out: list[tuple[int, Optional[dict]]] = []
+    for xk, yk in pairs:
+        i, j = idx[xk], idx[yk]
+        n = N[i, j]
+        if n < 2:
+            out.append((int(n), None))
+            continue
+        sx, sy = S1[i, j], S1[j, i]
+        vx = S2[i, j] - sx * sx / n
+        vy = S2[j, i] - sy * sy / n
+        cxy = SP[i, j] - sx * sy / n
+        if vx <= 0:
+            out.append((int(n), None))
+            continue
+        slope = cxy / vx
+        intercept = (sy / n + centers[j]) - slope * (sx / n + centers[i])
+        r2 = min(1.0, cxy * cxy / (vx * vy)) if vy > 0 else 0.0
+        both = F[i] & F[j]
+        xv = X[i][both]
+        out.append((int(n), {
+            "slope": round(float(slope), 5),
+            "intercept": round(float(intercept), 4),
+            "r2": round(float(r2), 4),
+            "x_min": round(float(xv.min()), 3),
+            "x_max": round(float(xv.max()), 3),
+        }))
+    return out
+
+
+def run_items(
+    fn: Callable[[Any], Any], items: Sequence[Any], max_workers: int = DEFAULT_WORKERS,
+) -> list[Any]:
+    """fn по каждому элементу, результаты в порядке items (≤ 1 — в потоке вызова)."""
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(it) for it in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(fn, items))
@@ -8,6 +8,10 @@
 - flow_rate.calculator — расчёт Q из давления
 - flow_rate.data_access — чтение pressure_raw, choke_mm
 - pressure_mask_service — маски давления
+
+Давление периода загружается и готовится ОДИН раз (_prepare_period_pressure),
+дебит считается один раз по валидным строкам; окна ИРВ, baseline и кривые
+overlay — срезы этого кадра по позициям (_period_arrays, _batch_irv_metrics).
 """
 from __future__ import annotations
 
@@ -805,6 +809,7 @@ def _prepare_period_pressure(
     well_id: int,
     period_start: datetime,
     period_end: datetime,
+    ctx=None,
 ) -> pd.DataFrame:
     """
     Загружает и подготавливает давление ОДИН раз на весь период.
@@ -812,17 +817,23 @@ def _prepare_period_pressure(
     Делает: SQL → удаление LoRa false-zeros → активные маски →
     clean_pressure → smooth_pressure (SavGol).
 
-    Используется в analyze_reagent_effectiveness как замена
-    N+1 загрузки внутри цикла по вбросам.
+    Используется в analyze_reagent_effectiveness и get_overlay_data как
+    замена N+1 загрузки внутри цикла по вбросам.
+
+    ctx — WellDataContext сборки отчёта: сырые точки — срез его кадра
+    pressure_raw вместо отдельного запроса.
 
     Возвращает DataFrame с колонками p_tube, p_line (+ _raw),
     индекс = measured_at (UTC). Пустой DF если нет данных.
     """
-    df = get_pressure_data(
-        well_id,
-        start=period_start.isoformat(),
-        end=period_end.isoformat(),
-    )
+    if ctx is not None:
+        df = ctx.raw_pressure(period_start, period_end)
+    else:
+        df = get_pressure_data(
+            well_id,
+            start=period_start.isoformat(),
+            end=period_end.isoformat(),
+        )
     if df.empty:
         return df
 
@@ -841,129 +852,194 @@ def _prepare_period_pressure(
     return df
 
 
-def _compute_irv_metrics_from_df(
-    df_full: pd.DataFrame,
-    inj: ReagentInjection,
-    t_start: datetime,
-    t_end: datetime,
+@dataclass
+class _PeriodArrays:
+    """Подготовленное давление периода в виде массивов для срезов ИРВ.
+
+    Все окна (pre-window, ИРВ, кривые overlay) вырезаются из одного кадра
+    по позициям searchsorted; дебит считается один раз по валидным строкам.
+    """
+    df: pd.DataFrame                     # результат _prepare_period_pressure
+    t_ns: np.ndarray                     # индекс df (int64, нс UTC)
+    valid_t: np.ndarray                  # время валидных строк (p_tube > p_line, ΔP > 0.1)
+    valid_dp: np.ndarray                 # ΔP валидных строк
+    q_prefix: Optional[np.ndarray] = None       # Σ Q по валидным строкам (префикс)
+    q_trapz_prefix: Optional[np.ndarray] = None  # Σ трапеций Q·dt между соседними валидными
+
+
+def _to_ns(times) -> np.ndarray:
+    return pd.DatetimeIndex(list(times)).as_unit("ns").asi8
+
+
+def _period_arrays(
+    df: pd.DataFrame,
     choke_mm: Optional[float],
     flow_cfg: FlowRateConfig,
+) -> _PeriodArrays:
+    """Массивы периода + мгновенный дебит (если есть штуцер) — один проход."""
+    if df is None or df.empty:
+        empty = np.array([], dtype=np.int64)
+        return _PeriodArrays(df=pd.DataFrame(), t_ns=empty, valid_t=empty,
+                             valid_dp=np.array([], dtype=float))
+
+    pt = df["p_tube"].to_numpy(dtype=float)
+    pl = df["p_line"].to_numpy(dtype=float)
+    dp = pt - pl
+    valid = ~np.isnan(pt) & ~np.isnan(pl) & (pt > pl) & (dp > 0.1)
+    t_ns = pd.DatetimeIndex(df.index).as_unit("ns").asi8
+    arrays = _PeriodArrays(df=df, t_ns=t_ns, valid_t=t_ns[valid], valid_dp=dp[valid])
+
+    if choke_mm is not None and choke_mm > 0 and valid.any():
+        q = calculate_flow_rate(
+            pd.DataFrame({"p_tube": pt[valid], "p_line": pl[valid]}),
+            choke_mm, flow_cfg, copy=False,
+        )["flow_rate"].to_numpy()
+        # Трапеции как в calculate_cumulative: вклад k — между валидными k−1 и k.
+        dt_days = np.diff(arrays.valid_t // 10**9) / 86400.0
+        trapz = (q[:-1] + q[1:]) * dt_days / 2.0
+        arrays.q_prefix = np.concatenate(([0.0], np.cumsum(q)))
+        arrays.q_trapz_prefix = np.concatenate(([0.0], np.cumsum(trapz)))
+    return arrays
+
+
+def _baseline_dp(arrays: _PeriodArrays, lo: int, hi: int) -> Optional[float]:
+    """Медиана ΔP валидных строк [lo, hi) — baseline pre-window."""
+    return float(np.median(arrays.valid_dp[lo:hi])) if hi > lo else None
+
+
+def _effect_duration_hours(
+    df_irv: pd.DataFrame,
+    baseline_dp: float,
     cfg: ReagentAnalysisConfig,
-) -> tuple[IRVMetrics, Optional[pd.DataFrame]]:
+) -> Optional[float]:
+    """M4: максимальный непрерывный блок, где сглаженная ΔP ≥ baseline + threshold.
+
+    Реагент может подействовать не сразу → ищем первое превышение,
+    потом считаем до момента падения ниже порога.
+    """
+    threshold = baseline_dp + cfg.dp_effect_threshold
+    dp_series = df_irv[["p_tube", "p_line"]].dropna()
+    if dp_series.empty:
+        return None
+    dp_rolling = (
+        (dp_series["p_tube"] - dp_series["p_line"])
+        .rolling(window=cfg.smoothing_window_min, min_periods=1)
+        .mean()
+    )
+    above = dp_rolling >= threshold
+    if not above.any():
+        return 0.0
+    # Находим первый момент превышения порога
+    first_above_idx = above[above].index[0]
+    # От этого момента ищем первое падение ниже порога
+    after_rise = above.loc[first_above_idx:]
+    below_after = after_rise[~after_rise]
+    end_effect = below_after.index[0] if len(below_after) > 0 else dp_rolling.index[-1]
+    effect_minutes = (end_effect - first_above_idx).total_seconds() / 60.0
+    return round(effect_minutes / 60.0, 2)
+
+
+def _batch_irv_metrics(
+    arrays: _PeriodArrays,
+    boundaries: list[tuple[ReagentInjection, datetime, datetime]],
+    choke_mm: Optional[float],
+    cfg: ReagentAnalysisConfig,
+) -> list[tuple[IRVMetrics, Optional[pd.DataFrame]]]:
     """
-    Рассчитывает M1-M5 для одного ИРВ из УЖЕ ПОДГОТОВЛЕННОГО давления.
+    M1–M5 и фазы ΔP для всех ИРВ периода по УЖЕ ПОДГОТОВЛЕННОМУ давлению.
 
-    df_full должен быть результатом _prepare_period_pressure (или
-    эквивалентного pipeline) и содержать pre-window + ИРВ.
+    Границы окон всех ИРВ — один searchsorted по времени кадра и валидных
+    строк; M1 (трапеции Q), средний Q и M5 — разности префиксных сумм,
+    медианы ΔP (baseline, M3) — по срезам массивов. Кадр нужен только для
+    M4 и фаз (скользящие окна внутри ИРВ). Без SQL и clean/smooth.
 
-    Не делает SQL и не вызывает clean/smooth — только slice + расчёты.
+    Для каждого ИРВ — (метрики, кадр pre-window + ИРВ | None), как раньше
+    давал расчёт по одному ИРВ.
     """
-    metrics = IRVMetrics()
+    if not boundaries:
+        return []
+    if arrays.df.empty:
+        return [(IRVMetrics(invalid_reason="нет данных давления"), None) for _ in boundaries]
+
+    ev = _to_ns(inj.event_time for inj, _, _ in boundaries)
+    ts = _to_ns(t_start for _, t_start, _ in boundaries)
+    te = _to_ns(t_end for _, _, t_end in boundaries)
+    ps = ev - pd.Timedelta(hours=cfg.pre_window_hours).value
+
+    # Кадр: pre-window + ИРВ и только ИРВ (включительно, как df.loc[a:b])
+    f_lo = np.searchsorted(arrays.t_ns, ps, side="left")
+    f_hi = np.searchsorted(arrays.t_ns, te, side="right")
+    i_lo = np.searchsorted(arrays.t_ns, ts, side="left")
+    i_hi = np.searchsorted(arrays.t_ns, te, side="right")
+    # Валидные строки: pre-window [ps, ev] и ИРВ [ts, te]
+    pa = np.searchsorted(arrays.valid_t, ps, side="left")
+    pb = np.searchsorted(arrays.valid_t, ev, side="right")
+    va = np.searchsorted(arrays.valid_t, ts, side="left")
+    vb = np.searchsorted(arrays.valid_t, te, side="right")
+
+    n_valid = vb - va
+    total_minutes = (te - ts) / 1e9 / 3600.0 * 60.0
+    utilisation = np.minimum(100.0, n_valid / np.maximum(total_minutes, 1) * 100.0)
+    has_q = arrays.q_prefix is not None
+    if has_q:
+        nz = n_valid > 0
+        last = np.where(nz, vb - 1, va)
+        q_cum = arrays.q_trapz_prefix[last] - arrays.q_trapz_prefix[va]
+        q_avg = np.where(
+            nz, (arrays.q_prefix[vb] - arrays.q_prefix[va]) / np.maximum(n_valid, 1), np.nan,
+        )
 
-    duration_hours = (t_end - t_start).total_seconds() / 3600.0
+    out: list[tuple[IRVMetrics, Optional[pd.DataFrame]]] = []
+    for k, (inj, _t_start, _t_end) in enumerate(boundaries):
+        metrics = IRVMetrics()
+        if f_hi[k] <= f_lo[k]:
+            metrics.invalid_reason = "нет данных давления"
+            out.append((metrics, None))
+            continue
+        df_full = arrays.df.iloc[f_lo[k]:f_hi[k]]
 
-    if df_full is None or df_full.empty:
-        metrics.invalid_reason = "нет данных давления"
-        return metrics, None
+        # --- Baseline ΔP (pre-window) ---
+        baseline_dp = _baseline_dp(arrays, pa[k], pb[k])
+        metrics.baseline_dp = baseline_dp
 
-    # Slice интересующего диапазона: pre-window + ИРВ
-    pre_start = inj.event_time - timedelta(hours=cfg.pre_window_hours)
-    df_full = df_full.loc[pre_start:t_end]
-    if df_full.empty:
-        metrics.invalid_reason = "нет данных давления"
-        return metrics, None
-
-    # --- Baseline ΔP (pre-window) ---
-    pre_end = inj.event_time
-    df_pre = df_full.loc[:pre_end]
-    df_pre_valid = df_pre.dropna(subset=["p_tube", "p_line"])
-    df_pre_valid = df_pre_valid[
-        (df_pre_valid["p_tube"] > df_pre_valid["p_line"])
-        & ((df_pre_valid["p_tube"] - df_pre_valid["p_line"]) > 0.1)
-    ]
-    if not df_pre_valid.empty:
-        baseline_dp = float(np.median(df_pre_valid["p_tube"] - df_pre_valid["p_line"]))
-    else:
-        baseline_dp = None
-    metrics.baseline_dp = baseline_dp
-
-    # --- Данные ИРВ (после grace) ---
-    df_irv = df_full.loc[t_start:t_end]
-    if df_irv.empty:
-        metrics.invalid_reason = "нет данных давления в интервале ИРВ"
-        return metrics, df_full
-
-    # Фильтрация: p_tube > p_line AND ΔP > 0.1 AND оба NOT NULL
-    df_valid = df_irv.dropna(subset=["p_tube", "p_line"])
-    df_valid = df_valid[
-        (df_valid["p_tube"] > df_valid["p_line"])
-        & ((df_valid["p_tube"] - df_valid["p_line"]) > 0.1)
-    ]
+        # --- Данные ИРВ (после grace) ---
+        if i_hi[k] <= i_lo[k]:
+            metrics.invalid_reason = "нет данных давления в интервале ИРВ"
+            out.append((metrics, df_full))
+            continue
+        df_irv = arrays.df.iloc[i_lo[k]:i_hi[k]]
 
-    metrics.data_points = len(df_valid)
-    if df_valid.empty:
-        metrics.invalid_reason = "нет валидных точек (после фильтрации ΔP)"
-        return metrics, df_full
-
-    # --- M5: Коэффициент использования ---
-    total_minutes = duration_hours * 60.0
-    # «Рабочие минуты» = количество валидных точек (≈1 точка/мин)
-    working_minutes = len(df_valid)
-    metrics.utilisation_pct = min(100.0, (working_minutes / max(total_minutes, 1)) * 100.0)
-
-    # --- M3: Прирост ΔP ---
-    dp_values = (df_valid["p_tube"] - df_valid["p_line"]).values
-    avg_dp = float(np.median(dp_values))
-    metrics.avg_dp = avg_dp
-    if baseline_dp is not None:
-        metrics.dp_gain = round(avg_dp - baseline_dp, 3)
+        # Валидные: p_tube > p_line AND ΔP > 0.1 AND оба NOT NULL
+        metrics.data_points = int(n_valid[k])
+        if n_valid[k] == 0:
+            metrics.invalid_reason = "нет валидных точек (после фильтрации ΔP)"
+            out.append((metrics, df_full))
+            continue
 
-    # --- M4: Продолжительность эффекта ---
-    # Ищем максимальный непрерывный блок, где ΔP >= baseline + threshold.
-    # Реагент может подействовать не сразу → ищем первое превышение,
-    # потом считаем до момента падения ниже порога.
-    if baseline_dp is not None:
-        threshold = baseline_dp + cfg.dp_effect_threshold
-        dp_series = df_irv[["p_tube", "p_line"]].dropna()
-        if not dp_series.empty:
-            dp_rolling = (
-                (dp_series["p_tube"] - dp_series["p_line"])
-                .rolling(window=cfg.smoothing_window_min, min_periods=1)
-                .mean()
-            )
-            above = dp_rolling >= threshold
-
-            if above.any():
-                # Находим первый момент превышения порога
-                first_above_idx = above[above].index[0]
-                # От этого момента ищем первое падение ниже порога
-                after_rise = above.loc[first_above_idx:]
-                below_after = after_rise[~after_rise]
-                if len(below_after) > 0:
-                    end_effect = below_after.index[0]
-                else:
-                    end_effect = dp_rolling.index[-1]
-                effect_minutes = (end_effect - first_above_idx).total_seconds() / 60.0
-                metrics.effect_duration_hours = round(effect_minutes / 60.0, 2)
-            else:
-                metrics.effect_duration_hours = 0.0
+        # --- M5: Коэффициент использования ---
+        # «Рабочие минуты» = количество валидных точек (≈1 точка/мин)
+        metrics.utilisation_pct = float(utilisation[k])
 
-    # --- Фазовый анализ ΔP ---
-    metrics.phases = _analyze_dp_phases(df_irv, baseline_dp, cfg)
+        # --- M3: Прирост ΔP ---
+        avg_dp = float(np.median(arrays.valid_dp[va[k]:vb[k]]))
+        metrics.avg_dp = avg_dp
+        if baseline_dp is not None:
+            metrics.dp_gain = round(avg_dp - baseline_dp, 3)
+            # --- M4: Продолжительность эффекта ---
+            metrics.effect_duration_hours = _effect_duration_hours(df_irv, baseline_dp, cfg)
 
-    # --- M1: Накопленный дебит ---
-    if choke_mm is not None and choke_mm > 0:
-        df_calc = calculate_flow_rate(df_valid.copy(), choke_mm, flow_cfg)
-        df_calc = calculate_cumulative(df_calc)
-        q_cum = float(df_calc["cumulative_flow"].iloc[-1])
-        metrics.q_cumulative = round(q_cum, 4)
-        metrics.avg_flow_rate = round(float(df_calc["flow_rate"].mean()), 4)
+        # --- Фазовый анализ ΔP ---
+        metrics.phases = _analyze_dp_phases(df_irv, baseline_dp, cfg)
 
-        # --- M2: Q_cum / qty ---
-        if inj.qty is not None and inj.qty > 0:
-            metrics.q_per_unit = round(q_cum / inj.qty, 4)
+        # --- M1: Накопленный дебит, M2: Q_cum / qty ---
+        if has_q:
+            metrics.q_cumulative = round(float(q_cum[k]), 4)
+            metrics.avg_flow_rate = round(float(q_avg[k]), 4)
+            if inj.qty is not None and inj.qty > 0:
+                metrics.q_per_unit = round(float(q_cum[k]) / inj.qty, 4)
 
-    return metrics, df_full
+        out.append((metrics, df_full))
+    return out
 
 
 def _compute_irv_metrics(
@@ -976,21 +1052,18 @@ def _compute_irv_metrics(
     cfg: ReagentAnalysisConfig,
 ) -> tuple[IRVMetrics, Optional[pd.DataFrame]]:
     """
-    Совместимая обёртка: загружает давление + маски + clean/smooth для ОДНОГО ИРВ
-    и считает метрики. Используется в `get_irv_detail` (детальный popup для
-    одного вброса).
+    Метрики ОДНОГО ИРВ с загрузкой давления только под него. Используется в
+    `get_irv_detail` (детальный popup для одного вброса).
 
-    Для массового анализа (analyze_reagent_effectiveness) используется связка
-    `_prepare_period_pressure` + `_compute_irv_metrics_from_df`, которая
-    загружает давление ОДИН раз на весь период.
+    Для массового анализа (analyze_reagent_effectiveness) давление
+    загружается ОДИН раз на весь период и считается `_batch_irv_metrics`.
     """
     pre_start = inj.event_time - timedelta(hours=cfg.pre_window_hours)
     df_full = _prepare_period_pressure(well_id, pre_start, t_end)
     if df_full is None or df_full.empty:
         return IRVMetrics(invalid_reason="нет данных давления"), None
-    return _compute_irv_metrics_from_df(
-        df_full, inj, t_start, t_end, choke_mm, flow_cfg, cfg,
-    )
+    arrays = _period_arrays(df_full, choke_mm, flow_cfg)
+    return _batch_irv_metrics(arrays, [(inj, t_start, t_end)], choke_mm, cfg)[0]
 
 
 # ---------------------------------------------------------------------------
@@ -1164,10 +1237,14 @@ def analyze_reagent_effectiveness(
     period_end: datetime,
     cfg: ReagentAnalysisConfig = DEFAULT_CONFIG,
     include_pressure_data: bool = False,
+    ctx=None,
 ) -> dict:
     """
     Полный анализ эффективности реагентов для скважины.
 
+    ctx — WellDataContext сборки отчёта об адаптации (штуцер и сырое
+    давление берутся из него); None — прямые запросы.
+
     Возвращает dict:
     {
         "well_id": int,
@@ -1185,7 +1262,7 @@ def analyze_reagent_effectiveness(
     warnings: list[str] = []
 
     # --- 1. Получаем штуцер ---
-    choke_mm = get_choke_mm(well_id)
+    choke_mm = ctx.choke_mm() if ctx is not None else get_choke_mm(well_id)
     if choke_mm is None:
         warnings.append("Штуцер не найден — M1/M2 (дебит) не будут рассчитаны")
 
@@ -1219,31 +1296,28 @@ def analyze_reagent_effectiveness(
     flow_cfg = _get_flow_config(well_id)
 
     # --- 6a. Подготавливаем давление ОДИН раз на весь период.
-    # Раньше это делалось для каждого ИРВ отдельно (N+1 SQL + N×clean+smooth).
-    # Теперь: один SQL, одно применение масок, один clean+smooth.
-    # Слайсим под каждый ИРВ через df.loc[pre_start:t_end].
+    # Один SQL, одно применение масок, один clean+smooth, один расчёт Q;
+    # окна ИРВ вырезаются по позициям (_period_arrays / _batch_irv_metrics).
     if boundaries:
         _t0 = _time.perf_counter()
         first_inj_time = min(inj.event_time for inj, _, _ in boundaries)
         load_start = first_inj_time - timedelta(hours=cfg.pre_window_hours)
         load_end = max(t_end for _, _, t_end in boundaries)
-        df_period = _prepare_period_pressure(well_id, load_start, load_end)
+        df_period = _prepare_period_pressure(well_id, load_start, load_end, ctx=ctx)
         log.info(
             "reagent_effectiveness: well=%d IRV=%d prepare_period_pressure=%.2fs rows=%d",
             well_id, len(boundaries), _time.perf_counter() - _t0, len(df_period),
         )
     else:
         df_period = pd.DataFrame()
+    arrays = _period_arrays(df_period, choke_mm, flow_cfg)
 
-    # --- 7. Рассчитываем метрики для каждого ИРВ ---
+    # --- 7. Рассчитываем метрики для всех ИРВ ---
     _t_loop = _time.perf_counter()
+    batch = _batch_irv_metrics(arrays, boundaries, choke_mm, cfg)
     irv_results: list[IRVResult] = []
-    for inj, t_start, t_end in boundaries:
+    for (inj, t_start, t_end), (metrics, df) in zip(boundaries, batch):
         duration_hours = (t_end - t_start).total_seconds() / 3600.0
-        metrics, df = _compute_irv_metrics_from_df(
-            df_period, inj, t_start, t_end,
-            choke_mm, flow_cfg, cfg,
-        )
         # Сегменты + extended (Score) — для сводной таблицы ИРВ.
         segs: list[dict] = []
         ext: dict = {}
@@ -1482,38 +1556,43 @@ def get_overlay_data(
     purge_times = _get_purge_times(well_id, period_start, period_end)
     boundaries = _build_irv_boundaries(injections, purge_times, cfg, period_end)
 
+    if not boundaries:
+        return {"reagent": reagent_name or injections[0].reagent, "curves": []}
+
+    # Давление — один раз на все кривые (как в analyze_reagent_effectiveness):
+    # pre-window первого вброса … конец последнего ИРВ; кривая (от вброса) и
+    # baseline (pre-window) вырезаются по позициям.
+    load_start = min(inj.event_time for inj, _, _ in boundaries) - timedelta(
+        hours=cfg.pre_window_hours)
+    load_end = max(t_end for _, _, t_end in boundaries)
+    arrays = _period_arrays(
+        _prepare_period_pressure(well_id, load_start, load_end), None, DEFAULT_FLOW,
+    )
+    if arrays.df.empty:
+        return {"reagent": reagent_name or injections[0].reagent, "curves": []}
+
+    ev = _to_ns(inj.event_time for inj, _, _ in boundaries)
+    te = _to_ns(t_end for _, _, t_end in boundaries)
+    c_lo = np.searchsorted(arrays.t_ns, ev, side="left")
+    c_hi = np.searchsorted(arrays.t_ns, te, side="right")
+    pa = np.searchsorted(arrays.valid_t, ev - pd.Timedelta(hours=cfg.pre_window_hours).value,
+                         side="left")
+    pb = np.searchsorted(arrays.valid_t, ev, side="right")
+
     curves = []
-    for inj, _t_start, t_end in boundaries:
-        # Получаем данные: от момента вброса (не от pre-window)
-        df = get_pressure_data(
-            well_id,
-            start=inj.event_time.isoformat(),
-            end=t_end.isoformat(),
-        )
+    for k, (inj, _t_start, _t_end) in enumerate(boundaries):
+        # Кривая — от момента вброса (не от pre-window)
+        df = arrays.df.iloc[c_lo[k]:c_hi[k]]
         if df.empty:
             continue
 
-        masks = load_active_masks(well_id, inj.event_time, t_end, verified_only=True)
-        if masks:
-            df, _ = apply_masks(df, masks)
-
-        # Единый pipeline со страницей скважины: clean + Savitzky–Golay.
-        df = clean_pressure(df)
-        df = smooth_pressure(df)
-
         dp_curve = _build_dp_curve(df, inj.event_time, cfg.smoothing_window_min, max_points=300)
         if not dp_curve:
             continue
 
-        # Baseline
-        pre_start = inj.event_time - timedelta(hours=cfg.pre_window_hours)
-        df_pre = get_pressure_data(well_id, start=pre_start.isoformat(), end=inj.event_time.isoformat())
-        baseline = None
-        if not df_pre.empty:
-            df_pv = df_pre.dropna(subset=["p_tube", "p_line"])
-            df_pv = df_pv[(df_pv["p_tube"] > df_pv["p_line"]) & ((df_pv["p_tube"] - df_pv["p_line"]) > 0.1)]
-            if not df_pv.empty:
-                baseline = round(float(np.median(df_pv["p_tube"] - df_pv["p_line"])), 3)
+        baseline = _baseline_dp(arrays, pa[k], pb[k])
+        if baseline is not None:
+            baseline = round(baseline, 3)
 
         # Phases
         phases = _analyze_dp_phases(df, baseline, cfg)
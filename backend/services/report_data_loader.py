@@ -0,0 +1,346 @@
+"""
+report_data_loader — данные списка скважин на сборку суточного сводного /
+месячного отчёта.
+
+generate_monthly_report_pdf и generate_summary_report_pdf шли по скважинам,
+и каждая скважина сама читала штуцер, статусы, события (4–6 запросов на
+разные срезы одних и тех же суток/месяца), pressure_raw (по разу на каждый
+помощник: суточные средние, база потерь, тренд, сетка графиков), маски и
+flow_result. Число запросов росло линейно со списком скважин.
+
+ReportDataLoader грузит каждую таблицу ОДНИМ запросом на все скважины
+отчёта и раскладывает строки по скважинам в памяти:
+
+  • конструкция (штуцер + горизонт, последняя запись well_construction);
+  • well_status (вся история — из неё последний статус и интервалы
+    периода), активный подстатус well_sub_status;
+  • events за [d_from; d_to] (Кунград) + последний вброс каждого реагента
+    до d_from (интервал между вбросами на первом дне периода);
+  • pressure_raw за UTC-покрытие периода и индексы масок
+    (pressure_mask_service.preload_mask_indexes);
+  • flow_result базового сценария за [d_from; d_to].
+
+Загрузка ленивая по виду данных: первое обращение грузит его для всех
+скважин. Давления и события подставляются в WellDataContext скважины
+(prime), производные — masked_hourly — считаются им же, как
+_load_masked_hourly. Запрос за пределами периода не ломается: контекст
+догружает недостающее по одной скважине.
+
+Загрузчик живёт в рамках одной сборки. Ленивая загрузка не потокобезопасна:
+перед параллельной сборкой по скважинам (well_build_executor) вызывается
+preload() — дальше методы только читают загруженное.
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.services.build_profiler import profiled
+from backend.services.well_data_context import WellDataContext
+
+log = logging.getLogger(__name__)
+
+KUNGRAD_OFFSET = timedelta(hours=5)
+
+
+class ReportDataLoader:
+    """Наборная загрузка данных скважин отчёта за [d_from; d_to] (Кунград).
+
+    wells — ORM Well (нужны id и number). Время pressure_raw — UTC,
+    покрытие [pressure_from 00:00 − 5 ч; d_to 23:59:59] (с запасом под окно
+    базы потерь, которое считается от местного конца периода);
+    pressure_from — по умолчанию d_from.
+    """
+
+    def __init__(
+        self, db: Session, wells: Iterable[Any], d_from: date, d_to: date,
+        *, pressure_from: Optional[date] = None,
+    ):
+        self.db = db
+        self.wells = list(wells)
+        self.d_from = d_from
+        self.d_to = d_to
+        self.local_start = datetime.combine(d_from, time(0, 0))
+        self.local_end = datetime.combine(d_to, time(23, 59, 59))
+        self.utc_start = datetime.combine(pressure_from or d_from, time(0, 0)) - KUNGRAD_OFFSET
+        self.utc_end = self.local_end
+        self._ids = [int(w.id) for w in self.wells]
+        self._numbers = {int(w.id): str(w.number) for w in self.wells}
+        self._ctx = {int(w.id): WellDataContext(db, w) for w in self.wells}
+        self._construction: Optional[dict[str, tuple]] = None
+        self._status: Optional[dict[int, list]] = None
+        self._substatus: Optional[dict[int, str]] = None
+        self._events_loaded = False
+        self._reagent_before: Optional[dict[tuple[str, str], datetime]] = None
+        self._pressure_loaded = False
+        self._flow: Optional[dict[int, list]] = None
+        self.queries = 0   # число запросов загрузчика (диагностика/тесты)
+
+    def preload(self) -> "ReportDataLoader":
+        """Загрузить все виды данных сразу (перед сборкой скважин в потоках)."""
+        if self.wells:
+            self.construction(self.wells[0].id)
+        self._ensure_status()
+        self._ensure_events()
+        self._ensure_reagent_before()
+        self._ensure_pressure()
+        self._ensure_flow()
+        return self
+
+    def _check_span(self, d_from: date, d_to: date) -> None:
+        if d_from < self.d_from or d_to > self.d_to:
+            raise ValueError(
+                f"Диапазон {d_from}..{d_to} вне периода загрузчика {self.d_from}..{self.d_to}"
+            )
+
+    def context(self, well_id: int) -> WellDataContext:
+        """WellDataContext скважины с подставленными давлениями и событиями."""
+        self._ensure_pressure()
+        self._ensure_events()
+        return self._ctx[int(well_id)]
+
+    # ── Конструкция ─────────────────────────────────────────────────
+
+    def construction(self, well_id: int) -> tuple[Optional[float], Optional[str]]:
+        """(штуцер, горизонт) последней записи well_construction."""
+        if self._construction is None:
+            self.queries += 1
+            rows = self.db.execute(text("""
+                SELECT DISTINCT ON (well_no) well_no, choke_diam_mm, horizon
+                FROM well_construction
+                WHERE well_no = ANY(:wnos)
+                ORDER BY well_no, data_as_of DESC NULLS LAST
+            """), {"wnos": sorted(set(self._numbers.values()))}).fetchall()
+            self._construction = {
+                str(r[0]): (float(r[1]) if r[1] else None, str(r[2]) if r[2] else None)
+                for r in rows
+            }
+            for wid, ctx in self._ctx.items():
+                ctx.prime(construction=self._construction.get(self._numbers[wid], (None, None)))
+        return self._construction.get(self._numbers[int(well_id)], (None, None))
+
+    def choke_mm(self, well_id: int) -> Optional[float]:
+        return self.construction(well_id)[0]
+
+    # ── Статусы ─────────────────────────────────────────────────────
+
+    def _ensure_status(self) -> None:
+        if self._status is not None:
+            return
+        self._load_status()
+
+    @profiled("loader_status")
+    def _load_status(self) -> None:
+        self.queries += 2
+        rows = self.db.execute(text("""
+            SELECT well_id, status, dt_start, dt_end
+            FROM well_status
+            WHERE well_id = ANY(:ids)
+            ORDER BY well_id, dt_start
+        """), {"ids": self._ids}).fetchall()
+        self._status = {wid: [] for wid in self._ids}
+        for r in rows:
+            self._status[int(r[0])].append((r[1], r[2], r[3]))
+        rows = self.db.execute(text("""
+            SELECT DISTINCT ON (well_id) well_id, sub_status
+            FROM well_sub_status
+            WHERE well_id = ANY(:ids) AND dt_end IS NULL
+            ORDER BY well_id, dt_start DESC
+        """), {"ids": self._ids}).fetchall()
+        self._substatus = {int(r[0]): r[1] for r in rows}
+
+    def latest_status(self, well_id: int) -> str:
+        """Статус с самым поздним dt_start ("" — нет записей)."""
+        self._ensure_status()
+        rows = self._status.get(int(well_id)) or []
+        return rows[-1][0] if rows else ""
+
+    def substatus(self, well_id: int) -> str:
+        """Активный (dt_end IS NULL) подстатус ("" — нет)."""
+        self._ensure_status()
+        return self._substatus.get(int(well_id)) or ""
+
+    def status_rows(self, well_id: int, period_start: date, period_end: date) -> list[tuple]:
+        """(status, дата начала, дата конца | None) интервалов, задевающих период.
+
+        Тот же отбор, что SQL в _build_status_segments.
+        """
+        self._ensure_status()
+        out = []
+        for status, dt_start, dt_end in self._status.get(int(well_id)) or []:
+            d_start = _as_date(dt_start)
+            d_end = _as_date(dt_end) if dt_end is not None else None
+            if d_start > period_end or (d_end is not None and d_end < period_start):
+                continue
+            out.append((status, d_start, d_end))
+        return out
+
+    # ── События ─────────────────────────────────────────────────────
+
+    def _ensure_events(self) -> None:
+        if self._events_loaded:
+            return
+        self._load_events()
+
+    @profiled("loader_events")
+    def _load_events(self) -> None:
+        self.queries += 1
+        rows = self.db.execute(text("""
+            SELECT well, event_time, event_type, purge_phase, reagent, qty,
+                   description, p_tube, p_line
+            FROM events
+            WHERE well = ANY(:wnos)
+              AND event_time >= :start AND event_time <= :end
+            ORDER BY event_time
+        """), {"wnos": sorted(set(self._numbers.values())),
+               "start": self.local_start, "end": self.local_end}).fetchall()
+        by_number: dict[str, list] = {}
+        for r in rows:
+            by_number.setdefault(str(r.well), []).append(r)
+        for wid, ctx in self._ctx.items():
+            ctx.prime(events=by_number.get(self._numbers[wid], []),
+                      events_span=(self.local_start, self.local_end))
+        self._events_loaded = True
+
+    def events(self, well_id: int, start: datetime, end: datetime, *, types=None) -> list:
+        """События скважины за [start; end] (Кунград, включительно).
+
+        Поля: event_time, event_type, purge_phase, reagent, qty, description,
+        p_tube, p_line — по возрастанию event_time.
+        """
+        self._ensure_events()
+        return self._ctx[int(well_id)].events(start, end, types=types)
+
+    def last_reagent_before(self, well_id: int, reagent: str, before: datetime) -> Optional[datetime]:
+        """Время последнего вброса reagent строго до before (как MAX(event_time)).
+
+        before — не раньше начала периода: сначала ищем в событиях периода,
+        затем среди последних вбросов до него (один запрос на все скважины).
+        """
+        self._ensure_events()
+        rows = self._ctx[int(well_id)].events(self.local_start, self.local_end, types=("reagent",))
+        times = [r.event_time for r in rows if r.reagent == reagent]
+        i = bisect.bisect_left(times, before)
+        if i > 0:
+            return times[i - 1]
+        self._ensure_reagent_before()
+        last = self._reagent_before.get((self._numbers[int(well_id)], reagent))
+        return last if last is not None and last < before else None
+
+    def _ensure_reagent_before(self) -> None:
+        if self._reagent_before is not None:
+            return
+        self.queries += 1
+        prev = self.db.execute(text("""
+            SELECT well, reagent, MAX(event_time)
+            FROM events
+            WHERE well = ANY(:wnos) AND event_type = 'reagent'
+              AND reagent IS NOT NULL AND event_time < :start
+            GROUP BY well, reagent
+        """), {"wnos": sorted(set(self._numbers.values())),
+               "start": self.local_start}).fetchall()
+        self._reagent_before = {(str(r[0]), r[1]): r[2] for r in prev}
+
+    # ── Давления ────────────────────────────────────────────────────
+
+    def _ensure_pressure(self) -> None:
+        if self._pressure_loaded:
+            return
+        self._load_pressure()
+
+    @profiled("loader_pressure")
+    def _load_pressure(self) -> None:
+        from backend.services.flow_rate.data_access import get_pressure_data_many
+        from backend.services.pressure_mask_service import preload_mask_indexes
+
+        self.queries += 1
+        frames = get_pressure_data_many(
+            self._ids, self.utc_start.isoformat(), self.utc_end.isoformat(),
+        )
+        for wid, ctx in self._ctx.items():
+            ctx.prime(raw=frames.get(wid), raw_span=(self.utc_start, self.utc_end))
+        try:
+            if preload_mask_indexes(self._ids):
+                self.queries += 1
+        except Exception as exc:
+            log.warning("[report_data_loader] mask preload failed: %s", exc)
+        self._pressure_loaded = True
+
+    def raw_pressure(self, well_id: int, utc_start, utc_end) -> pd.DataFrame:
+        """pressure_raw скважины за диапазон — как get_pressure_data (копия)."""
+        self._ensure_pressure()
+        return self._ctx[int(well_id)].raw_pressure(utc_start, utc_end)
+
+    def masked_hourly(self, well_id: int, utc_start, utc_end) -> pd.DataFrame:
+        """Почасовое давление с verified-масками — как _load_masked_hourly."""
+        self._ensure_pressure()
+        return self._ctx[int(well_id)].masked_hourly(utc_start, utc_end)
+
+    # ── flow_result ─────────────────────────────────────────────────
+
+    def _ensure_flow(self) -> None:
+        if self._flow is not None:
+            return
+        self._load_flow()
+
+    @profiled("loader_flow")
+    def _load_flow(self) -> None:
+        self.queries += 1
+        rows = self.db.execute(text("""
+            SELECT fs.well_id, fr.result_date,
+                   fr.avg_flow_rate, fr.median_flow_rate,
+                   fr.min_flow_rate, fr.max_flow_rate,
+                   fr.cumulative_flow, fr.purge_loss,
+                   fr.downtime_minutes, fr.data_points
+            FROM flow_result fr
+            JOIN flow_scenario fs ON fs.id = fr.scenario_id
+            WHERE fs.well_id = ANY(:ids)
+              AND fs.is_baseline = TRUE
+              AND fr.result_date BETWEEN :d0 AND :d1
+            ORDER BY fs.well_id, fr.result_date
+        """), {"ids": self._ids, "d0": self.d_from, "d1": self.d_to}).fetchall()
+        self._flow = {wid: [] for wid in self._ids}
+        for r in rows:
+            self._flow[int(r[0])].append(tuple(r[1:]))
+
+    def flow_result_day(self, well_id: int, day: date) -> Optional[tuple]:
+        """Строка flow_result базового сценария за сутки.
+
+        Поля: avg, median, min, max flow_rate, cumulative_flow, purge_loss,
+        downtime_minutes, data_points — как в запросе build_well_day_data.
+        """
+        self._check_span(day, day)
+        self._ensure_flow()
+        for row in self._flow.get(int(well_id)) or []:
+            if row[0] == day:
+                return row[1:]
+        return None
+
+    def flow_result_stats(self, well_id: int, d_from: date, d_to: date) -> tuple:
+        """(SUM cumulative, AVG median, медиана median, COUNT) за [d_from; d_to].
+
+        Семантика SQL-агрегатов: NULL пропускаются, пустой набор — None
+        (COUNT — 0).
+        """
+        self._check_span(d_from, d_to)
+        self._ensure_flow()
+        rows = [r for r in self._flow.get(int(well_id)) or [] if d_from <= r[0] <= d_to]
+        medians = [float(r[2]) for r in rows if r[2] is not None]
+        cums = [float(r[5]) for r in rows if r[5] is not None]
+        return (
+            sum(cums) if cums else None,
+            float(np.mean(medians)) if medians else None,
+            float(np.median(medians)) if medians else None,
+            len(rows),
+        )
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
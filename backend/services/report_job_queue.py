@@ -0,0 +1,563 @@
+"""
+report_job_queue.py — фоновая очередь генерации PDF-отчётов.
+
+Суточный / сводный / месячный отчёты и отчёт об адаптации раньше
+собирались прямо в обработчике запроса: collect_report_data + графики +
+xelatex держали воркер веб-сервера и сессию БД минутами.
+
+Очередь живёт в job_execution_logs (JobExecutionLog, job_type =
+'report_<kind>'):
+
+  • enqueue — запись со status='queued'; одинаковый запрос (тот же kind и
+    params), пока он в очереди или выполняется, возвращает уже
+    существующую задачу (частичный уникальный индекс по dedupe_key);
+  • воркеры — отдельные процессы (start_workers при старте приложения
+    или `python -m backend.services.report_job_queue`). Задачу забирают
+    под pg_advisory_xact_lock + FOR UPDATE SKIP LOCKED; одновременно
+    выполняется не больше REPORT_JOB_WORKERS задач на всю БД, сколько бы
+    процессов приложения ни было;
+  • этапы — генераторы вызывают report_stage('charts' / 'latex'):
+    вне задачи это no-op, внутри — stage + heartbeat_at в БД и проверка
+    отмены; время этапов — в result_summary.stages;
+  • отмена — queued сразу становится cancelled, running получает
+    cancel_requested и прерывается на ближайшей смене этапа;
+  • пока задача выполняется, поток-пульс обновляет heartbeat_at каждые
+    HEARTBEAT_INTERVAL_S (и на долгих этапах); running без heartbeat
+    дольше STALE_AFTER (воркер убит / перезапуск) помечаются failed перед
+    каждым выбором задачи — потерянные задачи не занимают лимит;
+  • воркеры — не daemon: внутри задачи работает пул процессов графиков
+    (chart_render_pool); останавливаются через _stop_event + join
+    (stop_workers при остановке приложения и atexit);
+  • профиль сборки (build_profiler: время, запросы, строки, память по
+    секциям) — в result_summary.build_profile и doc.meta["build_profile"].
+
+UI ставит задачу (POST /api/jobs/reports, POST
+/api/adaptation-report/preview-pdf/jobs) и опрашивает
+GET /api/jobs/reports/{id}; готовый PDF — GET /api/jobs/reports/{id}/file.
+"""
+from __future__ import annotations
+
+import atexit
+import contextvars
+import hashlib
+import json
+import logging
+import multiprocessing
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import func, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.documents.models_notifications import JobExecutionLog
+from backend.services import build_profiler
+
+log = logging.getLogger(__name__)
+
+JOB_PREFIX = "report_"
+ACTIVE_STATUSES = ("queued", "running")
+FINAL_STATUSES = ("success", "failed", "cancelled")
+DEFAULT_WORKERS = 2
+POLL_INTERVAL_S = 1.0
+HEARTBEAT_INTERVAL_S = 15.0
+# Несколько пропущенных пульсов — воркер мёртв.
+STALE_AFTER = timedelta(minutes=2)
+# Ключ pg_advisory_xact_lock: выбор следующей задачи — по одному.
+_CLAIM_LOCK_KEY = 0x5245504F  # 'REPO'
+
+# kind → генератор PDF документа (doc, db) -> путь относительно backend/static
+DOCUMENT_GENERATORS: dict[str, str] = {
+    "daily": "backend.services.daily_report_service:generate_daily_report_pdf",
+    "summary": "backend.services.daily_report_service:generate_summary_report_pdf",
+    "monthly": "backend.services.daily_report_service:generate_monthly_report_pdf",
+    "adaptation": "backend.services.adaptation_report_service:generate_adaptation_report_pdf",
+}
+# Превью отчёта об адаптации из мастера (без документа): params = тело
+# POST /api/adaptation-report/preview-pdf.
+PREVIEW_KIND = "adaptation_preview"
+REPORT_KINDS = (*DOCUMENT_GENERATORS, PREVIEW_KIND)
+
+STATIC_DIR = Path("backend/static")
+JOBS_PDF_DIR = STATIC_DIR / "generated" / "pdf" / "jobs"
+
+
+class ReportJobCancelled(Exception):
+    """Задача отменена пользователем (бросает report_stage)."""
+
+
+@dataclass
+class _JobHandle:
+    job_id: int
+    t0: float = field(default_factory=time.perf_counter)
+    stages: list[dict] = field(default_factory=list)
+    profile: Optional[build_profiler.BuildProfile] = None
+
+    def mark(self, stage: str) -> None:
+        """Новый этап; повтор текущего (графики по каждой скважине) — без новой записи."""
+        if self.stages and self.stages[-1]["stage"] == stage:
+            return
+        now = round((time.perf_counter() - self.t0) * 1000, 1)
+        if self.stages:
+            self.stages[-1]["ms"] = round(now - self.stages[-1]["at_ms"], 1)
+        self.stages.append({"stage": stage, "at_ms": now})
+
+
+_current: contextvars.ContextVar[Optional[_JobHandle]] = contextvars.ContextVar(
+    "report_job", default=None,
+)
+
+
+# ─── Постановка / статус / отмена ─────────────────────────────────────
+
+def dedupe_key(job_type: str, params: dict) -> str:
+    blob = json.dumps({"t": job_type, "p": params}, sort_keys=True, default=str,
+                      ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _active_by_key(db: Session, key: str) -> Optional[JobExecutionLog]:
+    return (
+        db.query(JobExecutionLog)
+        .filter(JobExecutionLog.dedupe_key == key,
+                JobExecutionLog.status.in_(ACTIVE_STATUSES))
+        .first()
+    )
+
+
+def enqueue(
+    db: Session, kind: str, params: dict, *,
+    triggered_by: str = "manual", user_id: int | None = None,
+) -> tuple[JobExecutionLog, bool]:
+    """Поставить отчёт в очередь. → (задача, создана ли новая).
+
+    Если такая же задача уже queued/running — возвращается она (False).
+    Коммитит сессию.
+    """
+    if kind not in REPORT_KINDS:
+        raise ValueError(f"Неизвестный тип отчёта: {kind}")
+    job_type = JOB_PREFIX + kind
+    key = dedupe_key(job_type, params)
+    existing = _active_by_key(db, key)
+    if existing is not None:
+        return existing, False
+
+    now = datetime.now()
+    job = JobExecutionLog(
+        job_type=job_type, params=params, status="queued", stage="queued",
+        dedupe_key=key, started_at=now, created_at=now,
+        triggered_by=triggered_by, triggered_by_user_id=user_id,
+    )
+    try:
+        with db.begin_nested():
+            db.add(job)
+            db.flush()
+    except IntegrityError:
+        # параллельный запрос успел вставить такую же задачу
+        existing = _active_by_key(db, key)
+        if existing is None:
+            raise
+        return existing, False
+    db.commit()
+    log.info("[report_jobs] queued #%s %s %s", job.id, job_type, params)
+    return job, True
+
+
+def document_kind(doc) -> str:
+    """Тип отчёта для документа (daily_report_* — по meta.report_mode)."""
+    code = doc.doc_type.code if doc.doc_type else ""
+    if code in ("daily_report_well", "daily_report_all"):
+        mode = (doc.meta or {}).get("report_mode", "")
+        return mode if mode in ("summary", "monthly") else "daily"
+    if code == "adaptation_report":
+        return "adaptation"
+    raise ValueError(f"Для документа типа {code!r} нет генератора отчёта")
+
+
+def enqueue_document(
+    db: Session, doc, *, triggered_by: str = "manual", user_id: int | None = None,
+) -> tuple[JobExecutionLog, bool]:
+    """Поставить генерацию PDF документа; id задачи — в doc.meta.report_job_id.
+
+    В dedupe входит отпечаток meta: перегенерация с другими настройками —
+    новая задача.
+    """
+    from sqlalchemy.orm.attributes import flag_modified
+
+    meta = dict(doc.meta or {})
+    meta.pop("report_job_id", None)
+    meta.pop("well_build", None)
+    meta.pop("build_profile", None)
+    meta_hash = dedupe_key("meta", meta)[:16]
+    job, created = enqueue(
+        db, document_kind(doc), {"doc_id": doc.id, "meta_hash": meta_hash},
+        triggered_by=triggered_by, user_id=user_id,
+    )
+    meta["report_job_id"] = job.id
+    doc.meta = meta
+    flag_modified(doc, "meta")
+    db.commit()
+    return job, created
+
+
+def cancel(db: Session, job_id: int) -> Optional[JobExecutionLog]:
+    """Отменить задачу: queued — сразу, running — на ближайшем этапе."""
+    job = (
+        db.query(JobExecutionLog)
+        .filter(JobExecutionLog.id == job_id,
+                JobExecutionLog.job_type.like(JOB_PREFIX + "%"))
+        .with_for_update()
+        .first()
+    )
+    if job is None:
+        return None
+    if job.status == "queued":
+        job.status = job.stage = "cancelled"
+        job.finished_at = datetime.now()
+    elif job.status == "running":
+        job.cancel_requested = True
+    db.commit()
+    return job
+
+
+def artifact_file(job: JobExecutionLog) -> Optional[Path]:
+    """Путь к готовому PDF задачи (или None)."""
+    if job.status != "success" or not job.artifact_path:
+        return None
+    p = Path(job.artifact_path)
+    if not p.is_absolute():
+        p = STATIC_DIR / p
+    return p if p.exists() else None
+
+
+def job_status(job: JobExecutionLog) -> dict:
+    """JSON-статус задачи для опроса из UI."""
+    summary = job.result_summary or {}
+    return {
+        "id": job.id,
+        "kind": job.job_type[len(JOB_PREFIX):],
+        "status": job.status,
+        "stage": job.stage,
+        "cancel_requested": bool(job.cancel_requested),
+        "params": job.params,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": (job.started_at.isoformat()
+                       if job.started_at and job.status != "queued" else None),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "heartbeat_at": job.heartbeat_at.isoformat() if job.heartbeat_at else None,
+        "stages": summary.get("stages") or [],
+        "total_ms": summary.get("total_ms"),
+        "error": job.error_message,
+        "file_url": (f"/api/jobs/reports/{job.id}/file"
+                     if job.status == "success" and job.artifact_path else None),
+    }
+
+
+def slowest_builds(db: Session, *, days: int = 7, limit: int = 50) -> list[dict]:
+    """Самые долгие завершённые сборки отчётов за days суток (для админки).
+
+    → job_status задачи + doc_id и профиль сборки (build_profile) из
+    result_summary; по убыванию total_ms.
+    """
+    from sqlalchemy import Float
+
+    total_ms = JobExecutionLog.result_summary["total_ms"].astext.cast(Float)
+    jobs = (
+        db.query(JobExecutionLog)
+        .filter(JobExecutionLog.job_type.like(JOB_PREFIX + "%"),
+                JobExecutionLog.status.in_(FINAL_STATUSES),
+                JobExecutionLog.finished_at >= datetime.now() - timedelta(days=days),
+                JobExecutionLog.result_summary.isnot(None))
+        .order_by(total_ms.desc().nullslast())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {**job_status(j), "doc_id": (j.params or {}).get("doc_id"),
+         "profile": (j.result_summary or {}).get("build_profile")}
+        for j in jobs
+    ]
+
+
+# ─── Этапы (вызываются из генераторов) ───────────────────────────────
+
+def report_stage(stage: str) -> None:
+    """Отметить этап текущей задачи; бросает ReportJobCancelled при отмене.
+
+    Вне задачи очереди (синхронный вызов генератора) ничего не делает.
+    """
+    handle = _current.get()
+    if handle is None:
+        return
+    from backend.db import SessionLocal
+
+    handle.mark(stage)
+    with SessionLocal() as s:
+        cancel_requested = s.execute(
+            update(JobExecutionLog)
+            .where(JobExecutionLog.id == handle.job_id)
+            .values(stage=stage, heartbeat_at=datetime.now())
+            .returning(JobExecutionLog.cancel_requested)
+        ).scalar()
+        s.commit()
+    if cancel_requested:
+        raise ReportJobCancelled(f"задача #{handle.job_id} отменена на этапе {stage}")
+
+
+# ─── Выполнение ───────────────────────────────────────────────────────
+
+def _load(path: str):
+    import importlib
+
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def _run_document(db: Session, kind: str, params: dict, job_id: int) -> str:
+    from backend.documents.models import Document
+
+    doc = db.query(Document).filter(Document.id == params["doc_id"]).first()
+    if doc is None:
+        raise ValueError(f"Документ {params['doc_id']} не найден")
+    pdf_rel = _load(DOCUMENT_GENERATORS[kind])(doc, db)
+    doc.pdf_filename = pdf_rel
+    doc.status = "generated"
+    prof = build_profiler.current()
+    if prof is not None:
+        from sqlalchemy.orm.attributes import flag_modified
+
+        doc.meta = {**(doc.meta or {}), "build_profile": prof.to_dict()}
+        flag_modified(doc, "meta")
+    db.commit()
+    return pdf_rel
+
+
+def _run_adaptation_preview(db: Session, params: dict, job_id: int) -> str:
+    from backend.routers.adaptation_report import (
+        CustomDatesRequest, _build_pdf_response, _preview_pdf_kwargs,
+    )
+
+    req = CustomDatesRequest(**params)
+    resp = _build_pdf_response(db, req.well_id, **_preview_pdf_kwargs(req))
+    # PDF превью пишется в общий файл скважины — копия на задачу, чтобы
+    # следующая сборка не подменила результат до скачивания.
+    JOBS_PDF_DIR.mkdir(parents=True, exist_ok=True)
+    target = JOBS_PDF_DIR / f"report_job_{job_id}.pdf"
+    shutil.copyfile(resp.path, target)
+    return str(target.relative_to(STATIC_DIR))
+
+
+def _heartbeat(job_id: int, stop: threading.Event) -> None:
+    """Пульс задачи: heartbeat_at каждые HEARTBEAT_INTERVAL_S, пока не stop."""
+    from backend.db import SessionLocal
+
+    while not stop.wait(HEARTBEAT_INTERVAL_S):
+        try:
+            with SessionLocal() as s:
+                s.execute(
+                    update(JobExecutionLog)
+                    .where(JobExecutionLog.id == job_id,
+                           JobExecutionLog.status == "running")
+                    .values(heartbeat_at=datetime.now())
+                )
+                s.commit()
+        except Exception as exc:
+            log.warning("[report_jobs] #%s heartbeat failed: %s", job_id, exc)
+
+
+def run_job(job_id: int) -> str:
+    """Выполнить задачу (уже переведённую в running). → итоговый статус."""
+    from backend.db import SessionLocal
+
+    handle = _JobHandle(job_id)
+    token = _current.set(handle)
+    status, artifact, error = "failed", None, None
+    beat_stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job_id, beat_stop),
+                            name=f"report-job-{job_id}-heartbeat", daemon=True)
+    beat.start()
+    with build_profiler.profile_build() as handle.profile:
+        db = SessionLocal()
+        try:
+            job = db.get(JobExecutionLog, job_id)
+            kind = job.job_type[len(JOB_PREFIX):]
+            params = dict(job.params or {})
+            db.commit()
+            report_stage("data")
+            if kind == PREVIEW_KIND:
+                artifact = _run_adaptation_preview(db, params, job_id)
+            else:
+                artifact = _run_document(db, kind, params, job_id)
+            status = "success"
+        except ReportJobCancelled as exc:
+            db.rollback()
+            status, error = "cancelled", str(exc)
+        except Exception as exc:
+            db.rollback()
+            log.exception("[report_jobs] #%s failed", job_id)
+            error = getattr(exc, "detail", None) or f"{type(exc).__name__}: {exc}"
+        finally:
+            db.close()
+            _current.reset(token)
+            beat_stop.set()
+            beat.join()
+    _finish(handle, status, artifact=artifact, error=error)
+    return status
+
+
+def _finish(handle: _JobHandle, status: str, *, artifact: str | None, error: str | None) -> None:
+    from backend.db import SessionLocal
+
+    handle.mark("done")
+    handle.stages.pop()
+    total_ms = round((time.perf_counter() - handle.t0) * 1000, 1)
+    summary = {"stages": handle.stages, "total_ms": total_ms}
+    if handle.profile is not None:
+        summary["build_profile"] = handle.profile.to_dict()
+    with SessionLocal() as s:
+        s.execute(
+            update(JobExecutionLog)
+            .where(JobExecutionLog.id == handle.job_id)
+            .values(
+                status=status, stage="done" if status == "success" else status,
+                finished_at=datetime.now(), heartbeat_at=datetime.now(),
+                artifact_path=artifact, error_message=error and str(error)[:4000],
+                result_summary=summary,
+            )
+        )
+        s.commit()
+    log.info("[report_jobs] #%s %s in %.0f ms (%s)", handle.job_id, status, total_ms,
+             ", ".join(f"{st['stage']}={st.get('ms')}" for st in handle.stages))
+
+
+def claim_next(db: Session, limit: int) -> Optional[int]:
+    """Забрать следующую queued-задачу, если running < limit. → id или None."""
+    db.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _CLAIM_LOCK_KEY})
+    running = (
+        db.query(func.count(JobExecutionLog.id))
+        .filter(JobExecutionLog.status == "running",
+                JobExecutionLog.job_type.like(JOB_PREFIX + "%"))
+        .scalar()
+    )
+    if running >= limit:
+        db.rollback()
+        return None
+    job = (
+        db.query(JobExecutionLog)
+        .filter(JobExecutionLog.status == "queued",
+                JobExecutionLog.job_type.like(JOB_PREFIX + "%"))
+        .order_by(JobExecutionLog.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.rollback()
+        return None
+    now = datetime.now()
+    job.status, job.stage = "running", "started"
+    job.started_at = job.heartbeat_at = now
+    job_id = job.id
+    db.commit()
+    return job_id
+
+
+def fail_stale(db: Session, older_than: timedelta = STALE_AFTER) -> int:
+    """running-задачи без heartbeat дольше older_than → failed (воркер потерян)."""
+    res = db.execute(
+        update(JobExecutionLog)
+        .where(JobExecutionLog.status == "running",
+               JobExecutionLog.job_type.like(JOB_PREFIX + "%"),
+               JobExecutionLog.heartbeat_at < datetime.now() - older_than)
+        .values(status="failed", stage="failed", finished_at=datetime.now(),
+                error_message="воркер очереди отчётов перестал отвечать")
+    )
+    db.commit()
+    return res.rowcount or 0
+
+
+def worker_loop(limit: int = DEFAULT_WORKERS, stop=None, poll_s: float = POLL_INTERVAL_S) -> None:
+    """Цикл воркера: снять потерянные задачи → забрать задачу → выполнить;
+    пусто — пауза poll_s."""
+    from backend.db import SessionLocal
+
+    while stop is None or not stop.is_set():
+        try:
+            with SessionLocal() as db:
+                n = fail_stale(db)
+                if n:
+                    log.warning("[report_jobs] %d stale running job(s) marked failed", n)
+                job_id = claim_next(db, limit)
+        except Exception:
+            log.exception("[report_jobs] claim failed")
+            job_id = None
+        if job_id is None:
+            if stop is not None:
+                stop.wait(poll_s)
+            else:
+                time.sleep(poll_s)
+            continue
+        run_job(job_id)
+
+
+# ─── Процессы воркеров ────────────────────────────────────────────────
+
+_processes: list = []
+_stop_event = None
+
+
+def start_workers(n: int = DEFAULT_WORKERS) -> list:
+    """Запустить n процессов-воркеров (spawn); n — и глобальный лимит задач.
+
+    Не daemon: daemon-процесс не может запускать дочерние, а задачам нужен
+    пул рендера графиков. Остановка — stop_workers (зарегистрирован в
+    atexit раньше join'а multiprocessing, иначе выход ждал бы воркеры вечно).
+    """
+    global _stop_event
+    if n <= 0 or _processes:
+        return _processes
+    ctx = multiprocessing.get_context("spawn")
+    _stop_event = ctx.Event()
+    for i in range(n):
+        p = ctx.Process(target=worker_loop, args=(n, _stop_event),
+                        name=f"report-worker-{i}", daemon=False)
+        p.start()
+        _processes.append(p)
+    atexit.register(stop_workers)
+    log.info("[report_jobs] started %d worker process(es)", n)
+    return _processes
+
+
+def stop_workers(timeout: float = 10.0) -> None:
+    """Остановить воркеры: текущие задачи дорабатывают до timeout.
+
+    timeout — на каждый процесс; не успевшие — terminate, их задачи снимет
+    fail_stale (пульса больше нет).
+    """
+    if _stop_event is not None:
+        _stop_event.set()
+    for p in _processes:
+        p.join(timeout)
+        if p.is_alive():
+            p.terminate()
+    _processes.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Воркеры очереди генерации отчётов")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="число процессов и лимит одновременных задач")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    start_workers(args.workers)
+    try:
+        for proc in list(_processes):
+            proc.join()
+    except KeyboardInterrupt:
+        stop_workers()
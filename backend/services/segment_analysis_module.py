@@ -13,6 +13,7 @@ Standalone модуль сегментного анализа газовых с
 ЗАВИСИМОСТИ:
     - numpy
     - pandas
+    - timeseries_analyzer (векторные примитивы changepoints)
 
 ОСНОВНЫЕ ТОЧКИ ВХОДА:
     - _segment_analysis(df) → dict
@@ -25,6 +26,13 @@ Standalone модуль сегментного анализа газовых с
 from __future__ import annotations
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from backend.services.timeseries_analyzer import (
+    cost_local_maxima,
+    dip_changepoints,
+    level_shift_cost,
+)
 
 
 # ════════════════════════════════════════════════════════════════════
@@ -290,44 +298,42 @@ def _detect_changepoints(y: np.ndarray, min_segment: int = 3,
     return _detect_changepoints_extended(y, None, min_segment, threshold_pct)
 
 
-def _detect_level_shifts(series: np.ndarray, min_segment: int,
-                          abs_threshold: float, rel_threshold_pct: float) -> set[int]:
-    """Универсальный поиск скачков уровня для произвольного ряда (Q, P, ΔP).
-    Возвращает множество индексов, где `|mean_right − mean_left| + 0.5|jump|`
-    превышает порог И является локальным максимумом cost в окне ±min_segment.
-
-    Порог = max(abs_threshold, |median| × rel_threshold_pct / 100).
-    """
+def _level_shift_base(series: np.ndarray, min_segment: int) -> tuple[np.ndarray, float] | None:
+    """Порого-независимая часть _detect_level_shifts: (cost, |median|) или None."""
     s = np.asarray(series, dtype=float)
     mask = np.isfinite(s)
     if mask.sum() < min_segment * 2:
-        return set()
+        return None
     s_clean = s.copy()
     if not mask.all():
         nans = ~mask
         x_all = np.arange(len(s))
         s_clean[nans] = np.interp(x_all[nans], x_all[mask], s[mask])
-    n = len(s_clean)
     med = float(np.nanmedian(np.abs(s_clean[mask])) or 1.0)
+    return level_shift_cost(s_clean, min_segment), med
+
+
+def _level_shift_maxima(base: tuple[np.ndarray, float] | None, min_segment: int,
+                        abs_threshold: float, rel_threshold_pct: float) -> set[int]:
+    """Пороговая часть _detect_level_shifts поверх готового cost."""
+    if base is None:
+        return set()
+    cost, med = base
     threshold = max(abs_threshold, med * rel_threshold_pct / 100.0)
+    return set(cost_local_maxima(cost, min_segment, threshold).tolist())
 
-    cost = np.zeros(n)
-    for i in range(min_segment, n - min_segment):
-        left = s_clean[:i]
-        right = s_clean[i:]
-        mean_diff = abs(np.mean(right) - np.mean(left))
-        jump = abs(s_clean[i] - s_clean[i - 1])
-        cost[i] = mean_diff + jump * 0.5
-
-    result: set[int] = set()
-    for i in range(min_segment, n - min_segment):
-        if cost[i] < threshold:
-            continue
-        ws = max(0, i - min_segment)
-        we = min(n, i + min_segment + 1)
-        if cost[i] == np.max(cost[ws:we]):
-            result.add(i)
-    return result
+
+def _detect_level_shifts(series: np.ndarray, min_segment: int,
+                          abs_threshold: float, rel_threshold_pct: float) -> set[int]:
+    """Универсальный поиск скачков уровня для произвольного ряда (Q, P, ΔP).
+    Возвращает множество индексов, где `|mean_right − mean_left| + 0.5|jump|`
+    превышает порог И является локальным максимумом cost в окне ±min_segment.
+
+    Порог = max(abs_threshold, |median| × rel_threshold_pct / 100).
+    """
+    return _level_shift_maxima(
+        _level_shift_base(series, min_segment), min_segment, abs_threshold, rel_threshold_pct
+    )
 
 
 def _detect_changepoints_extended(y: np.ndarray, shutdown: np.ndarray | None = None,
@@ -343,6 +349,9 @@ def _detect_changepoints_extended(y: np.ndarray, shutdown: np.ndarray | None = N
     2. Границы кластеров = обязательные точки перелома
     3. Внутри рабочих периодов — обычная детекция по Q
 
+    Расчёт разделён на две части: _changepoint_base (не зависит от
+    SEGMENT_THRESHOLDS, кэшируется) и _changepoints_from_base (пороги).
+
     Args:
         y: временной ряд значений Q
         shutdown: временной ряд простоев (мин/сут), опционально
@@ -352,10 +361,25 @@ def _detect_changepoints_extended(y: np.ndarray, shutdown: np.ndarray | None = N
     Returns:
         Список индексов точек перелома
     """
+    base = _changepoint_base(y, shutdown, min_segment, threshold_pct,
+                             p_flowline=p_flowline, dp=dp, choke=choke)
+    return _changepoints_from_base(base)
+
+
+def _changepoint_base(y: np.ndarray, shutdown: np.ndarray | None = None,
+                      min_segment: int = 3, threshold_pct: float = 15.0,
+                      p_flowline: np.ndarray | None = None,
+                      dp: np.ndarray | None = None,
+                      choke: np.ndarray | None = None) -> dict | None:
+    """
+    Часть _detect_changepoints_extended, не читающая SEGMENT_THRESHOLDS:
+    интерполяция Q, cost скачка уровня, кандидаты по штуцеру, простоям и
+    волатильности, cost скачков P шлейфа / ΔP. None — мало точек.
+    """
     y = np.asarray(y, dtype=float)
     mask = np.isfinite(y)
     if mask.sum() < min_segment * 2:
-        return []
+        return None
 
     # Заменяем NaN на интерполированные значения
     y_clean = y.copy()
@@ -371,23 +395,7 @@ def _detect_changepoints_extended(y: np.ndarray, shutdown: np.ndarray | None = N
 
     threshold = median_val * threshold_pct / 100.0
 
-    changepoints = set()
-
-    # === 0. ВАРИАНТ D: Кластеры простоев как обязательные границы ===
-    shutdown_clusters = []
-    if shutdown is not None:
-        shutdown_clusters = _find_shutdown_clusters(
-            shutdown, y_clean,
-            min_days=2,
-            shutdown_threshold_min=600.0,
-            q_drop_threshold_pct=50.0
-        )
-        # Добавляем границы кластеров как обязательные changepoints
-        for start, end in shutdown_clusters:
-            if start > 0:
-                changepoints.add(start)
-            if end < n:
-                changepoints.add(end)
+    candidates: set[int] = set()
 
     # === 0b. СМЕНА ШТУЦЕРА = обязательная точка перелома ===
     # Любое изменение диаметра штуцера физически меняет режим скважины:
@@ -399,103 +407,131 @@ def _detect_changepoints_extended(y: np.ndarray, shutdown: np.ndarray | None = N
     if choke is not None:
         choke_arr = np.asarray(choke, dtype=float)
         if len(choke_arr) == n:
-            for i in range(1, n):
-                a, b = choke_arr[i - 1], choke_arr[i]
-                if np.isfinite(a) and np.isfinite(b) and a != b:
-                    changepoints.add(i)
-                    choke_change_indices.add(i)
+            a, b = choke_arr[:-1], choke_arr[1:]
+            changed = np.isfinite(a) & np.isfinite(b) & (a != b)
+            choke_change_indices = set((np.nonzero(changed)[0] + 1).tolist())
+            candidates |= choke_change_indices
 
     # === 1. Базовая детекция по скачку уровня ===
-    cost_reduction = np.zeros(n)
-    for i in range(min_segment, n - min_segment):
-        left = y_clean[:i]
-        right = y_clean[i:]
-        mean_diff = abs(np.mean(right) - np.mean(left))
-        jump = abs(y_clean[i] - y_clean[i-1]) if i > 0 else 0
-        cost_reduction[i] = mean_diff + jump * 0.5
-
-    for i in range(min_segment, n - min_segment):
-        if cost_reduction[i] < threshold:
-            continue
-        window_start = max(0, i - min_segment)
-        window_end = min(n, i + min_segment + 1)
-        if cost_reduction[i] == np.max(cost_reduction[window_start:window_end]):
-            changepoints.add(i)
-
-    # === 2. Детекция коротких аномалий (провалов) ===
-    dip_drop = _segth("dip_drop_pct")
-    dip_rec = _segth("dip_recovery_pct")
-    dip_win = int(_segth("dip_recovery_window_days"))
-    for i in range(1, n - 1):
-        if i >= 1:
-            drop_pct = (y_clean[i] - y_clean[i-1]) / y_clean[i-1] * 100 if y_clean[i-1] != 0 else 0
-            if drop_pct < -dip_drop:
-                changepoints.add(i)
-                for j in range(i + 1, min(i + 1 + dip_win, n)):
-                    recovery_pct = (y_clean[j] - y_clean[i]) / y_clean[i] * 100 if y_clean[i] != 0 else 0
-                    if recovery_pct > dip_rec:
-                        changepoints.add(j)
-                        break
+    # |mean справа − mean слева| + 0.5·|скачок| — префиксные суммы, O(n)
+    cost_reduction = level_shift_cost(y_clean, min_segment)
+    candidates.update(cost_local_maxima(cost_reduction, min_segment, threshold).tolist())
 
     # === 3. Детекция по простоям (включая частые небольшие) ===
+    shutdown_raw = shutdown
     if shutdown is not None:
         shutdown = np.asarray(shutdown, dtype=float)
         shutdown = np.nan_to_num(shutdown, nan=0.0)
 
         # 3a. Резкие скачки простоев
-        for i in range(1, n):
-            if shutdown[i] > 500 and (i == 0 or shutdown[i-1] < 100):
-                changepoints.add(i)
-            if i > 0 and shutdown[i-1] > 500 and shutdown[i] < 100:
-                changepoints.add(i)
+        prev_sd, cur_sd = shutdown[:n - 1], shutdown[1:n]
+        jumps = ((cur_sd > 500) & (prev_sd < 100)) | ((prev_sd > 500) & (cur_sd < 100))
+        candidates.update((np.nonzero(jumps)[0] + 1).tolist())
 
         # 3b. Детекция периодов с частыми простоями (нестабильная работа)
         window = 7  # окно 7 дней
-        for i in range(window, n - window):
-            # Считаем частоту простоев в окне до и после точки i
-            before_window = shutdown[max(0, i-window):i]
-            after_window = shutdown[i:min(n, i+window)]
-
-            # Дни с простоями >30 мин
-            days_with_shutdown_before = np.sum(before_window > 30)
-            days_with_shutdown_after = np.sum(after_window > 30)
-
-            # Если частота простоев резко изменилась (было мало, стало много или наоборот)
-            freq_before = days_with_shutdown_before / len(before_window)
-            freq_after = days_with_shutdown_after / len(after_window)
-
-            # Начало нестабильного периода: было <30% дней с простоями, стало >60%
-            if freq_before < 0.3 and freq_after > 0.6:
-                changepoints.add(i)
-
-            # Конец нестабильного периода: было >60% дней с простоями, стало <30%
-            if freq_before > 0.6 and freq_after < 0.3:
-                changepoints.add(i)
+        if n > 2 * window:
+            # Дни с простоями >30 мин в окне [j, j+window); для точки i окно
+            # «до» начинается с i-window, окно «после» — с i
+            busy = sliding_window_view(shutdown[:n] > 30, window).sum(axis=1)
+            idx = np.arange(window, n - window)
+            freq_before = busy[idx - window] / window
+            freq_after = busy[idx] / window
+
+            # Начало нестабильного периода: было <30% дней с простоями, стало >60%;
+            # конец — наоборот
+            unstable = ((freq_before < 0.3) & (freq_after > 0.6)) | \
+                       ((freq_before > 0.6) & (freq_after < 0.3))
+            candidates.update(idx[unstable].tolist())
 
     # === 4. Детекция по волатильности (нестабильность Q) ===
     window = 7
     volatility = np.zeros(n)
-    for i in range(window, n - window):
-        # Коэффициент вариации в окне
-        window_data = y_clean[i-window:i+window]
-        if np.mean(window_data) != 0:
-            volatility[i] = np.std(window_data) / np.mean(window_data) * 100  # CV в %
+    if n > 2 * window:
+        # Коэффициент вариации в окне [i-window, i+window) — строка i-window
+        idx = np.arange(window, n - window)
+        windows = sliding_window_view(y_clean, 2 * window)[idx - window]
+        w_mean = windows.mean(axis=1)
+        w_std = windows.std(axis=1)
+        nonzero = w_mean != 0
+        volatility[idx[nonzero]] = w_std[nonzero] / w_mean[nonzero] * 100  # CV в %
 
     # Средняя волатильность
     mean_volatility = np.mean(volatility[volatility > 0]) if np.any(volatility > 0) else 0
 
-    for i in range(window + 1, n - window):
-        # Резкое изменение волатильности
-        vol_before = np.mean(volatility[max(0, i-window):i])
-        vol_after = np.mean(volatility[i:min(n, i+window)])
+    if n > 2 * window + 1:
+        # Резкое изменение волатильности: средние окон [i-window, i) и [i, i+window)
+        vol_mean = sliding_window_view(volatility, window).mean(axis=1)
+        idx = np.arange(window + 1, n - window)
+        vol_before = vol_mean[idx - window]
+        vol_after = vol_mean[idx]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Начало нестабильного периода: волатильность выросла в 2+ раза
+            rising = (vol_before > 0) & (vol_after / vol_before > 2.0) & \
+                     (vol_after > mean_volatility * 1.5)
+            # Конец нестабильного периода: волатильность снизилась в 2+ раза
+            falling = (vol_after > 0) & (vol_before / vol_after > 2.0) & \
+                      (vol_before > mean_volatility * 1.5)
+        candidates.update(idx[rising | falling].tolist())
 
-        # Начало нестабильного периода: волатильность выросла в 2+ раза
-        if vol_before > 0 and vol_after / vol_before > 2.0 and vol_after > mean_volatility * 1.5:
-            changepoints.add(i)
+    return {
+        "n": n,
+        "min_segment": min_segment,
+        "y_clean": y_clean,
+        "shutdown_raw": shutdown_raw,
+        "shutdown": shutdown,
+        "cost_reduction": cost_reduction,
+        "candidates": frozenset(candidates),
+        "choke_change_indices": frozenset(choke_change_indices),
+        # 4b: cost скачков давления — пороги применяются в _changepoints_from_base
+        "pressure_bases": [
+            _level_shift_base(series, min_segment)
+            for series in (p_flowline, dp) if series is not None
+        ],
+    }
+
+
+def _changepoints_from_base(base: dict | None) -> list[int]:
+    """
+    Часть _detect_changepoints_extended, зависящая от SEGMENT_THRESHOLDS:
+    кластеры простоев, провалы, пороги скачков давления, отступ от краёв,
+    слияние близких точек и финальная фильтрация.
+    """
+    if base is None:
+        return []
+
+    n = base["n"]
+    min_segment = base["min_segment"]
+    y_clean = base["y_clean"]
+    shutdown = base["shutdown"]
+    cost_reduction = base["cost_reduction"]
+    choke_change_indices = base["choke_change_indices"]
+
+    changepoints = set(base["candidates"])
+
+    # === 0. ВАРИАНТ D: Кластеры простоев как обязательные границы ===
+    shutdown_clusters = []
+    if base["shutdown_raw"] is not None:
+        shutdown_clusters = _find_shutdown_clusters(
+            base["shutdown_raw"], y_clean,
+            min_days=2,
+            shutdown_threshold_min=600.0,
+            q_drop_threshold_pct=50.0
+        )
+        # Добавляем границы кластеров как обязательные changepoints
+        for start, end in shutdown_clusters:
+            if start > 0:
+                changepoints.add(start)
+            if end < n:
+                changepoints.add(end)
 
-        # Конец нестабильного периода: волатильность снизилась в 2+ раза
-        if vol_after > 0 and vol_before / vol_after > 2.0 and vol_before > mean_volatility * 1.5:
-            changepoints.add(i)
+    # === 2. Детекция коротких аномалий (провалов) ===
+    changepoints.update(dip_changepoints(
+        y_clean,
+        _segth("dip_drop_pct"),
+        _segth("dip_recovery_pct"),
+        int(_segth("dip_recovery_window_days")),
+    ))
 
     # === 4b. ПЕРЕЛОМЫ ПО ДАВЛЕНИЯМ (v1.6) ===
     # Q может не двинуться, но скважина перешла в другой режим из-за
@@ -504,10 +540,8 @@ def _detect_changepoints_extended(y: np.ndarray, shutdown: np.ndarray | None = N
     p_abs = _segth("pressure_cp_abs_threshold")
     p_rel = _segth("pressure_cp_rel_threshold_pct")
     pressure_cps: set[int] = set()
-    if p_flowline is not None:
-        pressure_cps |= _detect_level_shifts(p_flowline, min_segment, p_abs, p_rel)
-    if dp is not None:
-        pressure_cps |= _detect_level_shifts(dp, min_segment, p_abs, p_rel)
+    for pressure_base in base["pressure_bases"]:
+        pressure_cps |= _level_shift_maxima(pressure_base, min_segment, p_abs, p_rel)
     changepoints |= pressure_cps
 
     # === 5. Сортируем и фильтруем ===
@@ -1160,8 +1194,20 @@ def _segment_analysis(df: pd.DataFrame) -> dict:
     Расширенный анализ сегментов с детектированием точек перелома.
     Учитывает простои, Q рабочий и ΔP для определения причин изменения дебита.
     """
+    return _segment_analysis_from_base(_segment_base(df))
+
+
+def _segment_base(df: pd.DataFrame) -> dict | None:
+    """
+    Порого-независимая база _segment_analysis: отсортированные ряды
+    (даты, Q, простои, давления, штуцер) и _changepoint_base по Q.
+    Не читает SEGMENT_THRESHOLDS — её можно кэшировать на (скважина,
+    период, версия данных) и пересчитывать только пороговую часть.
+    Массивы помечены read-only: база разделяется между запросами.
+    None — нет данных.
+    """
     if df.empty or "q_gas_total" not in df.columns:
-        return {"segments": [], "changepoints": [], "descriptions": [], "cp_descriptions": []}
+        return None
 
     d = df.sort_values("date").copy()
     dates = d["date"].values
@@ -1181,14 +1227,38 @@ def _segment_analysis(df: pd.DataFrame) -> dict:
     choke = (d["choke_mm"].to_numpy(dtype=float)
              if "choke_mm" in d.columns else None)
 
-    # Детектируем точки перелома с учётом простоев + давлений + штуцера
-    changepoints = _detect_changepoints_extended(
+    # Порого-независимая часть детектора (простои + давления + штуцер)
+    cp_base = _changepoint_base(
         q_total, shutdown, min_segment=3, threshold_pct=15.0,
         p_flowline=p_fl if np.isfinite(p_fl).any() else None,
         dp=dp if np.isfinite(dp).any() else None,
         choke=choke,
     )
 
+    base = {
+        "dates": dates, "q_total": q_total, "q_working": q_working,
+        "shutdown": shutdown, "p_wh": p_wh, "p_fl": p_fl, "dp": dp,
+        "choke": choke, "cp_base": cp_base,
+    }
+    for arr in (dates, q_total, q_working, shutdown, p_wh, p_fl, dp, choke):
+        if arr is not None:
+            arr.flags.writeable = False
+    return base
+
+
+def _segment_analysis_from_base(base: dict | None) -> dict:
+    """Пороговая часть _segment_analysis: точки перелома, сегменты, описания."""
+    if base is None:
+        return {"segments": [], "changepoints": [], "descriptions": [], "cp_descriptions": []}
+
+    dates = base["dates"]
+    q_total, q_working = base["q_total"], base["q_working"]
+    shutdown, dp, choke = base["shutdown"], base["dp"], base["choke"]
+    p_wh, p_fl = base["p_wh"], base["p_fl"]
+
+    # Детектируем точки перелома с учётом простоев + давлений + штуцера
+    changepoints = _changepoints_from_base(base["cp_base"])
+
     # Находим кластеры простоев для маркировки сегментов
     shutdown_clusters = _find_shutdown_clusters(
         shutdown, q_total,
@@ -1916,8 +1986,29 @@ def _segment_analysis_dual(df: pd.DataFrame) -> dict:
     есть переломы, которых нет в q_total — фактическая работа отклоняется
     от расчёта (накопление жидкости / износ штуцера / 2-фазный режим).
     """
-    primary = _segment_analysis(df)
+    return _segment_analysis_dual_from_base(_segment_dual_base(df))
+
+
+def _segment_dual_base(df: pd.DataFrame) -> dict:
+    """Порого-независимая база _segment_analysis_dual: {"primary", "working"}
+    из _segment_base; working=None, если второй кривой нет."""
+    primary = _segment_base(df)
     if "q_gas_working" not in df.columns or df["q_gas_working"].isna().all():
+        return {"primary": primary, "working": None}
+    # Подменяем колонки, чтобы _segment_analysis обработал q_working как
+    # «первичный» ряд (по нему детектируется ПЕРЕЛОМ). Структура выхода
+    # та же; field naming в коде остаётся «q_total/q_working» — это просто
+    # внутренние имена потока, semantically в working-анализе они меняются.
+    df_swap = df.copy()
+    df_swap["q_gas_total"]   = df["q_gas_working"]
+    df_swap["q_gas_working"] = df["q_gas_total"]
+    return {"primary": primary, "working": _segment_base(df_swap)}
+
+
+def _segment_analysis_dual_from_base(dual_base: dict) -> dict:
+    """Пороговая часть _segment_analysis_dual поверх _segment_dual_base."""
+    primary = _segment_analysis_from_base(dual_base["primary"])
+    if dual_base["working"] is None:
         # Нет второй кривой — параллельный анализ невозможен
         return {
             "primary": primary,
@@ -1926,14 +2017,7 @@ def _segment_analysis_dual(df: pd.DataFrame) -> dict:
             "only_total":   [cp["date"] for cp in primary.get("changepoints", [])],
             "only_working": [],
         }
-    # Подменяем колонки, чтобы _segment_analysis обработал q_working как
-    # «первичный» ряд (по нему детектируется ПЕРЕЛОМ). Структура выхода
-    # та же; field naming в коде остаётся «q_total/q_working» — это просто
-    # внутренние имена потока, semantically в working-анализе они меняются.
-    df_swap = df.copy()
-    df_swap["q_gas_total"]   = df["q_gas_working"]
-    df_swap["q_gas_working"] = df["q_gas_total"]
-    working = _segment_analysis(df_swap)
+    working = _segment_analysis_from_base(dual_base["working"])
 
     t_dates = {cp["date"] for cp in primary.get("changepoints", [])}
     w_dates = {cp["date"] for cp in working.get("changepoints", [])}
@@ -11,13 +11,16 @@
   customer_daily_service.create_block(kind=     ─┘         │
                        'segment_analysis', ...)            │
                                                            ▼
-                                       load_for_well(well, d_from, d_to)  ← переиспользуем
+                                       well_daily_version(well, d_from, d_to)
+                                                           │
+                                                           ▼
+                                       segment_base_cache  ─(промах)─► load_for_well + _segment_dual_base(df)
                                                            │
                                                            ▼
                                        _apply_user_overrides()            ← из segment_settings_service
                                                            │
                                                            ▼
-                                       _segment_analysis_dual(df)         ← из standalone-модуля
+                                       _segment_analysis_dual_from_base() ← из standalone-модуля
                                        _compute_pav_score(dual, df)       ← из standalone-модуля
                                                            │
                                                            ▼
@@ -42,8 +45,9 @@ import pandas as pd
 from sqlalchemy.orm import Session
 
 from backend.services import segment_analysis_module as sam
+from backend.services import segment_base_cache
 from backend.services import segment_settings_service as settings
-from backend.services.customer_daily_service import load_for_well
+from backend.services.customer_daily_service import load_for_well, well_daily_version
 
 log = logging.getLogger(__name__)
 
@@ -846,6 +850,22 @@ def _build_shutdown_clusters(df) -> list[dict]:
     return out
 
 
+def _load_segment_base(
+    db: Session, well: str, d_from: date, d_to: date,
+) -> tuple[pd.DataFrame, dict | None, str | None]:
+    """Загрузка ряда и порого-независимая база dual-анализа для кэша.
+
+    Ошибка расчёта базы возвращается строкой (а не исключением) и
+    кэшируется вместе с рядом — на тех же данных она повторится.
+    """
+    df = load_for_well(db, well, d_from=d_from, d_to=d_to)
+    try:
+        return df, sam._segment_dual_base(df), None
+    except Exception as e:
+        log.exception("_segment_dual_base failed for well=%s", well)
+        return df, None, str(e)
+
+
 def compute_segment_block(
     db: Session,
     well: str,
@@ -902,8 +922,9 @@ def compute_segment_block(
     """
     from datetime import datetime as _dt
 
-    df = load_for_well(db, str(well), d_from=d_from, d_to=d_to)
-    if df is None or df.empty:
+    version = well_daily_version(db, str(well), d_from=d_from, d_to=d_to)
+    n_points = version[0]
+    if not n_points:
         return {
             "ok": False,
             "error": (
@@ -912,7 +933,6 @@ def compute_segment_block(
             ),
         }
 
-    n_points = len(df)
     # Минимум для модуля: 6 точек (min_segment × 2). См. ТЗ §13.
     if n_points < 6:
         return {
@@ -924,10 +944,18 @@ def compute_segment_block(
             "n_points": n_points,
         }
 
-    # Применяем user-overrides и запускаем анализ.
+    # Порого-независимая база — из кэша, пока не изменились данные.
+    df, dual_base, base_error = segment_base_cache.get_or_build(
+        ("customer_daily", str(well), d_from, d_to, version),
+        lambda: _load_segment_base(db, str(well), d_from, d_to),
+    )
+    if base_error:
+        return {"ok": False, "error": f"Анализ сегментов упал: {base_error}"}
+
+    # Применяем user-overrides и запускаем пороговую часть анализа.
     with _apply_user_overrides():
         try:
-            dual = sam._segment_analysis_dual(df)
+            dual = sam._segment_analysis_dual_from_base(dual_base)
         except Exception as e:
             log.exception("_segment_analysis_dual failed for well=%s", well)
             return {"ok": False, "error": f"Анализ сегментов упал: {e}"}
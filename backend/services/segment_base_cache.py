@@ -0,0 +1,84 @@
+"""
+segment_base_cache — кэш порого-независимой базы сегментного анализа.
+
+Сегментный анализ делится на две части:
+  • база — загрузка рядов из БД, сортировка, интерполяция, cost скачков,
+    кандидаты в точки перелома по простоям/штуцеру/волатильности
+    (segment_analysis_module._segment_dual_base, агрегаты /analyze);
+  • пороговая часть — фильтрация кандидатов, классификация, описания
+    (читает SEGMENT_THRESHOLDS / AnalyzerConfig).
+
+База не зависит от порогов, поэтому при подборе порогов через
+/segment-thresholds пересчитывается только вторая часть — миллисекунды
+вместо повторной загрузки и полного прогона.
+
+Ключ: (источник, скважина, период…, версия данных). Версию считает
+вызывающая сторона дешёвым запросом (COUNT/MAX(loaded_at) и т.п.) —
+новая загрузка данных даёт новый ключ, старая запись вытесняется по LRU.
+TTL страхует от изменений, которые версия не видит.
+
+Значения в кэше разделяются между запросами — потребители НЕ должны их
+мутировать (массивы базы помечены read-only).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+BASE_CACHE_TTL_SECONDS = 30 * 60
+BASE_CACHE_MAX_ENTRIES = 64
+
+_cache: "OrderedDict[tuple, tuple[float, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def get_or_build(key: tuple[Hashable, ...], build: Callable[[], Any]) -> Any:
+    """Значение по ключу из кэша или build() с сохранением.
+
+    build() выполняется вне блокировки: два одновременных промаха по
+    одному ключу посчитают базу дважды, но не заблокируют остальные
+    запросы. Исключение из build() не кэшируется.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        item = _cache.get(key)
+        if item is not None and now - item[0] < BASE_CACHE_TTL_SECONDS:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return item[1]
+
+    value = build()
+
+    with _cache_lock:
+        _cache[key] = (time.monotonic(), value)
+        _cache.move_to_end(key)
+        while len(_cache) > BASE_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+        _stats["misses"] += 1
+    return value
+
+
+def invalidate(source: str | None = None, well: str | None = None) -> int:
+    """Сбросить записи источника и/или скважины (всё — без аргументов).
+
+    Returns:
+        Число удалённых записей.
+    """
+    with _cache_lock:
+        doomed = [
+            key for key in _cache
+            if (source is None or key[0] == source)
+            and (well is None or key[1] == str(well))
+        ]
+        for key in doomed:
+            del _cache[key]
+    return len(doomed)
+
+
+def cache_info() -> dict[str, int]:
+    """Размер кэша и счётчики попаданий — для диагностики."""
+    with _cache_lock:
+        return {"entries": len(_cache), **_stats}
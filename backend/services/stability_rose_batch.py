@@ -0,0 +1,463 @@
+"""
+stability_rose_batch.py — пакетный расчёт и калибровка розы нестабильности.
+
+Превью розы (stability_rose_service.compute_stability_rose) на каждый вызов
+читало всю историю скважины из well_daily и считало оси заново, а шкалы
+SCALES были откалиброваны вручную разовым анализом (133 скважины, P95,
+2026-06-24). Пакетный прогон делает то же для всего фонда:
+
+  1. Загрузка — ОДИН запрос к well_daily по всем скважинам (или списку).
+  2. Оси — параллельно по скважинам (ProcessPoolExecutor: расчёт чисто
+     CPU, Theil–Sen и L* на Python) для последней даты и, по желанию,
+     исторических якорей с шагом anchor_step_days. Ядро — общее с превью
+     (_well_daily_axes), результаты совпадают.
+  3. Запись — одна транзакция: stability_rose_axes (UPSERT по скважине,
+     якорю и окнам) + строка stability_rose_calibration с перцентилями
+     сырых осей по фонду и предложенными шкалами (P95).
+
+Превью берёт сырые оси из stability_rose_axes, если версия данных скважины
+до якоря (число строк + MAX(loaded_at)) не изменилась, и пересчитывает
+только лепестки — с шкалами активной калибровки (--apply) или SCALES.
+
+Только источник well_daily: LoRa-оси требуют минутных данных по каждой
+скважине и считаются превью как раньше.
+
+Запуск:
+    python -m backend.services.stability_rose_batch [--wells 101,205] [--workers 4]
+        [--anchor-step-days 30 --history-days 365] [--apply] [--dry-run]
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from backend.db import engine as pg_engine
+from backend.services import stability_rose_service as srs
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+CALIBRATION_PERCENTILES: tuple[int, ...] = (50, 75, 90, 95, 99)
+SCALE_PERCENTILE = 95
+ACTIVE_SCALES_TTL_SECONDS = 600
+
+# Оси, достоверность которых зависит от числа рабочих точек в окне тренда:
+# при insufficient их сырые значения в калибровку не идут.
+_TREND_GROUP = ("trend", "rough", "cyc", "dp")
+
+
+# ──────────────────── Загрузка ────────────────────
+
+
+def load_fleet_daily(wells: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Вся well_daily (или по списку скважин) одним запросом, по (well, date)."""
+    where = ""
+    params: dict[str, Any] = {}
+    if wells is not None:
+        where = "WHERE well = ANY(:wells)"
+        params["wells"] = [str(w) for w in wells]
+    with pg_engine.connect() as conn:
+        rows = conn.execute(
+            text(f"""
+                SELECT date, ggu, well, choke_mm, p_wellhead, p_flowline,
+                       q_gas_total, q_gas_working, shutdown_min, loaded_at
+                FROM well_daily
+                {where}
+                ORDER BY well, date
+            """),
+            params,
+        ).mappings().fetchall()
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def _anchors_for(df_well: pd.DataFrame, anchor_step_days: int,
+                 history_days: int) -> list[Optional[date]]:
+    """Якоря скважины: последняя дата (None) + каждые anchor_step_days назад."""
+    anchors: list[Optional[date]] = [None]
+    if anchor_step_days <= 0 or df_well.empty:
+        return anchors
+    last = pd.Timestamp(df_well["date"].max()).normalize()
+    first = max(pd.Timestamp(df_well["date"].min()).normalize(),
+                last - pd.Timedelta(days=history_days))
+    a = last - pd.Timedelta(days=anchor_step_days)
+    while a >= first:
+        anchors.append(a.date())
+        a -= pd.Timedelta(days=anchor_step_days)
+    return anchors
+
+
+def _well_task(well: str, df_well: pd.DataFrame, anchors: list[Optional[date]],
+               w_trend: int, w_downtime: int) -> list[dict]:
+    """Оси одной скважины на все якоря (в процессе пула). Якоря с тем же
+    фактическим днём (пропуски в данных) считаются один раз."""
+    out: list[dict] = []
+    seen: set[date] = set()
+    for anchor in anchors:
+        axes = srs._well_daily_axes(df_well, anchor, w_trend, w_downtime)
+        if "error" in axes or axes["anchor_eff"] in seen:
+            continue
+        seen.add(axes["anchor_eff"])
+        axes["well"] = well
+        out.append(axes)
+    return out
+
+
+# ──────────────────── Кэш осей ────────────────────
+
+
+def _json_raw(raw: dict) -> str:
+    """raw → JSON для JSONB (NaN/Inf недопустимы → null, лепесток всё равно 0)."""
+    return json.dumps({
+        k: (float(v) if v is not None and math.isfinite(float(v)) else None)
+        for k, v in raw.items()
+    })
+
+
+_UPSERT_AXES_SQL = text("""
+    INSERT INTO stability_rose_axes
+        (well, anchor, source, trend_days, downtime_days, rows_count,
+         data_loaded_at, choke_mm, n_days, n_work, l_star, raw, confidence,
+         computed_at, batch_id)
+    VALUES (:well, :anchor, 'well_daily', :trend_days, :downtime_days, :rows_count,
+            :data_loaded_at, :choke_mm, :n_days, :n_work, :l_star,
+            CAST(:raw AS JSONB), CAST(:confidence AS JSONB), :computed_at, :batch_id)
+    ON CONFLICT (well, anchor, source, trend_days, downtime_days) DO UPDATE SET
+        rows_count = EXCLUDED.rows_count,
+        data_loaded_at = EXCLUDED.data_loaded_at,
+        choke_mm = EXCLUDED.choke_mm,
+        n_days = EXCLUDED.n_days,
+        n_work = EXCLUDED.n_work,
+        l_star = EXCLUDED.l_star,
+        raw = EXCLUDED.raw,
+        confidence = EXCLUDED.confidence,
+        computed_at = EXCLUDED.computed_at,
+        batch_id = EXCLUDED.batch_id
+""")
+
+
+def _axes_params(well: str, w_trend: int, w_downtime: int, axes: dict,
+                 batch_id: Optional[str], now: datetime) -> dict:
+    return {
+        "well": str(well),
+        "anchor": axes["anchor_eff"],
+        "trend_days": int(w_trend),
+        "downtime_days": int(w_downtime),
+        "rows_count": axes["rows_count"],
+        "data_loaded_at": axes["data_loaded_at"],
+        "choke_mm": axes["choke"],
+        "n_days": axes["n_days"],
+        "n_work": axes["n_work"],
+        "l_star": axes["L_star"],
+        "raw": _json_raw(axes["raw"]),
+        "confidence": json.dumps(axes["confidence"]),
+        "computed_at": now,
+        "batch_id": batch_id,
+    }
+
+
+def store_axes(well: str, w_trend: int, w_downtime: int, axes_list: list[dict]) -> int:
+    """Записать оси, посчитанные превью (ошибки записи не мешают превью)."""
+    now = datetime.utcnow()
+    try:
+        with pg_engine.begin() as conn:
+            conn.execute(_UPSERT_AXES_SQL, [
+                _axes_params(well, w_trend, w_downtime, a, None, now) for a in axes_list
+            ])
+        return len(axes_list)
+    except Exception as e:
+        log.warning("[stability_rose] кэш осей не записан (well=%s): %s", well, e)
+        return 0
+
+
+def lookup_axes(well: str, anchor: Optional[date], w_trend: int,
+                w_downtime: int) -> Optional[dict]:
+    """Сырые оси из кэша, если версия данных скважины до якоря совпадает.
+
+    Один запрос: версия well_daily (COUNT, MAX(loaded_at), MAX(date) ≤ anchor)
+    ⋈ stability_rose_axes по фактическому якорю. None — промах (или таблицы
+    нет: миграция не применена) → превью считает оси само.
+    """
+    anchor_sql = "AND date <= :anchor" if anchor is not None else ""
+    try:
+        with pg_engine.connect() as conn:
+            row = conn.execute(
+                text(f"""
+                    WITH v AS (
+                        SELECT COUNT(*) AS n, MAX(loaded_at) AS loaded_at,
+                               MAX(date) AS anchor_eff
+                        FROM well_daily
+                        WHERE well = :well {anchor_sql}
+                    )
+                    SELECT a.anchor, a.choke_mm, a.n_days, a.n_work, a.l_star,
+                           a.raw, a.confidence, a.rows_count, a.data_loaded_at
+                    FROM v
+                    JOIN stability_rose_axes a
+                      ON a.well = :well
+                     AND a.anchor = v.anchor_eff
+                     AND a.source = 'well_daily'
+                     AND a.trend_days = :wt
+                     AND a.downtime_days = :wd
+                     AND a.rows_count = v.n
+                     AND a.data_loaded_at IS NOT DISTINCT FROM v.loaded_at
+                """),
+                {"well": str(well), "anchor": anchor, "wt": int(w_trend),
+                 "wd": int(w_downtime)},
+            ).mappings().first()
+    except Exception as e:
+        log.debug("[stability_rose] кэш осей недоступен: %s", e)
+        return None
+    if row is None:
+        return None
+    return {
+        "anchor_eff": row["anchor"],
+        "choke": row["choke_mm"],
+        "n_days": int(row["n_days"]),
+        "raw": dict(row["raw"]),
+        "L_star": int(row["l_star"]),
+        "confidence": dict(row["confidence"]),
+        "n_work": int(row["n_work"]),
+        "rows_count": int(row["rows_count"]),
+        "data_loaded_at": row["data_loaded_at"],
+    }
+
+
+# ──────────────────── Калибровка ────────────────────
+
+_active_scales: Optional[tuple[float, tuple[dict, float, Optional[int]]]] = None
+_active_scales_lock = threading.Lock()
+
+
+def active_scales() -> tuple[dict, float, Optional[int]]:
+    """(шкалы, DSTAR, id калибровки) для превью well_daily.
+
+    Активная калибровка из stability_rose_calibration (кэш на
+    ACTIVE_SCALES_TTL_SECONDS), иначе SCALES/DSTAR и id=None.
+    """
+    global _active_scales
+    with _active_scales_lock:
+        cached = _active_scales
+    if cached is not None and time.monotonic() - cached[0] < ACTIVE_SCALES_TTL_SECONDS:
+        return cached[1]
+
+    value: tuple[dict, float, Optional[int]] = (dict(srs.SCALES), srs.DSTAR, None)
+    try:
+        with pg_engine.connect() as conn:
+            row = conn.execute(text("""
+                SELECT id, scales FROM stability_rose_calibration
+                WHERE source = 'well_daily' AND is_active
+                ORDER BY computed_at DESC LIMIT 1
+            """)).mappings().first()
+        if row is not None:
+            sc = {k: float(row["scales"].get(k, srs.SCALES[k])) for k in srs.SCALES}
+            value = (sc, float(row["scales"].get("DSTAR", srs.DSTAR)), int(row["id"]))
+    except Exception as e:
+        log.debug("[stability_rose] калибровка недоступна: %s", e)
+
+    with _active_scales_lock:
+        _active_scales = (time.monotonic(), value)
+    return value
+
+
+def invalidate_active_scales() -> None:
+    """Сбросить кэш активной калибровки (после --apply)."""
+    global _active_scales
+    with _active_scales_lock:
+        _active_scales = None
+
+
+def calibrate(samples: list[dict]) -> dict[str, Any]:
+    """Перцентили сырых осей по фонду и предложенные шкалы.
+
+    Шкала оси = P{SCALE_PERCENTILE} её сырых значений (как ручная калибровка
+    2026-06-24); нулевые значения входят в выборку. Трендовая группа — только
+    при достоверности ≠ insufficient. DSTAR — экспертная граница, не
+    перцентиль, переносится без изменений; перцентили purge (средняя
+    длительность эпизода) — справочно.
+    """
+    percentiles: dict[str, dict[str, float | int]] = {}
+    scales: dict[str, float] = {}
+    for axis in srs.AXES:
+        vals = np.array([
+            float(s["raw"][axis]) for s in samples
+            if s["raw"].get(axis) is not None and math.isfinite(float(s["raw"][axis]))
+            and not (axis in _TREND_GROUP and s["confidence"].get(axis) == "insufficient")
+        ])
+        entry: dict[str, float | int] = {"n": int(vals.size)}
+        if vals.size:
+            for p, v in zip(CALIBRATION_PERCENTILES,
+                            np.percentile(vals, CALIBRATION_PERCENTILES)):
+                entry[f"p{p}"] = round(float(v), 6)
+        percentiles[axis] = entry
+        if axis in srs.SCALES:
+            p95 = entry.get(f"p{SCALE_PERCENTILE}")
+            scales[axis] = round(float(p95), 3) if p95 else srs.SCALES[axis]
+    scales["DSTAR"] = srs.DSTAR
+    return {"percentiles": percentiles, "scales": scales}
+
+
+# ──────────────────── Прогон по фонду ────────────────────
+
+
+def run_batch(
+    wells: Optional[Iterable[str]] = None,
+    *,
+    anchor_step_days: int = 0,
+    history_days: int = 365,
+    w_trend: int = srs.WINDOW_TREND_DAYS,
+    w_downtime: int = srs.WINDOW_DOWNTIME_DAYS,
+    max_workers: int = DEFAULT_WORKERS,
+    apply: bool = False,
+    write: bool = True,
+) -> dict:
+    """
+    Оси розы по фонду + калибровка шкал.
+
+    Args:
+        wells: Ограничить скважинами (номера well_daily.well; None — все).
+        anchor_step_days: Шаг исторических якорей (0 — только последняя дата).
+        history_days: Глубина исторических якорей.
+        max_workers: Процессы пула (≤ 1 — в текущем процессе).
+        apply: Сделать новую калибровку активной (превью возьмут её шкалы).
+        write: False — только расчёт, без записи в БД.
+
+    Returns:
+        {wells_total, wells_done, samples, calibration, calibration_id,
+         batch_id, errors, timings_ms}
+    """
+    t_start = time.perf_counter()
+    timings: dict[str, float] = {}
+
+    t0 = time.perf_counter()
+    df = load_fleet_daily(wells)
+    groups = {str(w): g for w, g in df.groupby("well", sort=True)} if not df.empty else {}
+    timings["load"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    samples: list[dict] = []
+    errors: dict[str, str] = {}
+    t0 = time.perf_counter()
+    tasks = {
+        well: (well, g.reset_index(drop=True), _anchors_for(g, anchor_step_days, history_days),
+               w_trend, w_downtime)
+        for well, g in groups.items()
+    }
+    if max_workers <= 1:
+        for well, args in tasks.items():
+            try:
+                samples.extend(_well_task(*args))
+            except Exception as e:
+                log.error("[stability_rose] well=%s ошибка расчёта: %s", well, e)
+                errors[well] = str(e)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {well: pool.submit(_well_task, *args) for well, args in tasks.items()}
+            for well, fut in futures.items():
+                try:
+                    samples.extend(fut.result())
+                except Exception as e:
+                    log.error("[stability_rose] well=%s ошибка расчёта: %s", well, e)
+                    errors[well] = str(e)
+    timings["compute"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    calibration = calibrate(samples)
+    wells_done = len({s["well"] for s in samples})
+    batch_id = str(uuid.uuid4())[:8]
+    calibration_id = None
+
+    t0 = time.perf_counter()
+    if write and samples:
+        now = datetime.utcnow()
+        with pg_engine.begin() as conn:
+            conn.execute(_UPSERT_AXES_SQL, [
+                _axes_params(s["well"], w_trend, w_downtime, s, batch_id, now)
+                for s in samples
+            ])
+            if apply:
+                conn.execute(text("""
+                    UPDATE stability_rose_calibration SET is_active = FALSE
+                    WHERE source = 'well_daily' AND is_active
+                """))
+            calibration_id = conn.execute(
+                text("""
+                    INSERT INTO stability_rose_calibration
+                        (source, computed_at, batch_id, n_wells, n_samples,
+                         params, percentiles, scales, is_active)
+                    VALUES ('well_daily', :now, :batch_id, :n_wells, :n_samples,
+                            CAST(:params AS JSONB), CAST(:percentiles AS JSONB),
+                            CAST(:scales AS JSONB), :active)
+                    RETURNING id
+                """),
+                {
+                    "now": now, "batch_id": batch_id, "n_wells": wells_done,
+                    "n_samples": len(samples),
+                    "params": json.dumps({
+                        "trend_days": w_trend, "downtime_days": w_downtime,
+                        "anchor_step_days": anchor_step_days,
+                        "history_days": history_days,
+                    }),
+                    "percentiles": json.dumps(calibration["percentiles"]),
+                    "scales": json.dumps(calibration["scales"]),
+                    "active": bool(apply),
+                },
+            ).scalar()
+        if apply:
+            invalidate_active_scales()
+    timings["write"] = round((time.perf_counter() - t0) * 1000, 1)
+    timings["total"] = round((time.perf_counter() - t_start) * 1000, 1)
+
+    log.info(
+        "[stability_rose] wells=%d done=%d samples=%d errors=%d calibration=%s за %.0f мс",
+        len(groups), wells_done, len(samples), len(errors), calibration_id,
+        timings["total"],
+    )
+    return {
+        "wells_total": len(groups),
+        "wells_done": wells_done,
+        "samples": len(samples),
+        "calibration": calibration,
+        "calibration_id": calibration_id,
+        "applied": bool(apply and calibration_id is not None),
+        "batch_id": batch_id if write and samples else None,
+        "errors": errors,
+        "timings_ms": timings,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Пакетный расчёт и калибровка розы нестабильности (well_daily)",
+    )
+    parser.add_argument("--wells", help="Номера скважин через запятую")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--anchor-step-days", type=int, default=0)
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--apply", action="store_true",
+                        help="сделать новую калибровку активной")
+    parser.add_argument("--dry-run", action="store_true", help="без записи в БД")
+    args = parser.parse_args()
+
+    res = run_batch(
+        args.wells.split(",") if args.wells else None,
+        anchor_step_days=args.anchor_step_days,
+        history_days=args.history_days,
+        max_workers=args.workers,
+        apply=args.apply,
+        write=not args.dry_run,
+    )
+    print(json.dumps(res, indent=2, ensure_ascii=False, default=str))
@@ -12,6 +12,8 @@
 готов под сохранение в `customer_report_block.data_snapshot` (kind='stability_rose').
 
 Шкалы откалиброваны на 133 скважинах well_daily (перцентиль P95), 2026-06-24.
+Перекалибровка по всему фонду — `python -m backend.services.stability_rose_batch`
+(с --apply её шкалы заменяют SCALES в превью well_daily); там же кэш сырых осей.
 Полная мат-модель и обоснование: plans/handoffs/HANDOFF_customer_chapter_map_2026-06-23.md
 (Приложение C).
 """
@@ -87,6 +89,8 @@ DESCRIPTIONS: dict[str, str] = {
 
 # ═══════════════════════════════════════════════════════════════════
 #  Калибровка (P95 по well_daily, 2026-06-24) — см. Приложение C.6/C.9
+#  Значения по умолчанию: активная калибровка stability_rose_batch (--apply)
+#  их переопределяет для well_daily (snapshot.calibration_id).
 # ═══════════════════════════════════════════════════════════════════
 
 SCALES: dict[str, float] = {
@@ -189,6 +193,31 @@ def _stable_run_len(d: np.ndarray, q: np.ndarray, sd: np.ndarray) -> int:
     return best
 
 
+def _petals_from_raw(
+    raw: dict[str, float | None], conf_trend: str,
+    scales: dict | None = None, dstar: float | None = None,
+) -> dict[str, float]:
+    """Лепестки 0..100 из сырых значений осей (см. _compute_factors).
+
+    Отделено от расчёта raw: кэш stability_rose_axes хранит только raw,
+    и лепестки пересчитываются с текущими шкалами (после перекалибровки
+    кэш не устаревает)."""
+    sc = scales if scales is not None else SCALES
+    ds = dstar if dstar is not None else DSTAR
+    pet = {k: _petal(raw.get(k), sc[k]) for k in AXES if k != "purge"}
+    pet["purge"] = 0.0
+    lam, dbar = raw.get("freq"), raw.get("purge")
+    if dbar is not None and lam is not None:
+        # продувочный паттерн: частые И короткие
+        pet["purge"] = _petal(lam / sc["freq"], 1.0) * max(0.0, 1.0 - min(1.0, dbar / ds))
+    # Группа трендовых осей (trend/rough/cyc/dp) считается на окне w_trend →
+    # её достоверность общая. freq/purge/uplift устойчивы (эпизоды, не наклон).
+    if conf_trend == "insufficient":
+        for k in ("trend", "rough", "cyc", "dp"):
+            pet[k] = 0.0
+    return pet
+
+
 def _compute_factors(
     df: pd.DataFrame, w_trend: int = WINDOW_TREND_DAYS,
     w_downtime: int = WINDOW_DOWNTIME_DAYS,
@@ -208,7 +237,6 @@ def _compute_factors(
     sd = np.nan_to_num(pd.to_numeric(df.get("shutdown_min"), errors="coerce").to_numpy(float))
     n = len(q)
 
-    pet = {k: 0.0 for k in AXES}
     raw: dict[str, float | None] = {k: None for k in AXES}
 
     # ── трендовые оси: окно w_trend дн, только рабочие дни ──
@@ -229,7 +257,6 @@ def _compute_factors(
         res = qe - (np.median(qe) - b * np.median(x) + b * x)
         F = 1.4826 * np.median(np.abs(res - np.median(res))) / m
         raw["trend"], raw["rough"] = T, F
-        pet["trend"], pet["rough"] = _petal(T, sc["trend"]), _petal(F, sc["rough"])
 
     # ── давления (окно 30 дн) ──
     pwl, pfl = pw[last], pf[last]
@@ -244,12 +271,10 @@ def _compute_factors(
         det = pwf - (np.median(pwf) - bb * np.median(xx) + bb * xx)
         amp = float(np.std(det) / np.median(pwf))
         raw["cyc"] = amp
-        pet["cyc"] = _petal(amp, sc["cyc"])
     # ось dp — ТОЛЬКО при стабильном давлении в линии (гейт R1/R2)
     if dpf.size >= 3 and np.median(np.abs(dpf)) > 0 and cvline < KAPPA_LINE:
         rel = (dpf[0] - dpf[-1]) / abs(np.median(dpf))
         raw["dp"] = rel
-        pet["dp"] = _petal(rel, sc["dp"])
 
     # ── простои (окно w_downtime дн) ──
     last90 = slice(max(0, n - w_downtime), n)
@@ -259,12 +284,8 @@ def _compute_factors(
     episodes = int(np.sum(isd & ~np.concatenate([[False], isd[:-1]])))
     lam = episodes * 30.0 / max(1, tau9)
     raw["freq"] = lam
-    pet["freq"] = _petal(lam, sc["freq"])
     if episodes > 0:
-        dbar = float(sd9[isd].sum()) / episodes
-        # продувочный паттерн: частые И короткие
-        pet["purge"] = _petal(lam / sc["freq"], 1.0) * max(0.0, 1.0 - min(1.0, dbar / ds))
-        raw["purge"] = dbar
+        raw["purge"] = float(sd9[isd].sum()) / episodes   # средняя длительность эпизода
 
     # ── прирост дебита после остановки (по всей доступной истории) ──
     isdh = sd > SHUTDOWN_MIN
@@ -282,13 +303,8 @@ def _compute_factors(
     posu = [u for u in ups if u > 0]
     up = float(np.mean(posu)) if posu else 0.0
     raw["uplift"] = up
-    pet["uplift"] = _petal(up, sc["uplift"])
 
-    # Группа трендовых осей (trend/rough/cyc/dp) считается на окне w_trend →
-    # её достоверность общая. freq/purge/uplift устойчивы (эпизоды, не наклон).
-    if conf_trend == "insufficient":
-        for k in ("trend", "rough", "cyc", "dp"):
-            pet[k] = 0.0
+    pet = _petals_from_raw(raw, conf_trend, sc, ds)
     confidence = {
         "trend": conf_trend, "rough": conf_trend, "cyc": conf_trend, "dp": conf_trend,
         "uplift": "normal", "freq": "normal", "purge": "normal",
@@ -297,6 +313,47 @@ def _compute_factors(
     return pet, raw, L, confidence, n_work
 
 
+def _well_daily_axes(
+    df: pd.DataFrame, anchor: date | None,
+    w_trend: int = WINDOW_TREND_DAYS, w_downtime: int = WINDOW_DOWNTIME_DAYS,
+) -> dict[str, Any]:
+    """Сырые оси розы по well_daily одной скважины на якорную дату.
+
+    df — вся история скважины (как load_for_well). Берутся дни ≤ anchor,
+    затем фильтр по текущему штуцеру. Общий код превью и пакетного
+    расчёта (stability_rose_batch): лепестки не считаются — их даёт
+    _petals_from_raw с действующими шкалами.
+
+    Возвращает {anchor_eff, choke, n_days, raw, L_star, confidence, n_work,
+    rows_count, data_loaded_at} (последние два — версия данных до якоря)
+    или {"error": ...}.
+    """
+    df = df.copy()
+    df["_d"] = pd.to_datetime(df["date"]).dt.date
+    if anchor is not None:
+        df = df[df["_d"] <= anchor]
+    if len(df) < 3:
+        return {"error": "Слишком мало данных до якорной даты (< 3 дн.)"}
+    anchor_eff = df["_d"].max()
+    choke = _select_current_choke(df, anchor_eff)
+    dfc = _filter_by_choke(df, choke) if choke is not None else df
+    if len(dfc) < 3:
+        return {"error": "Слишком мало данных (< 3 дн.)"}
+    _, raw, L, confidence, n_work = _compute_factors(dfc, w_trend, w_downtime)
+    loaded_at = df["loaded_at"].max() if "loaded_at" in df.columns else None
+    return {
+        "anchor_eff": anchor_eff,
+        "choke": choke,
+        "n_days": int(len(dfc)),
+        "raw": raw,
+        "L_star": int(L),
+        "confidence": confidence,
+        "n_work": int(n_work),
+        "rows_count": int(len(df)),
+        "data_loaded_at": pd.Timestamp(loaded_at).to_pydatetime() if pd.notna(loaded_at) else None,
+    }
+
+
 # ═══════════════════════════════════════════════════════════════════
 #  Entry-point
 # ═══════════════════════════════════════════════════════════════════
@@ -325,20 +382,39 @@ def compute_stability_rose(
     if source not in ("well_daily", "lora"):
         return {"ok": False, "error": f"Неизвестный источник: {source}"}
 
+    # Окно трендовых осей. ВАЖНО: окно скользящее НАЗАД — меньшее окно = МЕНЬШЕ
+    # точек, поэтому «ужимать при нехватке данных» вредно. Защита от нехватки —
+    # это не отказ и не шринк, а расчёт на доступных точках + флаг достоверности
+    # (normal/reduced/insufficient) из _compute_factors. Срез сам ограничивается
+    # доступной историей. Ручной window_days позволяет СФОКУСИРОВАТЬ на недавнем.
+    window_auto = window_days is None and downtime_window_days is None
+    w_trend = WINDOW_TREND_DAYS if window_days is None else max(N_MIN_HARD, int(window_days))
+    w_downtime = (WINDOW_DOWNTIME_DAYS if downtime_window_days is None
+                  else max(N_MIN_HARD, int(downtime_window_days)))
+
+    calibration_id = None
     if source == "well_daily":
-        # ── УзКорГаз: суточные сводки well_daily, фильтр по текущему штуцеру ──
-        df = csvc.load_for_well(db, str(well_number))
-        if df.empty:
-            return {"ok": False, "error": f"Нет данных по скв. №{well_number} в well_daily"}
-        df = df.copy()
-        df["_d"] = pd.to_datetime(df["date"]).dt.date
-        if anchor is not None:
-            df = df[df["_d"] <= anchor]
-        if len(df) < 3:
-            return {"ok": False, "error": "Слишком мало данных до якорной даты (< 3 дн.)"}
-        anchor_eff = df["_d"].max()
-        choke = _select_current_choke(df, anchor_eff)
-        dfc = _filter_by_choke(df, choke) if choke is not None else df
+        # ── УзКорГаз: суточные сводки well_daily, фильтр по текущему штуцеру.
+        # Сырые оси — из кэша пакетного расчёта (stability_rose_batch), пока
+        # версия данных скважины до якоря не изменилась; иначе — расчёт по
+        # истории скважины с записью в кэш.
+        from backend.services import stability_rose_batch as srb
+
+        axes = srb.lookup_axes(str(well_number), anchor, w_trend, w_downtime)
+        if axes is None:
+            df = csvc.load_for_well(db, str(well_number))
+            if df.empty:
+                return {"ok": False, "error": f"Нет данных по скв. №{well_number} в well_daily"}
+            axes = _well_daily_axes(df, anchor, w_trend, w_downtime)
+            if "error" in axes:
+                return {"ok": False, "error": axes["error"]}
+            srb.store_axes(str(well_number), w_trend, w_downtime, [axes])
+        anchor_eff, choke, n_days = axes["anchor_eff"], axes["choke"], axes["n_days"]
+        raw, L = dict(axes["raw"]), axes["L_star"]
+        confidence, n_work = dict(axes["confidence"]), axes["n_work"]
+        _sc, _ds, calibration_id = srb.active_scales()
+        pet = _petals_from_raw(raw, confidence["trend"], _sc, _ds)
+        scales_used = {**_sc, "DSTAR": _ds}
         _lora_ctx = None
     else:
         # ── LoRa: минутные давления → дебит (flow_rate) → суточная агрегация.
@@ -357,23 +433,13 @@ def compute_stability_rose(
         anchor_eff = dfc["_d"].max()
         choke = data.get("choke_mm")
         _lora_ctx = int(well["id"])
-
-    if len(dfc) < 3:
-        return {"ok": False, "error": "Слишком мало данных (< 3 дн.)"}
-
-    # Окно трендовых осей. ВАЖНО: окно скользящее НАЗАД — меньшее окно = МЕНЬШЕ
-    # точек, поэтому «ужимать при нехватке данных» вредно. Защита от нехватки —
-    # это не отказ и не шринк, а расчёт на доступных точках + флаг достоверности
-    # (normal/reduced/insufficient) из _compute_factors. Срез сам ограничивается
-    # доступной историей. Ручной window_days позволяет СФОКУСИРОВАТЬ на недавнем.
-    window_auto = window_days is None and downtime_window_days is None
-    w_trend = WINDOW_TREND_DAYS if window_days is None else max(N_MIN_HARD, int(window_days))
-    w_downtime = (WINDOW_DOWNTIME_DAYS if downtime_window_days is None
-                  else max(N_MIN_HARD, int(downtime_window_days)))
-
-    _sc = SCALES_LORA if source == "lora" else SCALES
-    _ds = DSTAR_LORA if source == "lora" else DSTAR
-    pet, raw, L, confidence, n_work = _compute_factors(dfc, w_trend, w_downtime, _sc, _ds)
+        if len(dfc) < 3:
+            return {"ok": False, "error": "Слишком мало данных (< 3 дн.)"}
+        n_days = int(len(dfc))
+        pet, raw, L, confidence, n_work = _compute_factors(
+            dfc, w_trend, w_downtime, SCALES_LORA, DSTAR_LORA,
+        )
+        scales_used = {**SCALES, "DSTAR": DSTAR}
 
     # LoRa: частота и длительность остановок — ТОЧНО из минутных эпизодов
     # (преимущество датчиков; по УзКор такого не было). Переопределяем freq/purge
@@ -436,7 +502,7 @@ def compute_stability_rose(
         "anchor": anchor_eff.isoformat(),
         "source": source,
         "choke_mm": choke,
-        "n_days": int(len(dfc)),
+        "n_days": int(n_days),
         "windows": {"trend_days": int(w_trend), "downtime_days": int(w_downtime)},
         "window_auto": bool(window_auto),
         "n_work": int(n_work),
@@ -459,7 +525,8 @@ def compute_stability_rose(
         "labels": dict(LABELS_FULL),
         "labels_short": dict(LABELS_SHORT),
         "descriptions": dict(DESCRIPTIONS),
-        "scales": {**SCALES, "DSTAR": DSTAR},
+        "scales": scales_used,
+        "calibration_id": calibration_id,   # None — шкалы по умолчанию (SCALES)
     }
 
 
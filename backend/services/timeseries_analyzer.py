@@ -16,6 +16,7 @@ timeseries_analyzer.py
 ТОЧКИ ВХОДА:
     - analyze_timeseries(df, config) → dict
     - detect_changepoints(series, config) → list[int]
+    - pelt_changepoints / binseg_changepoints — штрафная сегментация
     - compute_segments(series, boundaries, config) → list[dict]
 
 ЗАВИСИМОСТИ:
@@ -24,9 +25,11 @@ timeseries_analyzer.py
 """
 from __future__ import annotations
 
+import heapq
 import numpy as np
 import pandas as pd
 from dataclasses import dataclass, field
+from numpy.lib.stride_tricks import sliding_window_view
 from typing import Optional, List, Dict, Any, Tuple
 
 
@@ -47,6 +50,11 @@ class AnalyzerConfig:
     min_segment_days: int = 12                # минимальная длина сегмента (часов)
     edge_margin_days: int = 3                 # отступ от края периода
 
+    # Метод поиска CP: "window" — оконные детекторы скачков и разворотов,
+    # "pelt" / "binseg" — штрафная сегментация по сумме квадратов отклонений
+    changepoint_method: str = "window"
+    changepoint_penalty: Optional[float] = None  # None → 2·σ²·ln(n)
+
     # Требование к R² для подтверждения changepoint
     min_rsq_for_cp: float = 0.3               # минимальный R² тренда в сегменте
 
@@ -117,6 +125,16 @@ def detect_changepoints(
     if n < config.min_segment_days * 2:
         return []
 
+    if config.changepoint_method in ("pelt", "binseg"):
+        backend = pelt_changepoints if config.changepoint_method == "pelt" else binseg_changepoints
+        all_cps = backend(
+            _interpolate_nans(series),
+            penalty=config.changepoint_penalty,
+            min_size=max(2, config.min_segment_days // 2),
+        )
+        filtered_cps = _filter_short_segments(all_cps, n, config.min_segment_days)
+        return _merge_close_cps(filtered_cps, config.merge_close_cp_days)
+
     # Сглаживание (сильнее для низкой чувствительности)
     smooth_window = max(3, 15 - config.sensitivity)
     smoothed = _rolling_median(series, smooth_window)
@@ -154,34 +172,62 @@ def _detect_level_shifts(
     threshold: float,
     config: AnalyzerConfig
 ) -> List[int]:
-    """Детекция скачков уровня."""
+    """
+    Детекция скачков уровня.
+
+    Для каждой точки i сравниваются nanmean окна слева [i-hw, i) и справа
+    [i, i+hw). Полные окна считаются одним проходом sliding_window_view
+    (то же попарное суммирование, что и у np.nanmean), укороченные у краёв —
+    поштучно.
+    """
     n = len(smoothed)
-    candidates = []
     half_window = max(6, config.min_segment_days // 2)
+    idx = np.arange(config.edge_margin_days, n - config.edge_margin_days)
+    if len(idx) == 0:
+        return []
 
-    for i in range(config.edge_margin_days, n - config.edge_margin_days):
-        left_start = max(0, i - half_window)
-        right_end = min(n, i + half_window)
-
-        left_data = smoothed[left_start:i]
-        right_data = smoothed[i:right_end]
-
-        if len(left_data) < 3 or len(right_data) < 3:
-            continue
-
-        left_mean = np.nanmean(left_data)
-        right_mean = np.nanmean(right_data)
+    left_len = np.minimum(idx, half_window)
+    right_len = np.minimum(n - idx, half_window)
+    left_mean = _window_nanmeans(smoothed, idx - left_len, left_len, half_window)
+    right_mean = _window_nanmeans(smoothed, idx, right_len, half_window)
 
-        if not np.isfinite(left_mean) or not np.isfinite(right_mean):
-            continue
+    jump = np.abs(right_mean - left_mean)
+    ok = (
+        (left_len >= 3) & (right_len >= 3)
+        & np.isfinite(left_mean) & np.isfinite(right_mean)
+        & (jump >= threshold)
+    )
 
-        jump = abs(right_mean - left_mean)
+    # Выбираем локальные максимумы
+    return _select_local_maxima_simple(
+        list(zip(idx[ok].tolist(), jump[ok].tolist())), config.merge_close_cp_days
+    )
 
-        if jump >= threshold:
-            candidates.append((i, jump))
 
-    # Выбираем локальные максимумы
-    return _select_local_maxima_simple(candidates, config.merge_close_cp_days)
+def _window_nanmeans(
+    values: np.ndarray,
+    starts: np.ndarray,
+    lengths: np.ndarray,
+    width: int
+) -> np.ndarray:
+    """nanmean окон values[start:start+length]; полные окна (length == width) — векторно."""
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(starts), np.nan)
+    if len(values) >= width:
+        nan_mask = np.isnan(values)
+        totals = sliding_window_view(np.where(nan_mask, 0.0, values), width).sum(axis=1)
+        counts = sliding_window_view(~nan_mask, width).sum(axis=1)
+        full = lengths == width
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[full] = totals[starts[full]] / counts[starts[full]]
+    else:
+        full = np.zeros(len(starts), dtype=bool)
+
+    for k in np.nonzero(~full & (lengths > 0))[0]:
+        chunk = values[starts[k]:starts[k] + lengths[k]]
+        if np.isfinite(chunk).any():
+            out[k] = np.nanmean(chunk)
+    return out
 
 
 def _detect_trend_reversals(
@@ -191,7 +237,11 @@ def _detect_trend_reversals(
     """
     Детекция разворотов тренда - локальные максимумы и минимумы.
     Находит точки где тренд меняет направление (рост→падение или падение→рост).
+
+    Окно [i-window, i+window] для всех i берётся одним sliding_window_view;
+    тренды слева/справа — разности концов полуокон.
     """
+    smoothed = np.asarray(smoothed, dtype=float)
     n = len(smoothed)
     if n < 20:
         return []
@@ -202,62 +252,61 @@ def _detect_trend_reversals(
     window = max(4, 22 - config.sensitivity * 2)
     half_w = window // 2
 
-    reversals = []
-
-    # Поиск локальных экстремумов через сравнение трендов слева и справа
-    for i in range(window, n - window):
-        local_region = smoothed[max(0, i - window):min(n, i + window + 1)]
-        val = smoothed[i]
-
-        if len(local_region) < 5:
-            continue
-
-        local_max = np.nanmax(local_region)
-        local_min = np.nanmin(local_region)
-        local_range = local_max - local_min
-
-        if local_range < 0.5:  # слишком плоский участок
-            continue
-
-        # Порог значимости экстремума (% от локального диапазона)
-        # sensitivity 10 → 10% достаточно
-        # sensitivity 1 → 40% нужно
-        threshold_pct = 0.45 - config.sensitivity * 0.035  # от 0.415 до 0.10
+    idx = np.arange(window, n - window)
+    if len(idx) == 0:
+        return []
 
-        left_vals = smoothed[max(0, i - half_w):i]
-        right_vals = smoothed[i + 1:min(n, i + half_w + 1)]
+    # Окно i-window..i+window целиком внутри ряда для всех idx;
+    # fmax/fmin игнорируют NaN (как nanmax/nanmin), но без предупреждений
+    regions = sliding_window_view(smoothed, 2 * window + 1)
+    local_max = np.fmax.reduce(regions, axis=1)
+    local_min = np.fmin.reduce(regions, axis=1)
+    local_range = local_max - local_min
+    val = smoothed[idx]
 
-        if len(left_vals) < 2 or len(right_vals) < 2:
-            continue
+    # Порог значимости экстремума (% от локального диапазона)
+    # sensitivity 10 → 10% достаточно
+    # sensitivity 1 → 40% нужно
+    threshold_pct = 0.45 - config.sensitivity * 0.035  # от 0.415 до 0.10
 
-        left_trend = (left_vals[-1] - left_vals[0]) if len(left_vals) > 0 else 0
-        right_trend = (right_vals[-1] - right_vals[0]) if len(right_vals) > 0 else 0
+    left_trend = smoothed[idx - 1] - smoothed[idx - half_w]
+    right_trend = smoothed[idx + half_w] - smoothed[idx + 1]
 
-        # Локальный максимум: рост слева, падение справа
-        if val >= local_max - local_range * threshold_pct:
-            if left_trend > 0 and right_trend < 0:
-                reversals.append(i)
+    not_flat = ~(local_range < 0.5)  # слишком плоский участок отбрасываем
+    near_max = val >= local_max - local_range * threshold_pct
+    near_min = val <= local_min + local_range * threshold_pct
 
-        # Локальный минимум: падение слева, рост справа
-        elif val <= local_min + local_range * threshold_pct:
-            if left_trend < 0 and right_trend > 0:
-                reversals.append(i)
+    # Локальный максимум: рост слева, падение справа;
+    # локальный минимум: падение слева, рост справа
+    is_peak = near_max & (left_trend > 0) & (right_trend < 0)
+    is_trough = ~near_max & near_min & (left_trend < 0) & (right_trend > 0)
 
-    return reversals
+    return idx[not_flat & (is_peak | is_trough)].tolist()
 
 
 def _select_local_maxima_simple(candidates: List[Tuple[int, float]], min_gap: int) -> List[int]:
-    """Простой выбор локальных максимумов."""
+    """
+    Простой выбор локальных максимумов: жадно по убыванию score,
+    пропуская кандидатов ближе min_gap к уже выбранным.
+    """
     if not candidates:
         return []
 
-    sorted_cands = sorted(candidates, key=lambda x: -x[1])
-    selected = []
+    cand = np.asarray(candidates, dtype=float)
+    positions = cand[:, 0].astype(np.int64)
+    order = np.argsort(-cand[:, 1], kind="stable")
 
-    for idx, score in sorted_cands:
-        too_close = any(abs(idx - s) < min_gap for s in selected)
-        if not too_close:
-            selected.append(idx)
+    # blocked[p] — p ближе min_gap к одному из выбранных
+    offset = int(positions.min())
+    blocked = np.zeros(int(positions.max()) - offset + 1, dtype=bool)
+    selected = []
+    for idx in positions[order]:
+        pos = idx - offset
+        if blocked[pos]:
+            continue
+        selected.append(int(idx))
+        if min_gap > 0:
+            blocked[max(0, pos - min_gap + 1):pos + min_gap] = True
 
     return sorted(selected)
 
@@ -366,16 +415,33 @@ def _validate_changepoints(
     return validated
 
 
+# Строк окон на один np.sort: ограничивает память на минутных рядах
+_ROLLING_BLOCK_ROWS = 65_536
+
+
 def _rolling_median(series: np.ndarray, window: int) -> np.ndarray:
-    """Скользящая медиана с центрированием."""
-    n = len(series)
-    result = np.empty(n)
+    """
+    Скользящая медиана с центрированием (у краёв окно укорачивается, NaN
+    пропускаются). Окна сортируются блоками через sliding_window_view: NaN
+    уходят в конец строки, медиана берётся по числу валидных значений.
+    """
+    values = np.asarray(series, dtype=float)
+    n = len(values)
+    result = np.full(n, np.nan)
     half = window // 2
-
-    for i in range(n):
-        start = max(0, i - half)
-        end = min(n, i + half + 1)
-        result[i] = np.nanmedian(series[start:end])
+    width = 2 * half + 1
+    if n == 0:
+        return result
+
+    padded = np.concatenate([np.full(half, np.nan), values, np.full(half, np.nan)])
+    windows = sliding_window_view(padded, width)
+    for start in range(0, n, _ROLLING_BLOCK_ROWS):
+        block = np.sort(windows[start:start + _ROLLING_BLOCK_ROWS], axis=1)
+        count = np.count_nonzero(~np.isnan(block), axis=1)
+        rows = np.arange(len(block))
+        lo = block[rows, np.maximum(count - 1, 0) // 2]
+        hi = block[rows, count // 2]
+        result[start:start + len(block)] = (lo + hi) / 2
 
     return result
 
@@ -419,6 +485,223 @@ def _merge_close_cps(cps: List[int], merge_gap: int) -> List[int]:
     return merged
 
 
+# ════════════════════════════════════════════════════════════════════
+# 2b. Векторные примитивы changepoints (префиксные суммы)
+# ════════════════════════════════════════════════════════════════════
+# Общие для timeseries_analyzer, segment_analysis_module и
+# observation_segment_service: раньше каждый модуль считал их циклом
+# `for i in range(n)` со срезами, т.е. O(n·w) или O(n²).
+
+def _interpolate_nans(series: np.ndarray) -> np.ndarray:
+    """Линейная интерполяция NaN по индексу (концы — ближайшим значением)."""
+    values = np.asarray(series, dtype=float)
+    mask = np.isfinite(values)
+    if mask.all() or not mask.any():
+        return values.copy()
+    x_all = np.arange(len(values))
+    out = values.copy()
+    out[~mask] = np.interp(x_all[~mask], x_all[mask], values[mask])
+    return out
+
+
+def level_shift_cost(y: np.ndarray, min_segment: int) -> np.ndarray:
+    """
+    Стоимость перелома в каждой точке:
+    cost[i] = |mean(y[i:]) − mean(y[:i])| + 0.5·|y[i] − y[i−1]|
+    для i ∈ [min_segment, n − min_segment), иначе 0.
+
+    Средние «всё слева / всё справа» берутся из префиксных сумм (прямой и
+    обратной) — O(n) вместо O(n²). Для рядов с точными суммами (целые,
+    шаговые значения) результат совпадает с np.mean бит-в-бит, иначе —
+    с точностью до ULP.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    cost = np.zeros(n)
+    idx = np.arange(max(1, min_segment), n - min_segment)
+    if len(idx) == 0:
+        return cost
+
+    head = np.cumsum(y)               # head[i-1] = sum(y[:i])
+    tail = np.cumsum(y[::-1])[::-1]   # tail[i]   = sum(y[i:])
+    mean_left = head[idx - 1] / idx
+    mean_right = tail[idx] / (n - idx)
+    cost[idx] = np.abs(mean_right - mean_left) + np.abs(y[idx] - y[idx - 1]) * 0.5
+    return cost
+
+
+def cost_local_maxima(cost: np.ndarray, min_segment: int, threshold: float) -> np.ndarray:
+    """
+    Индексы i ∈ [min_segment, n − min_segment), где cost[i] ≥ threshold и
+    cost[i] — максимум окна [i − min_segment, i + min_segment].
+    """
+    cost = np.asarray(cost, dtype=float)
+    n = len(cost)
+    width = 2 * min_segment + 1
+    idx = np.arange(min_segment, n - min_segment)
+    if len(idx) == 0 or n < width:
+        return np.empty(0, dtype=np.int64)
+
+    # Строка j окна начинается с j → центр j + min_segment = idx[j]
+    window_max = sliding_window_view(cost, width).max(axis=1)
+    values = cost[idx]
+    return idx[(values >= threshold) & (values == window_max[:len(idx)])]
+
+
+def dip_changepoints(
+    y: np.ndarray,
+    drop_pct: float,
+    recovery_pct: float,
+    recovery_window: int
+) -> List[int]:
+    """
+    Короткие провалы: точка i, где y упал более чем на drop_pct % к y[i−1],
+    и первая точка j ∈ (i, i + recovery_window], где y восстановился более
+    чем на recovery_pct % к y[i].
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n < 3:
+        return []
+
+    prev, cur = y[:n - 2], y[1:n - 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drop = np.where(prev != 0, (cur - prev) / prev * 100, 0.0)
+    dips = np.nonzero(drop < -drop_pct)[0] + 1
+    if len(dips) == 0 or recovery_window <= 0:
+        return dips.tolist()
+
+    # Окна восстановления всех провалов сразу: (n_dips, recovery_window)
+    ahead = dips[:, None] + np.arange(1, recovery_window + 1)
+    inside = ahead < n
+    base = y[dips][:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        recovery = np.where(
+            base != 0, (y[np.minimum(ahead, n - 1)] - base) / base * 100, 0.0
+        )
+    hit = inside & (recovery > recovery_pct)
+    has_hit = hit.any(axis=1)
+    first = ahead[np.arange(len(dips)), hit.argmax(axis=1)][has_hit]
+
+    return sorted(set(dips.tolist()) | set(first.tolist()))
+
+
+def _default_penalty(values: np.ndarray) -> float:
+    """Штраф BIC-типа 2·σ²·ln(n); σ — робастная оценка шума по разностям."""
+    n = len(values)
+    diffs = np.diff(values)
+    sigma = 1.4826 * np.median(np.abs(diffs - np.median(diffs))) / np.sqrt(2) if len(diffs) else 0.0
+    if not np.isfinite(sigma) or sigma == 0:
+        sigma = float(np.std(values)) or 1.0
+    return 2.0 * sigma ** 2 * np.log(max(n, 2))
+
+
+def _segment_sse(head1: np.ndarray, head2: np.ndarray, start, end):
+    """Сумма квадратов отклонений от среднего на [start, end) из префиксных сумм."""
+    length = end - start
+    total = head1[end] - head1[start]
+    return head2[end] - head2[start] - total * total / length
+
+
+def pelt_changepoints(
+    series: np.ndarray,
+    penalty: Optional[float] = None,
+    min_size: int = 2
+) -> List[int]:
+    """
+    PELT (Killick et al., 2012) для смены среднего: минимум
+    Σ SSE(сегмент) + penalty·(число CP) с отсечением кандидатов.
+    Стоимость сегмента — O(1) по префиксным суммам; на каждом шаге
+    векторно обрабатывается только уцелевший набор кандидатов.
+
+    Returns:
+        Индексы начала новых сегментов (как у detect_changepoints).
+    """
+    values = np.asarray(series, dtype=float)
+    n = len(values)
+    min_size = max(1, int(min_size))
+    if n < 2 * min_size:
+        return []
+    if penalty is None:
+        penalty = _default_penalty(values)
+
+    head1 = np.concatenate([[0.0], np.cumsum(values)])
+    head2 = np.concatenate([[0.0], np.cumsum(values * values)])
+    best = np.empty(n + 1)
+    best[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    candidates = np.zeros(1, dtype=np.int64)
+
+    for end in range(min_size, n + 1):
+        if end - min_size >= min_size:
+            candidates = np.append(candidates, end - min_size)
+        fit = best[candidates] + _segment_sse(head1, head2, candidates, end)
+        k = int(np.argmin(fit))
+        best[end] = fit[k] + penalty
+        last[end] = candidates[k]
+        candidates = candidates[fit <= best[end]]
+
+    cps = []
+    end = n
+    while end > 0:
+        end = int(last[end])
+        if end > 0:
+            cps.append(end)
+    return sorted(cps)
+
+
+def binseg_changepoints(
+    series: np.ndarray,
+    penalty: Optional[float] = None,
+    min_size: int = 2,
+    max_changepoints: Optional[int] = None
+) -> List[int]:
+    """
+    Бинарная сегментация для смены среднего: на каждом шаге делится сегмент
+    с наибольшим выигрышем SSE, пока выигрыш > penalty. Все точки раздела
+    сегмента оцениваются одним векторным выражением по префиксным суммам.
+    """
+    values = np.asarray(series, dtype=float)
+    n = len(values)
+    min_size = max(1, int(min_size))
+    if n < 2 * min_size:
+        return []
+    if penalty is None:
+        penalty = _default_penalty(values)
+    limit = max_changepoints if max_changepoints is not None else n
+
+    head1 = np.concatenate([[0.0], np.cumsum(values)])
+    head2 = np.concatenate([[0.0], np.cumsum(values * values)])
+
+    def best_split(start: int, end: int):
+        splits = np.arange(start + min_size, end - min_size + 1)
+        if len(splits) == 0:
+            return None
+        gain = (
+            _segment_sse(head1, head2, start, end)
+            - _segment_sse(head1, head2, start, splits)
+            - _segment_sse(head1, head2, splits, end)
+        )
+        k = int(np.argmax(gain))
+        return float(gain[k]), int(splits[k])
+
+    heap: List[Tuple[float, int, int, int]] = []
+
+    def push(start: int, end: int) -> None:
+        found = best_split(start, end)
+        if found is not None and found[0] > penalty:
+            heapq.heappush(heap, (-found[0], found[1], start, end))
+
+    push(0, n)
+    cps: List[int] = []
+    while heap and len(cps) < limit:
+        _, split, start, end = heapq.heappop(heap)
+        cps.append(split)
+        push(start, split)
+        push(split, end)
+    return sorted(cps)
+
+
 # ════════════════════════════════════════════════════════════════════
 # 3. Сегментация и расчёт характеристик
 # ════════════════════════════════════════════════════════════════════
@@ -0,0 +1,376 @@
+"""
+trend_stats — робастный тренд: Mann-Kendall + Theil-Sen за O(n log n).
+
+Используется daily_report_service._robust_trend / _mann_kendall (а через них —
+adaptation_report_service для ΔP, P_tube, P_line, Q по стадиям).
+
+Прежняя реализация строила матрицу разностей n×n (Mann-Kendall) и все
+n(n−1)/2 наклонов (scipy.stats.theilslopes): на часовых/поминутных рядах
+многомесячных стадий это O(n²) памяти и времени (n = 100k → ~40 ГБ).
+
+  kendall_s(y)        — S-статистика через сортировку слиянием (подсчёт
+                        инверсий), точная, с учётом ties. O(n log² n) в numpy.
+  mann_kendall(y)     — (z, p): та же формула дисперсии и поправка
+                        непрерывности, что и раньше.
+  theil_sen(y, x)     — (slope, intercept, low, high), формулы scipy:
+                        медиана наклонов, CI по Sen (1968), intercept =
+                        median(y) − slope·median(x).
+                        n ≤ THEIL_SEN_EXACT_MAX — scipy.theilslopes (бит-в-бит);
+                        больше — выбор k-го наклона без перебора пар:
+                        число наклонов ≤ t = число инверсий ряда y − t·x,
+                        скобка [lo; hi] по случайной выборке пар сужается
+                        интерполяцией по рангу (массовые ничьи наклонов
+                        проверяются напрямую), остаток (≤ 2n наклонов)
+                        перечисляется вставками. Результат — реальные
+                        наклоны пар, те же порядковые статистики.
+
+Бенчмарк: python scripts/bench_trend_stats.py
+"""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+# До этого n — scipy.theilslopes: n(n−1)/2 ≈ 2 млн наклонов, ~100 МБ пика
+THEIL_SEN_EXACT_MAX = 2000
+
+# Скобка сужается, пока в ней больше наклонов, чем столько × n
+_ENUM_FACTOR = 2
+
+# Объём случайной выборки пар для начальной скобки
+_SAMPLE_PAIRS = 200_000
+
+
+# ──────────────────── Инверсии (сортировка слиянием) ────────────────────
+
+
+def _ranks_and_tied_pairs(a: np.ndarray) -> tuple[np.ndarray, int]:
+    """Плотные ранги 0..m−1 (равные значения — равный ранг) и число равных пар."""
+    _, ranks, counts = np.unique(a, return_inverse=True, return_counts=True)
+    tied = int((counts * (counts - 1) // 2).sum())
+    return ranks.astype(np.int64).ravel(), tied
+
+
+def _inversions_of_ranks(ranks: np.ndarray) -> int:
+    """
+    Число пар i < j с ranks[i] > ranks[j] — восходящая сортировка слиянием.
+
+    На уровне ширины w соседние отсортированные блоки (L, R) сливаются
+    одной устойчивой сортировкой ключа pair·m + rank (timsort видит два
+    готовых отрезка на блок). Для r ∈ R число l ∈ L, l ≤ r, — это его
+    позиция в слитом блоке минус позиция внутри R; остальные из L > r.
+    """
+    n = len(ranks)
+    if n < 2:
+        return 0
+    cur = ranks
+    m = int(cur.max()) + 1
+    idx = np.arange(n, dtype=np.int64)
+    merged_pos = np.empty(n, dtype=np.int64)
+    total = 0
+    width = 1
+    while width < n:
+        pair = idx // (2 * width)
+        key = pair * m + cur
+        order = np.argsort(key, kind="stable")
+        merged_pos[order] = idx
+        is_right = ((idx // width) & 1).astype(bool)
+        block_start = pair[is_right] * (2 * width)
+        left_le = (merged_pos[is_right] - block_start) - (idx[is_right] - block_start - width)
+        total += int((width - left_le).sum())
+        cur = key[order] - pair * m
+        width *= 2
+    return total
+
+
+def count_inversions(a: np.ndarray) -> int:
+    """Число пар i < j с a[i] > a[j] (строго). O(n log² n) в numpy."""
+    if len(a) < 2:
+        return 0
+    ranks, _ = _ranks_and_tied_pairs(np.asarray(a))
+    return _inversions_of_ranks(ranks)
+
+
+def _tied_pairs(a: np.ndarray) -> int:
+    """Число пар с равными значениями."""
+    _, counts = np.unique(a, return_counts=True)
+    return int((counts * (counts - 1) // 2).sum())
+
+
+# ──────────────────── Mann-Kendall ────────────────────
+
+
+def kendall_s(y: np.ndarray) -> int:
+    """S = Σ_{i<j} sign(y[j] − y[i]) без матрицы n×n."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n < 2:
+        return 0
+    total = n * (n - 1) // 2
+    ranks, tied = _ranks_and_tied_pairs(y)
+    descents = _inversions_of_ranks(ranks)
+    ascents = total - descents - tied
+    return int(ascents - descents)
+
+
+def mann_kendall(y: np.ndarray) -> tuple[float, float]:
+    """Mann-Kendall test для наличия монотонного тренда.
+
+    Returns
+    -------
+    (z, p_value): Z-статистика и двусторонний p-value.
+    """
+    from scipy import stats as _stats
+
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n < 4:
+        return 0.0, 1.0
+
+    s = float(kendall_s(y))
+
+    # Дисперсия с поправкой на ties.
+    var_s = n * (n - 1) * (2 * n + 5) / 18.0
+    _, counts = np.unique(y, return_counts=True)
+    ties = counts[counts > 1]
+    if ties.size:
+        var_s -= float(np.sum(ties * (ties - 1) * (2 * ties + 5))) / 18.0
+
+    if var_s <= 0:
+        return 0.0, 1.0
+
+    # Z с поправкой непрерывности.
+    if s > 0:
+        z = (s - 1.0) / np.sqrt(var_s)
+    elif s < 0:
+        z = (s + 1.0) / np.sqrt(var_s)
+    else:
+        z = 0.0
+
+    p = 2.0 * (1.0 - float(_stats.norm.cdf(abs(z))))
+    return float(z), float(p)
+
+
+# ──────────────────── Theil-Sen: выбор k-го наклона ────────────────────
+
+
+class _SlopeSelector:
+    """
+    Порядковые статистики наклонов (y_j − y_i)/(x_j − x_i), x_i < x_j.
+
+    Для x, отсортированного по возрастанию: наклон пары ≤ t ⇔
+    z_j ≤ z_i при z = y − t·x, т.е. число наклонов ≤ t — это число
+    «неубываний назад» ряда z (инверсии + равные z), минус пары с
+    одинаковым x.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, seed: int = 0):
+        order = np.argsort(x, kind="stable")
+        self.x = x[order]
+        self.y = y[order]
+        self.n = len(x)
+        self.x_tied = _tied_pairs(self.x)
+        self.total = self.n * (self.n - 1) // 2 - self.x_tied
+        self.rng = np.random.default_rng(seed)
+
+    def count_le(self, t: float) -> int:
+        """Число наклонов ≤ t."""
+        z = self.y - t * self.x
+        # Внутри группы равных x упорядочиваем z по убыванию — каждая пара
+        # группы тогда «инверсия или равенство»...
+        if self.x_tied:
+            z = z[np.lexsort((-z, self.x))]
+        # ...поэтому каждая пара с равным x попала в подсчёт ровно раз
+        ranks, tied = _ranks_and_tied_pairs(z)
+        return int(_inversions_of_ranks(ranks) + tied - self.x_tied)
+
+    def _sample_slopes(self, size: int) -> tuple[np.ndarray, np.ndarray]:
+        """Случайные различные пары → (уникальные наклоны, их кратность)."""
+        i = self.rng.integers(0, self.n, size)
+        j = self.rng.integers(0, self.n, size)
+        a, b = np.minimum(i, j), np.maximum(i, j)
+        ok = self.x[b] != self.x[a]
+        # пара выбирается с возвращением — считаем каждую один раз
+        pair_id = np.unique(a[ok] * self.n + b[ok])
+        a, b = np.divmod(pair_id, self.n)
+        slopes = (self.y[b] - self.y[a]) / (self.x[b] - self.x[a])
+        return np.unique(slopes, return_counts=True)
+
+    def _enumerate(self, lo: float, hi: float) -> np.ndarray:
+        """Все наклоны в (lo; hi] — инверсии порядка z(lo) относительно z(hi)."""
+        z_lo = self.y - lo * self.x
+        z_hi = self.y - hi * self.x
+        # Порядок по z(lo) по возрастанию (при равенстве — по x по убыванию,
+        # как в count_le); вставками переупорядочиваем по z(hi): каждая
+        # перестановка соседей — ровно одна пара с наклоном в (lo; hi].
+        # Сдвигов ровно столько, сколько таких пар: O(n + m).
+        seq = np.lexsort((-self.x, z_lo)).tolist()
+        key = z_hi.tolist()
+        xs = self.x.tolist()
+        ys = self.y.tolist()
+        slopes: list[float] = []
+        for pos in range(1, len(seq)):
+            p = seq[pos]
+            k = pos
+            while k > 0 and key[seq[k - 1]] >= key[p]:
+                q = seq[k - 1]
+                dx = xs[p] - xs[q]
+                if dx != 0:
+                    # пара (i, j) с x_i < x_j — тот же порядок, что у scipy
+                    if dx > 0:
+                        slopes.append((ys[p] - ys[q]) / dx)
+                    else:
+                        slopes.append((ys[q] - ys[p]) / (xs[q] - xs[p]))
+                seq[k] = q
+                k -= 1
+            seq[k] = p
+        out = np.array(slopes, dtype=float)
+        return np.sort(out[(out > lo) & (out <= hi)])
+
+    def select(self, ks: list[int]) -> list[float]:
+        """Наклоны рангов ks (1-based) по возрастанию."""
+        sample, mult = self._sample_slopes(min(_SAMPLE_PAIRS, max(self.total, 1) * 4))
+        # Значения, повторившиеся в выборке, — кандидаты «массовых» ничьих
+        # (датчик округляет давление, x — целые часы → много равных наклонов)
+        self._tied_sample = sample[mult >= 3]
+        self._tied_mult = mult[mult >= 3]
+        # Все вычисленные (t, число наклонов ≤ t): скобки соседних рангов
+        # (две середины медианы, границы CI) переиспользуют друг друга
+        self._known: dict[float, int] = {}
+        return [self._select_one(k, sample, len(sample)) for k in ks]
+
+    def _count_cached(self, t: float) -> int:
+        c = self._known.get(t)
+        if c is None:
+            c = self._known[t] = self.count_le(t)
+        return c
+
+    def _select_one(self, k: int, sample: np.ndarray, m: int) -> float:
+        p = k / self.total
+        spread = 3.0 * math.sqrt(p * (1 - p) / m) + 2.0 / m
+        # Границы — середины между соседними наклонами выборки: граница,
+        # совпавшая с реальным наклоном, считается по z с погрешностью
+        if m < 2:
+            lo = hi = float(sample[0]) if m else 0.0
+        else:
+            a_lo = min(max(int((p - spread) * m), 1), m - 1)
+            a_hi = min(max(int(math.ceil((p + spread) * m)), a_lo), m - 1)
+            lo = float((sample[a_lo - 1] + sample[a_lo]) / 2)
+            hi = float((sample[a_hi - 1] + sample[a_hi]) / 2)
+        # Уже известные точки могут дать скобку уже
+        below = [t for t, c in self._known.items() if c < k]
+        above = [t for t, c in self._known.items() if c >= k]
+        if below and max(below) > lo:
+            lo = max(below)
+        if above and min(above) < hi:
+            hi = min(above)
+        c_lo = self._count_cached(lo)
+        c_hi = self._count_cached(hi)
+
+        # Расширяем скобку, пока k не окажется внутри (c_lo < k ≤ c_hi)
+        width = max(hi - lo, 1e-12 * max(abs(lo), abs(hi), 1.0))
+        while c_lo >= k:
+            lo -= width
+            width *= 2
+            c_lo = self._count_cached(lo)
+        width = max(hi - lo, width)
+        while c_hi < k:
+            hi += width
+            width *= 2
+            c_hi = self._count_cached(hi)
+
+        # Ранг k внутри блока равных наклонов v: c(v⁻) < k ≤ c(v).
+        # Проверяем одно, самое частое в скобке значение — 2 подсчёта
+        in_bracket = (self._tied_sample > lo) & (self._tied_sample <= hi)
+        if in_bracket.any():
+            v = float(self._tied_sample[in_bracket][np.argmax(self._tied_mult[in_bracket])])
+            eps = 1e-12 * max(abs(v), 1e-300)
+            if self._count_cached(v - eps) < k <= self._count_cached(v + eps):
+                return v
+
+        # Сужаем интерполяцией по рангу (с откатом на бисекцию)
+        # (ступенчатая функция рангов при повторяющихся наклонах плохо
+        # интерполируется: если шаг не сократил скобку вдвое — бисекция)
+        limit = max(_ENUM_FACTOR * self.n, 64)
+        bisect = False
+        while c_hi - c_lo > limit:
+            if bisect:
+                frac = 0.5
+            else:
+                frac = min(max((k - c_lo - 0.5) / (c_hi - c_lo), 0.01), 0.99)
+            t = lo + (hi - lo) * frac
+            if not (lo < t < hi):
+                # Скобка схлопнулась до точки: много одинаковых наклонов
+                return hi
+            gap = c_hi - c_lo
+            c = self._count_cached(t)
+            if c >= k:
+                hi, c_hi = t, c
+            else:
+                lo, c_lo = t, c
+            bisect = not bisect and (c_hi - c_lo) * 2 > gap
+
+        candidates = self._enumerate(lo, hi)
+        pos = min(max(k - c_lo - 1, 0), len(candidates) - 1)
+        if len(candidates) == 0:
+            return hi
+        return float(candidates[pos])
+
+
+def theil_sen(
+    y: np.ndarray,
+    x: np.ndarray,
+    alpha: float = 0.95,
+) -> tuple[float, float, float, float]:
+    """
+    Theil-Sen: (slope, intercept, low_slope, high_slope).
+
+    Семантика scipy.stats.theilslopes(y, x, alpha) (method='separate').
+    """
+    from scipy import stats as _stats
+
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    n = len(y)
+    if n <= THEIL_SEN_EXACT_MAX:
+        res = _stats.theilslopes(y, x, alpha)
+        return (
+            float(res[0]), float(res[1]), float(res[2]), float(res[3]),
+        )
+
+    sel = _SlopeSelector(x, y, seed=n)
+    nt = sel.total
+    if nt == 0:
+        raise ValueError("All `x` coordinates are identical.")
+
+    # CI — (2.6) из Sen (1968), как в scipy
+    if alpha > 0.5:
+        alpha = 1.0 - alpha
+    z = _stats.norm.ppf(alpha / 2.0)
+    _, x_counts = np.unique(x, return_counts=True)
+    _, y_counts = np.unique(y, return_counts=True)
+    x_rep = x_counts[x_counts > 1].astype(float)
+    y_rep = y_counts[y_counts > 1].astype(float)
+    sigsq = 1 / 18.0 * (
+        n * (n - 1) * (2 * n + 5)
+        - float(np.sum(x_rep * (x_rep - 1) * (2 * x_rep + 5)))
+        - float(np.sum(y_rep * (y_rep - 1) * (2 * y_rep + 5)))
+    )
+    sigma = math.sqrt(sigsq)
+    ru = min(int(np.round((nt - z * sigma) / 2.0)), nt - 1)
+    rl = max(int(np.round((nt + z * sigma) / 2.0)) - 1, 0)
+
+    # Медиана: при чётном числе наклонов — среднее двух средних
+    if nt % 2:
+        med_ranks = [nt // 2 + 1]
+    else:
+        med_ranks = [nt // 2, nt // 2 + 1]
+    # ranks 0-based (rl, ru) → 1-based
+    values = sel.select(med_ranks + [rl + 1, ru + 1])
+    med = values[:-2]
+    slope = med[0] if len(med) == 1 else float(np.mean(med))
+    low, high = values[-2], values[-1]
+
+    intercept = float(np.median(y) - slope * np.median(x))
+    return float(slope), intercept, float(low), float(high)
@@ -0,0 +1,134 @@
+"""
+well_build_executor.py — параллельная сборка данных скважин суточного и
+сводного отчётов.
+
+generate_daily_report_pdf / generate_summary_report_pdf собирали скважины
+по очереди: build_well_day_data (запросы + pandas-аналитика давления,
+продувок, простоев), затем подсчёт сессий продувок, аномалий и тренда.
+Скважины друг от друга не зависят, а время сборки — это в основном
+ожидание БД и numpy/pandas, отпускающие GIL.
+
+run_per_well(wells, fn) выполняет fn(db, well) в пуле потоков:
+
+  • у каждого потока своя Session (SessionLocal) — Session не делится
+    между потоками; общий ReportDataLoader перед этим загружается целиком
+    (preload) и дальше только читается;
+  • результаты — в порядке wells, независимо от порядка завершения;
+  • исключение одной скважины не роняет отчёт: WellBuildResult.error,
+    вызывающий подставляет строку-предупреждение;
+  • workers ≤ 1 или одна скважина — в текущем потоке с db вызывающего
+    (как раньше).
+
+matplotlib-графики сюда не попадают: сборщик копит их в один ChartBatch на
+весь отчёт и рендерит в пуле процессов chart_render_pool одним run().
+
+build_meta(results, wall_ms) — сводка для doc.meta["well_build"]: время
+сборки (wall-clock), число потоков, время и ошибка каждой скважины.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class WellBuildResult:
+    well: Any
+    value: Any = None
+    ms: float = 0.0
+    error: Optional[str] = None
+
+
+def default_workers() -> int:
+    from backend.settings import settings
+
+    return settings.REPORT_WELL_WORKERS
+
+
+def _build_one(fn: Callable[[Session, Any], Any], db: Session, well: Any) -> WellBuildResult:
+    t0 = time.perf_counter()
+    try:
+        value, error = fn(db, well), None
+    except Exception as exc:
+        log.exception("[well_build] well %s failed", getattr(well, "number", well))
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        value, error = None, f"{type(exc).__name__}: {exc}"
+    return WellBuildResult(well=well, value=value,
+                           ms=round((time.perf_counter() - t0) * 1000, 1), error=error)
+
+
+def run_per_well(
+    wells: Sequence[Any], fn: Callable[[Session, Any], Any], *,
+    db: Session | None = None, workers: int | None = None,
+    session_factory: Callable[[], Session] | None = None,
+) -> list[WellBuildResult]:
+    """fn(db, well) для каждой скважины; результаты — в порядке wells.
+
+    db — сессия вызывающего (для последовательного режима). В потоках —
+    по сессии на поток из session_factory (None → backend.db.SessionLocal),
+    сессии закрываются по завершении.
+    """
+    workers = default_workers() if workers is None else workers
+    workers = min(workers, len(wells))
+    if workers <= 1:
+        if db is None:
+            raise ValueError("run_per_well: без пула потоков нужна сессия db")
+        return [_build_one(fn, db, w) for w in wells]
+
+    if session_factory is None:
+        from backend.db import SessionLocal as session_factory
+
+    local = threading.local()
+    sessions: list[Session] = []
+    sessions_lock = threading.Lock()
+
+    def thread_db() -> Session:
+        s = getattr(local, "db", None)
+        if s is None:
+            s = local.db = session_factory()
+            with sessions_lock:
+                sessions.append(s)
+        return s
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="well-build") as ex:
+            # copy_context: профиль сборки (build_profiler) виден и в потоках
+            futures = [
+                ex.submit(contextvars.copy_context().run,
+                          lambda w=w: _build_one(fn, thread_db(), w))
+                for w in wells
+            ]
+            return [f.result() for f in futures]
+    finally:
+        for s in sessions:
+            try:
+                s.close()
+            except Exception:
+                pass
+
+
+def build_meta(results: Sequence[WellBuildResult], wall_ms: float, workers: int) -> dict:
+    """Сводка сборки для doc.meta["well_build"]."""
+    return {
+        "wall_ms": round(wall_ms, 1),
+        "workers": workers,
+        "wells_ms": round(sum(r.ms for r in results), 1),
+        "failed": sum(1 for r in results if r.error),
+        "wells": [
+            {"well": str(getattr(r.well, "number", r.well)), "ms": r.ms,
+             **({"error": r.error} if r.error else {})}
+            for r in results
+        ],
+    }
@@ -0,0 +1,305 @@
+"""
+well_data_context — данные одной скважины на время сборки отчёта.
+
+Секции отчёта об адаптации (collect_report_data) — статистика этапов
+наблюдения/адаптации/оптимума, поиск оптимальных окон, помесячная
+статистика, периоды заказчика, обогащение событий снимков, эффективность
+реагента — раньше сами читали pressure_raw, well_daily, events и штуцер за
+свои (пересекающиеся) диапазоны: одна и та же минута давления читалась из
+БД по 4–5 раз, все события скважины — на каждый блок-снимок.
+
+WellDataContext создаётся один раз на сборку и лениво загружает:
+
+  • сырые минутные давления (pressure_raw). Покрытие — один непрерывный
+    интервал UTC; запрос за его пределами догружает только недостающие
+    края, каждая строка читается из БД один раз. cover() заранее объявляет
+    диапазоны секций — первая загрузка берёт их объединение;
+  • все события скважины (events) — одним запросом, срезы по bisect;
+  • суточный ряд заказчика (well_daily) — одним запросом;
+  • штуцер: для конвейера дебита (get_choke_mm, как compute_full_flow) и
+    запись конструкции для шапки отчёта (штуцер + горизонт).
+
+Секции получают срезы (копии) и производные, мемоизированные по диапазону:
+почасовое давление с verified-масками (как _load_masked_hourly) и полный
+расчёт дебита (как compute_full_flow, через run_flow_pipeline). Шаги
+очистки зависят от краёв диапазона (интерполяция, ffill/bfill), поэтому
+производные считаются по срезу сырых данных ровно за запрошенный
+диапазон — результат совпадает с прямым расчётом. Маски отдаёт индекс
+масок скважины (pressure_mask_service.get_mask_index) — он уже в памяти.
+
+Отчёты по списку скважин (report_data_loader.ReportDataLoader) грузят
+давления, события и конструкцию всех скважин набором и подставляют срезы
+через prime(): данные считаются уже загруженными за указанный диапазон,
+запрос за его пределами догружается как обычно.
+
+Производные (masked_hourly, full_flow) разделяются секциями — не мутировать.
+Контекст живёт в рамках одного запроса и не потокобезопасен.
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+
+_ONE_US = timedelta(microseconds=1)
+_PURGE_COLUMNS = ["event_time", "purge_phase", "p_tube", "p_line", "description"]
+_UNSET = object()
+
+
+def _ts(value) -> datetime:
+    """Naive datetime из datetime / ISO-строки / Timestamp."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.to_pydatetime()
+
+
+class WellDataContext:
+    """Ленивые мемоизированные данные одной скважины для сборки отчёта.
+
+    well — ORM Well (нужны id и number). Время pressure_raw и производных —
+    UTC; время событий — Кунград (как хранится в events).
+    """
+
+    def __init__(self, db: Session, well: Any):
+        self.db = db
+        self.well_id = int(well.id)
+        self.well_number = str(well.number)
+        self._plan: Optional[tuple[datetime, datetime]] = None
+        self._raw: Optional[pd.DataFrame] = None
+        self._raw_span: Optional[tuple[datetime, datetime]] = None
+        self._events: Optional[list] = None
+        self._event_times: list[datetime] = []
+        self._events_span: Optional[tuple[datetime, datetime]] = None
+        self._daily: Optional[pd.DataFrame] = None
+        self._choke: Any = _UNSET
+        self._construction: Optional[tuple[Optional[float], Optional[str]]] = None
+        self._memo: dict[tuple, Any] = {}
+        self.raw_loads = 0   # число запросов к pressure_raw (диагностика/тесты)
+
+    def prime(
+        self,
+        *,
+        raw: Optional[pd.DataFrame] = None,
+        raw_span: Optional[tuple] = None,
+        events: Optional[list] = None,
+        events_span: Optional[tuple] = None,
+        construction: Optional[tuple[Optional[float], Optional[str]]] = None,
+    ) -> None:
+        """Подставить данные, загруженные набором на несколько скважин.
+
+        raw — pressure_raw за raw_span (UTC, как get_pressure_data); events —
+        строки events (поля как в _ensure_events) за events_span (Кунград),
+        по возрастанию event_time; construction — (штуцер, горизонт).
+        """
+        if raw is not None:
+            self._raw = raw
+            self._raw_span = (_ts(raw_span[0]), _ts(raw_span[1]))
+        if events is not None:
+            self._events = list(events)
+            self._event_times = [r.event_time for r in self._events]
+            self._events_span = (_ts(events_span[0]), _ts(events_span[1]))
+        if construction is not None:
+            self._construction = construction
+
+    # ── Минутные давления ────────────────────────────────────────────
+
+    def cover(self, utc_start, utc_end) -> None:
+        """Объявить диапазон UTC, который понадобится секциям.
+
+        Первая загрузка pressure_raw берёт объединение объявленных и
+        запрошенного диапазонов одним запросом.
+        """
+        s, e = _ts(utc_start), _ts(utc_end)
+        if self._plan is not None:
+            s, e = min(s, self._plan[0]), max(e, self._plan[1])
+        self._plan = (s, e)
+
+    def _fetch(self, s: datetime, e: datetime) -> pd.DataFrame:
+        from backend.services.flow_rate.data_access import get_pressure_data
+
+        self.raw_loads += 1
+        return get_pressure_data(self.well_id, s.isoformat(), e.isoformat())
+
+    def _ensure_raw(self, s: datetime, e: datetime) -> None:
+        if self._plan is not None:
+            s, e = min(s, self._plan[0]), max(e, self._plan[1])
+            self._plan = None
+        if self._raw_span is None:
+            self._raw = self._fetch(s, e)
+            self._raw_span = (s, e)
+            return
+        lo, hi = self._raw_span
+        parts = []
+        if s < lo:
+            parts.append(self._fetch(s, lo - _ONE_US))
+        parts.append(self._raw)
+        if e > hi:
+            parts.append(self._fetch(hi + _ONE_US, e))
+        if len(parts) > 1:
+            non_empty = [p for p in parts if not p.empty]
+            self._raw = pd.concat(non_empty) if non_empty else self._raw
+            self._raw_span = (min(s, lo), max(e, hi))
+
+    def raw_pressure(self, utc_start, utc_end) -> pd.DataFrame:
+        """Сырые точки [p_tube, p_line] за [utc_start, utc_end] (копия).
+
+        Тот же кадр, что get_pressure_data за этот диапазон.
+        """
+        s, e = _ts(utc_start), _ts(utc_end)
+        self._ensure_raw(s, e)
+        if self._raw.empty:
+            return self._raw.copy()
+        return self._raw.loc[s:e].copy()
+
+    def masked_hourly(self, utc_start, utc_end) -> pd.DataFrame:
+        """Почасовое давление с verified-масками — как _load_masked_hourly."""
+        from backend.services.daily_report_service import _masked_hourly_from_raw
+
+        s, e = _ts(utc_start), _ts(utc_end)
+        key = ("hourly", s, e)
+        if key not in self._memo:
+            self._memo[key] = _masked_hourly_from_raw(
+                self.raw_pressure(s, e), self.well_id, s, e,
+            )
+        return self._memo[key]
+
+    def full_flow(self, utc_start, utc_end, *, dp_threshold: float = 0.1) -> dict:
+        """Полный расчёт дебита — как compute_full_flow(smooth=True).
+
+        Бросает ValueError, если нет данных давления или штуцера (не кэшируется).
+        """
+        from backend.services.flow_rate.full_pipeline import run_flow_pipeline
+
+        s, e = _ts(utc_start), _ts(utc_end)
+        key = ("flow", s, e, float(dp_threshold))
+        if key in self._memo:
+            return self._memo[key]
+
+        df = self.raw_pressure(s, e)
+        if df.empty:
+            raise ValueError(
+                f"Нет данных давления для well_id={self.well_id} "
+                f"за период {s.isoformat()}..{e.isoformat()}"
+            )
+        choke = self.choke_mm()
+        if choke is None:
+            raise ValueError(
+                f"Штуцер (choke_diam_mm) не найден для well_id={self.well_id}. "
+                f"Проверьте таблицу well_construction."
+            )
+        masks: list = []
+        try:
+            from backend.services.pressure_mask_service import load_active_masks
+            masks = load_active_masks(self.well_id, s, e)
+        except Exception as exc:
+            log.warning("[well_data_context] failed to load pressure masks: %s", exc)
+
+        result = run_flow_pipeline(
+            df, choke,
+            masks=masks,
+            events_df=self.purge_events(s, e),
+            well_id=self.well_id,
+            smooth=True,
+            dp_threshold=dp_threshold,
+            copy=False,
+        )
+        self._memo[key] = result
+        return result
+
+    # ── Штуцер / конструкция ─────────────────────────────────────────
+
+    def choke_mm(self) -> Optional[float]:
+        """Штуцер для конвейера дебита (get_choke_mm — как compute_full_flow)."""
+        if self._choke is _UNSET:
+            from backend.services.flow_rate.data_access import get_choke_mm
+            self._choke = get_choke_mm(self.well_id)
+        return self._choke
+
+    def construction(self) -> tuple[Optional[float], Optional[str]]:
+        """(штуцер, горизонт) последней записи well_construction — шапка отчёта."""
+        if self._construction is None:
+            row = self.db.execute(text("""
+                SELECT choke_diam_mm, horizon FROM well_construction
+                WHERE well_no = :wno
+                ORDER BY data_as_of DESC NULLS LAST LIMIT 1
+            """), {"wno": self.well_number}).fetchone()
+            self._construction = (
+                float(row[0]) if row and row[0] else None,
+                str(row[1]) if row and row[1] else None,
+            )
+        return self._construction
+
+    # ── События ─────────────────────────────────────────────────────
+
+    def _ensure_events(self, start=None, end=None) -> None:
+        if self._events is not None and self._events_span is not None:
+            lo, hi = self._events_span
+            if start is None or end is None or start < lo or end > hi:
+                # подставлены события за диапазон, а нужен шире — все события
+                self._events = None
+                self._events_span = None
+        if self._events is not None:
+            return
+        self._events = list(self.db.execute(text("""
+            SELECT event_time, event_type, purge_phase, reagent, qty,
+                   description, p_tube, p_line
+            FROM events
+            WHERE well = :wno AND event_time IS NOT NULL
+            ORDER BY event_time
+        """), {"wno": self.well_number}).fetchall())
+        self._event_times = [r.event_time for r in self._events]
+
+    def events(
+        self, start=None, end=None, *, types: Optional[Sequence[str]] = None,
+    ) -> list:
+        """События скважины за [start, end] (Кунград, границы включительно).
+
+        Строки: event_time, event_type, purge_phase, reagent, qty,
+        description, p_tube, p_line — по возрастанию event_time.
+        """
+        self._ensure_events(start, end)
+        lo = 0 if start is None else bisect.bisect_left(self._event_times, start)
+        hi = (len(self._events) if end is None
+              else bisect.bisect_right(self._event_times, end))
+        rows = self._events[lo:hi]
+        if types is not None:
+            rows = [r for r in rows if r.event_type in types]
+        return rows
+
+    def purge_events(self, start, end) -> pd.DataFrame:
+        """Маркеры продувок — тот же кадр, что get_purge_events(well_id, start, end)."""
+        rows = [
+            (r.event_time, r.purge_phase, r.p_tube, r.p_line, r.description)
+            for r in self.events(_ts(start), _ts(end), types=("purge",))
+        ]
+        df = pd.DataFrame(rows, columns=_PURGE_COLUMNS)
+        df["event_time"] = pd.to_datetime(df["event_time"])
+        return df
+
+    # ── Суточные данные заказчика ─────────────────────────────────────
+
+    def customer_daily(
+        self, d_from: date | None = None, d_to: date | None = None,
+    ) -> pd.DataFrame:
+        """Ряд well_daily за [d_from, d_to] — как load_for_well (копия)."""
+        if self._daily is None:
+            from backend.services.customer_daily_service import load_for_well
+            self._daily = load_for_well(self.db, self.well_number)
+        df = self._daily
+        if df.empty:
+            return pd.DataFrame()
+        mask = pd.Series(True, index=df.index)
+        if d_from:
+            mask &= df["date"] >= pd.Timestamp(d_from)
+        if d_to:
+            mask &= df["date"] <= pd.Timestamp(d_to)
+        out = df[mask].reset_index(drop=True)
+        return out if not out.empty else pd.DataFrame()
@@ -2,18 +2,12 @@
 
 Используется для блока «Технические данные» в LaTeX-отчёте.
 
-Бесплатные провайдеры тайлов из contextily (без ключей API):
-  * `Esri.WorldTopoMap`       — рельеф + города/посёлки/дороги (по умолчанию)
-  * `OpenTopoMap`             — рельеф + горизонтали (без городских объектов)
-  * `Esri.WorldImagery`       — спутниковые снимки
-  * `Esri.WorldShadedRelief`  — чисто рельеф без подписей
-  * `Esri.WorldStreetMap`     — улицы / без рельефа
-  * `OpenStreetMap.Mapnik`    — обычный OSM
-  * `CartoDB.Positron`        — светлый, минималистичный
-  * `CartoDB.Voyager`         — современный, мягкие цвета
-
-Координаты переводим WGS84 → Web Mercator (EPSG:3857) для совместимости
-с тайлами. Если тайлы недоступны — автоматически рисуем без подложки.
+Подложка — спутниковые тайлы Esri.WorldImagery из локального хранилища
+MBTiles (basemap_tiles): сеть при сборке отчёта не используется, тайлы
+месторождения заранее докачивает scripts/prefetch_basemap_tiles.py, а
+склеенная подложка кэшируется по (провайдер, bbox, размер). Координаты
+переводим WGS84 → Web Mercator (EPSG:3857) — проекция тайлов. Нет тайлов
+в хранилище — рисуем без подложки (сетка + подписи в градусах).
 
 Соотношение сторон фигуры подобрано под печать на ширину textwidth A4
 с высотой не более 0.3·textheight (≈ 18×8 cm → 2.25:1).
@@ -38,6 +32,10 @@ TARGET_ASPECT = TARGET_FIG_W_IN / TARGET_FIG_H_IN
 # не на максимальном зум-уровне, когда у нас всего одна точка.
 MIN_BBOX_METERS = 2_000.0
 
+# Провайдер и зум подложки (basemap_tiles.PROVIDERS)
+BASEMAP_PROVIDER = "esri_imagery"
+BASEMAP_ZOOM = 13
+
 
 def render_well_map_png(
     active: dict,
@@ -134,22 +132,25 @@ def render_well_map_png(
     basemap_attribution = None
     if use_basemap:
         try:
-            import contextily as ctx
-            source = ctx.providers.Esri.WorldImagery
-            basemap_attribution = (
-                "Imagery © Esri — Source: Esri, Maxar, Earthstar Geographics, "
-                "and the GIS User Community"
-            )
-            ctx.add_basemap(
-                ax,
-                crs="EPSG:3857",
-                source=source,
-                attribution=False,
-                zoom=13,
+            from backend.services import basemap_tiles
+            png = basemap_tiles.basemap_png(
+                BASEMAP_PROVIDER,
+                (x_min, y_min, x_max, y_max),
+                (int(TARGET_FIG_W_IN * dpi), int(TARGET_FIG_H_IN * dpi)),
+                zoom=BASEMAP_ZOOM,
+                output_path=output_path.with_name(output_path.stem + "_basemap.png"),
             )
-            basemap_added = True
+            if png:
+                ax.imshow(plt.imread(png), extent=(x_min, x_max, y_min, y_max),
+                          interpolation="bilinear", zorder=0)
+                ax.set_xlim(x_min, x_max)
+                ax.set_ylim(y_min, y_max)
+                basemap_attribution = basemap_tiles.provider(BASEMAP_PROVIDER).attribution
+                basemap_added = True
+            else:
+                log.info("basemap tiles not prefetched for this area — plain map")
         except Exception as e:
-            log.warning("contextily basemap failed, fallback to plain: %s", e)
+            log.warning("basemap failed, fallback to plain: %s", e)
 
     if not basemap_added:
         ax.grid(True, which="major", linestyle="-",
@@ -448,6 +448,27 @@ def _build_descriptions(
     return desc
 
 
+def _window_medians(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """np.median не-NaN values[lo:hi] для каждого окна (NaN — пустое окно).
+
+    Окна собираются в матрицу (окна × макс. длина), NaN уходят в конец
+    строки при сортировке; медиана — среднее двух средних элементов,
+    как в np.median.
+    """
+    if lo.size == 0:
+        return np.empty(0)
+    width = int((hi - lo).max())
+    idx = lo[:, None] + np.arange(width)
+    inside = idx < hi[:, None]
+    block = np.where(inside, values[np.minimum(idx, len(values) - 1)], np.nan)
+    block.sort(axis=1)
+    k = (~np.isnan(block)).sum(axis=1)
+    rows = np.arange(lo.size)
+    a = block[rows, np.maximum(k - 1, 0) // 2]
+    b = block[rows, k // 2 - (k == 0)]
+    return np.where(k > 0, (a + b) / 2.0, np.nan)
+
+
 def _iter_q_dp_windows(
     df_history: pd.DataFrame,
     window_days: int,
@@ -455,34 +476,35 @@ def _iter_q_dp_windows(
 ) -> tuple[list[float], list[float]]:
     """Скользящие окна по истории: выборки q_median и dp_median.
 
-    Аналог _iter_history_windows, но для медианных метрик.
+    Аналог _history_window_metrics, но для медианных метрик: те же
+    календарные окна (crs._history_window_bounds), медианы по рабочим
+    дням — одной векторной операцией на все окна.
     Нужен ≥ N_MIN_HARD рабочих точек в окне.
     """
     if df_history.empty or window_days < 7:
         return [], []
-    d = df_history.sort_values("date").copy()
-    d["_do"] = pd.to_datetime(d["date"]).dt.date
-    dmin = d["_do"].iloc[0]
-    dmax = d["_do"].iloc[-1]
-
-    q_sample: list[float] = []
-    dp_sample: list[float] = []
-    cur = dmin
-    step = timedelta(days=step_days)
-    win_delta = timedelta(days=window_days - 1)
-
-    while cur + win_delta <= dmax:
-        win_to = cur + win_delta
-        sub = d[(d["_do"] >= cur) & (d["_do"] <= win_to)]
-        if len(sub) >= N_MIN_HARD:
-            m = _compute_window_metrics(sub)
-            if m["q_median"] is not None:
-                q_sample.append(m["q_median"])
-            if m["dp_median"] is not None:
-                dp_sample.append(m["dp_median"])
-        cur += step
-
-    return q_sample, dp_sample
+    d = df_history.sort_values("date").reset_index(drop=True)
+    lo, hi = crs._history_window_bounds(
+        d["date"], window_days, step_days, min_rows=N_MIN_HARD,
+    )
+
+    def column(name: str) -> np.ndarray:
+        if name not in d.columns:
+            return np.full(len(d), np.nan)
+        return pd.to_numeric(d[name], errors="coerce").to_numpy(dtype=float)
+
+    sd_raw = column("shutdown_min")
+    work = np.where(np.isnan(sd_raw), 0.0, sd_raw) <= SHUTDOWN_THRESHOLD_MIN
+    q = np.where(work, column("q_gas_total"), np.nan)
+    dp = column("p_wellhead") - column("p_flowline")
+    dp = np.where(work & np.isfinite(dp) & (dp > 0.0), dp, np.nan)
+
+    q_med = _window_medians(q, lo, hi)
+    dp_med = _window_medians(dp, lo, hi)
+    return (
+        [float(v) for v in q_med[np.isfinite(q_med)]],
+        [float(v) for v in dp_med[np.isfinite(dp_med)]],
+    )
 
 
 # ───────────────────────────────────────────────────────────────────
@@ -48,6 +48,16 @@ class Settings(BaseSettings):
     # === Background Jobs ===
     # Секретный ключ для API автозадач (Render Cron -> HTTP endpoint)
     JOB_API_SECRET: str = "change_me_job_secret"
+    # Очередь генерации отчётов: процессы-воркеры при старте приложения и
+    # лимит одновременных сборок PDF на всю БД (0 — воркеры запускаются
+    # отдельно: python -m backend.services.report_job_queue --workers N)
+    REPORT_JOB_WORKERS: int = 2
+    # Тёплый рендерер Plotly-графиков PDF (plotly_render_daemon): число вкладок
+    # Chromium; 0 — демон не запускается, графики в одноразовом режиме
+    PLOTLY_RENDER_TABS: int = 3
+    # Потоки сборки скважин суточного / сводного отчёта (well_build_executor);
+    # у каждого потока своё соединение из пула engine, 1 — последовательно
+    REPORT_WELL_WORKERS: int = 4
 
     # === Pressure staleness alert ===
     # Через сколько минут отсутствия новых данных слать алерт в Telegram
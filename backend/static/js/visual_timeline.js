@@ -339,7 +339,7 @@ const EVENT_TRANSLATIONS = {
 // ==========================================
 // ИНИЦИАЛИЗАЦИЯ
 // ==========================================
-document.addEventListener('DOMContentLoaded', function() {
+document.addEventListener('DOMContentLoaded', async function() {
     console.log('Timeline chart initializing...');
 
     // Загружаем кастомные цвета
@@ -351,6 +351,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Инициализируем период из URL
     initializePeriod();
 
+    // Догружаем события (страница уже отрисована)
+    await loadTimelineData();
+
     // Обновляем легенды
     updateLegends();
 
@@ -360,6 +363,36 @@ document.addEventListener('DOMContentLoaded', function() {
     }, 100);
 });
 
+// ==========================================
+// ЗАГРУЗКА СОБЫТИЙ
+// ==========================================
+async function loadTimelineData() {
+    const data = window.reagentsData;
+    if (!data || !data.timelineUrl) return;
+
+    // Те же фильтры tl_*, что у страницы
+    const params = new URLSearchParams();
+    new URLSearchParams(window.location.search).forEach((value, key) => {
+        if (key.startsWith('tl_')) params.append(key, value);
+    });
+
+    let offset = 0;
+    try {
+        while (offset !== null) {
+            params.set('offset', offset);
+            const r = await fetch(`${data.timelineUrl}?${params}`);
+            if (!r.ok) throw new Error(`HTTP ${r.status}`);
+            const page = await r.json();
+            data.timelineEvents.push(...page.events);
+            data.timelineInjections.push(...page.injections);
+            offset = page.next_offset;
+        }
+    } catch (e) {
+        console.error('Timeline load error:', e);
+    }
+    console.log(`Timeline loaded: ${data.timelineEvents.length} events, ${data.timelineInjections.length} injections`);
+}
+
 // ==========================================
 // ПЕРИОД
 // ==========================================
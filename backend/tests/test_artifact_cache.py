@@ -0,0 +1,136 @@
+"""
+Тесты контентно-адресуемого кэша артефактов (artifact_cache).
+
+Проверяется:
+  - PNG снапшота рисуется один раз, ключ не зависит от порядка ключей
+    снапшота; удалённый снаружи файл — перерисовка;
+  - глава «Наблюдение»: после правки одного блока перерисовывается только
+    он, пути картинок во фрагменте ведут в запись кэша;
+  - вытеснение удаляет давно не использованные записи;
+  - ARTIFACT_CACHE=0 — рендер в заданный путь, как раньше.
+
+Запуск:
+    python -m pytest backend/tests/test_artifact_cache.py -v
+"""
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+from backend.services import artifact_cache as ac
+from backend.services import observation_chapter_renderer as ocr
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ac, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(ac, "_approx_bytes", None)
+    monkeypatch.delenv("ARTIFACT_CACHE", raising=False)
+    return tmp_path / "cache"
+
+
+CALLS: list[str] = []
+
+
+def _chart(snapshot: dict, output_path: str) -> None:
+    CALLS.append(snapshot["name"])
+    Path(output_path).write_bytes(b"\x89PNG" + snapshot["name"].encode())
+
+
+def test_png_rendered_once_per_snapshot(cache_dir):
+    CALLS.clear()
+    snap = {"name": "a", "q": [1.0, 2.0], "period": {"from": "2025-01-01", "to": "2025-01-10"}}
+    key = ac.artifact_key("chart", snap, version=ac.renderer_version(_chart))
+    first = ac.render_png(_chart, snap, key)
+    assert Path(first).read_bytes() == b"\x89PNGa" and cache_dir in Path(first).parents
+
+    reordered = {"period": {"to": "2025-01-10", "from": "2025-01-01"}, "q": [1.0, 2.0], "name": "a"}
+    assert ac.artifact_key("chart", reordered, version=ac.renderer_version(_chart)) == key
+    assert ac.render_png(_chart, reordered, key) == first
+    assert CALLS == ["a"] and ac.owns(first)
+
+    Path(first).unlink()
+    assert ac.lookup_png(key) is None
+    assert ac.render_png(_chart, snap, key) == first and CALLS == ["a", "a"]
+
+    assert ac.artifact_key("chart", {**snap, "name": "b"}) != ac.artifact_key("chart", snap)
+    assert ac.render_png(lambda s, p: None, snap, "ff" * 32) is None
+
+
+def _blocks(comment_b: str = "") -> list[dict]:
+    return [
+        {"block_id": 1, "kind": "observation_baseline", "title": "A", "block_status": "ok",
+         "snapshot": {"name": "a"}, "params": {}, "comment": ""},
+        {"block_id": 2, "kind": "observation_baseline", "title": "B", "block_status": "ok",
+         "snapshot": {"name": "b"}, "params": {}, "comment": comment_b},
+    ]
+
+
+def test_chapter_rerenders_only_edited_block(tmp_path, monkeypatch):
+    rendered: list[int] = []
+
+    def fake_baseline(snapshot, ctx):
+        rendered.append(ctx.block_id)
+        path = os.path.join(ctx.output_dir, f"obs_{ctx.block_id}_x.png")
+        Path(path).write_bytes(b"\x89PNG")
+        fig = ocr.FigureRef(relative_path="", absolute_path=path, caption=ctx.title)
+        return ocr.RenderResult(html="", latex=f"\\subsection*{{{ctx.title}}}\n"
+                                + ocr._latex_includegraphics(fig) + f"% raw {path}")
+
+    monkeypatch.setitem(ocr.KIND_RENDERERS, "observation_baseline", fake_baseline)
+    out_dir = str(tmp_path / "charts")
+
+    first = ocr.render_observation_chapter_latex(_blocks(), output_dir=out_dir)
+    again = ocr.render_observation_chapter_latex(_blocks(), output_dir=out_dir)
+    assert first == again and rendered == [1, 2]
+
+    edited = ocr.render_observation_chapter_latex(_blocks("уточнение"), output_dir=out_dir)
+    assert rendered == [1, 2, 2] and "уточнение" in edited
+
+    paths = re.findall(r"% raw (\S+)", edited)
+    assert len(paths) == 2 and all(ac.owns(p) and Path(p).exists() for p in paths)
+    graphics = re.findall(r"includegraphics\[[^]]*\]\{([^}]*)\}", edited)
+    root = ocr.latex_escape(str(ac.CACHE_DIR.resolve()))
+    assert len(graphics) == 2 and all(g.startswith(root) and "/." not in g for g in graphics)
+    assert not os.listdir(out_dir)
+
+    ocr.render_observation_chapter_latex(_blocks(), output_dir=out_dir, use_cache=False)
+    assert rendered == [1, 2, 2, 1, 2] and len(os.listdir(out_dir)) == 2
+
+
+def test_eviction_drops_least_recently_used(cache_dir, monkeypatch):
+    keys = []
+    for i in range(4):
+        snap = {"name": "x" * 1000 + str(i)}
+        keys.append(ac.artifact_key("chart", snap))
+        ac.render_png(_chart, snap, keys[-1])
+        marker = ac._entry_dir(keys[-1]) / ac._MARKER
+        os.utime(marker, (1000 + i, 1000 + i))
+    os.utime(ac._entry_dir(keys[0]) / ac._MARKER, (2000, 2000))   # недавнее попадание
+
+    assert ac.evict(max_bytes=10 ** 9) == 0
+    one = sum(f.stat().st_size for f in ac._entry_dir(keys[0]).iterdir())
+    assert ac.evict(max_bytes=int(one * 3.5)) == 2
+    assert [ac.lookup(k) is not None for k in keys] == [True, False, False, True]
+
+
+def test_disabled_cache_renders_in_place(tmp_path, monkeypatch):
+    from backend.services import adaptation_report_service as ars
+
+    monkeypatch.setenv("ARTIFACT_CACHE", "0")
+    target = tmp_path / "plain.png"
+    assert ars._render_snapshot_chart(_chart, {"name": "p"}, target) == str(target)
+    assert not ac.CACHE_DIR.exists()
+
+    monkeypatch.delenv("ARTIFACT_CACHE")
+    out: dict = {}
+    batch = ars.ChartBatch(workers=1)
+    ars._add_snapshot_chart(batch, _chart, {"name": "p"}, target, (out, "chart"))
+    assert len(batch) == 1
+    batch.run()
+    assert ac.owns(out["chart"])
+    ars._add_snapshot_chart(batch, _chart, {"name": "p"}, target, (out, "again"))
+    assert len(batch) == 0 and out["again"] == out["chart"]
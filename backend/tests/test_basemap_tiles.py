@@ -0,0 +1,116 @@
+"""
+Тесты локального хранилища тайлов подложки (basemap_tiles) без сети.
+
+Проверяется:
+  - prefetch кладёт тайлы в MBTiles (y в TMS), повторно не качает;
+  - склейка обрезается ровно по extent: цвет тайла попадает в нужный угол;
+    не скачанный зум — подложка с меньшего, нет тайлов — None;
+  - склейка кэшируется по (провайдер, bbox, size), новая докачка её
+    инвалидирует;
+  - карта скважины рисуется с подложкой из хранилища, не обращаясь к сети.
+
+Запуск:
+    python -m pytest backend/tests/test_basemap_tiles.py -v
+"""
+from __future__ import annotations
+
+from io import BytesIO
+
+import mercantile
+import pytest
+from PIL import Image
+
+from backend.services import artifact_cache as ac
+from backend.services import basemap_tiles as bt
+
+BBOX = (58.40, 43.95, 58.55, 44.05)      # ≈ 12 × 11 км, Сургил
+
+
+@pytest.fixture(autouse=True)
+def dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(bt, "TILES_DIR", tmp_path / "basemap")
+    monkeypatch.setattr(ac, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(ac, "_approx_bytes", None)
+    monkeypatch.delenv("ARTIFACT_CACHE", raising=False)
+    monkeypatch.setattr(bt, "_http_fetch", lambda p: pytest.fail("network used"))
+
+
+def _color(x: int, y: int) -> tuple[int, int, int]:
+    return (x * 37 % 256, y * 53 % 256, 128)
+
+
+def _fake_fetch(calls: list):
+    def fetch(z, x, y):
+        calls.append((z, x, y))
+        buf = BytesIO()
+        Image.new("RGB", (256, 256), _color(x, y)).save(buf, format="PNG")
+        return buf.getvalue()
+    return fetch
+
+
+def _extent(zoom: int):
+    """extent (EPSG:3857) из четырёх целых тайлов в центре BBOX."""
+    t = mercantile.tile((BBOX[0] + BBOX[2]) / 2, (BBOX[1] + BBOX[3]) / 2, zoom)
+    a = mercantile.xy_bounds(t.x, t.y, zoom)
+    b = mercantile.xy_bounds(t.x + 1, t.y + 1, zoom)
+    return t, (a.left, b.bottom, b.right, a.top)
+
+
+def test_prefetch_stores_tiles_once():
+    calls: list = []
+    stats = bt.prefetch("esri_imagery", BBOX, [11, 12], fetch=_fake_fetch(calls))
+    assert stats["downloaded"] == stats["tiles"] == len(calls) > 0
+    z, x, y = calls[0]
+    assert Image.open(BytesIO(bt.tile("esri_imagery", z, x, y))).getpixel((5, 5)) == _color(x, y)
+    assert bt.store("esri_imagery").metadata()["format"] == "jpg"
+
+    again = bt.prefetch("esri_imagery", BBOX, [11, 12], fetch=_fake_fetch(calls))
+    assert again["downloaded"] == 0 and again["cached"] == stats["tiles"]
+    assert len(calls) == stats["downloaded"]
+
+
+def test_compose_crops_to_extent_and_falls_back_to_lower_zoom():
+    assert bt.compose("esri_imagery", _extent(13)[1], (64, 64), 13) is None
+    bt.prefetch("esri_imagery", BBOX, [12, 13], fetch=_fake_fetch([]))
+
+    t, extent = _extent(13)
+    img = bt.compose("esri_imagery", extent, (100, 100), 13)
+    assert img.size == (100, 100)
+    assert img.getpixel((10, 10)) == _color(t.x, t.y)
+    assert img.getpixel((90, 90)) == _color(t.x + 1, t.y + 1)
+
+    # зума 15 нет (и 14 тоже) — берётся 13
+    img15 = bt.compose("esri_imagery", extent, (100, 100), 15)
+    assert img15.getpixel((90, 10)) == _color(t.x + 1, t.y)
+
+
+def test_basemap_png_cached_per_bbox_and_store_version(monkeypatch):
+    bt.prefetch("esri_imagery", BBOX, [13], fetch=_fake_fetch([]))
+    composed: list = []
+    real = bt.compose
+    monkeypatch.setattr(bt, "compose", lambda *a: composed.append(a) or real(*a))
+
+    _, extent = _extent(13)
+    p1 = bt.basemap_png("esri_imagery", extent, (80, 60), zoom=13)
+    p2 = bt.basemap_png("esri_imagery", extent, (80, 60), zoom=13)
+    assert p1 == p2 and ac.owns(p1) and len(composed) == 1
+    assert Image.open(p1).size == (80, 60)
+
+    bt.basemap_png("esri_imagery", extent, (160, 120), zoom=13)
+    assert len(composed) == 2
+
+    bt.store("esri_imagery").set_metadata(prefetched_at="later")
+    assert bt.basemap_png("esri_imagery", extent, (80, 60), zoom=13) != p1
+    assert len(composed) == 3
+
+
+def test_well_map_uses_store_offline(tmp_path):
+    from backend.services import well_map_renderer as wmr
+
+    active = {"number": "11", "lat": 44.0, "lon": 58.47}
+    neighbors = [{"number": "12", "lat": 44.01, "lon": 58.49}]
+    bt.prefetch(wmr.BASEMAP_PROVIDER, BBOX, [12, 13], fetch=_fake_fetch([]))
+
+    out = wmr.render_well_map_png(active, neighbors, tmp_path / "map.png", dpi=40)
+    assert out is not None and out.exists()
+    assert any(ac.CACHE_DIR.rglob("chart.png"))          # подложка склеена и в кэше
@@ -0,0 +1,111 @@
+"""
+Тесты профиля сборки отчёта (build_profiler) на SQLite в памяти.
+
+Проверяется:
+  - вне profile_build секции и @profiled — no-op, запросы не считаются;
+  - запросы и строки считаются слушателями Engine, вложенные секции —
+    путь через «/», повторные вызовы суммируются, итоги — по убыванию ms;
+  - потоки well_build_executor пишут в профиль вызывающего (copy_context),
+    параллельные секции в потоках не считают запросы друг друга;
+  - память — текущий RSS на границах секций, а не пик процесса.
+
+Запуск:
+    python -m pytest backend/tests/test_build_profiler.py -v
+"""
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from backend.services import build_profiler as bp
+from backend.services import well_build_executor as wbe
+
+
+@pytest.fixture
+def engine():
+    # StaticPool: одна БД в памяти на все потоки
+    eng = create_engine("sqlite://", poolclass=StaticPool,
+                        connect_args={"check_same_thread": False})
+    with eng.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1), (2), (3)"))
+    yield eng
+    eng.dispose()
+
+
+def _count(eng):
+    with eng.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM t")).scalar()
+
+
+@bp.profiled()
+def _format_demo_block(eng):
+    time.sleep(0.01)
+    return _count(eng)
+
+
+def test_noop_outside_profile(engine):
+    assert bp.current() is None
+    with bp.section("x"):
+        assert _format_demo_block(engine) == 3
+    with bp.profile_build() as prof:
+        pass
+    assert prof.to_dict()["queries"] == 0 and prof.sections == {}
+
+
+def test_sections_queries_and_nesting(engine):
+    with bp.profile_build() as prof:
+        with bp.section("collect"):
+            _count(engine)
+            time.sleep(0.03)
+            with bp.section("charts"):
+                _format_demo_block(engine)
+        _format_demo_block(engine)
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE t SET x = x + 1"))
+        with bp.profile_build() as inner:          # вложенный — тот же профиль
+            assert inner is prof
+
+    d = prof.to_dict()
+    assert d["queries"] == 4 and d["rows"] >= 3     # UPDATE: rowcount = 3
+    by_name = {s["name"]: s for s in d["sections"]}
+    assert set(by_name) == {"collect", "collect/charts",
+                            "collect/charts/_format_demo_block", "_format_demo_block"}
+    assert by_name["collect"]["queries"] == 2 and by_name["collect/charts"]["queries"] == 1
+    assert by_name["_format_demo_block"]["calls"] == 1
+    assert d["sections"][0]["name"] == "collect"
+    assert d["total_ms"] >= by_name["collect"]["ms"] > 0
+    assert bp.current() is None
+
+
+def test_well_threads_report_into_caller_profile(engine):
+    wells = [SimpleNamespace(id=i, number=i) for i in range(8)]
+    with bp.profile_build() as prof:
+        with bp.section("wells"):
+            # 4 потока, секции скважин идут одновременно (sleep внутри)
+            results = wbe.run_per_well(wells, lambda db, w: _format_demo_block(engine),
+                                       workers=4, session_factory=lambda: SimpleNamespace(
+                                           close=lambda: None, rollback=lambda: None))
+    assert [r.value for r in results] == [3] * 8
+    d = prof.to_dict()
+    assert d["queries"] == 8
+    by_name = {s["name"]: s for s in d["sections"]}
+    assert by_name["wells/_format_demo_block"]["calls"] == 8
+    assert by_name["wells/_format_demo_block"]["queries"] == 8   # по 1 на вызов
+    assert by_name["wells"]["queries"] == 8
+
+
+def test_rss_sampled_per_build_not_process_peak(monkeypatch):
+    samples = iter([500.0, 900.0, 700.0, 600.0])
+    monkeypatch.setattr(bp, "_rss_mb", lambda: next(samples))
+    with bp.profile_build() as prof:                # 500
+        with bp.section("big"):                     # 900 → 700
+            pass
+    d = prof.to_dict()                              # 600
+    s = d["sections"][0]
+    assert s["rss_grow_mb"] == -200.0 and s["rss_max_mb"] == 900.0
+    assert d["peak_rss_mb"] == 900.0 and d["rss_grow_mb"] == 100.0
@@ -0,0 +1,115 @@
+"""
+Тесты пула рендера графиков (chart_render_pool).
+
+Проверяется:
+  - результаты в порядке заданий, время на каждый график, ошибка одного
+    задания не роняет остальные — в пуле процессов и в текущем процессе;
+  - ChartBatch раскладывает пути по target только при успехе, output —
+    путь для рендереров, которые ничего не возвращают;
+  - зависший воркер: пул снимается по таймауту, график рисуется в
+    текущем процессе;
+  - реальный matplotlib-рендер этапа через пул даёт PNG.
+
+Запуск:
+    python -m pytest backend/tests/test_chart_render_pool.py -v
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import chart_render_pool as crp
+
+
+def _write_png(path: str, tag: str) -> str:
+    Path(path).write_bytes(b"\x89PNG" + tag.encode() + str(os.getpid()).encode())
+    return path
+
+
+def _write_silent(path: str) -> None:
+    Path(path).write_bytes(b"\x89PNG")
+
+
+def _fail(path: str) -> str:
+    raise RuntimeError("нет данных")
+
+
+def _hang_in_worker(path: str) -> str:
+    import multiprocessing
+    import time
+
+    if multiprocessing.parent_process() is not None:
+        time.sleep(60)                      # «завис» matplotlib в воркере
+    return _write_png(path, "h")
+
+
+@pytest.fixture(autouse=True)
+def _pool_cleanup():
+    yield
+    crp.shutdown_pool()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_render_order_timing_and_errors(tmp_path, workers):
+    jobs = [
+        crp.ChartJob(_write_png, (str(tmp_path / "a.png"), "a"), label="a"),
+        crp.ChartJob(_fail, (str(tmp_path / "b.png"),), label="b"),
+        crp.ChartJob(_write_silent, (str(tmp_path / "c.png"),),
+                     output=str(tmp_path / "c.png"), label="c"),
+        crp.ChartJob(_write_png, (str(tmp_path / "d.png"), "d"), label="d"),
+    ]
+    res = crp.render_charts(jobs, workers=workers)
+    assert [r.label for r in res] == ["a", "b", "c", "d"]
+    assert [r.path for r in res] == [
+        str(tmp_path / "a.png"), None, str(tmp_path / "c.png"), str(tmp_path / "d.png")]
+    assert res[1].error == "RuntimeError: нет данных"
+    assert all(r.ms >= 0 for r in res)
+    body = (tmp_path / "d.png").read_bytes()
+    assert body.startswith(b"\x89PNGd")
+    assert (body[5:] == str(os.getpid()).encode()) == (workers == 1)
+
+
+def test_hung_worker_falls_back_in_process(tmp_path):
+    jobs = [
+        crp.ChartJob(_write_png, (str(tmp_path / "a.png"), "a"), label="a"),
+        crp.ChartJob(_hang_in_worker, (str(tmp_path / "h.png"),), label="h"),
+    ]
+    res = crp.render_charts(jobs, workers=2, timeout=3)
+    assert [r.path for r in res] == [str(tmp_path / "a.png"), str(tmp_path / "h.png")]
+    assert (tmp_path / "h.png").read_bytes()[5:] == str(os.getpid()).encode()
+    assert crp._pool is None                # пул с зависшим воркером снят
+
+
+def test_batch_targets(tmp_path):
+    out: dict = {"ok": None, "bad": "прежнее"}
+    batch = crp.ChartBatch(workers=1)
+    batch.add(_write_png, str(tmp_path / "x.png"), "x", target=(out, "ok"))
+    batch.add(_fail, str(tmp_path / "y.png"), target=(out, "bad"))
+    assert len(batch) == 2 and out["ok"] is None
+    batch.run()
+    assert out == {"ok": str(tmp_path / "x.png"), "bad": "прежнее"}
+    assert [t["ok"] for t in batch.timings()] == [True, False]
+    assert len(batch) == 0 and batch.run() == []
+
+
+def test_stage_charts_render_in_pool(tmp_path, monkeypatch):
+    pytest.importorskip("matplotlib")
+    from backend.services import adaptation_report_service as ars
+
+    idx = pd.date_range("2025-01-01", periods=96, freq="h")
+    rng = np.random.default_rng(0)
+    hourly = pd.DataFrame({"p_tube": 30 + rng.normal(0, 0.3, 96),
+                           "p_line": 20 + rng.normal(0, 0.3, 96)}, index=idx)
+    out: dict = {}
+    batch = crp.ChartBatch(workers=2)
+    batch.add(ars._render_stage_pressure_chart, hourly, 101, "t_p", target=(out, "p"))
+    batch.add(ars._render_stage_dp_chart, hourly, 101, "t_dp", None, target=(out, "dp"))
+    batch.run()
+    assert set(out) == {"p", "dp"}
+    for path in out.values():
+        assert Path(path).read_bytes()[:4] == b"\x89PNG"
+        Path(path).unlink()
@@ -0,0 +1,133 @@
+"""
+Тесты снимка парка для /visual и постраничного таймлайна (fleet_snapshot).
+
+Проверяется:
+  - get_snapshot отдаёт кэш, пока не изменилась ревизия и не истёк TTL;
+    invalidate() и новая ревизия (запись из другого процесса) пересобирают;
+  - timeline_page режет ленту на страницы без пропусков и повторов, формат
+    событий / вбросов — как у window.reagentsData, фильтр реагентов
+    отсекает только вбросы других реагентов;
+  - фильтр по статусам берёт скважины из снимка, timeline_facets отдаёт
+    реагенты и типы событий при тех же фильтрах (SQLite в памяти).
+
+Запуск:
+    python -m pytest backend/tests/test_fleet_snapshot.py -v
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import backend.models  # noqa: F401 — модели для relationship()
+import backend.models.equipment  # noqa: F401
+import backend.documents.models  # noqa: F401
+from backend.models.events import Event
+from backend.models.users import User
+from backend.services import fleet_snapshot as fs
+
+
+@pytest.fixture(autouse=True)
+def reset(monkeypatch):
+    monkeypatch.setattr(fs, "_snapshot", None)
+
+
+def test_snapshot_cached_until_revision_ttl_or_invalidate(monkeypatch):
+    revision = [("r1",)]
+    builds: list = []
+
+    def build(db, *, revision):
+        builds.append(revision)
+        return fs.FleetSnapshot(revision=revision)
+
+    monkeypatch.setattr(fs, "_revision", lambda db: revision[0])
+    monkeypatch.setattr(fs, "build_snapshot", build)
+
+    first = fs.get_snapshot(None)
+    assert fs.get_snapshot(None) is first and len(builds) == 1
+
+    revision[0] = ("r2",)                                  # событие от бота
+    second = fs.get_snapshot(None)
+    assert second is not first and builds[-1] == ("r2",)
+
+    fs.invalidate()                                         # запись статуса
+    third = fs.get_snapshot(None)
+    assert third is not second and len(builds) == 3
+
+    third.loaded_at -= fs.SNAPSHOT_TTL_SECONDS + 1          # интервал пайплайна
+    assert fs.get_snapshot(None) is not third and len(builds) == 4
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    for model in (Event, User):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    now = datetime.now().replace(microsecond=0)
+    session.add(User(id=7, username="oper"))
+    rows = []
+    for i in range(25):
+        well = ("101", "102", "103")[i % 3]
+        if i % 4 == 0:
+            rows.append(Event(id=i + 1, well=well, event_type="reagent",
+                              reagent=("Foamer", "ПАР")[i % 8 == 0], qty=2,
+                              event_time=now - timedelta(hours=i), user_id=7))
+        else:
+            rows.append(Event(id=i + 1, well=well, event_type=("purge", "pressure")[i % 2],
+                              p_tube=10.5, event_time=now - timedelta(hours=i)))
+    rows.append(Event(id=100, well="101", event_type="purge",
+                      event_time=now - timedelta(days=120)))       # вне 90 дней
+    session.add_all(rows)
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _snapshot() -> fs.FleetSnapshot:
+    snap = fs.FleetSnapshot(revision=())
+    for wid, number, status in ((1, "101", "Адаптация"), (2, "102", "Наблюдение"),
+                                (3, "103", "Адаптация"), (4, None, "Адаптация")):
+        snap.tiles[wid] = fs.WellTile(well_id=wid, number=number, name=None, status=status)
+    return snap
+
+
+def _all_pages(db, snap, **kw):
+    events, injections, offset, pages = [], [], 0, 0
+    while offset is not None:
+        page = fs.timeline_page(db, snap, limit=7, offset=offset, **kw)
+        events += page["events"]
+        injections += page["injections"]
+        offset = page["next_offset"]
+        pages += 1
+    return events, injections, pages
+
+
+def test_timeline_pages_cover_period_once(db):
+    events, injections, pages = _all_pages(db, _snapshot())
+    assert pages == 4 and len(events) + len(injections) == 25
+    times = [e["t"] for e in events]
+    assert times == sorted(times, reverse=True) and len(set(times)) == len(times)
+    assert events[0]["type"] in ("purge", "pressure") and events[0]["p_tube"] == 10.5
+    assert injections[0]["username"] == "oper" and injections[0]["qty"] == 2.0
+
+    asc, _, _ = _all_pages(db, _snapshot(), sort="asc")
+    assert [e["t"] for e in asc] == sorted(times)
+
+    # Реагент «ПАР» скрывает вбросы Foamer, остальные события остаются
+    ev_par, inj_par, _ = _all_pages(db, _snapshot(), reagents=["ПАР"])
+    assert {i["reagent"] for i in inj_par} == {"ПАР"} and len(ev_par) == len(events)
+
+
+def test_timeline_status_filter_and_facets(db):
+    snap = _snapshot()
+    events, injections, _ = _all_pages(db, snap, statuses=["Наблюдение"])
+    assert {e["well"] for e in events + injections} == {"102"}
+
+    reagents, types = fs.timeline_facets(db, snap)
+    assert reagents == ["Foamer", "ПАР"] and types == ["pressure", "purge"]
+    assert fs.timeline_facets(db, snap, event_types=["purge"]) == ([], ["purge"])
+    assert fs.reagent_colors(reagents)["ПАР"] == fs.REAGENT_COLORS_BASE["ПАР"]
@@ -65,11 +65,12 @@ def _s(series) -> dict:
 def fingerprint(well_id: int, smooth: bool) -> dict:
     """Слепок выхода compute_full_flow для одной скважины.
 
-    Сид фиксируется, т.к. реконструкция масок использует np.random.normal
-    (см. pressure_mask_service) — без сида golden невоспроизводим. Сид держит
-    реализацию шума постоянной, чтобы тест ловил АЛГОРИТМИЧЕСКИЕ изменения.
+    Шум реконструкции масок детерминирован: генератор засеян от ключа
+    маски (id, границы, датчик, метод, параметр) — см.
+    pressure_mask_service._mask_rng; якоря и σ — из контекста маски.
+    Глобальный сид больше не нужен: golden воспроизводим сам по себе и
+    меняется только при правке масок или алгоритма.
     """
-    np.random.seed(12345)
     u_start = (K_START - KUNGRAD_OFFSET).isoformat()
     u_end = (K_END - KUNGRAD_OFFSET).isoformat()
     res = compute_full_flow(well_id, u_start, u_end, smooth=smooth)
@@ -0,0 +1,123 @@
+"""
+Тесты latex_compile_service без TeX: вместо xelatex — скрипт-имитация.
+
+Имитация пишет .aux (с \\newlabel, если в документе есть \\label), .log и
+PDF, считает запуски в файле FAKE_TEX_COUNTER; \\FAIL — ошибка без PDF,
+\\WARN — ненулевой код при созданном PDF; \\input{shared} ищет файл по
+TEXINPUTS.
+
+Проверяется:
+  - документ без ссылок — один проход, со ссылками — два;
+  - рабочий каталог изолирован и удаляется, TEXINPUTS видит work_root;
+  - ошибка → LatexCompileError со строками «! …» и копией каталога;
+  - параллельные сборки с одинаковым именем не мешают друг другу.
+
+Запуск:
+    python -m pytest backend/tests/test_latex_compile_service.py -v
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import textwrap
+
+import pytest
+
+from backend.services import latex_compile_service as lcs
+
+FAKE_XELATEX = textwrap.dedent(r'''
+    import os, pathlib, sys, time
+    job = next(a.split("=", 1)[1] for a in sys.argv if a.startswith("-jobname="))
+    tex = pathlib.Path(sys.argv[-1]).read_text(encoding="utf-8")
+    with open(os.environ["FAKE_TEX_COUNTER"], "a") as f:
+        f.write(job + "\n")
+    time.sleep(0.05)
+    log = ["This is fake XeTeX"]
+    if "\\input{shared}" in tex:
+        dirs = [d or "." for d in os.environ.get("TEXINPUTS", "").split(os.pathsep)]
+        if not any(pathlib.Path(d, "shared.tex").exists() for d in dirs):
+            log.append("! LaTeX Error: File `shared.tex' not found.")
+            pathlib.Path(job + ".log").write_text("\n".join(log))
+            sys.exit(1)
+    if "\\FAIL" in tex:
+        log += ["! Undefined control sequence.", "l.3 \\FAIL"]
+        pathlib.Path(job + ".log").write_text("\n".join(log))
+        sys.exit(1)
+    aux = ["\\relax"]
+    if "\\label" in tex:
+        aux.append("\\newlabel{sec}{{1}{1}}")
+    aux.append("\\gdef \\@abspage@last{1}")
+    pathlib.Path(job + ".aux").write_text("\n".join(aux) + "\n")
+    pathlib.Path(job + ".log").write_text("\n".join(log))
+    pathlib.Path(job + ".pdf").write_bytes(b"%PDF-fake " + tex.encode())
+    sys.exit(1 if "\\WARN" in tex else 0)
+''')
+
+
+@pytest.fixture
+def fake_tex(tmp_path, monkeypatch):
+    script = tmp_path / "fake_xelatex.py"
+    script.write_text(FAKE_XELATEX, encoding="utf-8")
+    exe = tmp_path / "xelatex"
+    exe.write_text(f"#!/bin/sh\nexec {sys.executable} {script} \"$@\"\n")
+    exe.chmod(0o755)
+    counter = tmp_path / "runs.txt"
+    counter.write_text("")
+    monkeypatch.setattr(lcs, "find_xelatex", lambda: str(exe))
+    monkeypatch.setenv("FAKE_TEX_COUNTER", str(counter))
+    return lambda: counter.read_text().split()
+
+
+def _doc(body: str) -> str:
+    return "\\documentclass{article}\n\\begin{document}\n" + body + "\n\\end{document}\n"
+
+
+def test_passes_only_when_aux_changes(tmp_path, fake_tex):
+    out, work = tmp_path / "pdf", tmp_path / "temp"
+    res = lcs.compile_latex(_doc("Текст"), "plain", out, work_root=work)
+    assert res.pdf_path == (out / "plain.pdf").resolve() and res.pdf_path.exists()
+    assert [p["pass"] for p in res.passes] == [1] and fake_tex() == ["plain"]
+
+    res = lcs.compile_latex(_doc("\\section{A}\\label{sec} см. \\ref{sec}"), "refs", out,
+                            work_root=work)
+    assert len(res.passes) == 2 and all(p["ms"] >= 0 for p in res.passes)
+    assert list(work.iterdir()) == []          # рабочие каталоги удалены
+
+
+def test_texinputs_sees_work_root(tmp_path, fake_tex):
+    work = tmp_path / "temp"
+    work.mkdir()
+    (work / "shared.tex").write_text("% общий фрагмент")
+    res = lcs.compile_latex(_doc("\\input{shared}"), "inc", tmp_path / "pdf", work_root=work)
+    assert res.pdf_path.exists()
+
+
+def test_failure_and_tolerated_warning(tmp_path, fake_tex):
+    with pytest.raises(lcs.LatexCompileError) as exc:
+        lcs.compile_latex(_doc("\\FAIL"), "broken", tmp_path / "pdf")
+    err = exc.value
+    assert err.pass_num == 1 and err.errors[0] == "! Undefined control sequence."
+    assert (err.debug_dir / "broken.tex").exists()
+    assert isinstance(err, RuntimeError)
+    shutil.rmtree(err.debug_dir)
+
+    with pytest.raises(lcs.LatexCompileError) as exc:
+        lcs.compile_latex(_doc("\\WARN"), "warn", tmp_path / "pdf")
+    shutil.rmtree(exc.value.debug_dir)
+    res = lcs.compile_latex(_doc("\\WARN"), "warn", tmp_path / "pdf", tolerate_errors=True)
+    assert res.pdf_path.exists() and res.passes[0]["returncode"] == 1
+
+
+def test_parallel_jobs_are_isolated(tmp_path, fake_tex):
+    futures = [
+        lcs.compile_latex_async(_doc(f"\\label{{sec}} вариант {i}"), "same", tmp_path / f"out{i}",
+                                work_root=tmp_path / "temp")
+        for i in range(4)
+    ]
+    for i, fut in enumerate(futures):
+        res = fut.result()
+        assert res.pdf_path.read_bytes().endswith(f"вариант {i}\n\\end{{document}}\n".encode())
+        assert len(res.passes) == 2
+    assert len(fake_tex()) == 8
+    assert os.listdir(tmp_path / "temp") == []
@@ -0,0 +1,139 @@
+"""
+Тесты пространственного индекса карты (map_spatial_service).
+
+Проверяется:
+  - векторный haversine и матрица совпадают с попарным расчётом,
+    геодезическая WGS84 — в пределах долей процента от сферы;
+  - nearest / within через KD-дерево совпадают с перебором;
+  - get_index пересобирается только при изменении координат и при этом
+    пересчитывает сохранённые well_antenna_distance — в том числе когда
+    индекс пересобрал вызов без sync (SQLite в памяти).
+
+Запуск:
+    python -m pytest backend/tests/test_map_spatial_service.py -v
+"""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import backend.models  # noqa: F401 — модели для relationship()
+import backend.models.equipment  # noqa: F401
+import backend.documents.models  # noqa: F401
+from backend.models.map_object import MapObject
+from backend.models.well_antenna_distance import WellAntennaDistance
+from backend.models.wells import Well
+from backend.services import map_spatial_service as ms
+
+
+def _ref_m(la1, lo1, la2, lo2):
+    la1, lo1, la2, lo2 = map(math.radians, (la1, lo1, la2, lo2))
+    a = math.sin((la2 - la1) / 2) ** 2 + math.cos(la1) * math.cos(la2) * math.sin((lo2 - lo1) / 2) ** 2
+    return 2 * 6_371_000 * math.asin(math.sqrt(a))
+
+
+@pytest.fixture
+def field():
+    rng = np.random.default_rng(3)
+    wells = [(i + 1, 44.0 + rng.uniform(-0.2, 0.2), 58.4 + rng.uniform(-0.3, 0.3),
+              {"number": str(100 + i), "name": f"W{i}"}) for i in range(150)]
+    objects = [(i + 1, 44.0 + rng.uniform(-0.25, 0.25), 58.4 + rng.uniform(-0.35, 0.35),
+                {"name": f"O{i}", "icon_type": "antenna" if i % 3 == 0 else "default"})
+               for i in range(30)]
+    return wells, objects
+
+
+def test_vector_distances_match_pairwise(field):
+    wells, objects = field
+    lat_a = [p[1] for p in wells[:20]]; lon_a = [p[2] for p in wells[:20]]
+    lat_b = [p[1] for p in objects]; lon_b = [p[2] for p in objects]
+    m = ms.distance_matrix_m(lat_a, lon_a, lat_b, lon_b)
+    assert m.shape == (20, 30)
+    assert m[3, 7] == pytest.approx(_ref_m(lat_a[3], lon_a[3], lat_b[7], lon_b[7]), abs=1e-6)
+    geo = ms.distance_matrix_m(lat_a, lon_a, lat_b, lon_b, method="geodesic")
+    assert np.allclose(geo, m, rtol=5e-3)
+    assert float(ms.haversine_m(44.0, 58.4, 44.0, 58.4)) == 0.0
+
+
+def test_nearest_and_within_match_brute_force(field):
+    wells, objects = field
+    index = ms.SpatialIndex(wells, objects)
+    antennas = [p for p in objects if p[3]["icon_type"] == "antenna"]
+
+    for wid, lat, lon, _ in wells[::17]:
+        brute = sorted((round(_ref_m(lat, lon, p[1], p[2]), 1), p[0]) for p in antennas)
+        got = index.nearest(lat, lon, kind="antenna", k=3)
+        assert [(g["distance_m"], g["id"]) for g in got] == brute[:3]
+
+        near_wells = index.nearest(lat, lon, kind="well", k=5, exclude_id=wid)
+        brute_w = sorted((_ref_m(lat, lon, p[1], p[2]), p[0]) for p in wells if p[0] != wid)
+        assert [g["id"] for g in near_wells] == [i for _, i in brute_w[:5]]
+        assert near_wells[0]["number"] and wid not in [g["id"] for g in near_wells]
+
+        inside = index.within(lat, lon, 8_000, kind="object")
+        assert {g["id"] for g in inside} == {
+            p[0] for p in objects if _ref_m(lat, lon, p[1], p[2]) <= 8_000
+        }
+        assert [g["distance_m"] for g in inside] == sorted(g["distance_m"] for g in inside)
+
+    assert ms.SpatialIndex([], []).nearest(44.0, 58.4) == []
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(ms, "_cached", None)
+    monkeypatch.setattr(ms, "_synced_signature", None)
+    engine = create_engine("sqlite://")
+    for model in (Well, MapObject, WellAntennaDistance):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_get_index_rebuilds_on_coordinate_change_and_syncs_stored(db):
+    db.add_all([
+        Well(id=1, number=11, name="W11", lat=44.00, lon=58.40),
+        Well(id=2, number=12, name="W12", lat=44.02, lon=58.45),
+        MapObject(id=1, name="A1", lat=44.05, lon=58.42, icon_type="antenna"),
+        WellAntennaDistance(well_id=1, map_object_id=1, distance_m=1.0),
+    ])
+    db.commit()
+
+    first = ms.get_index(db, sync=True)
+    row = db.query(WellAntennaDistance).one()
+    assert row.distance_m == pytest.approx(_ref_m(44.00, 58.40, 44.05, 58.42), abs=0.06)
+    assert ms.get_index(db, sync=True) is first               # координаты те же
+
+    db.query(MapObject).filter(MapObject.id == 1).update({"lat": 44.10})
+    db.commit()
+    second = ms.get_index(db, sync=True)
+    assert second is not first
+    db.refresh(row)
+    assert row.distance_m == pytest.approx(_ref_m(44.00, 58.40, 44.10, 58.42), abs=0.06)
+    assert second.nearest(44.0, 58.4, kind="well", k=1, exclude_id=1)[0]["number"] == "12"
+
+
+def test_sync_after_rebuild_by_plain_get_index(db):
+    db.add_all([
+        Well(id=1, number=11, name="W11", lat=44.00, lon=58.40),
+        MapObject(id=1, name="A1", lat=44.05, lon=58.42, icon_type="antenna"),
+        WellAntennaDistance(well_id=1, map_object_id=1, distance_m=1.0),
+    ])
+    db.commit()
+    ms.get_index(db, sync=True)
+
+    db.query(Well).filter(Well.id == 1).update({"lat": 43.95})
+    db.commit()
+    plain = ms.get_index(db)                          # /nearest пересобрал индекс
+    row = db.query(WellAntennaDistance).one()
+    assert row.distance_m == pytest.approx(_ref_m(44.00, 58.40, 44.05, 58.42), abs=0.06)
+
+    assert ms.get_index(db, sync=True) is plain       # подпись та же, но не синхронизирована
+    db.refresh(row)
+    assert row.distance_m == pytest.approx(_ref_m(43.95, 58.40, 44.05, 58.42), abs=0.06)
@@ -0,0 +1,119 @@
+"""
+Тесты для backend/services/flow_rate/minute_frame.py и in-place конвейера.
+
+Чистые unit-тесты без БД: синтетические поминутные кадры.
+
+Запуск:
+    python -m pytest backend/tests/test_minute_frame.py -v
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services.flow_rate.calculator import (
+    calculate_cumulative,
+    calculate_flow_rate,
+    calculate_purge_loss,
+)
+from backend.services.flow_rate.cleaning import clean_pressure, smooth_pressure
+from backend.services.flow_rate.full_pipeline import run_flow_pipeline
+from backend.services.flow_rate.minute_frame import MinuteFrame
+
+
+def _make_raw(n: int = 3 * 1440, seed: int = 3) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range("2026-03-01", periods=n, freq="min")
+    t = np.arange(n)
+    p_tube = 30.0 + 2.0 * np.sin(t / 300.0) + rng.normal(0, 0.2, n)
+    p_line = 25.0 + rng.normal(0, 0.1, n)
+    p_tube[rng.random(n) < 0.04] = 0.0
+    p_line[500:540] = 0.0           # дыра длиннее max_fill_min
+    p_tube[2000:2200] = 20.0        # участок простоя (p_tube < p_line)
+    return pd.DataFrame({"p_tube": p_tube, "p_line": p_line}, index=idx)
+
+
+class TestMinuteFrame:
+    def test_roundtrip_dtypes(self):
+        df = _make_raw(100)
+        df["cumulative_flow"] = np.arange(100, dtype=float)
+        df["purge_flag"] = 0
+        mf = MinuteFrame.from_frame(df)
+        view = mf.to_frame()
+        assert view["p_tube"].dtype == np.float32
+        assert view["cumulative_flow"].dtype == np.float64
+        assert view["purge_flag"].dtype == np.int8
+        assert view.index.equals(df.index)
+        np.testing.assert_allclose(view["p_tube"], df["p_tube"], rtol=1e-6)
+
+    def test_view_shares_memory(self):
+        mf = MinuteFrame.from_frame(_make_raw(50))
+        view = mf.to_frame()
+        assert np.shares_memory(view["p_tube"].to_numpy(), mf["p_tube"])
+
+    def test_copy_is_explicit(self):
+        mf = MinuteFrame.from_frame(_make_raw(50))
+        snap = mf.copy()
+        mf["p_tube"] = 1.0
+        assert np.all(mf["p_tube"] == 1.0)
+        assert not np.all(snap["p_tube"] == 1.0)
+
+    def test_setitem_length_mismatch(self):
+        mf = MinuteFrame.from_frame(_make_raw(50))
+        with pytest.raises(ValueError):
+            mf["flow_rate"] = np.zeros(10)
+
+    def test_slice_time(self):
+        df = _make_raw(120)
+        mf = MinuteFrame.from_frame(df)
+        part = mf.slice_time(df.index[10], df.index[19])
+        assert len(part) == 10
+        assert part.index[0] == df.index[10]
+
+
+class TestInPlacePipeline:
+    def _legacy(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Историческая цепочка с копией на каждом этапе (без БД-шагов)."""
+        df = clean_pressure(df)
+        df.index = df.index + timedelta(hours=5)
+        df = smooth_pressure(df)
+        df = calculate_flow_rate(df, 10.0)
+        df = calculate_purge_loss(df)
+        return calculate_cumulative(df)
+
+    def test_stages_copy_false_match_copy_true(self):
+        raw = _make_raw()
+        expected = self._legacy(raw.copy())
+
+        work = raw.copy()
+        out = clean_pressure(work, copy=False)
+        assert out is work
+        out.index = out.index + timedelta(hours=5)
+        out = smooth_pressure(out, copy=False)
+        out = calculate_flow_rate(out, 10.0, copy=False)
+        out = calculate_purge_loss(out, copy=False)
+        out = calculate_cumulative(out, copy=False)
+        assert out is work
+        pd.testing.assert_frame_equal(out, expected)
+
+    def test_run_flow_pipeline_keeps_input(self):
+        raw = _make_raw()
+        before = raw.copy()
+        run_flow_pipeline(raw, 10.0)
+        pd.testing.assert_frame_equal(raw, before)
+
+    def test_compact_matches_full_precision(self):
+        raw = _make_raw()
+        full = run_flow_pipeline(raw, 10.0)
+        compact = run_flow_pipeline(raw, 10.0, compact=True)
+        assert isinstance(compact["frame"], MinuteFrame)
+        assert compact["summary"] == full["summary"]
+        np.testing.assert_allclose(
+            compact["df"]["cumulative_flow"], full["df"]["cumulative_flow"],
+        )
+        np.testing.assert_allclose(
+            compact["df"]["flow_rate"], full["df"]["flow_rate"], rtol=1e-6,
+        )
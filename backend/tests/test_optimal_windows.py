@@ -0,0 +1,112 @@
+"""
+Тесты поиска оптимального окна (adaptation_report_service).
+
+Эталон — прежний расчёт по одному окну: срез hourly/df_flow через .loc,
+np.polyfit по рабочим точкам Q, счёт продувок перебором маркеров.
+_window_metrics_batch считает все окна префиксными суммами — результат
+должен совпадать (с точностью до округления сумм).
+
+Запуск:
+    python -m pytest backend/tests/test_optimal_windows.py -v
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import adaptation_report_service as ars
+
+K = ars.KUNGRAD_OFFSET
+
+
+def _hourly(seed: int, days: int = 30) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n = 24 * days
+    idx = pd.date_range("2025-01-01 19:00", periods=n, freq="h")
+    pt = 30 + np.cumsum(rng.normal(0, 0.05, n))
+    pl = 20 + rng.normal(0, 0.5, n)
+    pt[rng.random(n) < 0.05] = np.nan
+    pt[150:200] = pl[150:200] - 0.05          # простой
+    pt[400:500] = np.nan                      # дыра давления
+    h = pd.DataFrame({"p_tube": pt, "p_line": pl}, index=idx)
+    return h.drop(idx[rng.random(n) < 0.1])
+
+
+def _ref(hourly, df_flow, markers, w_from, w_to):
+    utc_from, utc_to = w_from - K, w_to - K
+    h = hourly.loc[utc_from:utc_to]
+    hours = (w_to - w_from).total_seconds() / 3600.0
+    if len(h) < 3 or len(h) / max(hours, 1) < 0.5:
+        return None
+    q = df_flow.loc[utc_from:utc_to, "flow_rate"].dropna()
+    q = q[q > 0]
+    if len(q) < 3:
+        return None
+    t_h = (q.index - q.index.min()).total_seconds().to_numpy() / 3600.0
+    coef = np.polyfit(t_h, q.values, 1)
+    residual_std = float(np.std(q.values - np.polyval(coef, t_h)))
+    working = (h["p_tube"] - h["p_line"]) > 0.1
+    purges = sum(1 for m in markers if utc_from <= m["time_utc"] <= utc_to)
+    return {
+        "start": w_from, "end": w_to,
+        "q_mean": float(q.mean()), "q_median": float(q.median()),
+        "cv_q": residual_std / float(q.mean()),
+        "utilization_pct": float(working.sum()) / len(h) * 100.0,
+        "purge_freq_per_day": purges / max(hours / 24.0, 0.1),
+        "q_trend_abs": abs(float(coef[0]) * 24.0),
+        "data_points": len(h),
+    }
+
+
+@pytest.mark.parametrize("seed,window_h,step_h,minute", [
+    (0, 72, 6, 0), (1, 24, 1, 37), (2, 100, 7, 5),
+])
+def test_batch_matches_per_window_reference(seed, window_h, step_h, minute):
+    hourly = _hourly(seed)
+    df_flow = ars._compute_hourly_flow(hourly, 8.0)
+    rng = np.random.default_rng(seed)
+    markers = [{"time_utc": t.to_pydatetime(), "event_type": "purge"}
+               for t in hourly.index[rng.integers(0, len(hourly), 12)]]
+    dt_from, window = datetime(2025, 1, 2, 0, minute), timedelta(hours=window_h)
+    starts = [dt_from + timedelta(hours=step_h * k)
+              for k in range((datetime(2025, 1, 30) - dt_from - window) // timedelta(hours=step_h))]
+
+    got = ars._window_metrics_batch(hourly, df_flow, markers, starts, window)
+    assert len(got) == len(starts)
+    assert any(g is None for g in got) and any(g is not None for g in got)
+    for s, g in zip(starts, got):
+        ref = _ref(hourly, df_flow, markers, s, s + window)
+        if ref is None:
+            assert g is None
+            continue
+        assert g.keys() == ref.keys()
+        for key, expected in ref.items():
+            assert g[key] == pytest.approx(expected, rel=1e-7, abs=1e-9), key
+
+    assert ars._window_metrics(hourly, df_flow, markers, starts[0], starts[0] + window) == got[0]
+
+
+def test_hourly_flow_idle_and_gaps():
+    hourly = pd.DataFrame(
+        {"p_tube": [30.0, np.nan, 20.05, 0.0, 30.0], "p_line": [20.0, 20.0, 20.0, -1.0, np.nan]},
+        index=pd.date_range("2025-01-01", periods=5, freq="h"),
+    )
+    q = ars._compute_hourly_flow(hourly, 8.0)["flow_rate"].to_numpy()
+    assert q[0] > 0 and q[2] == 0.0
+    assert np.isnan(q[[1, 3, 4]]).all()
+
+
+def test_score_candidates_stable_order_and_fallback():
+    def cand(q, cv=0.01, util=90.0):
+        return {"q_median": q, "cv_q": cv, "utilization_pct": util, "purge_freq_per_day": 0}
+
+    cands = [cand(5.0), cand(7.0), cand(9.0, cv=0.2), cand(7.0), cand(6.0, util=50.0)]
+    ranked = ars._score_candidates(cands)
+    assert ranked == [cands[1], cands[3], cands[0]]
+    assert [c["score"] for c in ranked] == [1.0, 1.0, 0.0]
+
+    noisy = [cand(3.0, cv=0.5), cand(4.0, cv=0.5)]
+    assert [c["q_median"] for c in ars._score_candidates(noisy)] == [4.0, 3.0]
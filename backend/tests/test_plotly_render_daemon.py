@@ -0,0 +1,126 @@
+"""
+Тесты тёплого рендерера Plotly (plotly_render_daemon) без Chromium.
+
+Вместо TabPool — заглушка: «PNG» = id блока, renderChapter-ошибка по kind.
+Сервер слушает Unix-сокет во временном каталоге в отдельном потоке.
+
+Проверяется:
+  - _select_blocks повторяет JS-фильтр (kind, строгая глава, id из block_id);
+  - render_chart_pngs через демон пишет PNG в out_dir, даты в блоках
+    сериализуются;
+  - ошибка renderChapter → RuntimeError, сбой пула → одноразовый режим;
+  - нет сокета → одноразовый режим, демон не вызывается.
+
+Запуск:
+    python -m pytest backend/tests/test_plotly_render_daemon.py -v
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from datetime import date
+
+import pytest
+
+from backend.services import plotly_png_service as pps
+from backend.services import plotly_render_daemon as daemon
+
+
+class _FakePool:
+    tabs = 2
+
+    def __init__(self):
+        self.renders = 0
+        self.calls: list[list] = []
+
+    async def render(self, blocks, scale=3, timeout_ms=20000):
+        self.calls.append(blocks)
+        self.renders += 1
+        if any(b["kind"] == "param_correlation" for b in blocks):
+            raise daemon.RenderChapterError("renderChapter error: boom")
+        if any(b["kind"] == "pressure_spectrum" for b in blocks):
+            raise ValueError("tab crashed")
+        return {f"adapt-{b['id']}-chart": b"PNG" + str(b["id"]).encode() for b in blocks}
+
+
+@pytest.fixture
+def running(tmp_path, monkeypatch):
+    path = str(tmp_path / "r.sock")
+    monkeypatch.setattr(daemon, "SOCKET_PATH", path)
+    monkeypatch.delenv("PLOTLY_RENDER_DAEMON", raising=False)
+    monkeypatch.setattr(pps, "_autocrop", lambda p: None)
+    pool = _FakePool()
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    stop: dict = {}
+
+    async def main():
+        stop["event"] = asyncio.Event()
+        ready = asyncio.Event()
+        task = asyncio.ensure_future(daemon.serve(pool, path, started=ready, stop=stop["event"]))
+        await ready.wait()
+        started.set()
+        await task
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(main(),), daemon=True)
+    thread.start()
+    assert started.wait(5)
+    yield pool
+    loop.call_soon_threadsafe(stop["event"].set)
+    thread.join(5)
+
+
+def _payload(*blocks):
+    return {"blocks": list(blocks)}
+
+
+def test_select_blocks_mirrors_js_filter():
+    payload = _payload(
+        {"block_id": 1, "kind": "optimal_window", "params": {"chapter": "adaptation"}},
+        {"id": 2, "kind": "optimal_window", "params": {"chapter": "observation"}},
+        {"id": 3, "kind": "works_analysis", "params": {"chapter": "adaptation"}},
+        {"id": 4, "kind": "segment_analysis", "params": {}},
+    )
+    assert [b["id"] for b in pps._select_blocks(payload, "adaptation", None)] == [1]
+    assert [b["id"] for b in pps._select_blocks(payload, None, None)] == [1, 2, 4]
+    assert payload["blocks"][0].get("id") is None          # исходный payload не трогаем
+    assert pps._select_blocks({"items": payload["blocks"]}, "observation", None)[0]["id"] == 2
+
+
+def test_render_via_daemon_writes_pngs(running, tmp_path, monkeypatch):
+    monkeypatch.setattr(pps, "_render_chart_pngs_oneshot",
+                        lambda *a, **k: pytest.fail("одноразовый режим при живом демоне"))
+    assert daemon.ping() == {"ok": True, "tabs": 2, "renders": 0}
+    payload = _payload(
+        {"id": 5, "kind": "optimal_window", "params": {"chapter": "adaptation"},
+         "data_snapshot": {"from": date(2026, 1, 2)}},
+        {"id": 6, "kind": "optimal_window", "params": {"chapter": "adaptation"}},
+    )
+    out = pps.render_chart_pngs(payload, tmp_path / "build", chapter="adaptation")
+    assert sorted(out) == ["adapt-5-chart", "adapt-6-chart"]
+    with open(out["adapt-6-chart"], "rb") as f:
+        assert f.read() == b"PNG6"
+    assert running.calls[0][0]["data_snapshot"] == {"from": "2026-01-02"}
+
+
+def test_render_errors_and_fallback(running, tmp_path, monkeypatch):
+    oneshot = []
+    monkeypatch.setattr(pps, "_render_chart_pngs_oneshot",
+                        lambda *a, **k: oneshot.append(k["chapter"]) or {"x": "x.png"})
+
+    broken = _payload({"id": 7, "kind": "param_correlation", "params": {}})
+    with pytest.raises(RuntimeError, match="boom"):
+        pps.render_chart_pngs(broken, tmp_path, chapter=None)
+    assert oneshot == []
+
+    crashed = _payload({"id": 8, "kind": "pressure_spectrum", "params": {}})
+    assert pps.render_chart_pngs(crashed, tmp_path, chapter=None) == {"x": "x.png"}
+    assert oneshot == [None]
+
+
+def test_no_socket_uses_oneshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(daemon, "SOCKET_PATH", str(tmp_path / "missing.sock"))
+    monkeypatch.setattr(daemon, "render", lambda *a, **k: pytest.fail("демон не запущен"))
+    monkeypatch.setattr(pps, "_render_chart_pngs_oneshot", lambda *a, **k: {})
+    assert not daemon.enabled() and daemon.ping() is None
+    assert pps.render_chart_pngs(_payload(), tmp_path) == {}
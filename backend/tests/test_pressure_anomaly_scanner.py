@@ -0,0 +1,147 @@
+"""
+Тесты для backend/services/pressure_anomaly_scanner.py — инкрементальный скан.
+
+Без БД: загрузчики сырых данных и маркеров продувок подменяются
+синтетикой через monkeypatch. Запись масок-кандидатов и их невидимость для
+load_active_masks до подтверждения — на SQLite в памяти.
+
+Запуск:
+    python -m pytest backend/tests/test_pressure_anomaly_scanner.py -v
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import pressure_anomaly_scanner as scanner
+from backend.services.pressure_mask_service import find_dp_anomalies
+
+NOW = datetime(2026, 3, 10, 12, 0)
+
+
+def _frame_5min(days: int = 3, faults=(), seed: int = 4) -> pd.DataFrame:
+    """5-минутный кадр; faults — [(start, end, +Δp_tube)]."""
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range(NOW - timedelta(days=days), NOW, freq="5min")
+    df = pd.DataFrame(
+        {
+            "p_tube": 30 + rng.normal(0, 0.05, len(idx)),
+            "p_line": 25 + rng.normal(0, 0.05, len(idx)),
+        },
+        index=idx,
+    )
+    for start, end, dp in faults:
+        df.loc[start:end, "p_tube"] += dp
+    return df
+
+
+@pytest.fixture
+def fake_loaders(monkeypatch):
+    """Подменяет загрузку: кадр обрезается по запрошенному окну."""
+    state = {"df": None, "purges": [], "windows": []}
+
+    def load_raw(well_id, dt_start, dt_end, min_rows=100):
+        state["windows"].append((dt_start, dt_end))
+        part = state["df"].loc[dt_start:dt_end]
+        return (part if len(part) else None), len(part) * 5
+
+    monkeypatch.setattr(scanner, "_load_raw_5min", load_raw)
+    monkeypatch.setattr(scanner, "_load_purge_rows", lambda *a: state["purges"])
+    return state
+
+
+class TestFindDpAnomalies:
+    def test_detects_fault_and_keeps_input(self):
+        df = _frame_5min(faults=[(NOW - timedelta(hours=30), NOW - timedelta(hours=28), 3.0)])
+        before = df.copy()
+        found = find_dp_anomalies(df)
+        pd.testing.assert_frame_equal(df, before)
+        assert len(found) == 1
+        assert found[0]["affected_sensor"] == "p_tube"
+        assert datetime.fromisoformat(found[0]["dt_start"]) == NOW - timedelta(hours=30)
+
+    def test_purge_window_is_excluded(self):
+        a, b = NOW - timedelta(hours=30), NOW - timedelta(hours=28)
+        df = _frame_5min(faults=[(a, b, 3.0)])
+        assert find_dp_anomalies(df, exclude_windows=[(a, b)]) == []
+
+
+class TestScanWell:
+    def test_first_scan_uses_initial_lookback(self, fake_loaders):
+        fake_loaders["df"] = _frame_5min(days=10)
+        res = scanner.scan_well(1, None, now=NOW)
+        assert fake_loaders["windows"][0][0] == NOW - scanner.INITIAL_LOOKBACK
+        assert res["scanned_until"] == NOW
+
+    def test_only_anomalies_after_watermark(self, fake_loaders):
+        old = (NOW - timedelta(hours=20), NOW - timedelta(hours=18))
+        new = (NOW - timedelta(hours=5), NOW - timedelta(hours=3))
+        fake_loaders["df"] = _frame_5min(faults=[(*old, 3.0), (*new, 3.0)])
+        watermark = NOW - timedelta(hours=10)
+
+        res = scanner.scan_well(1, watermark, now=NOW)
+
+        assert fake_loaders["windows"][0][0] == watermark - scanner.DEFAULT_CONTEXT
+        assert res["found"] == 1
+        assert res["candidates"][0]["dt_start"] == new[0]
+        assert res["candidates"][0]["problem_type"] == "sensor_fault"
+
+    def test_no_data_keeps_watermark(self, fake_loaders):
+        fake_loaders["df"] = _frame_5min(days=1).iloc[:0]
+        watermark = NOW - timedelta(hours=1)
+        res = scanner.scan_well(1, watermark, now=NOW)
+        assert res["scanned_until"] == watermark
+        assert res["candidates"] == []
+
+
+def test_has_new_data():
+    t = NOW
+    assert scanner._has_new_data({"latest_at": t, "scanned_until": None})
+    assert scanner._has_new_data({"latest_at": None, "scanned_until": t})
+    assert scanner._has_new_data({"latest_at": t, "scanned_until": t - timedelta(minutes=1)})
+    assert not scanner._has_new_data({"latest_at": t, "scanned_until": t})
+
+
+def test_scanner_masks_are_candidates_until_verified(monkeypatch):
+    """Маски сканера не применяются к дебиту/отчётам до подтверждения."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    import backend.db
+    import backend.models  # noqa: F401 — модели для relationship()
+    import backend.models.equipment  # noqa: F401
+    import backend.documents.models  # noqa: F401
+    from backend.models.pressure_anomaly_scan import PressureAnomalyScan
+    from backend.models.pressure_mask import PressureMask
+    from backend.services import pressure_mask_service as pms
+
+    engine = create_engine("sqlite://")
+    for model in (PressureMask, PressureAnomalyScan):
+        model.__table__.create(engine)
+    monkeypatch.setattr(backend.db, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(pms, "pg_engine", engine)
+    pms.invalidate_mask_index()
+
+    fault = {"dt_start": NOW - timedelta(hours=5), "dt_end": NOW - timedelta(hours=3),
+             "problem_type": "sensor_fault", "affected_sensor": "p_tube",
+             "correction_method": "delta_reconstruct", "reason": "test"}
+    scan = {"well_id": 7, "candidates": [fault], "scanned_until": NOW,
+            "rows": 10, "found": 1, "duration_ms": 1.0}
+    assert scanner._write_results([scan], scanner.SCAN_SOURCE, "b1")["created"] == {7: 1}
+
+    period = (NOW - timedelta(days=1), NOW)
+    assert pms.load_active_masks(7, *period) == []
+    assert pms.load_active_masks(7, *period, use_index=False) == []
+
+    # Повторный прогон не дублирует кандидата
+    again = scanner._write_results([scan], scanner.SCAN_SOURCE, "b2")
+    assert again["created"] == {7: 0} and again["skipped_overlap"] == 1
+
+    with engine.begin() as conn:
+        conn.execute(PressureMask.__table__.update().values(is_verified=True))
+    pms.invalidate_mask_index(7)
+    assert [m["affected_sensor"] for m in pms.load_active_masks(7, *period)] == ["p_tube"]
+    pms.invalidate_mask_index()
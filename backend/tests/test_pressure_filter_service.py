@@ -0,0 +1,105 @@
+"""
+Тесты для backend/services/pressure_filter_service.py — потоковый Hampel.
+
+Эталон — прежняя реализация на pandas rolling().median(); новый расчёт
+(сортирующая сеть + блоки с перекрытием) обязан совпадать бит-в-бит.
+
+Запуск:
+    python -m pytest backend/tests/test_pressure_filter_service.py -v
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services.pressure_filter_service import (
+    _centered_rolling_median,
+    filter_pressure_pair,
+    hampel_filter,
+    hampel_filter_array,
+    hampel_filter_pair,
+)
+
+
+def _reference_hampel(series: pd.Series, window_half: int = 3, n_sigma: float = 3.5):
+    """Эталон: две pandas rolling-медианы по всему ряду."""
+    window_size = 2 * window_half + 1
+    if len(series) < window_size:
+        return series, 0
+    rolling_median = series.rolling(window=window_size, center=True, min_periods=3).median()
+    deviation = (series - rolling_median).abs()
+    rolling_mad = deviation.rolling(window=window_size, center=True, min_periods=3).median()
+    threshold = (1.4826 * rolling_mad).clip(lower=1.0 / n_sigma) * n_sigma
+    is_spike = (deviation > threshold) & series.notna() & rolling_median.notna()
+    result = series.copy()
+    if is_spike.any():
+        result[is_spike] = rolling_median[is_spike]
+    return result, int(is_spike.sum())
+
+
+def _series(n: int, seed: int, nan_share: float = 0.1) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    x = 30 + np.cumsum(rng.normal(0, 0.2, n))
+    spikes = rng.random(n) < 0.05
+    x[spikes] += rng.normal(0, 10, spikes.sum())
+    x[rng.random(n) < nan_share] = np.nan
+    x = np.round(x, 2)  # повторяющиеся значения — чётные медианы, ничьи
+    return pd.Series(x, index=pd.date_range("2026-01-01", periods=n, freq="min"), name="p")
+
+
+@pytest.mark.parametrize("window_half", [1, 2, 3, 7, 15, 20])
+def test_rolling_median_matches_pandas(window_half):
+    rng = np.random.default_rng(window_half)
+    x = rng.normal(size=(800, 2))
+    x[rng.random(x.shape) < 0.3] = np.nan
+    expected = (
+        pd.DataFrame(x)
+        .rolling(2 * window_half + 1, center=True, min_periods=3)
+        .median()
+        .to_numpy()
+    )
+    np.testing.assert_array_equal(_centered_rolling_median(x, window_half), expected)
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("window_half", [1, 3, 5])
+def test_hampel_equals_reference(seed, window_half):
+    s = _series(3000, seed, nan_share=0.05 * seed)
+    expected, n_expected = _reference_hampel(s, window_half)
+    got, n_got = hampel_filter(s, window_half)
+    assert n_got == n_expected
+    pd.testing.assert_series_equal(got, expected)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 100, 2999, 10_000])
+def test_chunking_does_not_change_result(chunk_rows):
+    s = _series(3000, 11)
+    expected, _ = _reference_hampel(s)
+    got, _ = hampel_filter_array(s.to_numpy(), chunk_rows=chunk_rows)
+    np.testing.assert_array_equal(got, expected.to_numpy())
+
+
+def test_pair_matches_single_channel():
+    tube, line = _series(2000, 1), _series(2000, 2)
+    t_exp, n_t = _reference_hampel(tube)
+    l_exp, n_l = _reference_hampel(line)
+    t_got, l_got, n = hampel_filter_pair(tube, line)
+    pd.testing.assert_series_equal(t_got, t_exp)
+    pd.testing.assert_series_equal(l_got, l_exp)
+    assert n == n_t + n_l
+
+
+def test_short_series_unchanged():
+    s = pd.Series([1.0, 50.0, 1.0])
+    out, n = hampel_filter(s)
+    assert n == 0 and out is s
+
+
+def test_filter_pressure_pair_lists():
+    tube, line = _series(500, 3), _series(500, 4)
+    ts = [t.isoformat() for t in tube.index]
+    res = filter_pressure_pair(tube.tolist(), line.tolist(), ts, filter_spikes=True)
+    t_exp, n_t = _reference_hampel(tube.where((tube > 0) & (tube <= 85)))
+    assert res["p_tube"] == [None if pd.isna(v) else round(float(v), 3) for v in t_exp]
+    assert res["stats"]["spikes_detected"] >= n_t
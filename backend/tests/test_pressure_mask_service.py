@@ -0,0 +1,264 @@
+"""
+Тесты для backend/services/pressure_mask_service.py — применение масок.
+
+Чистые unit-тесты без БД: синтетические поминутные кадры и маски-словари
+(well_id=None — без запросов периода сезонности; сессия БД для периода —
+заглушка).
+
+Запуск:
+    python -m pytest backend/tests/test_pressure_mask_service.py -v
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import pressure_mask_service as pms
+from backend.services.pressure_mask_service import (
+    WellMaskIndex,
+    _correlated_noise,
+    _mask_bounds,
+    _mask_noise,
+    apply_masks,
+)
+
+
+def _make_df(days: int = 10, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n = days * 1440
+    idx = pd.date_range("2026-03-01", periods=n, freq="min")
+    df = pd.DataFrame(
+        {"p_tube": 30 + rng.normal(0, 0.3, n), "p_line": 25 + rng.normal(0, 0.2, n)},
+        index=idx,
+    )
+    df.iloc[rng.random(n) < 0.03, 0] = 0.0
+    return df
+
+
+def _mask(mid, method, sensor, start, end, mdp=None, verified=True) -> dict:
+    return {
+        "id": mid, "well_id": None, "problem_type": "manual",
+        "affected_sensor": sensor, "correction_method": method,
+        "dt_start": datetime.fromisoformat(start),
+        "dt_end": datetime.fromisoformat(end),
+        "manual_delta_p": mdp, "reason": None, "is_verified": verified,
+    }
+
+
+class TestMaskBounds:
+    def test_inclusive_like_boolean_mask(self):
+        df = _make_df(1)
+        start, end = datetime(2026, 3, 1, 1, 0), datetime(2026, 3, 1, 2, 0)
+        lo, hi = _mask_bounds(df.index, start, end)
+        expected = np.flatnonzero((df.index >= start) & (df.index <= end))
+        assert (lo, hi) == (expected[0], expected[-1] + 1)
+
+    def test_outside_range_is_empty(self):
+        df = _make_df(1)
+        lo, hi = _mask_bounds(df.index, datetime(2027, 1, 1), datetime(2027, 1, 2))
+        assert hi - lo == 0
+
+
+class TestApplyMasks:
+    def test_median_and_delta_windows(self):
+        df = _make_df(5)
+        masks = [
+            _mask(1, "median_1d", "p_tube", "2026-03-03T00:00", "2026-03-03T05:00"),
+            _mask(2, "delta_reconstruct", "p_line", "2026-03-04T00:00", "2026-03-04T01:00", 4.0),
+        ]
+        out, n = apply_masks(df, masks)
+        assert n == 301 + 61
+        win = out.loc["2026-03-03 00:00":"2026-03-03 05:00", "p_tube"]
+        assert win.nunique() == 1
+        dp = out.loc["2026-03-04 00:00":"2026-03-04 01:00"]
+        np.testing.assert_allclose(dp["p_tube"] - dp["p_line"], 4.0)
+        # вне окон — без изменений
+        pd.testing.assert_series_equal(
+            out.loc[:"2026-03-02 23:59", "p_line"], df.loc[:"2026-03-02 23:59", "p_line"],
+        )
+
+    def test_copy_false_mutates_in_place(self):
+        df = _make_df(3)
+        masks = [_mask(1, "interpolate", "both", "2026-03-02T00:00", "2026-03-02T03:00")]
+        out, _ = apply_masks(df, masks, copy=False)
+        assert out is df
+
+    def test_unsorted_index_is_handled(self):
+        df = _make_df(3)
+        shuffled = df.sample(frac=1.0, random_state=0)
+        masks = [_mask(1, "interpolate", "p_tube", "2026-03-02T00:00", "2026-03-02T03:00")]
+        a, _ = apply_masks(df, masks)
+        b, _ = apply_masks(shuffled, masks)
+        pd.testing.assert_frame_equal(a, b.sort_index(), check_freq=False)
+
+
+class TestWellMaskIndex:
+    def _masks(self):
+        base = datetime(2026, 3, 1)
+        out = []
+        for i in range(12):
+            start = base + timedelta(hours=7 * i)
+            out.append({
+                "id": i + 1, "well_id": 7, "problem_type": "manual",
+                "affected_sensor": "p_tube", "correction_method": "interpolate",
+                "dt_start": start, "dt_end": start + timedelta(hours=3 + i % 4 * 5),
+                "manual_delta_p": None, "reason": None, "is_verified": i % 3 != 0,
+            })
+        return out
+
+    @pytest.mark.parametrize("verified_only", [False, True])
+    def test_query_matches_sql_overlap(self, verified_only):
+        masks = self._masks()
+        index = WellMaskIndex(7, masks)
+        for h0 in range(0, 90, 5):
+            ps = datetime(2026, 3, 1) + timedelta(hours=h0)
+            pe = ps + timedelta(hours=9)
+            got = [m["id"] for m in index.query(ps, pe, verified_only)]
+            expected = [
+                m["id"] for m in masks
+                if m["dt_start"] < pe and m["dt_end"] > ps
+                and (m["is_verified"] or not verified_only)
+            ]
+            assert got == expected
+
+    def test_revision_tracks_content(self):
+        masks = self._masks()
+        rev = WellMaskIndex(7, masks).revision
+        assert WellMaskIndex(7, [dict(m) for m in masks]).revision == rev
+        masks[3]["manual_delta_p"] = 2.0
+        assert WellMaskIndex(7, masks).revision != rev
+
+    def test_profiles_survive_edit_of_another_mask(self, monkeypatch):
+        monkeypatch.setattr(pms, "_mask_index", {})
+        masks = self._masks()
+        old = pms._store_index(WellMaskIndex(7, masks))
+        kept, edited = pms._mask_key(masks[0]), pms._mask_key(masks[1])
+        old.seasonal_profiles = {(kept, "p_tube", 144, "d"): {"ok": 1},
+                                 (edited, "p_tube", 144, "d"): {"ok": 2}}
+        masks[1]["dt_end"] += timedelta(hours=1)
+        fresh = pms._store_index(WellMaskIndex(7, masks))
+        assert fresh is not old
+        assert list(fresh.seasonal_profiles) == [(kept, "p_tube", 144, "d")]
+
+    def test_query_returns_copies_with_revision(self):
+        index = WellMaskIndex(7, self._masks())
+        got = index.query(datetime(2026, 3, 1), datetime(2026, 3, 2))
+        assert all(m["revision"] == index.revision for m in got)
+        got[0]["dt_start"] = None
+        assert index.masks[0]["dt_start"] is not None
+
+
+class TestDeterministicNoise:
+    def _noise_masks(self, revision="r1"):
+        masks = [
+            _mask(11, "interpolate_noise", "both", "2026-03-02T00:00", "2026-03-02T04:00", 1.0),
+            _mask(12, "bridge_median", "p_line", "2026-03-03T00:00", "2026-03-03T06:00", 2.0),
+        ]
+        for m in masks:
+            m["revision"] = revision
+        return masks
+
+    def test_repeated_calls_bit_identical(self):
+        df = _make_df(5)
+        np.random.seed(1)
+        a, _ = apply_masks(df, self._noise_masks())
+        np.random.seed(999)
+        b, _ = apply_masks(df, self._noise_masks())
+        assert a.to_numpy().tobytes() == b.to_numpy().tobytes()
+
+    def test_noise_depends_on_mask_not_well_revision(self):
+        df = _make_df(5)
+        a, _ = apply_masks(df, self._noise_masks("r1"))
+        b, _ = apply_masks(df, self._noise_masks("r2"))      # правка другой маски
+        win = slice("2026-03-02 00:00", "2026-03-02 03:00")
+        assert a.loc[win, "p_tube"].std() > 0
+        np.testing.assert_array_equal(a.loc[win, "p_tube"], b.loc[win, "p_tube"])
+
+        edited = self._noise_masks()
+        edited[0]["dt_end"] = datetime(2026, 3, 2, 5, 0)      # правка самой маски
+        c, _ = apply_masks(df, edited)
+        assert not np.array_equal(a.loc[win, "p_tube"], c.loc[win, "p_tube"])
+
+    def test_both_sensors_get_different_noise(self):
+        df = _make_df(5)
+        out, _ = apply_masks(df, self._noise_masks())
+        win = out.loc["2026-03-02 00:10":"2026-03-02 03:50"]
+        dp = win["p_tube"] - win["p_line"]
+        assert dp.std() > 0.01
+
+    def test_noise_independent_of_requested_window(self):
+        m = self._noise_masks()[1]
+        start, end = m["dt_start"], m["dt_end"]
+        daily = pd.date_range("2026-03-03 02:00", "2026-03-03 06:00", freq="min")
+        monthly = pd.date_range(start, end, freq="min")
+        a = _mask_noise(m, "p_line", 0.2, start, end, daily)
+        b = _mask_noise(m, "p_line", 0.2, start, end, monthly)
+        np.testing.assert_array_equal(a, b[120:])
+        assert not np.array_equal(_mask_noise(m, "p_tube", 0.2, start, end, daily), a)
+
+    def test_bridge_independent_of_requested_window(self, monkeypatch):
+        raw = _make_df(5)
+        mask = self._noise_masks()[1]
+        mask["well_id"] = 7
+        index = WellMaskIndex(7, [dict(mask)])
+        monkeypatch.setattr(pms, "get_mask_index", lambda well_id: index)
+        monkeypatch.setattr(
+            pms, "_load_raw_context",
+            lambda well_id, start, end: raw.loc[start:end].copy(),
+        )
+        month, _ = apply_masks(raw, [mask])
+        day, _ = apply_masks(raw.loc["2026-03-03 02:00":"2026-03-03 23:59"], [mask])
+        win = slice("2026-03-03 02:00", "2026-03-03 06:00")
+        np.testing.assert_array_equal(day.loc[win, "p_line"], month.loc[win, "p_line"])
+        assert index.bridge_params                      # контекст в прошлом — кэш
+
+    def test_vectorized_reset_matches_loop(self):
+        rng_a = np.random.default_rng(5)
+        rng_b = np.random.default_rng(5)
+        got = _correlated_noise(rng_a, 0.2, 200)
+
+        white = rng_b.normal(0, 0.2 * 0.3, size=200)
+        expected = np.cumsum(white)
+        for i in range(15, len(expected), 15):
+            expected[i:] -= expected[i]
+        expected = expected / expected.std() * 0.2
+        np.testing.assert_allclose(got, expected, rtol=1e-12, atol=1e-12)
+
+
+class TestReagentPeriod:
+    class _Session:
+        """Сессия-заглушка: агрегат ревизии и список вбросов скважины."""
+
+        def __init__(self, times, calls):
+            self.times, self.calls = times, calls
+
+        def execute(self, stmt, params):
+            self.calls.append(str(stmt))
+            if "count(e.id)" in str(stmt):
+                row = ("101", len(self.times), len(self.times) or None)
+                return type("R", (), {"fetchone": lambda _: row})()
+            rows = [(t,) for t in self.times]
+            return type("R", (), {"fetchall": lambda _: rows})()
+
+        def close(self):
+            pass
+
+    def test_new_injection_recomputes_period(self, monkeypatch):
+        import backend.db
+
+        base = datetime(2026, 3, 1)
+        times = [base + timedelta(hours=6 * i) for i in range(4)]
+        calls: list = []
+        monkeypatch.setattr(pms, "_reagent_period", {})
+        monkeypatch.setattr(backend.db, "SessionLocal",
+                            lambda: self._Session(times, calls))
+
+        assert pms._reagent_period_5min(7) == 72
+        assert pms._reagent_period_5min(7) == 72
+        assert len(calls) == 3                     # второй раз — только ревизия
+
+        times += [times[-1] + timedelta(hours=2 * i) for i in range(1, 6)]
+        assert pms._reagent_period_5min(7) == 24   # вбросы чаще — период меньше
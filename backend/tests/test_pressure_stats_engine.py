@@ -0,0 +1,161 @@
+"""
+Тесты движка минутной статистики (pressure_stats_engine) и его потребителей:
+спектра давления и зависимости параметров.
+
+Проверяется:
+  - каналы грузятся один раз на (скважина, период, версия данных);
+  - спектр и пара X↔Y по каналам совпадают с расчётом по кадру;
+  - pair_regressions совпадает с _regression (polyfit) на попарно-полных точках;
+  - матрица пропускает цикличные пары; пакетные вызовы сохраняют порядок.
+
+Запуск:
+    python -m pytest backend/tests/test_pressure_stats_engine.py -v
+"""
+from __future__ import annotations
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import param_correlation_service as pcs
+from backend.services import pressure_spectrum_service as pss
+from backend.services import pressure_stats_engine as engine
+from backend.services.flow_rate import data_access, full_pipeline
+
+
+def _frame(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    p_tube = 60 + np.cumsum(rng.normal(0, 0.05, n))
+    p_line = 20 + rng.normal(0, 0.3, n)
+    p_tube[rng.random(n) < 0.02] = 0.0            # false-zeros
+    p_line[rng.random(n) < 0.03] = np.nan
+    flow = np.clip(p_tube - p_line, 0, None) * 1.7 + rng.normal(0, 0.5, n)
+    return pd.DataFrame(
+        {"p_tube": p_tube, "p_line": p_line, "flow_rate": flow},
+        index=pd.date_range("2025-03-01", periods=n, freq="min"),
+    )
+
+
+@pytest.fixture
+def flow(monkeypatch):
+    """compute_full_flow без БД: кадр по well_id, счётчик вызовов, версия."""
+    state = {"calls": [], "version": 1, "frames": {}}
+
+    def compute_full_flow(well_id, ds, de, **kw):
+        state["calls"].append(well_id)
+        return {"df": state["frames"].get(well_id, _frame(seed=well_id))}
+
+    monkeypatch.setattr(full_pipeline, "compute_full_flow", compute_full_flow)
+    monkeypatch.setattr(data_access, "flow_data_version", lambda w: (state["version"], "r"))
+    engine.invalidate()
+    yield state
+    engine.invalidate()
+
+
+def _spectrum(well_id=1, **kw):
+    return pss.build_pressure_spectrum(
+        None, well_id=well_id, period_from=date(2025, 3, 1), period_to=date(2025, 3, 4), **kw)
+
+
+def test_channels_cached_by_data_version(flow):
+    first = _spectrum()
+    pcs.build_param_correlation(None, well_id=1, period_from=date(2025, 3, 1),
+                                period_to=date(2025, 3, 4))
+    assert flow["calls"] == [1]
+    flow["version"] = 2
+    assert _spectrum() == first
+    assert flow["calls"] == [1, 1]
+
+
+def test_spectrum_matches_frame_computation(flow):
+    df = _frame(seed=1)
+    snap = _spectrum(remove_outliers=True)
+    p_tube = df["p_tube"].to_numpy()
+    ref = pss._compute_signal_spectrum(
+        np.where(p_tube > 0, p_tube, np.nan), bin_width=pss.DEFAULT_BIN_WIDTH_PRESSURE,
+        left_edge_zero=False, thresholds=pss.STABILITY_THRESHOLDS["p_tube"],
+        remove_outliers=True,
+    )
+    assert snap["signals"]["p_tube"]["metrics"] == ref["metrics"]
+    assert snap["signals"]["p_tube"]["counts"] == ref["counts"]
+
+
+def test_spectrum_no_data(flow):
+    flow["frames"][7] = pd.DataFrame(columns=["p_tube", "p_line"])
+    assert _spectrum(well_id=7)["block_status"] == "no_data"
+
+
+@pytest.mark.parametrize("seed", [0, 3])
+def test_pair_regressions_match_polyfit(seed):
+    ch = engine.frame_channels(_frame(seed=seed))
+    pairs = [("dp", "q"), ("p_tube", "p_line"), ("p_line", "q")]
+    for (x, y), (n, reg) in zip(pairs, engine.pair_regressions(ch, pairs)):
+        mask = np.isfinite(ch[x]) & np.isfinite(ch[y])
+        assert n == int(mask.sum())
+        ref = pcs._regression(ch[x][mask], ch[y][mask])
+        for k in ref:
+            assert reg[k] == pytest.approx(ref[k], abs=2e-5), k
+
+
+def test_pair_regressions_degenerate():
+    ch = {"a": np.array([1.0, 1.0, 1.0]), "b": np.array([1.0, np.nan, 3.0]),
+          "c": np.array([np.nan, 2.0, np.nan])}
+    res = engine.pair_regressions(ch, [("a", "b"), ("b", "c")])
+    assert res == [(2, None), (0, None)]
+
+
+def test_matrix_minute_skips_circular(flow):
+    snap = pcs.build_param_correlation_matrix(
+        None, well_id=1, period_from=date(2025, 3, 1), period_to=date(2025, 3, 4),
+        signals=["dp", "q", "p_tube", "p_line"],
+    )
+    assert snap["resolution"] == "minute"
+    assert [(p["x"], p["y"]) for p in snap["pairs"]] == [("p_tube", "p_line")]
+    assert len(snap["skipped"]) == 5
+    pair = pcs.build_param_correlation(
+        None, well_id=1, period_from=date(2025, 3, 1), period_to=date(2025, 3, 4),
+        x_signal="p_tube", y_signal="p_line",
+    )
+    assert snap["pairs"][0]["n_points"] == pair["n_points"]
+    assert snap["pairs"][0]["regression"]["r2"] == pytest.approx(pair["regression"]["r2"], abs=1e-4)
+
+
+def test_matrix_daily_loads_each_series_once(monkeypatch):
+    series = {
+        "cust_q_total": {"2025-03-01": 10.0, "2025-03-02": 12.0, "2025-03-03": 14.0,
+                         "2025-03-04": None},
+        "cust_p_wellhead": {"2025-03-01": 50.0, "2025-03-02": 51.0, "2025-03-03": 52.5,
+                            "2025-03-04": 53.0},
+        "cust_dp": {"2025-03-01": 30.0, "2025-03-02": 31.0, "2025-03-03": 32.0},
+    }
+    loads = []
+
+    def daily_map(db, well_number, key, d_from, d_to):
+        loads.append(key)
+        return series[key]
+
+    monkeypatch.setattr(pcs, "_daily_map", daily_map)
+    snap = pcs.build_param_correlation_matrix(
+        None, well_id=1, well_number="101", period_from=date(2025, 3, 1),
+        period_to=date(2025, 3, 4), signals=list(series),
+    )
+    assert sorted(loads) == sorted(series)
+    assert snap["resolution"] == "daily"
+    assert snap["skipped"] == [["cust_p_wellhead", "cust_dp"]]
+    by_pair = {(p["x"], p["y"]): p for p in snap["pairs"]}
+    q_p = by_pair[("cust_q_total", "cust_p_wellhead")]
+    assert q_p["n_points"] == 3 and q_p["status"] == "ok"
+    ref = pcs._regression(np.array([10.0, 12.0, 14.0]), np.array([50.0, 51.0, 52.5]))
+    assert q_p["regression"] == pytest.approx(ref)
+
+
+def test_batch_preserves_order(flow):
+    items = [{"well_id": w, "period_from": date(2025, 3, 1), "period_to": date(2025, 3, 4),
+              "label": f"скв {w}"} for w in (3, 1, 2, 1)]
+    snaps = pss.build_pressure_spectra(None, items, max_workers=3)
+    assert [s["well_id"] for s in snaps] == [3, 1, 2, 1]
+    assert snaps[1]["signals"] == snaps[3]["signals"]
+    mats = pcs.build_param_correlation_matrices(None, items, signals=["p_tube", "p_line"])
+    assert [m["well_id"] for m in mats] == [3, 1, 2, 1]
@@ -0,0 +1,125 @@
+"""
+Тесты пакетного расчёта метрик ИРВ (reagent_effectiveness_service).
+
+Эталон — прежний расчёт по одному ИРВ: срез кадра df.loc[...], фильтр
+валидных точек, calculate_flow_rate + calculate_cumulative на срезе.
+Проверяется также, что анализ и overlay готовят давление один раз.
+
+Запуск:
+    python -m pytest backend/tests/test_reagent_batch_irv.py -v
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import reagent_effectiveness_service as res
+from backend.services.flow_rate.calculator import calculate_cumulative, calculate_flow_rate
+
+CHOKE = 8.0
+T0 = datetime(2025, 1, 1)
+
+
+def _pressure(n=20000, seed=1):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range(T0, periods=n, freq="min")
+    pt = 30 + np.cumsum(rng.normal(0, 0.03, n))
+    pl = 20 + rng.normal(0, 0.5, n)
+    pt[rng.random(n) < 0.03] = np.nan
+    pl[5000:5600] = np.nan                      # нет линии
+    pt[9000:9300] = pl[9000:9300] - 1           # простой (p_tube < p_line)
+    df = pd.DataFrame({"p_tube": pt, "p_line": pl}, index=idx)
+    return df.drop(idx[12000:12500])            # дыра в данных
+
+
+def _boundaries(hours=(3, 40, 80, 150, 199, 250), qty=(5.0, None, 2.0, 3.0, 1.0, 4.0)):
+    injs = [res.ReagentInjection([i], T0 + timedelta(hours=h), "A", q, None, None)
+            for i, (h, q) in enumerate(zip(hours, qty))]
+    out = []
+    for i, inj in enumerate(injs):
+        t_start = inj.event_time + timedelta(minutes=30)
+        nxt = injs[i + 1].event_time if i + 1 < len(injs) else T0 + timedelta(days=15)
+        out.append((inj, t_start, min(nxt, t_start + timedelta(days=7))))
+    return out
+
+
+def _ref(df, inj, t_start, t_end, cfg=res.DEFAULT_CONFIG):
+    pre = df.loc[inj.event_time - timedelta(hours=cfg.pre_window_hours):inj.event_time]
+    pre = pre.dropna(subset=["p_tube", "p_line"])
+    pre = pre[(pre["p_tube"] > pre["p_line"]) & ((pre["p_tube"] - pre["p_line"]) > 0.1)]
+    irv = df.loc[t_start:t_end].dropna(subset=["p_tube", "p_line"])
+    valid = irv[(irv["p_tube"] > irv["p_line"]) & ((irv["p_tube"] - irv["p_line"]) > 0.1)]
+    calc = calculate_cumulative(calculate_flow_rate(valid.copy(), CHOKE, res.DEFAULT_FLOW))
+    baseline = float(np.median(pre["p_tube"] - pre["p_line"])) if len(pre) else None
+    return {
+        "baseline_dp": baseline,
+        "avg_dp": float(np.median(valid["p_tube"] - valid["p_line"])),
+        "data_points": len(valid),
+        "q_cumulative": round(float(calc["cumulative_flow"].iloc[-1]), 4),
+        "avg_flow_rate": round(float(calc["flow_rate"].mean()), 4),
+        "q_per_unit": (round(float(calc["cumulative_flow"].iloc[-1]) / inj.qty, 4)
+                       if inj.qty else None),
+    }
+
+
+def test_batch_matches_per_irv_reference():
+    df = _pressure()
+    bounds = _boundaries()
+    arrays = res._period_arrays(df, CHOKE, res.DEFAULT_FLOW)
+    for (inj, t_start, t_end), (m, d) in zip(
+            bounds, res._batch_irv_metrics(arrays, bounds, CHOKE, res.DEFAULT_CONFIG)):
+        ref = _ref(df, inj, t_start, t_end)
+        for key, expected in ref.items():
+            assert getattr(m, key) == pytest.approx(expected, abs=1e-4), key
+        pre_start = inj.event_time - timedelta(hours=res.DEFAULT_CONFIG.pre_window_hours)
+        assert d.equals(df.loc[pre_start:t_end])
+
+
+def test_batch_without_choke_and_empty_windows():
+    df = _pressure()
+    bounds = _boundaries(hours=(3, 500), qty=(1.0, 1.0))   # второй ИРВ — за данными
+    arrays = res._period_arrays(df, None, res.DEFAULT_FLOW)
+    (m1, _), (m2, d2) = res._batch_irv_metrics(arrays, bounds, None, res.DEFAULT_CONFIG)
+    assert m1.q_cumulative is None and m1.utilisation_pct > 0
+    assert m2.invalid_reason == "нет данных давления" and d2 is None
+
+    empty = res._period_arrays(pd.DataFrame(), CHOKE, res.DEFAULT_FLOW)
+    results = res._batch_irv_metrics(empty, bounds, CHOKE, res.DEFAULT_CONFIG)
+    assert [m.invalid_reason for m, _ in results] == ["нет данных давления"] * 2
+    assert results[0][0] is not results[1][0]
+
+
+@pytest.fixture
+def db_free(monkeypatch):
+    """analyze/overlay без БД: вбросы, продувки, штуцер и давление — заглушки."""
+    df = _pressure()
+    loads = []
+    raw = [{"id": i, "event_time": inj.event_time, "reagent": "A", "qty": inj.qty,
+            "p_tube": None, "p_line": None} for i, (inj, _, _) in enumerate(_boundaries())]
+
+    def prepare(well_id, start, end, ctx=None):
+        loads.append((start, end))
+        return df.loc[start:end].copy()
+
+    monkeypatch.setattr(res, "_prepare_period_pressure", prepare)
+    monkeypatch.setattr(res, "_get_reagent_injections", lambda *a: raw)
+    monkeypatch.setattr(res, "_get_purge_times", lambda *a: [])
+    monkeypatch.setattr(res, "get_choke_mm", lambda w: CHOKE)
+    monkeypatch.setattr(res, "_get_flow_config", lambda w: res.DEFAULT_FLOW)
+    return loads
+
+
+def test_analyze_and_overlay_load_once(db_free):
+    period = (T0, T0 + timedelta(days=15))
+    out = res.analyze_reagent_effectiveness(1, *period)
+    assert len(db_free) == 1
+    assert len(out["irv_results"]) == 6 and out["scores"]
+
+    overlay = res.get_overlay_data(1, *period)
+    assert len(db_free) == 2
+    by_time = {r["event_time"]: r["metrics"]["baseline_dp"] for r in out["irv_results"]}
+    for curve in overlay["curves"]:
+        assert curve["baseline_dp"] == pytest.approx(round(by_time[curve["event_time"]], 3))
@@ -0,0 +1,225 @@
+"""
+Тесты ReportDataLoader — наборной загрузки данных месячного / сводного отчёта.
+
+Проверяется:
+  - число запросов загрузчика не зависит от числа скважин, помощники
+    месячного отчёта с data= не ходят в БД по скважинам;
+  - _aggregate_monthly_well / _build_status_segments с загрузчиком дают
+    то же, что прежние запросы по одной скважине;
+  - агрегаты flow_result повторяют SQL (NULL пропускаются, медиана =
+    PERCENTILE_CONT), последний вброс до периода — из одного запроса.
+
+Запуск:
+    python -m pytest backend/tests/test_report_data_loader.py -v
+"""
+from __future__ import annotations
+
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import daily_report_service as drs
+from backend.services import pressure_mask_service
+from backend.services.flow_rate import data_access
+from backend.services.report_data_loader import ReportDataLoader
+
+M0, M1 = date(2025, 3, 1), date(2025, 3, 10)
+Ev = namedtuple("Ev", "well event_time event_type purge_phase reagent qty description p_tube p_line")
+
+
+def _wells(n):
+    return [SimpleNamespace(id=i, number=100 + i, name=f"W{i}") for i in range(1, n + 1)]
+
+
+def _events(well):
+    t = datetime(2025, 3, 2, 8) + timedelta(hours=well.id)
+    wno = str(well.number)
+    return [
+        Ev(wno, datetime(2025, 2, 20), "reagent", None, "А", Decimal("1"), "", None, None),
+        Ev(wno, t, "purge", "start", None, None, "продувка", 30.0, 20.0),
+        Ev(wno, t + timedelta(minutes=20), "purge", "stop", None, None, "", None, None),
+        Ev(wno, t + timedelta(hours=3), "reagent", None, "Б", Decimal("1.5"), "", None, None),
+        Ev(wno, t + timedelta(days=2), "reagent", None, "Б", None, "", None, None),
+        Ev(wno, t + timedelta(days=3), "reagent", None, "А", Decimal("2.25"), "", None, None),
+        Ev(wno, t + timedelta(days=4), "other", None, None, None, "Гидрат в шлейфе", None, None),
+        Ev(wno, t + timedelta(days=5), "equip", None, None, None, "снято ДМ", None, None),
+    ]
+
+
+def _status(well):
+    return [("Наблюдение", datetime(2025, 1, 5), datetime(2025, 3, 4)),
+            ("Адаптация", datetime(2025, 3, 4), None)] if well.id % 2 else []
+
+
+class _FakeDB:
+    """Отвечает и на запросы по одной скважине, и на наборные (= ANY)."""
+
+    def __init__(self, wells):
+        self.wells = {w.id: w for w in wells}
+        self.by_no = {str(w.number): w for w in wells}
+        self.queries: list[str] = []
+
+    def execute(self, sql, params=None):
+        q, p = str(sql), params or {}
+        self.queries.append(q)
+        rows = self._rows(q, p)
+        return SimpleNamespace(fetchall=lambda: rows,
+                               fetchone=lambda: rows[0] if rows else None,
+                               scalar=lambda: rows[0][0] if rows else None)
+
+    def _rows(self, q, p):
+        if "well_construction" in q:
+            wnos = p.get("wnos") or [p.get("wno")]
+            if "DISTINCT ON" in q:
+                return [(n, 8.0, "J1\nJ2") for n in wnos]
+            return [("J1\nJ2",)] if "SELECT horizon" in q else [(8.0,)]
+        if "well_sub_status" in q:
+            ids = p.get("ids") or [p.get("wid")]
+            rows = [(i, "ремонт") for i in ids if i % 3 == 0]
+            return rows if "ANY" in q else [(r[1],) for r in rows]
+        if "FROM well_status" in q:
+            if "ANY" in q:
+                return [(i, *r) for i in p["ids"] for r in _status(self.wells[i])]
+            rows = _status(self.wells[p["wid"]])
+            if "dt_start::date" in q:
+                return [(st, a.date(), b and b.date()) for st, a, b in rows
+                        if a.date() <= p["pe"] and (b is None or b.date() >= p["ps"])]
+            return [(rows[-1][0],)] if rows else []
+        if "FROM events" in q:
+            if "ANY" in q:
+                evs = [e for n in p["wnos"] for e in _events(self.by_no[n])]
+                if "MAX(event_time)" in q:
+                    last: dict = {}
+                    for e in evs:
+                        if e.event_type == "reagent" and e.event_time < p["start"]:
+                            last[(e.well, e.reagent)] = max(last.get((e.well, e.reagent), e.event_time),
+                                                            e.event_time)
+                    return [(w, r, t) for (w, r), t in last.items()]
+                return sorted((e for e in evs if p["start"] <= e.event_time <= p["end"]),
+                              key=lambda e: e.event_time)
+            evs = [e for e in _events(self.by_no[p["wno"]])
+                   if p["start"] <= e.event_time <= p["end"]]
+            if "event_type = 'purge'" in q:
+                return [(e.event_time, e.description, e.purge_phase)
+                        for e in evs if e.event_type == "purge"]
+            if "GROUP BY reagent" in q:
+                return drs._reagent_totals(evs)
+            return [(e.event_type, e.description, e.purge_phase) for e in evs]
+        return []
+
+
+def _frame(well_id):
+    rng = np.random.default_rng(well_id)
+    idx = pd.date_range(datetime(2025, 2, 27), datetime(2025, 3, 12), freq="min")
+    pt = 30 + np.cumsum(rng.normal(0, 0.01, len(idx)))
+    pl = 20 + rng.normal(0, 0.3, len(idx))
+    pt[2000:2400] = pl[2000:2400] - 1                   # простой
+    return pd.DataFrame({"p_tube": pt, "p_line": pl}, index=idx.rename("measured_at"))
+
+
+@pytest.fixture
+def pressure(monkeypatch):
+    frames: dict[int, pd.DataFrame] = {}
+    calls = {"single": 0, "many": 0}
+
+    def frame(wid):
+        if wid not in frames:
+            frames[wid] = _frame(wid)
+        return frames[wid]
+
+    def get_pressure_data(well_id, start, end):
+        calls["single"] += 1
+        return frame(well_id).loc[pd.Timestamp(start):pd.Timestamp(end)].copy()
+
+    def get_pressure_data_many(well_ids, start, end):
+        calls["many"] += 1
+        return {w: frame(w).loc[pd.Timestamp(start):pd.Timestamp(end)].copy() for w in well_ids}
+
+    monkeypatch.setattr(data_access, "get_pressure_data", get_pressure_data)
+    monkeypatch.setattr(data_access, "get_pressure_data_many", get_pressure_data_many)
+    monkeypatch.setattr(pressure_mask_service, "load_active_masks", lambda *a, **k: [])
+    monkeypatch.setattr(pressure_mask_service, "preload_mask_indexes", lambda ids: 0)
+    return calls
+
+
+def _monthly_rows(db, wells, data):
+    out = []
+    for w in wells:
+        rows = data.status_rows(w.id, M0, M1) if data else None
+        for seg in drs._build_status_segments(db, w.id, M0, M1, rows=rows):
+            choke = data.choke_mm(w.id) if data else 8.0
+            wd = drs._aggregate_monthly_well(
+                db, w, M0, M1, choke, 5, status_override=seg["status"],
+                segment_start=seg["date_from"], segment_end=seg["date_to"], data=data,
+            )
+            wd["trend"] = drs._compute_multiday_trend(
+                db, w.id, str(w.number), choke, seg["date_to"], 3, "flow", data=data)
+            out.append(wd)
+    return out
+
+
+def test_loader_matches_per_well_queries(pressure):
+    wells = _wells(3)
+    ref = _monthly_rows(_FakeDB(wells), wells, None)
+    db = _FakeDB(wells)
+    data = ReportDataLoader(db, wells, M0 - timedelta(days=1), M1)
+    mine = _monthly_rows(db, wells, data)
+    assert mine == ref
+    assert [r["status"] for r in mine] == ["Наблюдение", "Адаптация", "Не задан",
+                                           "Наблюдение", "Адаптация"]
+    assert mine[3]["substatus"] == "ремонт" and mine[1]["s_hydrate_count"] == 1
+    assert pressure["many"] == 1 and len(db.queries) + 1 == data.queries
+
+
+def test_query_count_constant_in_well_count(pressure, tmp_path, monkeypatch):
+    monkeypatch.setattr(drs, "TEMP_DIR", tmp_path)
+    counts = []
+    for n in (2, 7):
+        wells = _wells(n)
+        db = _FakeDB(wells)
+        data = ReportDataLoader(db, wells, M0 - timedelta(days=1), M1)
+        _monthly_rows(db, wells, data)
+        drs._render_monthly_flow_grid(db, wells, M1, data=data)
+        counts.append((len(db.queries), data.queries))
+    assert counts[0] == counts[1]
+    assert pressure["single"] == 0
+
+
+def test_flow_stats_and_last_reagent(pressure):
+    wells = _wells(2)
+    db = _FakeDB(wells)
+    data = ReportDataLoader(db, wells, M0, M1)
+    data._flow = {1: [(M0, 5.0, 4.0, 1, 9, 10.0, 0, 0, 0),
+                      (M0 + timedelta(days=1), None, None, 1, 9, None, 0, 0, 0),
+                      (M0 + timedelta(days=2), 7.0, 7.0, 1, 9, 2.5, 0, 0, 0),
+                      (M0 + timedelta(days=3), 6.0, 5.0, 1, 9, 1.0, 0, 0, 0)], 2: []}
+    assert data.flow_result_stats(1, M0, M1) == (13.5, 16 / 3, 5.0, 4)
+    assert data.flow_result_stats(1, M0 + timedelta(days=1), M0 + timedelta(days=2)) == (2.5, 7.0, 7.0, 2)
+    assert data.flow_result_stats(2, M0, M1) == (None, None, None, 0)
+    assert data.flow_result_day(1, M0 + timedelta(days=2))[:2] == (7.0, 7.0)
+    with pytest.raises(ValueError):
+        data.flow_result_stats(1, M0 - timedelta(days=1), M1)
+
+    t = datetime(2025, 3, 2, 8) + timedelta(hours=1)
+    assert data.last_reagent_before(1, "Б", t + timedelta(days=2)) == t + timedelta(hours=3)
+    assert data.last_reagent_before(1, "А", t + timedelta(days=3)) == datetime(2025, 2, 20)
+    assert data.last_reagent_before(1, "В", t) is None
+    before = data.queries
+    data.last_reagent_before(2, "А", t)
+    assert data.queries == before
+
+
+def test_preload_then_read_only(pressure):
+    wells = _wells(3)
+    db = _FakeDB(wells)
+    data = ReportDataLoader(db, wells, M0 - timedelta(days=1), M1).preload()
+    loaded = (len(db.queries), data.queries)
+    _monthly_rows(db, wells, data)
+    for w in wells:
+        data.last_reagent_before(w.id, "А", datetime(2025, 3, 1))
+    assert (len(db.queries), data.queries) == loaded
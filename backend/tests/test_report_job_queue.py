@@ -0,0 +1,200 @@
+"""
+Тесты очереди генерации отчётов (report_job_queue) без БД.
+
+Проверяется:
+  - dedupe_key не зависит от порядка ключей params, тип отчёта документа
+    выбирается по meta.report_mode;
+  - report_stage вне задачи — no-op, внутри — этап в stages и отмена по
+    cancel_requested;
+  - run_job: успех / отмена на этапе / ошибка генератора → итоговый статус
+    и время этапов в _finish; пульс обновляет heartbeat на долгом этапе;
+  - worker_loop снимает потерянные задачи (fail_stale) перед каждым
+    выбором задачи; воркеры запускаются не daemon (им нужен пул графиков).
+
+Постановка и выбор задач (FOR UPDATE SKIP LOCKED, advisory lock,
+частичный уникальный индекс) требуют PostgreSQL и здесь не проверяются.
+
+Запуск:
+    python -m pytest backend/tests/test_report_job_queue.py -v
+"""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services import report_job_queue as rjq
+
+
+class _FakeSession:
+    """SessionLocal-заглушка: execute(...).scalar() → cancel_requested."""
+
+    def __init__(self, state: dict):
+        self.state = state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, stmt):
+        self.state["updates"] += 1
+        return SimpleNamespace(scalar=lambda: self.state["cancel"])
+
+    def get(self, model, job_id):
+        return SimpleNamespace(id=job_id, job_type=self.state["job_type"], params={"doc_id": 7})
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.state["rollbacks"] += 1
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    import backend.db
+
+    state = {"cancel": False, "updates": 0, "rollbacks": 0, "job_type": "report_daily",
+             "finished": None}
+    monkeypatch.setattr(backend.db, "SessionLocal", lambda: _FakeSession(state))
+
+    def fake_finish(handle, status, *, artifact, error):
+        state["finished"] = {"status": status, "artifact": artifact, "error": error,
+                             "stages": [s["stage"] for s in handle.stages]}
+
+    monkeypatch.setattr(rjq, "_finish", fake_finish)
+    return state
+
+
+def test_dedupe_key_and_document_kind():
+    a = rjq.dedupe_key("report_adaptation_preview", {"well_id": 5, "sections": {"a": 1, "b": 2}})
+    b = rjq.dedupe_key("report_adaptation_preview", {"sections": {"b": 2, "a": 1}, "well_id": 5})
+    assert a == b and len(a) == 64
+    assert a != rjq.dedupe_key("report_daily", {"well_id": 5, "sections": {"a": 1, "b": 2}})
+
+    def doc(code, mode=None):
+        return SimpleNamespace(doc_type=SimpleNamespace(code=code),
+                               meta={"report_mode": mode} if mode else {})
+
+    assert rjq.document_kind(doc("daily_report_all")) == "daily"
+    assert rjq.document_kind(doc("daily_report_all", "summary")) == "summary"
+    assert rjq.document_kind(doc("daily_report_well", "monthly")) == "monthly"
+    with pytest.raises(ValueError):
+        rjq.document_kind(doc("reagent_expense"))
+
+
+def test_report_stage_outside_job_is_noop(fake_db):
+    rjq.report_stage("charts")
+    assert fake_db["updates"] == 0
+
+
+def test_run_job_success_and_stage_timings(fake_db, monkeypatch):
+    def generator(db, kind, params, job_id):
+        assert (kind, params, job_id) == ("daily", {"doc_id": 7}, 41)
+        rjq.report_stage("charts")
+        rjq.report_stage("charts")          # повтор — без нового этапа
+        rjq.report_stage("latex")
+        return "generated/pdf/x.pdf"
+
+    monkeypatch.setattr(rjq, "_run_document", generator)
+    assert rjq.run_job(41) == "success"
+    assert fake_db["finished"] == {"status": "success", "artifact": "generated/pdf/x.pdf",
+                                   "error": None, "stages": ["data", "charts", "latex"]}
+    assert fake_db["updates"] == 4
+    assert rjq._current.get() is None
+
+
+def test_run_job_cancelled_and_failed(fake_db, monkeypatch):
+    def generator(db, kind, params, job_id):
+        fake_db["cancel"] = True
+        rjq.report_stage("charts")
+        raise AssertionError("не должно дойти")
+
+    monkeypatch.setattr(rjq, "_run_document", generator)
+    assert rjq.run_job(42) == "cancelled"
+    assert fake_db["finished"]["stages"] == ["data", "charts"]
+    assert "charts" in fake_db["finished"]["error"]
+
+    fake_db["cancel"] = False
+
+    def broken(db, kind, params, job_id):
+        raise ValueError("Документ 7 не найден")
+
+    monkeypatch.setattr(rjq, "_run_document", broken)
+    assert rjq.run_job(43) == "failed"
+    assert fake_db["finished"]["error"] == "ValueError: Документ 7 не найден"
+    assert fake_db["rollbacks"] == 2
+
+
+def test_job_status_payload():
+    from datetime import datetime
+
+    job = SimpleNamespace(
+        id=5, job_type="report_adaptation_preview", status="success", stage="done",
+        cancel_requested=False, params={"well_id": 1}, created_at=datetime(2026, 1, 1),
+        started_at=datetime(2026, 1, 1, 0, 1), finished_at=datetime(2026, 1, 1, 0, 2),
+        heartbeat_at=None, error_message=None, artifact_path="generated/pdf/jobs/x.pdf",
+        result_summary={"stages": [{"stage": "data", "at_ms": 0, "ms": 5}], "total_ms": 9},
+    )
+    st = rjq.job_status(job)
+    assert st["kind"] == "adaptation_preview" and st["file_url"] == "/api/jobs/reports/5/file"
+    assert st["total_ms"] == 9 and st["stages"][0]["stage"] == "data"
+    job.status = "queued"
+    assert rjq.job_status(job)["started_at"] is None and rjq.job_status(job)["file_url"] is None
+
+
+def test_heartbeat_during_long_stage(fake_db, monkeypatch):
+    import time
+
+    def generator(db, kind, params, job_id):
+        time.sleep(0.2)                     # долгий этап без смены stage
+        return "generated/pdf/x.pdf"
+
+    monkeypatch.setattr(rjq, "HEARTBEAT_INTERVAL_S", 0.02)
+    monkeypatch.setattr(rjq, "_run_document", generator)
+    assert rjq.run_job(44) == "success"
+    assert fake_db["updates"] > 2           # report_stage("data") + пульсы
+    beats = fake_db["updates"]
+    time.sleep(0.1)
+    assert fake_db["updates"] == beats      # после задачи пульс остановлен
+
+
+def test_worker_loop_reaps_stale_before_each_claim(fake_db, monkeypatch):
+    import threading
+
+    calls: list[str] = []
+    stop = threading.Event()
+
+    def claim(db, limit):
+        calls.append("claim")
+        if calls.count("claim") == 3:
+            stop.set()
+        return None
+
+    monkeypatch.setattr(rjq, "fail_stale", lambda db: calls.append("stale") or 0)
+    monkeypatch.setattr(rjq, "claim_next", claim)
+    rjq.worker_loop(2, stop, poll_s=0)
+    assert calls == ["stale", "claim"] * 3
+
+
+def test_workers_are_not_daemonic(monkeypatch):
+    started: list = []
+
+    class _Proc:
+        def __init__(self, **kw):
+            self.kw = kw
+
+        def start(self):
+            started.append(self.kw)
+
+    ctx = SimpleNamespace(Event=lambda: SimpleNamespace(set=lambda: None), Process=_Proc)
+    monkeypatch.setattr(rjq.multiprocessing, "get_context", lambda method: ctx)
+    monkeypatch.setattr(rjq, "_processes", [])
+    monkeypatch.setattr(rjq.atexit, "register", lambda fn: None)
+    rjq.start_workers(2)
+    assert [kw["daemon"] for kw in started] == [False, False]
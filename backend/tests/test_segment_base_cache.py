@@ -0,0 +1,152 @@
+"""
+Тесты кэша порого-независимой базы сегментного анализа.
+
+Проверяется:
+  - _segment_analysis_dual_from_base(_segment_dual_base(df)) совпадает с
+    прямым _segment_analysis_dual(df) при разных порогах;
+  - get_or_build / invalidate / LRU в segment_base_cache;
+  - compute_segment_block грузит ряд один раз, пока не изменилась версия
+    данных, а смена порогов меняет результат без повторной загрузки.
+
+Запуск:
+    python -m pytest backend/tests/test_segment_base_cache.py -v
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import segment_analysis_module as sam
+from backend.services import segment_analysis_service as sas
+from backend.services import segment_base_cache
+
+
+def _daily_df(n=120, seed=0):
+    rng = np.random.default_rng(seed)
+    q = np.where(np.arange(n) < n // 2, 40.0, 28.0) + rng.normal(0, 1.0, n)
+    shutdown = np.zeros(n)
+    shutdown[30:33] = 1300.0
+    return pd.DataFrame({
+        "date": pd.date_range("2025-01-01", periods=n, freq="D"),
+        "q_gas_total": q,
+        "q_gas_working": q * 0.9 + rng.normal(0, 0.5, n),
+        "shutdown_min": shutdown,
+        "p_wellhead": 60 + rng.normal(0, 1, n),
+        "p_flowline": 20 + rng.normal(0, 0.5, n),
+        "choke_mm": np.where(np.arange(n) < 90, 10.0, 12.0),
+    })
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    segment_base_cache.invalidate()
+    yield
+    segment_base_cache.invalidate()
+
+
+@pytest.fixture
+def thresholds():
+    """Временная подмена SEGMENT_THRESHOLDS с восстановлением."""
+    saved = dict(sam.SEGMENT_THRESHOLDS)
+    yield sam.SEGMENT_THRESHOLDS
+    sam.SEGMENT_THRESHOLDS.clear()
+    sam.SEGMENT_THRESHOLDS.update(saved)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_from_base_matches_direct_analysis(seed, thresholds):
+    df = _daily_df(seed=seed)
+    base = sam._segment_dual_base(df)
+    for overrides in ({}, {"q_change_notable_pct": 3.0, "merge_close_cp_days": 10,
+                           "changepoint_final_filter_pct": 1.0}):
+        thresholds.update(overrides)
+        direct = json.dumps(sam._segment_analysis_dual(df), default=str, sort_keys=True)
+        cached = json.dumps(sam._segment_analysis_dual_from_base(base), default=str,
+                            sort_keys=True)
+        assert cached == direct
+
+
+def test_base_without_working_curve():
+    df = _daily_df().drop(columns=["q_gas_working"])
+    base = sam._segment_dual_base(df)
+    assert base["working"] is None
+    assert sam._segment_analysis_dual_from_base(base) == sam._segment_analysis_dual(df)
+
+
+def test_get_or_build_hit_and_invalidate():
+    calls = []
+
+    def build():
+        calls.append(1)
+        return len(calls)
+
+    key = ("customer_daily", "101", date(2025, 1, 1), date(2025, 3, 1), (10, None))
+    assert segment_base_cache.get_or_build(key, build) == 1
+    assert segment_base_cache.get_or_build(key, build) == 1
+    assert len(calls) == 1
+
+    assert segment_base_cache.invalidate(source="segment_demo") == 0
+    assert segment_base_cache.invalidate(well="101") == 1
+    assert segment_base_cache.get_or_build(key, build) == 2
+
+
+def test_get_or_build_does_not_cache_errors():
+    key = ("customer_daily", "7", None, None, (0, None))
+
+    def broken():
+        raise RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        segment_base_cache.get_or_build(key, broken)
+    assert segment_base_cache.get_or_build(key, lambda: "ok") == "ok"
+
+
+def test_lru_eviction(monkeypatch):
+    monkeypatch.setattr(segment_base_cache, "BASE_CACHE_MAX_ENTRIES", 2)
+    for well in ("1", "2"):
+        segment_base_cache.get_or_build(("s", well), lambda w=well: w)
+    segment_base_cache.get_or_build(("s", "1"), lambda: "stale")  # «1» свежее «2»
+    segment_base_cache.get_or_build(("s", "3"), lambda: "3")
+    assert segment_base_cache.get_or_build(("s", "1"), lambda: "rebuilt") == "1"
+    assert segment_base_cache.get_or_build(("s", "2"), lambda: "rebuilt") == "rebuilt"
+
+
+def test_compute_segment_block_reuses_base(monkeypatch):
+    df = _daily_df()
+    loads = []
+    version = [(len(df), datetime(2025, 5, 1))]
+    effective = dict(sam.SEGMENT_THRESHOLDS)
+
+    def load_for_well(db, well, d_from=None, d_to=None):
+        loads.append(well)
+        return df.copy()
+
+    monkeypatch.setattr(sas, "load_for_well", load_for_well)
+    monkeypatch.setattr(sas, "well_daily_version", lambda *a, **k: version[0])
+    monkeypatch.setattr(sas.settings, "get_effective", lambda: dict(effective))
+    monkeypatch.setattr(sas.settings, "get_metadata",
+                        lambda: {"has_overrides": False, "updated_at": None})
+
+    args = (None, "101", date(2025, 1, 1), date(2025, 4, 30))
+    first = sas.compute_segment_block(*args)
+    assert first["ok"]
+
+    effective["changepoint_final_filter_pct"] = 50.0
+    tuned = sas.compute_segment_block(*args)
+    assert loads == ["101"]
+    assert len(tuned["cp_marks"]) < len(first["cp_marks"])
+
+    version[0] = (len(df), datetime(2025, 5, 2))  # перезагрузка сводки
+    sas.compute_segment_block(*args)
+    assert loads == ["101", "101"]
+
+
+def test_compute_segment_block_no_data(monkeypatch):
+    monkeypatch.setattr(sas, "well_daily_version", lambda *a, **k: (0, None))
+    res = sas.compute_segment_block(None, "101", date(2025, 1, 1), date(2025, 1, 31))
+    assert res["ok"] is False
+    assert segment_base_cache.cache_info()["entries"] == 0
@@ -0,0 +1,150 @@
+"""
+Тесты пакетного расчёта розы нестабильности (stability_rose_batch) и
+превью compute_stability_rose поверх кэша осей.
+
+Проверяется:
+  - лепестки из закэшированных сырых осей (после JSON) совпадают с прямым
+    расчётом _compute_factors;
+  - задача процесса пула: якоря, дедупликация по фактическому дню;
+  - перцентили и предложенные шкалы калибровки;
+  - run_batch без записи (write=False) в текущем процессе;
+  - превью: промах → расчёт + запись, попадание → без загрузки well_daily,
+    активная калибровка меняет лепестки.
+
+Запуск:
+    python -m pytest backend/tests/test_stability_rose_batch.py -v
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import stability_rose_batch as srb
+from backend.services import stability_rose_service as srs
+
+
+def _well_df(n=200, seed=0, well="101"):
+    rng = np.random.default_rng(seed)
+    q = 50 + np.cumsum(rng.normal(0, 0.5, n))
+    return pd.DataFrame({
+        "date": pd.date_range("2025-01-01", periods=n, freq="D"),
+        "ggu": "1",
+        "well": well,
+        "choke_mm": np.where(np.arange(n) < n // 2, 10.0, 12.0),
+        "p_wellhead": 60 + rng.normal(0, 2, n),
+        "p_flowline": 20 + rng.normal(0, 0.3, n),
+        "q_gas_total": q,
+        "q_gas_working": q * 0.95,
+        "shutdown_min": np.where(rng.random(n) < 0.2,
+                                 rng.integers(0, 1440, n), 0).astype(float),
+        "loaded_at": datetime(2025, 8, 1),
+    })
+
+
+@pytest.fixture(autouse=True)
+def _clean_scales():
+    srb.invalidate_active_scales()
+    yield
+    srb.invalidate_active_scales()
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_petals_from_cached_raw_match_direct(seed):
+    df = _well_df(seed=seed)
+    axes = srs._well_daily_axes(df, None)
+    choke = srs._select_current_choke(df.assign(_d=df["date"].dt.date), axes["anchor_eff"])
+    pet, raw, L, conf, _ = srs._compute_factors(srs._filter_by_choke(df, choke))
+    assert raw == axes["raw"] and L == axes["L_star"] and conf == axes["confidence"]
+
+    cached_raw = json.loads(srb._json_raw(axes["raw"]))
+    assert srs._petals_from_raw(cached_raw, conf["trend"]) == pytest.approx(pet)
+
+
+def test_well_task_dedupes_anchors():
+    df = _well_df(n=120)
+    df = df[(df["date"] < "2025-03-01") | (df["date"] > "2025-03-20")]  # пропуск
+    anchors = srb._anchors_for(df, 7, 60)
+    assert anchors[0] is None and len(anchors) == 9
+    out = srb._well_task("101", df.reset_index(drop=True), anchors, 30, 90)
+    days = [a["anchor_eff"] for a in out]
+    assert len(days) == len(set(days)) < len(anchors)
+    assert all(a["well"] == "101" for a in out)
+    assert out[0]["rows_count"] == len(df)
+
+
+def test_anchors_latest_only_by_default():
+    assert srb._anchors_for(_well_df(), 0, 365) == [None]
+
+
+def test_calibrate_percentiles_and_scales():
+    samples = [
+        {"raw": {**{k: float(i) for k in srs.AXES}, "freq": 0.0},
+         "confidence": {k: ("insufficient" if i == 99 else "normal") for k in srs.AXES}}
+        for i in range(100)
+    ]
+    cal = srb.calibrate(samples)
+    assert cal["percentiles"]["trend"]["n"] == 99      # insufficient не в выборке
+    assert cal["percentiles"]["uplift"]["n"] == 100
+    assert cal["scales"]["uplift"] == pytest.approx(np.percentile(np.arange(100.0), 95))
+    assert cal["scales"]["freq"] == srs.SCALES["freq"]  # P95 = 0 → шкала по умолчанию
+    assert cal["scales"]["DSTAR"] == srs.DSTAR
+    assert "purge" not in cal["scales"] and cal["percentiles"]["purge"]["n"] == 100
+
+
+def test_run_batch_without_write(monkeypatch):
+    fleet = pd.concat([_well_df(seed=1, well="101"), _well_df(seed=2, well="205"),
+                       _well_df(n=2, well="7")])
+    monkeypatch.setattr(srb, "load_fleet_daily", lambda wells=None: fleet)
+    res = srb.run_batch(max_workers=1, write=False)
+    assert res["wells_total"] == 3 and res["wells_done"] == 2
+    assert res["samples"] == 2 and res["errors"] == {}
+    assert res["calibration_id"] is None and res["batch_id"] is None
+    assert set(res["calibration"]["scales"]) == {*srs.SCALES, "DSTAR"}
+
+
+@pytest.fixture
+def preview(monkeypatch):
+    """compute_stability_rose без БД: кэш осей в словаре, счётчик загрузок."""
+    df = _well_df(seed=4)
+    state = {"loads": 0, "store": {}, "scales": (dict(srs.SCALES), srs.DSTAR, None)}
+
+    def load_for_well(db, well, **kw):
+        state["loads"] += 1
+        return df.copy()
+
+    def store_axes(well, w_trend, w_downtime, axes_list):
+        for a in axes_list:
+            state["store"][(well, w_trend, w_downtime)] = {
+                **a, "raw": json.loads(srb._json_raw(a["raw"]))}
+        return len(axes_list)
+
+    monkeypatch.setattr(srs.csvc, "load_for_well", load_for_well)
+    monkeypatch.setattr(srs, "_treatment_effectiveness", lambda *a: None)
+    monkeypatch.setattr(srb, "lookup_axes",
+                        lambda well, anchor, wt, wd: state["store"].get((well, wt, wd)))
+    monkeypatch.setattr(srb, "store_axes", store_axes)
+    monkeypatch.setattr(srb, "active_scales", lambda: state["scales"])
+    return state
+
+
+def test_preview_miss_then_hit(preview):
+    first = srs.compute_stability_rose(None, "101")
+    second = srs.compute_stability_rose(None, "101")
+    assert preview["loads"] == 1
+    assert first["petals"] == second["petals"]
+    assert first["anchor"] == second["anchor"] == date(2025, 7, 19).isoformat()
+    assert second["calibration_id"] is None
+
+
+def test_preview_uses_active_calibration(preview):
+    base = srs.compute_stability_rose(None, "101")
+    preview["scales"] = ({k: v * 2 for k, v in srs.SCALES.items()}, srs.DSTAR, 5)
+    tuned = srs.compute_stability_rose(None, "101")
+    assert preview["loads"] == 1
+    assert tuned["calibration_id"] == 5
+    assert tuned["scales"]["trend"] == 2 * srs.SCALES["trend"]
+    assert tuned["index_I"] <= base["index_I"]
@@ -0,0 +1,239 @@
+"""
+Тесты для векторных детекторов changepoints (timeseries_analyzer).
+
+Эталон — прежние циклы `for i in range(n)` со срезами: индексы CP обязаны
+совпадать. Проверяются сами примитивы, detect_changepoints,
+segment_analysis_module._detect_changepoints_extended и штрафные
+бэкенды PELT / бинарной сегментации.
+
+Запуск:
+    python -m pytest backend/tests/test_timeseries_analyzer.py -v
+"""
+from __future__ import annotations
+
+import warnings
+
+import numpy as np
+import pytest
+
+from backend.services import segment_analysis_module as sam
+from backend.services.timeseries_analyzer import (
+    AnalyzerConfig,
+    _detect_level_shifts,
+    _detect_trend_reversals,
+    _rolling_median,
+    binseg_changepoints,
+    cost_local_maxima,
+    detect_changepoints,
+    dip_changepoints,
+    level_shift_cost,
+    pelt_changepoints,
+)
+
+
+# ─── Эталоны: прежние реализации ───
+
+def _ref_rolling_median(series, window):
+    n, half = len(series), window // 2
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.array([
+            np.nanmedian(series[max(0, i - half):min(n, i + half + 1)]) for i in range(n)
+        ])
+
+
+def _ref_level_shifts(smoothed, threshold, config):
+    n = len(smoothed)
+    half_window = max(6, config.min_segment_days // 2)
+    candidates = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for i in range(config.edge_margin_days, n - config.edge_margin_days):
+            left = smoothed[max(0, i - half_window):i]
+            right = smoothed[i:min(n, i + half_window)]
+            if len(left) < 3 or len(right) < 3:
+                continue
+            lm, rm = np.nanmean(left), np.nanmean(right)
+            if np.isfinite(lm) and np.isfinite(rm) and abs(rm - lm) >= threshold:
+                candidates.append((i, abs(rm - lm)))
+    selected = []
+    for idx, _ in sorted(candidates, key=lambda x: -x[1]):
+        if not any(abs(idx - s) < config.merge_close_cp_days for s in selected):
+            selected.append(idx)
+    return sorted(selected)
+
+
+def _ref_trend_reversals(smoothed, config):
+    n = len(smoothed)
+    if n < 20:
+        return []
+    window = max(4, 22 - config.sensitivity * 2)
+    half_w = window // 2
+    threshold_pct = 0.45 - config.sensitivity * 0.035
+    out = []
+    for i in range(window, n - window):
+        region = smoothed[i - window:i + window + 1]
+        if np.isnan(region).all():
+            continue
+        local_max, local_min = np.nanmax(region), np.nanmin(region)
+        local_range = local_max - local_min
+        if local_range < 0.5:
+            continue
+        left_trend = smoothed[i - 1] - smoothed[i - half_w]
+        right_trend = smoothed[i + half_w] - smoothed[i + 1]
+        val = smoothed[i]
+        if val >= local_max - local_range * threshold_pct:
+            if left_trend > 0 and right_trend < 0:
+                out.append(i)
+        elif val <= local_min + local_range * threshold_pct:
+            if left_trend < 0 and right_trend > 0:
+                out.append(i)
+    return out
+
+
+def _ref_cost(y, min_segment):
+    cost = np.zeros(len(y))
+    for i in range(min_segment, len(y) - min_segment):
+        cost[i] = abs(np.mean(y[i:]) - np.mean(y[:i])) + abs(y[i] - y[i - 1]) * 0.5
+    return cost
+
+
+def _ref_dips(y, drop, rec, win):
+    out = set()
+    for i in range(1, len(y) - 1):
+        drop_pct = (y[i] - y[i - 1]) / y[i - 1] * 100 if y[i - 1] != 0 else 0
+        if drop_pct < -drop:
+            out.add(i)
+            for j in range(i + 1, min(i + 1 + win, len(y))):
+                if y[i] != 0 and (y[j] - y[i]) / y[i] * 100 > rec:
+                    out.add(j)
+                    break
+    return sorted(out)
+
+
+def _series(n, seed, kind, nan_share=0.0):
+    rng = np.random.default_rng(seed)
+    if kind == "walk":
+        y = np.round(20 + np.cumsum(rng.normal(0, 1, n)), 1)
+    elif kind == "steps":
+        y = np.repeat(rng.integers(5, 40, size=n // 10 + 1), 10)[:n].astype(float)
+    else:
+        y = 20 + rng.normal(0, 2, n)
+        y[rng.random(n) < 0.05] *= 0.3
+    y[rng.random(n) < nan_share] = np.nan
+    return y
+
+
+CASES = [(n, seed, kind) for seed, n in enumerate([25, 60, 180, 400])
+         for kind in ("walk", "steps", "dips")]
+
+
+# ─── timeseries_analyzer ───
+
+@pytest.mark.parametrize("window", [3, 6, 10, 14])
+def test_rolling_median_matches_reference(window):
+    y = _series(300, window, "walk", nan_share=0.3)
+    y[100:120] = np.nan  # окна целиком из NaN
+    np.testing.assert_array_equal(_rolling_median(y, window), _ref_rolling_median(y, window))
+
+
+@pytest.mark.parametrize("n,seed,kind", CASES)
+@pytest.mark.parametrize("sensitivity", [1, 5, 10])
+def test_window_detectors_match_reference(n, seed, kind, sensitivity):
+    config = AnalyzerConfig(sensitivity=sensitivity).apply_sensitivity()
+    y = _series(n, seed, kind, nan_share=0.1)
+    smoothed = _ref_rolling_median(y, max(3, 15 - sensitivity))
+    threshold = np.nanmedian(y) * config.changepoint_threshold_pct / 100
+    assert _detect_level_shifts(smoothed, threshold, config) == \
+        _ref_level_shifts(smoothed, threshold, config)
+    assert _detect_trend_reversals(smoothed, config) == _ref_trend_reversals(smoothed, config)
+
+
+# ─── Примитивы ───
+
+@pytest.mark.parametrize("n,seed,kind", CASES)
+def test_level_shift_cost_and_maxima(n, seed, kind):
+    y = _series(n, seed, kind)
+    for min_segment in (2, 3, 5):
+        ref = _ref_cost(y, min_segment)
+        cost = level_shift_cost(y, min_segment)
+        np.testing.assert_allclose(cost, ref, rtol=1e-12, atol=1e-12)
+        expected = [
+            i for i in range(min_segment, n - min_segment)
+            if ref[i] >= 3.0 and ref[i] == ref[i - min_segment:i + min_segment + 1].max()
+        ]
+        assert cost_local_maxima(ref, min_segment, 3.0).tolist() == expected
+
+
+def test_level_shift_cost_exact_on_step_series():
+    y = _series(400, 1, "steps")
+    np.testing.assert_array_equal(level_shift_cost(y, 3), _ref_cost(y, 3))
+
+
+@pytest.mark.parametrize("n,seed,kind", CASES)
+def test_dip_changepoints_match_reference(n, seed, kind):
+    y = _series(n, seed, kind)
+    y[n // 2] = 0.0  # нулевой уровень не делит на ноль
+    assert dip_changepoints(y, 25.0, 25.0, 7) == _ref_dips(y, 25.0, 25.0, 7)
+
+
+# ─── segment_analysis_module ───
+
+@pytest.mark.parametrize("n,seed,kind", CASES)
+def test_segment_level_shifts_match_reference(n, seed, kind):
+    y = _series(n, seed, kind, nan_share=0.1)
+    mask = np.isfinite(y)
+    x = np.arange(n)
+    y_clean = y.copy()
+    y_clean[~mask] = np.interp(x[~mask], x[mask], y[mask])
+    med = float(np.nanmedian(np.abs(y_clean)))
+    for min_segment in (2, 3, 5):
+        ref = _ref_cost(y_clean, min_segment)
+        threshold = max(0.3, med * 5.0 / 100.0)
+        expected = {
+            i for i in range(min_segment, n - min_segment)
+            if ref[i] >= threshold and ref[i] == ref[i - min_segment:i + min_segment + 1].max()
+        }
+        assert sam._detect_level_shifts(y, min_segment, 0.3, 5.0) == expected
+
+
+def test_extended_detector_flags_choke_and_shutdown():
+    n = 120
+    y = np.full(n, 20.0)
+    y[60:] = 12.0
+    shutdown = np.zeros(n)
+    shutdown[30:33] = 1300.0
+    choke = np.full(n, 10.0)
+    choke[90:] = 12.0
+    cps = sam._detect_changepoints_extended(y, shutdown, min_segment=3, choke=choke)
+    assert 60 in cps and 90 in cps
+    assert any(30 <= cp <= 33 for cp in cps)  # граница кластера простоев
+
+
+# ─── PELT / бинарная сегментация ───
+
+def _steps_with_noise(seed=0):
+    rng = np.random.default_rng(seed)
+    levels = [10.0, 16.0, 9.0, 14.0]
+    y = np.concatenate([np.full(150, lvl) for lvl in levels])
+    return y + rng.normal(0, 0.5, len(y))
+
+
+@pytest.mark.parametrize("backend", [pelt_changepoints, binseg_changepoints])
+def test_penalized_backends_find_steps(backend):
+    cps = backend(_steps_with_noise(), min_size=5)
+    assert len(cps) == 3
+    assert all(abs(cp - true) <= 2 for cp, true in zip(cps, [150, 300, 450]))
+
+
+def test_pelt_flat_series_has_no_changepoints():
+    rng = np.random.default_rng(1)
+    assert pelt_changepoints(20 + rng.normal(0, 1, 500)) == []
+
+
+def test_detect_changepoints_pelt_method():
+    config = AnalyzerConfig(changepoint_method="pelt")
+    y = _steps_with_noise(2)
+    y[200:210] = np.nan
+    cps = detect_changepoints(y, config)
+    assert len(cps) == 3
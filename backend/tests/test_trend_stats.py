@@ -0,0 +1,91 @@
+"""
+Тесты для backend/services/trend_stats.py — Mann-Kendall и Theil-Sen.
+
+Эталоны — прежние O(n²) расчёты: матрица разностей для S-статистики и
+scipy.stats.theilslopes. Путь выбора наклонов проверяется на малых n
+(THEIL_SEN_EXACT_MAX подменяется на 0).
+
+Запуск:
+    python -m pytest backend/tests/test_trend_stats.py -v
+"""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from backend.services import trend_stats
+from backend.services.trend_stats import (
+    count_inversions,
+    kendall_s,
+    mann_kendall,
+    theil_sen,
+)
+
+
+def _brute_s(y: np.ndarray) -> int:
+    diffs = y[None, :] - y[:, None]
+    return int(np.sign(diffs[np.triu_indices(len(y), k=1)]).sum())
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 3, 8, 97, 1024, 1500])
+def test_count_inversions_matches_brute(n):
+    rng = np.random.default_rng(n)
+    a = np.round(rng.normal(size=n), 1)
+    expected = sum(int((a[i] > a[i + 1:]).sum()) for i in range(n))
+    assert count_inversions(a) == expected
+
+
+@pytest.mark.parametrize("decimals", [0, 1, 3])
+def test_kendall_s_with_ties(decimals):
+    rng = np.random.default_rng(decimals)
+    y = np.round(np.cumsum(rng.normal(size=700)), decimals)
+    assert kendall_s(y) == _brute_s(y)
+
+
+def test_mann_kendall_trend_and_no_trend():
+    rng = np.random.default_rng(0)
+    z_up, p_up = mann_kendall(np.arange(200) * 0.05 + rng.normal(0, 1, 200))
+    assert z_up > 0 and p_up < 0.05
+    z, p = mann_kendall(np.ones(50))
+    assert (z, p) == (0.0, 1.0)
+
+
+def _cases():
+    rng = np.random.default_rng(42)
+    for i in range(8):
+        n = int(rng.integers(50, 1200))
+        x = np.sort(rng.uniform(0, 400, n)) if i % 2 else np.arange(n, dtype=float)
+        y = 0.02 * x + rng.normal(0, 1, n)
+        if i % 3 == 0:
+            y = np.round(y, 1)             # повторяющиеся значения/наклоны
+        if i == 4:
+            x = np.round(x / 4)            # повторяющиеся x
+        if i == 6:
+            y = 3.0 * x - 1.0              # все наклоны равны
+        yield x, y
+
+
+@pytest.mark.parametrize("case", list(_cases()))
+def test_theil_sen_selection_matches_scipy(case, monkeypatch):
+    monkeypatch.setattr(trend_stats, "THEIL_SEN_EXACT_MAX", 0)
+    x, y = case
+    expected = stats.theilslopes(y, x, 0.95)
+    got = theil_sen(y, x, 0.95)
+    np.testing.assert_allclose(got, tuple(expected), rtol=1e-12, atol=1e-12)
+
+
+def test_robust_trend_shape_unchanged():
+    from backend.services.daily_report_service import _robust_trend
+
+    rng = np.random.default_rng(3)
+    hours = list(range(300))
+    values = [4.0 - 0.001 * h + float(rng.normal(0, 0.2)) for h in hours]
+    values[10] = None
+    res = _robust_trend(values, hours)
+    assert set(res) == {
+        "slope_per_day", "slope_low_per_day", "slope_high_per_day", "intercept",
+        "mk_z", "mk_p", "mk_significant", "direction", "n", "method",
+    }
+    assert res["n"] == 299 and res["direction"] == "down"
+    assert res["method"] == "theil-sen + mann-kendall"
@@ -0,0 +1,96 @@
+"""
+Тесты параллельной сборки скважин отчёта (well_build_executor) без БД.
+
+Проверяется:
+  - результаты в порядке скважин при любом порядке завершения потоков,
+    у каждого потока своя сессия, все сессии закрываются;
+  - ошибка скважины → WellBuildResult.error + rollback её сессии,
+    остальные собираются; сводка build_meta;
+  - workers ≤ 1 — в текущем потоке с сессией вызывающего;
+  - ChartBatch.extend переносит задания с target в общий батч.
+
+Запуск:
+    python -m pytest backend/tests/test_well_build_executor.py -v
+"""
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services import well_build_executor as wbe
+from backend.services.chart_render_pool import ChartBatch
+
+
+class _FakeSession:
+    def __init__(self, registry):
+        self.thread = threading.get_ident()
+        self.closed = False
+        self.rollbacks = 0
+        registry.append(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def _wells(n):
+    return [SimpleNamespace(id=i, number=100 + i) for i in range(n)]
+
+
+def test_parallel_order_sessions_and_errors():
+    sessions: list[_FakeSession] = []
+    seen: dict[int, object] = {}
+
+    def build(db, w):
+        assert db.thread == threading.get_ident()     # сессия своего потока
+        seen[w.id] = db
+        time.sleep(0.02 * (5 - w.id))                 # первые заканчивают последними
+        if w.id == 2:
+            raise ValueError("нет давления")
+        return w.number
+
+    results = wbe.run_per_well(_wells(5), build, workers=3,
+                               session_factory=lambda: _FakeSession(sessions))
+    assert [r.value for r in results] == [100, 101, None, 103, 104]
+    assert results[2].error == "ValueError: нет давления"
+    assert seen[2].rollbacks == 1
+    assert 1 < len(sessions) <= 3 and all(s.closed for s in sessions)
+
+    meta = wbe.build_meta(results, 123.44, 3)
+    assert meta["failed"] == 1 and meta["workers"] == 3 and meta["wall_ms"] == 123.4
+    assert [m["well"] for m in meta["wells"]] == ["100", "101", "102", "103", "104"]
+    assert meta["wells"][2]["error"] == "ValueError: нет давления"
+    assert "error" not in meta["wells"][0]
+
+
+def test_sequential_uses_caller_session():
+    db = object()
+    results = wbe.run_per_well(_wells(3), lambda d, w: (d is db, threading.current_thread().name),
+                               db=db, workers=1)
+    assert [r.value for r in results] == [(True, "MainThread")] * 3
+    with pytest.raises(ValueError):
+        wbe.run_per_well(_wells(3), lambda d, w: None, workers=1)
+
+
+def _png(name):
+    return f"{name}.png"
+
+
+def test_chart_batch_extend_keeps_targets():
+    rows = [{}, {}]
+    per_well = [ChartBatch(), ChartBatch()]
+    for i, b in enumerate(per_well):
+        b.add(_png, f"p{i}", target=(rows[i], "chart_path"))
+        b.add(_png, f"d{i}", target=(rows[i], "dp_chart_path"))
+    shared = ChartBatch(workers=1)
+    for b in per_well:
+        shared.extend(b)
+    assert len(shared) == 4 and len(per_well[0]) == 0
+    shared.run()
+    assert rows == [{"chart_path": "p0.png", "dp_chart_path": "d0.png"},
+                    {"chart_path": "p1.png", "dp_chart_path": "d1.png"}]
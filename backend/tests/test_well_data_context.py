@@ -0,0 +1,161 @@
+"""
+Тесты WellDataContext — общих данных скважины на сборку отчёта об адаптации.
+
+Проверяется:
+  - pressure_raw читается одним запросом за объединение объявленных
+    диапазонов, выход за покрытие догружает только недостающий край;
+  - почасовое давление и полный расчёт дебита по срезу контекста совпадают
+    с прямыми _load_masked_hourly / compute_full_flow (включая края среза);
+  - collect_stage_stats по двум этапам с одним контекстом: один запрос
+    давления, события — из контекста (счётчики как в прежних SQL).
+
+Запуск:
+    python -m pytest backend/tests/test_well_data_context.py -v
+"""
+from __future__ import annotations
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import adaptation_report_service as ars
+from backend.services import daily_report_service as drs
+from backend.services import pressure_mask_service
+from backend.services.flow_rate import data_access, full_pipeline
+from backend.services.well_data_context import WellDataContext
+
+T0 = datetime(2025, 3, 1)
+WELL = SimpleNamespace(id=1, number=101)
+Ev = namedtuple("Ev", "event_time event_type purge_phase reagent qty description p_tube p_line")
+
+EVENTS = [
+    Ev(T0 + timedelta(hours=10), "purge", "start", None, None, "", 31.0, 20.0),
+    Ev(T0 + timedelta(hours=10, minutes=5), "purge", "stop", None, None, "", None, None),
+    Ev(T0 + timedelta(hours=30), "reagent", None, "Б", Decimal("1.5"), "", None, None),
+    Ev(T0 + timedelta(hours=40), "purge", None, None, None, "", None, None),
+    Ev(T0 + timedelta(days=4, hours=2), "reagent", None, "А", Decimal("2.25"), "", 30.5, 21.0),
+    Ev(T0 + timedelta(days=4, hours=3), "reagent", None, "Б", None, "", None, None),
+    Ev(T0 + timedelta(days=4, hours=4), "reagent", None, None, Decimal("0.5"), "", None, None),
+]
+
+
+def _frame(days=8, seed=2):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range(T0, periods=days * 1440, freq="min")
+    n = len(idx)
+    pt = 30 + np.cumsum(rng.normal(0, 0.02, n))
+    pl = 20 + rng.normal(0, 0.4, n)
+    pt[rng.random(n) < 0.03] = np.nan
+    pt[3000:3010] = 0.0                 # false-zeros
+    pl[6000:6300] = np.nan              # длинная дыра линии
+    pt[7000:7200] = pl[7000:7200] - 1   # простой
+    return pd.DataFrame({"p_tube": pt, "p_line": pl}, index=idx.rename("measured_at"))
+
+
+class _FakeDB:
+    def __init__(self):
+        self.queries: list[str] = []
+
+    def execute(self, sql, params=None):
+        q = str(sql)
+        self.queries.append(q)
+        if "FROM events" in q:
+            rows = list(EVENTS)
+        elif "well_construction" in q:
+            rows = [(8.0, "J1")]
+        else:
+            rows = []
+        return SimpleNamespace(fetchall=lambda: rows,
+                               fetchone=lambda: rows[0] if rows else None)
+
+
+@pytest.fixture
+def raw(monkeypatch):
+    """pressure_raw/штуцер/продувки/маски без БД; список вызовов pressure_raw."""
+    df = _frame()
+    calls = []
+
+    def get_pressure_data(well_id, start, end):
+        calls.append((pd.Timestamp(start), pd.Timestamp(end)))
+        return df.loc[pd.Timestamp(start):pd.Timestamp(end)].copy()
+
+    def get_purge_events(well_id, start=None, end=None):
+        rows = [(e.event_time, e.purge_phase, e.p_tube, e.p_line, e.description)
+                for e in EVENTS if e.event_type == "purge"
+                and pd.Timestamp(start) <= e.event_time <= pd.Timestamp(end)]
+        out = pd.DataFrame(rows, columns=["event_time", "purge_phase", "p_tube",
+                                          "p_line", "description"])
+        out["event_time"] = pd.to_datetime(out["event_time"])
+        return out
+
+    monkeypatch.setattr(data_access, "get_pressure_data", get_pressure_data)
+    monkeypatch.setattr(data_access, "get_choke_mm", lambda w: 8.0)
+    monkeypatch.setattr(data_access, "get_purge_events", get_purge_events)
+    monkeypatch.setattr(pressure_mask_service, "load_active_masks", lambda *a, **k: [])
+    return SimpleNamespace(df=df, calls=calls)
+
+
+def test_raw_pressure_union_and_edge_extension(raw):
+    ctx = WellDataContext(_FakeDB(), WELL)
+    ctx.cover(T0 + timedelta(days=1), T0 + timedelta(days=2))
+    ctx.cover(T0 + timedelta(days=3), T0 + timedelta(days=5))
+    a = ctx.raw_pressure(T0 + timedelta(days=1, hours=3), T0 + timedelta(days=1, hours=9))
+    b = ctx.raw_pressure(T0 + timedelta(days=4), T0 + timedelta(days=5))
+    assert ctx.raw_loads == 1
+    assert raw.calls == [(pd.Timestamp(T0 + timedelta(days=1)),
+                          pd.Timestamp(T0 + timedelta(days=5)))]
+    assert a.equals(raw.df.loc[T0 + timedelta(days=1, hours=3):T0 + timedelta(days=1, hours=9)])
+    assert b.equals(raw.df.loc[T0 + timedelta(days=4):T0 + timedelta(days=5)])
+
+    c = ctx.raw_pressure(T0 + timedelta(days=4), T0 + timedelta(days=6))
+    assert ctx.raw_loads == 2
+    assert raw.calls[-1][0] > pd.Timestamp(T0 + timedelta(days=5))   # только хвост
+    assert c.equals(raw.df.loc[T0 + timedelta(days=4):T0 + timedelta(days=6)])
+
+
+def test_derived_frames_match_direct_loaders(raw):
+    ctx = WellDataContext(_FakeDB(), WELL)
+    ctx.cover(T0, T0 + timedelta(days=7))
+    s, e = T0 + timedelta(days=1, hours=4, minutes=7), T0 + timedelta(days=5, hours=1)
+
+    assert ctx.masked_hourly(s, e).equals(drs._load_masked_hourly(1, s, e))
+    assert ctx.masked_hourly(s, e) is ctx.masked_hourly(s, e)
+
+    mine = ctx.full_flow(s, e, dp_threshold=0.2)
+    ref = full_pipeline.compute_full_flow(1, s, e, smooth=True, dp_threshold=0.2)
+    assert mine["summary"] == ref["summary"]
+    pd.testing.assert_frame_equal(mine["df"], ref["df"])
+    assert ctx.full_flow(s, e, dp_threshold=0.2) is mine
+    assert ctx.raw_loads == 1
+
+    with pytest.raises(ValueError):
+        ctx.full_flow(T0 - timedelta(days=3), T0 - timedelta(days=2))
+
+
+def test_stage_stats_share_context(raw):
+    db = _FakeDB()
+    ctx = WellDataContext(db, WELL)
+    ctx.cover(T0, T0 + timedelta(days=6))
+    k = drs.KUNGRAD_OFFSET
+    obs = ars.collect_stage_stats(db, WELL, 8.0, T0 + k, T0 + timedelta(days=2) + k, ctx=ctx)
+    adapt = ars.collect_stage_stats(db, WELL, 8.0, T0 + timedelta(days=3) + k,
+                                    T0 + timedelta(days=6) + k, ctx=ctx)
+    assert ctx.raw_loads == 1
+    assert sum("FROM events" in q for q in db.queries) == 1
+
+    assert obs["purge_count"] == 2 and obs["reagent_count"] == 1
+    assert obs["reagent_qty"] == 1.5
+    assert [m["t"][:13] for m in obs["events_for_chart"]] == [
+        "2025-03-01T10", "2025-03-01T10", "2025-03-02T06", "2025-03-02T16"]
+    assert adapt["purge_count"] == 0 and adapt["reagent_count"] == 3
+    assert adapt["reagent_qty"] == 2.75
+    assert adapt["reagent_stats"] == [
+        {"name": "А", "count": 1, "total_qty": 2.25},
+        {"name": "Б", "count": 1, "total_qty": 0.0},
+    ]
+    assert obs["flow_median"] is not None and adapt["chart_data"]
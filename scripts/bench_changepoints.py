@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк детекторов changepoints на поминутных рядах, без БД.
+
+Сравнивает векторные детекторы (префиксные суммы + sliding_window_view) с
+прежними циклами `for i in range(n)`:
+  analyzer  — timeseries_analyzer.detect_changepoints (медиана, скачки, развороты)
+  segment   — segment_analysis_module._detect_level_shifts (ряд ΔP, O(n²) раньше)
+  pelt      — штрафной бэкенд PELT на том же ряду (только новый)
+
+Прежние циклы запускаются только до --legacy-max точек. Колонка match —
+совпадение индексов CP со старым расчётом.
+
+Запуск:
+    PYTHONPATH=. python scripts/bench_changepoints.py [--sizes 1440,10080,43200]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def _synthetic(n: int, seed: int = 9) -> np.ndarray:
+    """Поминутный ΔP: ступени режимов + дрейф + шум + пропуски связи."""
+    rng = np.random.default_rng(seed)
+    levels = rng.uniform(2.0, 8.0, size=n // 2000 + 1)
+    y = np.repeat(levels, 2000)[:n] + np.cumsum(rng.normal(0, 0.002, n))
+    y += rng.normal(0, 0.15, n)
+    y[rng.random(n) < 0.01] = np.nan
+    return np.round(y, 3)
+
+
+# ─── Прежние циклы (копия кода до векторизации) ───
+
+def _legacy_rolling_median(series, window):
+    n, half = len(series), window // 2
+    result = np.empty(n)
+    for i in range(n):
+        result[i] = np.nanmedian(series[max(0, i - half):min(n, i + half + 1)])
+    return result
+
+
+def _legacy_level_shifts(smoothed, threshold, config):
+    n = len(smoothed)
+    half_window = max(6, config.min_segment_days // 2)
+    candidates = []
+    for i in range(config.edge_margin_days, n - config.edge_margin_days):
+        left = smoothed[max(0, i - half_window):i]
+        right = smoothed[i:min(n, i + half_window)]
+        if len(left) < 3 or len(right) < 3:
+            continue
+        lm, rm = np.nanmean(left), np.nanmean(right)
+        if np.isfinite(lm) and np.isfinite(rm) and abs(rm - lm) >= threshold:
+            candidates.append((i, abs(rm - lm)))
+    selected = []
+    for idx, _ in sorted(candidates, key=lambda x: -x[1]):
+        if not any(abs(idx - s) < config.merge_close_cp_days for s in selected):
+            selected.append(idx)
+    return sorted(selected)
+
+
+def _legacy_trend_reversals(smoothed, config):
+    n = len(smoothed)
+    window = max(4, 22 - config.sensitivity * 2)
+    half_w = window // 2
+    threshold_pct = 0.45 - config.sensitivity * 0.035
+    out = []
+    for i in range(window, n - window):
+        region = smoothed[i - window:i + window + 1]
+        local_max, local_min = np.nanmax(region), np.nanmin(region)
+        local_range = local_max - local_min
+        if local_range < 0.5:
+            continue
+        left_trend = smoothed[i - 1] - smoothed[i - half_w]
+        right_trend = smoothed[i + half_w] - smoothed[i + 1]
+        val = smoothed[i]
+        if val >= local_max - local_range * threshold_pct:
+            if left_trend > 0 and right_trend < 0:
+                out.append(i)
+        elif val <= local_min + local_range * threshold_pct:
+            if left_trend < 0 and right_trend > 0:
+                out.append(i)
+    return out
+
+
+def _legacy_segment_shifts(series, min_segment, abs_threshold, rel_threshold_pct):
+    s = np.asarray(series, dtype=float)
+    mask = np.isfinite(s)
+    x_all = np.arange(len(s))
+    s = s.copy()
+    s[~mask] = np.interp(x_all[~mask], x_all[mask], s[mask])
+    n = len(s)
+    med = float(np.nanmedian(np.abs(s)) or 1.0)
+    threshold = max(abs_threshold, med * rel_threshold_pct / 100.0)
+    cost = np.zeros(n)
+    for i in range(min_segment, n - min_segment):
+        cost[i] = abs(np.mean(s[i:]) - np.mean(s[:i])) + abs(s[i] - s[i - 1]) * 0.5
+    return {
+        i for i in range(min_segment, n - min_segment)
+        if cost[i] >= threshold
+        and cost[i] == np.max(cost[max(0, i - min_segment):min(n, i + min_segment + 1)])
+    }
+
+
+def _legacy_detect(series, config):
+    from backend.services import timeseries_analyzer as ta
+
+    saved = ta._rolling_median, ta._detect_level_shifts, ta._detect_trend_reversals
+    ta._rolling_median = _legacy_rolling_median
+    ta._detect_level_shifts = _legacy_level_shifts
+    ta._detect_trend_reversals = _legacy_trend_reversals
+    try:
+        return ta.detect_changepoints(series, config)
+    finally:
+        ta._rolling_median, ta._detect_level_shifts, ta._detect_trend_reversals = saved
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    return res, time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", default="1440,10080,43200")
+    ap.add_argument("--legacy-max", type=int, default=20000)
+    args = ap.parse_args()
+
+    from backend.services.segment_analysis_module import _detect_level_shifts
+    from backend.services.timeseries_analyzer import (
+        AnalyzerConfig,
+        _interpolate_nans,
+        detect_changepoints,
+        pelt_changepoints,
+    )
+
+    warnings.simplefilter("ignore", RuntimeWarning)
+    config = AnalyzerConfig(sensitivity=5).apply_sensitivity()
+
+    print(f"{'n':>7} {'detector':>9} {'new,s':>8} {'legacy,s':>9} {'speedup':>8} {'CPs':>5}  match")
+    for n in (int(v) for v in args.sizes.split(",")):
+        y = _synthetic(n)
+        rows = []
+
+        cps, t_new = _timed(detect_changepoints, y, config)
+        legacy = (lambda: _legacy_detect(y, config)) if n <= args.legacy_max else None
+        rows.append(("analyzer", cps, t_new, legacy))
+
+        cps, t_new = _timed(_detect_level_shifts, y, 60, 0.3, 5.0)
+        legacy = (lambda: _legacy_segment_shifts(y, 60, 0.3, 5.0)) if n <= args.legacy_max else None
+        rows.append(("segment", cps, t_new, legacy))
+
+        cps, t_new = _timed(pelt_changepoints, _interpolate_nans(y), min_size=60)
+        rows.append(("pelt", cps, t_new, None))
+
+        for name, cps, t_new, legacy in rows:
+            t_old, speedup, match = "—", "—", "—"
+            if legacy is not None:
+                old, t = _timed(legacy)
+                t_old, speedup, match = f"{t:.3f}", f"{t / t_new:.0f}×", str(old == cps)
+            print(f"{n:>7} {name:>9} {t_new:>8.3f} {t_old:>9} {speedup:>8} {len(cps):>5}  {match}")
+
+
+if __name__ == "__main__":
+    main()
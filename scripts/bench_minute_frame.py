@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк памяти дебитного тракта: 1 год поминутных данных, одна скважина.
+
+Сравнивает пиковый RSS двух режимов на синтетических данных (без БД):
+  legacy  — старая цепочка: каждый этап делает df.copy(), результат float64
+  compact — run_flow_pipeline: этапы на месте (copy=False) + MinuteFrame float32
+
+Каждый режим запускается в отдельном процессе — ru_maxrss не смешивается.
+
+Запуск:
+    PYTHONPATH=. python scripts/bench_minute_frame.py [--days 365]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def _rss_mb() -> float:
+    # Linux: ru_maxrss в КБ
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _synthetic(days: int):
+    import numpy as np
+    import pandas as pd
+
+    n = days * 24 * 60
+    rng = np.random.default_rng(7)
+    idx = pd.date_range("2025-01-01", periods=n, freq="min")
+    t = np.arange(n)
+    p_tube = 30.0 + 2.0 * np.sin(t / 720.0) + rng.normal(0, 0.2, n)
+    p_line = 25.0 + 0.5 * np.sin(t / 1440.0) + rng.normal(0, 0.1, n)
+    # ложные нули датчика (~4%) и короткие дыры
+    p_tube[rng.random(n) < 0.04] = 0.0
+    p_line[rng.random(n) < 0.04] = 0.0
+    return pd.DataFrame({"p_tube": p_tube, "p_line": p_line}, index=idx)
+
+
+def _run_legacy(df):
+    """Историческая цепочка — копия кадра на каждом этапе."""
+    from datetime import timedelta
+    from backend.services.flow_rate.cleaning import clean_pressure, smooth_pressure
+    from backend.services.flow_rate.calculator import (
+        calculate_flow_rate, calculate_cumulative, calculate_purge_loss,
+    )
+    from backend.services.flow_rate.purge_detector import (
+        PurgeDetector, recalculate_purge_loss_with_cycles,
+    )
+    from backend.services.flow_rate.downtime import detect_downtime_periods
+    from backend.services.flow_rate.summary import build_summary
+
+    df = clean_pressure(df)
+    df = df.copy()  # apply_masks(copy=True) при наличии масок
+    df.index = df.index + timedelta(hours=5)
+    df = smooth_pressure(df)
+    df = calculate_flow_rate(df, 10.0)
+    df = calculate_purge_loss(df)
+    cycles = PurgeDetector().detect(df, None, set())
+    df = recalculate_purge_loss_with_cycles(df, cycles)
+    df = calculate_cumulative(df)
+    periods = detect_downtime_periods(df)
+    dp = df["p_tube"] - df["p_line"]
+    downtime = (dp < 0.1) | df["purge_flag"].astype(bool)
+    df["flow_rate"] = df["flow_rate"].where(~downtime, 0.0)
+    df = calculate_cumulative(df)
+    build_summary(df, periods, 0, 10.0, cycles)
+    return df, int(df.memory_usage(deep=False).sum())
+
+
+def _run_compact(df):
+    from backend.services.flow_rate.full_pipeline import run_flow_pipeline
+
+    res = run_flow_pipeline(df, 10.0, copy=False, compact=True)
+    return res["df"], res["frame"].nbytes
+
+
+def _child(mode: str, days: int) -> None:
+    df = _synthetic(days)
+    rss_before = _rss_mb()
+    t0 = time.perf_counter()
+    out, retained = (_run_legacy if mode == "legacy" else _run_compact)(df)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({
+        "mode": mode,
+        "rows": len(out),
+        "elapsed_s": round(elapsed, 2),
+        "rss_input_mb": round(rss_before, 1),
+        "rss_peak_mb": round(_rss_mb(), 1),
+        "retained_mb": round(retained / 2**20, 1),
+    }))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--child", choices=["legacy", "compact"])
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args.child, args.days)
+        return
+
+    rows = []
+    for mode in ("legacy", "compact"):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--days", str(args.days)],
+            capture_output=True, text=True, check=True,
+        )
+        rows.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{'mode':<8} {'rows':>8} {'time,s':>7} {'RSS in,MB':>10} "
+          f"{'RSS peak,MB':>12} {'Δpeak,MB':>9} {'result,MB':>10}")
+    for r in rows:
+        print(f"{r['mode']:<8} {r['rows']:>8} {r['elapsed_s']:>7} "
+              f"{r['rss_input_mb']:>10} {r['rss_peak_mb']:>12} "
+              f"{r['rss_peak_mb'] - r['rss_input_mb']:>9.1f} {r['retained_mb']:>10}")
+
+
+if __name__ == "__main__":
+    main()
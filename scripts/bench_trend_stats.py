@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк робастного тренда (Theil-Sen + Mann-Kendall) на синтетике, без БД.
+
+Сравнивает daily_report_service._robust_trend (через trend_stats) с прежним
+расчётом: scipy.stats.theilslopes + матрица разностей n×n для S-статистики.
+Прежний расчёт запускается только до --legacy-max точек (O(n²) памяти).
+
+Запуск:
+    PYTHONPATH=. python scripts/bench_trend_stats.py [--sizes 1000,10000,100000]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def _synthetic(n: int, seed: int = 5):
+    """Часовой ряд ΔP: слабый тренд + шум + выбросы + округление датчика."""
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=float)
+    y = 4.0 - 0.0004 * x + rng.normal(0, 0.3, n)
+    spikes = rng.random(n) < 0.01
+    y[spikes] += rng.normal(0, 5, spikes.sum())
+    return x, np.round(y, 2)
+
+
+def _legacy(x: np.ndarray, y: np.ndarray) -> tuple:
+    from scipy import stats
+
+    res = stats.theilslopes(y, x, 0.95)
+    diffs = y[None, :] - y[:, None]
+    s = float(np.sign(diffs[np.triu_indices(len(y), k=1)]).sum())
+    return float(res[0]), float(res[2]), float(res[3]), s
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--legacy-max", type=int, default=5000)
+    args = ap.parse_args()
+
+    from backend.services.daily_report_service import _robust_trend
+    from backend.services.trend_stats import kendall_s
+
+    x0, y0 = _synthetic(3000)
+    _robust_trend(y0.tolist(), x0.tolist())  # прогрев: импорт scipy.stats
+
+    print(f"{'n':>8} {'new,s':>8} {'legacy,s':>9} {'slope/day':>10} "
+          f"{'CI low':>9} {'CI high':>9} {'mk_p':>7} {'S':>12}  match")
+    for n in (int(v) for v in args.sizes.split(",")):
+        x, y = _synthetic(n)
+        t0 = time.perf_counter()
+        res = _robust_trend(y.tolist(), x.tolist())
+        t_new = time.perf_counter() - t0
+        s = kendall_s(y)
+
+        t_old, match = "—", "—"
+        if n <= args.legacy_max:
+            t0 = time.perf_counter()
+            slope, low, high, s_old = _legacy(x, y)
+            t_old = f"{time.perf_counter() - t0:.3f}"
+            match = str(
+                round(slope * 24, 4) == res["slope_per_day"]
+                and round(low * 24, 4) == res["slope_low_per_day"]
+                and round(high * 24, 4) == res["slope_high_per_day"]
+                and s_old == s
+            )
+
+        print(f"{n:>8} {t_new:>8.3f} {t_old:>9} {res['slope_per_day']:>10} "
+              f"{res['slope_low_per_day']:>9} {res['slope_high_per_day']:>9} "
+              f"{res['mk_p']:>7} {s:>12}  {match}")
+
+
+if __name__ == "__main__":
+    main()
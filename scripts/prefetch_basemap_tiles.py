@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Докачка тайлов подложки месторождения в локальное хранилище MBTiles
+(backend/generated/basemap/<провайдер>.mbtiles, см. basemap_tiles).
+
+После неё карта скважины в PDF и /admin/map работают без сети. Уже
+скачанные тайлы повторно не запрашиваются — скрипт можно запускать
+повторно (например, после добавления новых скважин).
+
+Запуск:
+    PYTHONPATH=. python scripts/prefetch_basemap_tiles.py
+    PYTHONPATH=. python scripts/prefetch_basemap_tiles.py --provider esri_imagery opentopomap --zooms 8-15
+    PYTHONPATH=. python scripts/prefetch_basemap_tiles.py --bbox 58.1,43.9,58.9,44.5
+
+Без --bbox — bbox по координатам скважин из БД + отступ --pad-km.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+log = logging.getLogger("prefetch_basemap_tiles")
+
+
+def _zooms(spec: str) -> list[int]:
+    out: list[int] = []
+    for part in spec.split(","):
+        lo, _, hi = part.partition("-")
+        out.extend(range(int(lo), int(hi or lo) + 1))
+    return out
+
+
+def main() -> int:
+    from backend.services import basemap_tiles
+
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--provider", nargs="+", default=["esri_imagery"],
+                    choices=sorted(basemap_tiles.PROVIDERS))
+    ap.add_argument("--zooms", default="8-15", help="например 8-15 или 10,13")
+    ap.add_argument("--bbox", help="west,south,east,north (WGS84)")
+    ap.add_argument("--pad-km", type=float, default=3.0)
+    args = ap.parse_args()
+
+    if args.bbox:
+        bbox = tuple(float(v) for v in args.bbox.split(","))
+    else:
+        import backend.models  # noqa: resolve all relationships
+        from backend.db import SessionLocal
+
+        db = SessionLocal()
+        try:
+            bbox = basemap_tiles.field_bbox(db, pad_km=args.pad_km)
+        finally:
+            db.close()
+        if bbox is None:
+            log.error("нет скважин с координатами — укажите --bbox")
+            return 1
+    log.info("bbox %s, zooms %s", bbox, args.zooms)
+
+    for name in args.provider:
+        stats = basemap_tiles.prefetch(name, bbox, _zooms(args.zooms))
+        log.info("  %s: всего %d, уже были %d, скачано %d, ошибок %d",
+                 name, stats["tiles"], stats["cached"], stats["downloaded"], stats["failed"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())